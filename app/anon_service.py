@@ -1,8 +1,11 @@
+import logging
 import secrets
 import string
 from sqlalchemy.orm import Session
 from app.models import User, AnonMessage
 
+logger = logging.getLogger(__name__)
+
 
 class AnonService:
     def generate_link_uid(self, length=10):
@@ -25,7 +28,7 @@ class AnonService:
             return user.anon_link_uid
         except Exception as e:
             db.rollback()
-            print(f"❌ Ошибка создания ссылки: {e}")
+            logger.error(f"❌ Ошибка создания ссылки: {e}")
             return None
 
     def get_user_by_link_uid(self, db: Session, link_uid: str):
@@ -33,7 +36,7 @@ class AnonService:
         try:
             return db.query(User).filter(User.anon_link_uid == link_uid).first()
         except Exception as e:
-            print(f"❌ Ошибка поиска пользователя: {e}")
+            logger.error(f"❌ Ошибка поиска пользователя: {e}")
             return None
 
     def get_or_create_user(self, db: Session, telegram_id: int, username: str = None, first_name: str = None,
@@ -57,7 +60,7 @@ class AnonService:
                 if updated:
                     db.commit()
                     db.refresh(user)
-                    print(f"🔄 Обновлены данные пользователя {telegram_id}")
+                    logger.debug(f"🔄 Обновлены данные пользователя {telegram_id}", extra={"sampled": True})
             else:
                 user = User(
                     telegram_id=telegram_id,
@@ -68,25 +71,26 @@ class AnonService:
                 db.add(user)
                 db.commit()
                 db.refresh(user)
-                print(f"✅ Создан новый пользователь {telegram_id}")
+                logger.info(f"✅ Создан новый пользователь {telegram_id}")
             return user
         except Exception as e:
             db.rollback()
-            print(f"❌ Ошибка создания/обновления пользователя: {e}")
+            logger.error(f"❌ Ошибка создания/обновления пользователя: {e}")
             return None
 
     def add_anon_message(self, db: Session, receiver_link_uid: str, text: str, sender_id: int = None,
                          reply_to_message_id: int = None):
         """Добавить анонимное сообщение"""
         try:
-            print(f"🔍 Поиск получателя с UID ссылки: {receiver_link_uid}")
+            # Горячий путь каждого анонимного сообщения: в лог попадает каждая N-я запись
+            logger.debug(f"🔍 Поиск получателя с UID ссылки: {receiver_link_uid}", extra={"sampled": True})
 
             receiver = self.get_user_by_link_uid(db, receiver_link_uid)
             if not receiver:
-                print(f"❌ Получатель с UID {receiver_link_uid} не найден")
+                logger.info(f"❌ Получатель с UID {receiver_link_uid} не найден")
                 return None
 
-            print(f"✅ Получатель найден: TG ID={receiver.telegram_id}, Имя={receiver.first_name}")
+            logger.debug(f"✅ Получатель найден: TG ID={receiver.telegram_id}", extra={"sampled": True})
 
             message = AnonMessage(
                 sender_id=sender_id,
@@ -100,12 +104,12 @@ class AnonService:
             db.commit()
             db.refresh(message)
 
-            print(f"✅ Сообщение сохранено: ID={message.id}")
+            logger.debug(f"✅ Сообщение сохранено: ID={message.id}", extra={"sampled": True})
 
             return message, receiver.telegram_id
         except Exception as e:
             db.rollback()
-            print(f"❌ Ошибка сохранения сообщения: {e}")
+            logger.error(f"❌ Ошибка сохранения сообщения: {e}")
             return None
 
     def get_user_received_messages(self, db: Session, user_id: int):
@@ -114,7 +118,7 @@ class AnonService:
             return db.query(AnonMessage).filter(AnonMessage.receiver_id == user_id).order_by(
                 AnonMessage.timestamp.desc()).all()
         except Exception as e:
-            print(f"❌ Ошибка получения сообщений: {e}")
+            logger.error(f"❌ Ошибка получения сообщений: {e}")
             return []
 
     def get_message_by_id(self, db: Session, message_id: int):
@@ -122,7 +126,7 @@ class AnonService:
         try:
             return db.query(AnonMessage).filter(AnonMessage.id == message_id).first()
         except Exception as e:
-            print(f"❌ Ошибка поиска сообщения: {e}")
+            logger.error(f"❌ Ошибка поиска сообщения: {e}")
             return None
 
     def get_conversation_thread(self, db: Session, original_message_id: int):
@@ -141,7 +145,7 @@ class AnonService:
 
             return list(reversed(messages))  # Возвращаем в хронологическом порядке
         except Exception as e:
-            print(f"❌ Ошибка получения цепочки: {e}")
+            logger.error(f"❌ Ошибка получения цепочки: {e}")
             return []
 
     def get_original_sender_link(self, db: Session, message_id: int):
@@ -163,7 +167,7 @@ class AnonService:
 
             return None
         except Exception as e:
-            print(f"❌ Ошибка получения ссылки отправителя: {e}")
+            logger.error(f"❌ Ошибка получения ссылки отправителя: {e}")
             return None
 
     def get_user_stats(self, db: Session, user_id: int):
@@ -177,7 +181,7 @@ class AnonService:
                 'has_link': has_link
             }
         except Exception as e:
-            print(f"❌ Ошибка получения статистики: {e}")
+            logger.error(f"❌ Ошибка получения статистики: {e}")
             return {'total_messages': 0, 'has_link': False}
 
 
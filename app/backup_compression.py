@@ -0,0 +1,360 @@
+"""
+Сжатые бэкапы (zstd/gzip) с разбиением на части
+
+Снимок БД снимается sqlite backup API шагами во временный файл (блокировка держится только
+на время шага) и потоком проходит через компрессор в файлы частей - сжатие идет без
+блокировки рабочей БД. Части не превышают лимит загрузки
+Telegram (50 MB для ботов). Для SQLite сжатый бэкап прозрачно распаковывается во временный
+файл (materialized_backup), поэтому проверка и восстановление работают с любым форматом.
+
+Имена: backup_X.db.gz / backup_X.db.zst, при разбиении - backup_X.db.gz.001, .002, ...
+"""
+import os
+import re
+import gzip
+import sqlite3
+import logging
+import tempfile
+import threading
+from contextlib import contextmanager
+from typing import BinaryIO, Callable, Iterator, List, Optional
+
+# zstandard - необязательная зависимость: без нее используется gzip
+try:
+    import zstandard
+    ZSTD_AVAILABLE = True
+except ImportError:
+    zstandard = None
+    ZSTD_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+# none - обычные .db, gzip / zstd - сжатые бэкапы, auto - zstd, если установлен, иначе gzip
+BACKUP_COMPRESSION = os.getenv("BACKUP_COMPRESSION", "none").lower()
+
+# Максимальный размер части (лимит Telegram для ботов 50 MB, берем с запасом)
+BACKUP_PART_SIZE = int(os.getenv("BACKUP_PART_SIZE", 49 * 1024 * 1024))
+
+EXTENSIONS = {"gzip": ".gz", "zstd": ".zst"}
+MAGIC = {"gzip": b"\x1f\x8b", "zstd": b"\x28\xb5\x2f\xfd"}
+
+_COMPRESSED_RE = re.compile(r"\.db\.(gz|zst)(\.\d{3})?$")
+_PART_RE = re.compile(r"\.(\d{3})$")
+
+READ_SIZE = 1024 * 1024
+# Страниц за один шаг backup() при снятии снимка
+SNAPSHOT_STEP_PAGES = int(os.getenv("BACKUP_STEP_PAGES", 256))
+
+
+def resolve_method(method: Optional[str] = None) -> Optional[str]:
+    """Метод сжатия: 'gzip', 'zstd' или None (без сжатия)"""
+    method = (method or BACKUP_COMPRESSION).lower()
+    if method in ("none", "", "false", "0"):
+        return None
+    if method == "auto":
+        return "zstd" if ZSTD_AVAILABLE else "gzip"
+    if method == "zstd" and not ZSTD_AVAILABLE:
+        logger.warning("⚠️ zstandard не установлен, бэкап будет сжат gzip")
+        return "gzip"
+    if method not in EXTENSIONS:
+        raise ValueError(f"Неизвестный метод сжатия: {method}")
+    return method
+
+
+def is_compressed_backup(path: str) -> bool:
+    return bool(_COMPRESSED_RE.search(os.path.basename(path)))
+
+
+def is_backup_filename(filename: str) -> bool:
+    """Файл - бэкап: .db, сжатый .db.gz/.db.zst или первая часть многотомного бэкапа"""
+    if filename.endswith('.db'):
+        return True
+    match = _COMPRESSED_RE.search(filename)
+    return bool(match) and match.group(2) in (None, ".001")
+
+
+def backup_parts(path: str) -> List[str]:
+    """Все части бэкапа по пути к первой части (для цельного файла - он сам)"""
+    match = _PART_RE.search(path)
+    if not match or not is_compressed_backup(path):
+        return [path]
+
+    base = path[:match.start()]
+    parts = []
+    index = 1
+    while os.path.exists(f"{base}.{index:03d}"):
+        parts.append(f"{base}.{index:03d}")
+        index += 1
+    return parts
+
+
+def backup_size(path: str) -> int:
+    """Суммарный размер всех частей бэкапа"""
+    return sum(os.path.getsize(part) for part in backup_parts(path))
+
+
+def detect_method(path: str) -> Optional[str]:
+    """Метод сжатия по сигнатуре файла (None - обычный файл SQLite)"""
+    with open(path, 'rb') as f:
+        head = f.read(4)
+    for method, magic in MAGIC.items():
+        if head.startswith(magic):
+            return method
+    return None
+
+
+class PartWriter:
+    """Файлоподобный объект: пишет поток в части не больше part_size"""
+
+    def __init__(self, base_path: str, part_size: int = BACKUP_PART_SIZE):
+        self.base_path = base_path
+        self.part_size = part_size
+        self.parts: List[str] = []
+        self._file: Optional[BinaryIO] = None
+        self._written = 0
+
+    def _open_next(self):
+        if self._file is not None:
+            self._file.close()
+        self.parts.append(f"{self.base_path}.{len(self.parts) + 1:03d}.tmp")
+        self._file = open(self.parts[-1], 'wb')
+        self._written = 0
+
+    def write(self, data: bytes) -> int:
+        view = memoryview(data)
+        while view:
+            if self._file is None or self._written >= self.part_size:
+                self._open_next()
+            n = min(len(view), self.part_size - self._written)
+            self._file.write(view[:n])
+            self._written += n
+            view = view[n:]
+        return len(data)
+
+    def flush(self):
+        if self._file is not None:
+            self._file.flush()
+
+    def close(self) -> List[str]:
+        """Закрыть и переименовать части. Единственная часть сохраняется без номера"""
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+        if len(self.parts) == 1:
+            final = [self.base_path]
+        else:
+            final = [part[:-len(".tmp")] for part in self.parts]
+        for tmp, path in zip(self.parts, final):
+            os.replace(tmp, path)
+        self.parts = final
+        return final
+
+    def abort(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        for part in self.parts:
+            if os.path.exists(part):
+                os.remove(part)
+        self.parts = []
+
+
+class PartReader:
+    """Файлоподобный объект: последовательное чтение всех частей как одного потока"""
+
+    def __init__(self, path: str):
+        self._parts = backup_parts(path)
+        self._index = 0
+        self._file: Optional[BinaryIO] = None
+
+    def read(self, size: int = -1) -> bytes:
+        chunks = []
+        while size != 0:
+            if self._file is None:
+                if self._index >= len(self._parts):
+                    break
+                self._file = open(self._parts[self._index], 'rb')
+                self._index += 1
+            data = self._file.read(size)
+            if not data:
+                self._file.close()
+                self._file = None
+                continue
+            chunks.append(data)
+            if size > 0:
+                size -= len(data)
+        return b"".join(chunks)
+
+    def readable(self) -> bool:
+        return True
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+@contextmanager
+def consistent_db_file(db_path: str, step_pages: int = SNAPSHOT_STEP_PAGES) -> Iterator[BinaryIO]:
+    """
+    Открыть согласованный снимок БД для чтения.
+
+    Снимок снимается sqlite backup API шагами по step_pages страниц во временный файл рядом
+    с БД: блокировка чтения держится только на время шага (с учетом WAL), поэтому запись в БД
+    не ждет, пока снимок сжимается или хэшируется. Временный файл удаляется при выходе.
+    """
+    fd, snapshot_path = tempfile.mkstemp(
+        prefix=os.path.basename(db_path) + ".", suffix=".snapshot.tmp", dir=os.path.dirname(db_path) or "."
+    )
+    os.close(fd)
+    try:
+        source = sqlite3.connect(f"file:{db_path}?mode=ro", uri=True)
+        target = sqlite3.connect(snapshot_path)
+        try:
+            source.backup(target, pages=step_pages)
+        finally:
+            target.close()
+            source.close()
+
+        with open(snapshot_path, 'rb') as f:
+            yield f
+    finally:
+        if os.path.exists(snapshot_path):
+            os.remove(snapshot_path)
+
+
+def _compressor_stream(method: str, writer: PartWriter):
+    if method == "zstd":
+        return zstandard.ZstdCompressor(level=int(os.getenv("BACKUP_ZSTD_LEVEL", 10))).stream_writer(writer, closefd=False)
+    return gzip.GzipFile(fileobj=writer, mode='wb', compresslevel=int(os.getenv("BACKUP_GZIP_LEVEL", 6)))
+
+
+def compress_stream(source: BinaryIO, dest_path: str, method: str, total: int = 0,
+                    part_size: int = BACKUP_PART_SIZE,
+                    progress_callback: Optional[Callable[[int, int], None]] = None,
+                    cancel_event: Optional[threading.Event] = None) -> Optional[List[str]]:
+    """
+    Сжать поток в dest_path (с разбиением на части). Возвращает список частей
+    или None при отмене (частично записанные файлы удаляются).
+    """
+    writer = PartWriter(dest_path, part_size)
+    try:
+        compressor = _compressor_stream(method, writer)
+        done = 0
+        while True:
+            if cancel_event is not None and cancel_event.is_set():
+                compressor.close()
+                writer.abort()
+                return None
+            data = source.read(READ_SIZE)
+            if not data:
+                break
+            compressor.write(data)
+            done += len(data)
+            if progress_callback:
+                progress_callback(done, total or done)
+        compressor.close()
+        return writer.close()
+    except Exception:
+        writer.abort()
+        raise
+
+
+def compress_db(db_path: str, dest_path: str, method: str, snapshot: bool = True, **kwargs) -> Optional[List[str]]:
+    """
+    Сжать согласованный снимок рабочей БД. snapshot=False - готовый файл .db, который никто
+    не меняет (например, несжатый бэкап): сжимается напрямую, без снимка.
+    """
+    total = os.path.getsize(db_path)
+    if not snapshot:
+        with open(db_path, 'rb') as source:
+            return compress_stream(source, dest_path, method, total=total, **kwargs)
+    with consistent_db_file(db_path) as source:
+        return compress_stream(source, dest_path, method, total=total, **kwargs)
+
+
+def open_backup(path: str) -> BinaryIO:
+    """Открыть бэкап любого формата как поток несжатых байтов"""
+    method = detect_method(backup_parts(path)[0])
+    if method is None:
+        return open(path, 'rb')
+
+    reader = PartReader(path)
+    if method == "zstd":
+        if not ZSTD_AVAILABLE:
+            reader.close()
+            raise RuntimeError("Для чтения .zst бэкапа нужен пакет zstandard")
+        return zstandard.ZstdDecompressor().stream_reader(reader)
+    return gzip.GzipFile(fileobj=reader, mode='rb')
+
+
+def decompress_to(path: str, target_path: str):
+    """Распаковать бэкап в файл (через временный файл)"""
+    tmp_path = f"{target_path}.part"
+    try:
+        with open_backup(path) as source, open(tmp_path, 'wb') as dst:
+            while True:
+                data = source.read(READ_SIZE)
+                if not data:
+                    break
+                dst.write(data)
+        os.replace(tmp_path, target_path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+def _unpacked_path(path: str) -> str:
+    """Уникальный временный файл рядом с бэкапом (без расширения .db - не попадет в список бэкапов)"""
+    fd, tmp_path = tempfile.mkstemp(
+        prefix=os.path.basename(backup_parts(path)[0]) + ".",
+        suffix=".unpacked.tmp",
+        dir=os.path.dirname(path) or "."
+    )
+    os.close(fd)
+    return tmp_path
+
+
+@contextmanager
+def materialized_backup(path: str) -> Iterator[str]:
+    """Путь к файлу SQLite для бэкапа любого формата (сжатый распаковывается во временный файл)"""
+    if not is_compressed_backup(path):
+        yield path
+        return
+
+    tmp_path = _unpacked_path(path)
+    try:
+        decompress_to(path, tmp_path)
+        yield tmp_path
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+class _UnpackedBackupConnection(sqlite3.Connection):
+    """Соединение с распакованной копией бэкапа: временный файл удаляется при close()"""
+
+    unpacked_path: Optional[str] = None
+
+    def close(self):
+        super().close()
+        if self.unpacked_path and os.path.exists(self.unpacked_path):
+            os.remove(self.unpacked_path)
+
+
+def connect_backup(path: str) -> sqlite3.Connection:
+    """sqlite3.connect для бэкапа любого формата"""
+    if not is_compressed_backup(path):
+        return sqlite3.connect(path)
+
+    tmp_path = _unpacked_path(path)
+    try:
+        decompress_to(path, tmp_path)
+        conn = sqlite3.connect(tmp_path, factory=_UnpackedBackupConnection)
+    except Exception:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    conn.unpacked_path = tmp_path
+    return conn
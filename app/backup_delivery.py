@@ -0,0 +1,113 @@
+"""
+Рассылка бэкапов админам: одна загрузка файла, остальным - по file_id
+
+Первая успешная отправка загружает файл в Telegram и возвращает file_id, остальным админам
+документ уходит параллельно по этому file_id без повторной загрузки. file_id сохраняется
+в манифесте бэкапов, поэтому повторная отправка старого бэкапа вообще не загружает файл.
+"""
+import asyncio
+import logging
+from typing import Any, Dict, Iterable, List, Optional
+
+from aiogram.types import FSInputFile
+
+from app.backup_manifest import BackupManifest
+
+logger = logging.getLogger(__name__)
+
+
+def normalize_admin_ids(admin_ids: Any) -> List[int]:
+    """ADMIN_IDS как список int (список, строка через запятую или одно значение)"""
+    if isinstance(admin_ids, str):
+        raw = [part.strip() for part in admin_ids.split(',')]
+    elif isinstance(admin_ids, Iterable):
+        raw = list(admin_ids)
+    else:
+        raw = [admin_ids]
+
+    result = []
+    for value in raw:
+        if value in (None, ""):
+            continue
+        try:
+            result.append(int(value))
+        except (TypeError, ValueError):
+            logger.warning(f"⚠️ Некорректный ID админа: {value}")
+    return result
+
+
+async def fan_out_document(bot, admin_ids: Iterable[int], path: Optional[str], caption: str = None,
+                           parse_mode: Optional[str] = None, file_id: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Отправить документ всем админам.
+
+    Без file_id файл загружается один раз (админам по очереди до первой удачной отправки),
+    остальным отправка идет параллельно по полученному file_id. Если переданный file_id
+    больше не принимается, файл загружается заново (если path указан).
+    """
+    admin_ids = list(admin_ids)
+    result = {"file_id": file_id, "sent": 0, "total": len(admin_ids), "uploaded": False, "errors": {}}
+    pending = list(admin_ids)
+
+    if file_id is None:
+        if path is None:
+            result["errors"] = {admin_id: "нет файла для загрузки" for admin_id in pending}
+            return result
+
+        while pending and file_id is None:
+            admin_id = pending.pop(0)
+            try:
+                message = await bot.send_document(
+                    chat_id=admin_id,
+                    document=FSInputFile(path),
+                    caption=caption,
+                    parse_mode=parse_mode
+                )
+                file_id = message.document.file_id
+                result["uploaded"] = True
+                result["sent"] += 1
+            except Exception as e:
+                logger.error(f"❌ Ошибка загрузки бэкапа админу {admin_id}: {e}")
+                result["errors"][admin_id] = str(e)
+
+    if file_id is not None and pending:
+        responses = await asyncio.gather(*(
+            bot.send_document(chat_id=admin_id, document=file_id, caption=caption, parse_mode=parse_mode)
+            for admin_id in pending
+        ), return_exceptions=True)
+
+        for admin_id, response in zip(pending, responses):
+            if isinstance(response, Exception):
+                logger.error(f"❌ Ошибка отправки бэкапа админу {admin_id} по file_id: {response}")
+                result["errors"][admin_id] = str(response)
+            else:
+                result["sent"] += 1
+
+    # Сохраненный file_id не сработал ни для кого - загружаем файл заново
+    if result["sent"] == 0 and result["file_id"] is not None and path is not None:
+        logger.warning("⚠️ Сохраненный file_id не принят, загружаю файл заново")
+        return await fan_out_document(bot, admin_ids, path, caption, parse_mode)
+
+    result["file_id"] = file_id
+    return result
+
+
+async def send_backup_file(bot, admin_ids: Iterable[int], path: str, caption: str = None,
+                           parse_mode: Optional[str] = None) -> Dict[str, Any]:
+    """Отправить файл бэкапа админам с кэшем file_id в манифесте бэкапов"""
+    manifest = BackupManifest.for_file(path)
+    cached = manifest.get_telegram_cache(path, bot.id, "file") if manifest else None
+
+    result = await fan_out_document(
+        bot, admin_ids, path, caption, parse_mode,
+        file_id=cached["file_ids"][0] if cached else None
+    )
+
+    if manifest and result["file_id"] and result["file_id"] != (cached or {}).get("file_ids", [None])[0]:
+        manifest.set_telegram_cache(path, bot.id, {"file_ids": [result["file_id"]]}, "file")
+
+    logger.info(
+        f"📤 Бэкап {path}: отправлено {result['sent']}/{result['total']}, "
+        f"{'загружен' if result['uploaded'] else 'без загрузки (file_id)'}"
+    )
+    return result
@@ -0,0 +1,247 @@
+"""
+Фоновые задачи бэкапа: выделенный поток, прогресс, отмена и статус
+
+Хэндлеры не вызывают блокирующий DatabaseManager.create_backup напрямую, а ставят задачу
+в очередь и опрашивают ее статус, поэтому цикл событий бота и веб-панели не замирает.
+"""
+import os
+import asyncio
+import logging
+import contextvars
+import threading
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from app.database_manager import DatabaseManager, db_manager
+from app.metrics import backup_job_seconds
+
+logger = logging.getLogger(__name__)
+
+
+class BackupJob:
+    """Задача создания бэкапа"""
+
+    FINISHED_STATES = ("done", "failed", "cancelled")
+
+    def __init__(self, backup_name: Optional[str] = None, send_to_admins: bool = True,
+                 incremental: bool = False, export: Optional[Dict[str, Any]] = None,
+                 import_path: Optional[str] = None):
+        self.id = uuid.uuid4().hex[:8]
+        self.backup_name = backup_name
+        self.send_to_admins = send_to_admins
+        self.incremental = incremental
+        self.export = export  # параметры DatabaseManager.export_data (для задач экспорта)
+        self.import_path = import_path  # дамп для DatabaseManager.import_data (для задач импорта)
+        self.state = "queued"  # queued -> running -> done / failed / cancelled
+        self.pages_done = 0   # для экспорта - строки, для импорта - байты дампа
+        self.pages_total = 0
+        self.result_path: Optional[str] = None
+        self.error: Optional[str] = None
+        self.created_at = datetime.now()
+        self.started_at: Optional[datetime] = None
+        self.finished_at: Optional[datetime] = None
+        self.cancel_event = threading.Event()
+
+    @property
+    def finished(self) -> bool:
+        return self.state in self.FINISHED_STATES
+
+    @property
+    def progress(self) -> float:
+        """Прогресс в процентах"""
+        if self.state == "done":
+            return 100.0
+        if not self.pages_total:
+            return 0.0
+        return round(self.pages_done * 100 / self.pages_total, 1)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "id": self.id,
+            "state": self.state,
+            "backup_name": self.backup_name,
+            "incremental": self.incremental,
+            "export": self.export,
+            "import_path": self.import_path,
+            "progress": self.progress,
+            "pages_done": self.pages_done,
+            "pages_total": self.pages_total,
+            "result_path": self.result_path,
+            "error": self.error,
+            "created_at": self.created_at.isoformat(),
+            "started_at": self.started_at.isoformat() if self.started_at else None,
+            "finished_at": self.finished_at.isoformat() if self.finished_at else None,
+        }
+
+
+class BackupJobRunner:
+    """
+    Очередь бэкапов на одном выделенном потоке.
+
+    Бэкапы выполняются строго по одному, поэтому два одновременных запроса
+    не копируют БД параллельно. Последние max_history задач хранятся для статуса.
+    """
+
+    def __init__(self, manager: DatabaseManager, max_history: int = 20):
+        self.manager = manager
+        self.max_history = max_history
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="backup")
+        self._jobs: "OrderedDict[str, BackupJob]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def submit(self, backup_name: Optional[str] = None, send_to_admins: bool = True,
+               incremental: bool = False, export: Optional[Dict[str, Any]] = None,
+               import_path: Optional[str] = None) -> BackupJob:
+        """
+        Поставить бэкап в очередь. Возвращает задачу сразу, не дожидаясь копирования.
+        incremental=True создает инкрементальный снимок (result_path - имя снимка).
+        """
+        # Отправка бэкапа админам из потока идет через цикл событий вызывающего кода
+        try:
+            self.manager.loop = asyncio.get_running_loop()
+        except RuntimeError:
+            pass
+
+        job = BackupJob(backup_name, send_to_admins, incremental, export, import_path)
+        with self._lock:
+            self._jobs[job.id] = job
+            while len(self._jobs) > self.max_history:
+                oldest_id, oldest = next(iter(self._jobs.items()))
+                if not oldest.finished:
+                    break
+                del self._jobs[oldest_id]
+
+        # Контекст вызывающего кода (как в asyncio.to_thread): импорт подменяет БД через шлюз,
+        # и запрос, ожидающий задачу, не должен считаться незавершенным
+        self._executor.submit(contextvars.copy_context().run, self._run, job)
+        logger.info(f"📥 {self._kind(job)} поставлен в очередь: задача {job.id}")
+        return job
+
+    def submit_export(self, fmt: str = "sql", compression: Optional[str] = "none", name: str = "database_export",
+                      query: Optional[str] = None, params: tuple = ()) -> BackupJob:
+        """Поставить потоковый экспорт в ту же очередь (result_path - файл экспорта, прогресс - в строках)"""
+        return self.submit(name, send_to_admins=False, export={
+            "fmt": fmt, "compression": compression, "name": name, "query": query, "params": params
+        })
+
+    def submit_import(self, dump_path: str) -> BackupJob:
+        """Поставить импорт дампа (SQL/JSONL) в очередь: прогресс - в байтах дампа, result_path - путь БД"""
+        return self.submit(os.path.basename(dump_path), send_to_admins=False, import_path=dump_path)
+
+    @staticmethod
+    def _kind(job: BackupJob) -> str:
+        if job.export is not None:
+            return "Экспорт"
+        if job.import_path is not None:
+            return "Импорт"
+        return "Бэкап"
+
+    @staticmethod
+    def _metric_kind(job: BackupJob) -> str:
+        if job.export is not None:
+            return "export"
+        if job.import_path is not None:
+            return "import"
+        return "incremental" if job.incremental else "backup"
+
+    def _run(self, job: BackupJob):
+        if job.cancel_event.is_set():
+            job.state = "cancelled"
+            job.finished_at = datetime.now()
+            return
+
+        job.state = "running"
+        job.started_at = datetime.now()
+
+        def on_progress(done: int, total: int):
+            job.pages_done = done
+            job.pages_total = total
+
+        try:
+            if job.export is not None:
+                job.result_path = self.manager.export_data(
+                    **job.export,
+                    progress_callback=on_progress,
+                    cancel_event=job.cancel_event
+                )
+            elif job.import_path is not None:
+                if self.manager.import_data(job.import_path, progress_callback=on_progress,
+                                            cancel_event=job.cancel_event):
+                    job.result_path = self.manager.db_path
+            elif job.incremental:
+                job.result_path = self.manager.create_incremental_backup(
+                    job.backup_name,
+                    progress_callback=on_progress,
+                    cancel_event=job.cancel_event
+                )
+            else:
+                job.result_path = self.manager.create_backup(
+                    job.backup_name,
+                    send_to_admins=job.send_to_admins,
+                    progress_callback=on_progress,
+                    cancel_event=job.cancel_event
+                )
+            if job.result_path:
+                job.state = "done"
+            elif job.cancel_event.is_set():
+                job.state = "cancelled"
+            else:
+                job.state = "failed"
+                job.error = {
+                    "Экспорт": "Не удалось выполнить экспорт",
+                    "Импорт": "Не удалось импортировать дамп",
+                }.get(self._kind(job), "Не удалось создать бэкап")
+        except Exception as e:
+            logger.error(f"❌ Ошибка задачи бэкапа {job.id}: {e}")
+            job.state = "failed"
+            job.error = str(e)
+        finally:
+            job.finished_at = datetime.now()
+
+        duration = (job.finished_at - job.started_at).total_seconds()
+        backup_job_seconds.observe(duration, kind=self._metric_kind(job), state=job.state)
+        logger.info(f"📦 Задача бэкапа {job.id}: {job.state} за {duration:.1f} сек")
+
+    def get(self, job_id: str) -> Optional[BackupJob]:
+        return self._jobs.get(job_id)
+
+    def list_jobs(self) -> List[BackupJob]:
+        """Задачи от новых к старым"""
+        return list(reversed(self._jobs.values()))
+
+    def get_active(self) -> Optional[BackupJob]:
+        """Выполняющаяся или ожидающая задача"""
+        for job in self._jobs.values():
+            if not job.finished:
+                return job
+        return None
+
+    def cancel(self, job_id: str) -> bool:
+        """Отменить задачу: ожидающая не начнется, выполняющаяся остановится на следующем шаге"""
+        job = self._jobs.get(job_id)
+        if job is None or job.finished:
+            return False
+        job.cancel_event.set()
+        logger.info(f"⏹️ Запрошена отмена бэкапа {job.id}")
+        return True
+
+    async def wait(self, job: BackupJob, poll_interval: float = 0.5,
+                   on_progress: Optional[Callable[[BackupJob], Awaitable[None]]] = None) -> BackupJob:
+        """Дождаться завершения задачи, опрашивая статус (цикл событий не блокируется)"""
+        last_progress = None
+        while not job.finished:
+            if on_progress is not None and job.progress != last_progress:
+                last_progress = job.progress
+                try:
+                    await on_progress(job)
+                except Exception as e:
+                    logger.debug(f"⚠️ Ошибка обновления прогресса бэкапа: {e}")
+            await asyncio.sleep(poll_interval)
+        return job
+
+
+# Глобальный экземпляр
+backup_jobs = BackupJobRunner(db_manager)
@@ -0,0 +1,246 @@
+"""
+Индекс бэкапов (backups/manifest.json)
+
+Для каждого файла бэкапа хранится размер, mtime, SHA-256, размер БД в страницах, таблицы,
+оценка числа записей (MAX(rowid), без COUNT(*)) и результат проверки. Запись обновляется при создании бэкапа, а при листинге файл
+открывается заново только если изменились его размер или mtime.
+"""
+import os
+import json
+import sqlite3
+import logging
+import threading
+from datetime import datetime
+from typing import Any, Dict, Iterable, Optional
+
+from app.backup_compression import backup_parts, connect_backup, is_compressed_backup
+from app.backup_verify import file_sha256, read_header
+
+logger = logging.getLogger(__name__)
+
+REQUIRED_TABLES = ('users', 'anon_messages', 'payments')
+
+# Один замок на файл манифеста: экземпляры BackupManifest в разных модулях не мешают друг другу
+_locks: Dict[str, threading.RLock] = {}
+_locks_guard = threading.Lock()
+
+
+def _lock_for(path: str) -> threading.RLock:
+    with _locks_guard:
+        return _locks.setdefault(os.path.abspath(path), threading.RLock())
+
+
+# Поля, без которых запись считается устаревшей (манифест старого формата)
+_ENTRY_FIELDS = ("size", "mtime", "is_valid", "sha256", "page_count", "row_counts")
+
+
+def estimate_row_counts(conn) -> Dict[str, Optional[int]]:
+    """
+    Таблицы и оценка числа строк без сканирования: MAX(rowid) - O(log n) по B-дереву
+    (после удалений - с запасом, пустая таблица - 0). Для WITHOUT ROWID таблиц - None.
+    """
+    tables = [row[0] for row in conn.execute(
+        "SELECT name FROM sqlite_master WHERE type='table' AND name NOT LIKE 'sqlite_%' ORDER BY name"
+    )]
+    counts: Dict[str, Optional[int]] = {}
+    for table in tables:
+        try:
+            counts[table] = conn.execute(f'SELECT MAX(rowid) FROM "{table}"').fetchone()[0] or 0
+        except Exception:
+            counts[table] = None
+    return counts
+
+
+def inspect_backup(path: str, required_tables: Iterable[str] = REQUIRED_TABLES,
+                   row_counts: Optional[Dict[str, Optional[int]]] = None,
+                   previous: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """
+    Собрать запись для манифеста: checksum и заголовок читаются всегда, таблицы и число
+    записей - из row_counts (оценка по исходной БД на момент бэкапа), из прежней записи с тем
+    же SHA-256 или оценкой по MAX(rowid). Сжатый бэкап распаковывается, только если ни того,
+    ни другого нет (файл, которого манифест еще не видел).
+    """
+    parts = backup_parts(path)
+    stat = os.stat(path)
+    entry = {
+        "size": sum(os.path.getsize(part) for part in parts),
+        "mtime": stat.st_mtime,
+        "compressed": is_compressed_backup(path),
+        "parts": len(parts),
+        "sha256": file_sha256(path),
+        "page_size": None,
+        "page_count": None,
+        "tables": [],
+        "row_counts": {},
+        "total_records": 0,
+        "approximate": True,
+        "is_valid": False,
+        "error": None,
+        "checked_at": datetime.now().isoformat(),
+    }
+
+    if row_counts is None and previous and previous.get("sha256") == entry["sha256"] and "row_counts" in previous:
+        row_counts = previous["row_counts"]
+
+    try:
+        entry.update(read_header(path))
+        if row_counts is None:
+            if entry["compressed"]:
+                conn = connect_backup(path)
+            else:
+                conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+            try:
+                row_counts = estimate_row_counts(conn)
+            finally:
+                conn.close()
+
+        entry["row_counts"] = dict(row_counts)
+        entry["tables"] = sorted(row_counts)
+        entry["total_records"] = sum(count or 0 for count in entry["row_counts"].values())
+        entry["is_valid"] = any(table in entry["tables"] for table in required_tables)
+    except Exception as e:
+        entry["error"] = str(e)
+
+    return entry
+
+
+class BackupManifest:
+    """Манифест бэкапов: имя файла -> запись inspect_backup()"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.lock = _lock_for(path)
+
+    def load(self) -> Dict[str, Dict[str, Any]]:
+        try:
+            if os.path.exists(self.path):
+                with open(self.path, 'r', encoding='utf-8') as f:
+                    return json.load(f)
+        except Exception as e:
+            logger.warning(f"⚠️ Манифест бэкапов поврежден, будет пересоздан: {e}")
+        return {}
+
+    def save(self, entries: Dict[str, Dict[str, Any]]):
+        """Атомарно сохранить манифест"""
+        try:
+            tmp_file = f"{self.path}.tmp"
+            with open(tmp_file, 'w', encoding='utf-8') as f:
+                json.dump(entries, f, indent=2, ensure_ascii=False)
+            os.replace(tmp_file, self.path)
+        except Exception as e:
+            logger.warning(f"⚠️ Не удалось сохранить манифест бэкапов: {e}")
+
+    @staticmethod
+    def is_fresh(entry: Optional[Dict[str, Any]], size: int, mtime: float) -> bool:
+        """Запись актуальна: полная и файл не менялся"""
+        return (
+            entry is not None
+            and all(field in entry for field in _ENTRY_FIELDS)
+            and entry["size"] == size
+            and entry["mtime"] == mtime
+        )
+
+    @staticmethod
+    def carry_over(old: Optional[Dict[str, Any]], entry: Dict[str, Any], created: bool = False) -> Dict[str, Any]:
+        """
+        Кэш file_id и позиция журнала изменений переживают перепроверку, если содержимое файла
+        не изменилось. Если изменилось - SHA-256 на момент создания сохраняется, и проверка
+        целостности продолжает сверять с ним (created=True - бэкап создан заново под тем же именем).
+        """
+        if not old or not old.get("sha256"):
+            return entry
+        original = old.get("created_sha256", old["sha256"])
+        if original == entry["sha256"]:
+            for field in ("telegram", "journal_seq"):
+                if field in old:
+                    entry[field] = old[field]
+        elif not created:
+            entry["created_sha256"] = original
+            entry["verify_ok"] = False
+            entry["verify_error"] = "Файл изменился после создания бэкапа"
+        return entry
+
+    def get(self, filename: str, size: int, mtime: float) -> Optional[Dict[str, Any]]:
+        """Актуальная запись или None"""
+        entry = self.load().get(filename)
+        return entry if self.is_fresh(entry, size, mtime) else None
+
+    def record(self, path: str, row_counts: Optional[Dict[str, Optional[int]]] = None, **extra) -> Dict[str, Any]:
+        """
+        Проверить бэкап и записать результат в манифест (extra - дополнительные поля записи).
+        row_counts - оценка числа записей по исходной БД на момент бэкапа (см. estimate_row_counts).
+        """
+        name = os.path.basename(path)
+        entry = inspect_backup(path, row_counts=row_counts, previous=self.load().get(name))
+        with self.lock:
+            entries = self.load()
+            entries[name] = self.carry_over(entries.get(name), entry, created=True)
+            entry.update(extra)
+            self.save(entries)
+        return entry
+
+    def entry_for(self, path: str) -> Optional[Dict[str, Any]]:
+        """
+        Запись бэкапа даже если файл менялся после создания: для проверки целостности
+        нужны именно значения, записанные при создании.
+        """
+        return self.load().get(os.path.basename(path))
+
+    def set_verification(self, path: str, result: Dict[str, Any]):
+        """Запомнить результат проверки целостности"""
+        with self.lock:
+            entries = self.load()
+            entry = entries.get(os.path.basename(path))
+            if entry is None:
+                return
+            entry["verified_at"] = datetime.now().isoformat()
+            entry["verify_ok"] = result["ok"]
+            entry["verify_error"] = result.get("error")
+            self.save(entries)
+
+    def remove(self, filename: str):
+        with self.lock:
+            entries = self.load()
+            if entries.pop(filename, None) is not None:
+                self.save(entries)
+
+    @classmethod
+    def for_file(cls, path: str) -> Optional["BackupManifest"]:
+        """Манифест директории файла, если он есть (у рабочей БД манифеста нет)"""
+        manifest_path = os.path.join(os.path.dirname(os.path.abspath(path)), 'manifest.json')
+        return cls(manifest_path) if os.path.exists(manifest_path) else None
+
+    def _fresh_entry(self, entries: Dict[str, Dict[str, Any]], path: str) -> Optional[Dict[str, Any]]:
+        try:
+            size = sum(os.path.getsize(part) for part in backup_parts(path))
+            mtime = os.stat(path).st_mtime
+        except OSError:
+            return None
+        entry = entries.get(os.path.basename(path))
+        return entry if self.is_fresh(entry, size, mtime) else None
+
+    def get_telegram_cache(self, path: str, bot_id: int, variant: str = "parts") -> Optional[Dict[str, Any]]:
+        """
+        Сохраненные file_id бэкапа для бота (None, если файл менялся или не отправлялся).
+        
+        variant разделяет способы отправки: "parts" - подготовленные (сжатые) части,
+        "file" - файл как есть.
+        """
+        entry = self._fresh_entry(self.load(), path)
+        if entry is None:
+            return None
+        return entry.get("telegram", {}).get(str(bot_id), {}).get(variant)
+
+    def set_telegram_cache(self, path: str, bot_id: int, data: Optional[Dict[str, Any]], variant: str = "parts"):
+        """Запомнить file_id отправленного бэкапа (data=None - забыть)"""
+        with self.lock:
+            entries = self.load()
+            entry = self._fresh_entry(entries, path)
+            if entry is None:
+                return
+            cache = entry.setdefault("telegram", {}).setdefault(str(bot_id), {})
+            if data is None:
+                cache.pop(variant, None)
+            else:
+                cache[variant] = data
+            self.save(entries)
@@ -6,7 +6,7 @@ from datetime import datetime
 from aiogram import Bot
 from app.config import BOT_TOKEN, ADMIN_IDS
 from app.database import DATA_DIR
-from aiogram.types import BufferedInputFile
+from app.backup_delivery import normalize_admin_ids, send_backup_file
 import logging
 
 logger = logging.getLogger(__name__)
@@ -96,80 +96,33 @@ class BackupService:
                 logger.warning("⚠️ BOT_TOKEN или ADMIN_IDS не установлены, пропускаю отправку в Telegram")
                 return False
                 
+            admin_ids_list = normalize_admin_ids(ADMIN_IDS)
+            if not admin_ids_list:
+                logger.error(f"❌ Некорректный формат ADMIN_IDS: {ADMIN_IDS}")
+                return False
+            
             bot = Bot(token=BOT_TOKEN)
             backup_name = os.path.basename(backup_path)
             file_size = os.path.getsize(backup_path)
             file_size_mb = file_size / (1024 * 1024)
             
-            # Читаем файл
-            with open(backup_path, 'rb') as f:
-                file_data = f.read()
-            
-            success_count = 0
-            error_count = 0
-            
-            # Обрабатываем ADMIN_IDS в зависимости от их типа
-            admin_ids_list = []
-            
-            if isinstance(ADMIN_IDS, list):
-                # Если это список
-                admin_ids_list = ADMIN_IDS
-            elif isinstance(ADMIN_IDS, str):
-                # Если это строка с разделителями
-                for admin_id_str in ADMIN_IDS.split(','):
-                    admin_id_clean = admin_id_str.strip()
-                    if admin_id_clean:
-                        try:
-                            admin_ids_list.append(int(admin_id_clean))
-                        except ValueError:
-                            logger.warning(f"⚠️ Некорректный ID админа: {admin_id_str}")
-            else:
-                # Если это одиночное значение
-                try:
-                    admin_ids_list = [int(ADMIN_IDS)]
-                except (ValueError, TypeError):
-                    logger.error(f"❌ Некорректный формат ADMIN_IDS: {ADMIN_IDS}")
-                    return False
-            
-            for admin_id_int in admin_ids_list:
-                try:
-                    # Проверяем, что это число
-                    if not isinstance(admin_id_int, int):
-                        admin_id_int = int(admin_id_int)
-                    
-                    # Используем BufferedInputFile для aiogram 3.x
-                    input_file = BufferedInputFile(
-                        file=file_data,
-                        filename=backup_name
-                    )
-                    
-                    await bot.send_document(
-                        chat_id=admin_id_int,
-                        document=input_file,
-                        caption=(
-                            f"📦 <b>Автоматический backup базы</b>\n\n"
-                            f"📁 Файл: {backup_name}\n"
-                            f"📊 Размер: {file_size_mb:.2f} MB\n"
-                            f"⏰ Дата: {datetime.now().strftime('%d.%m.%Y %H:%M')}\n\n"
-                            f"💾 Сохраните для восстановления"
-                        ),
-                        parse_mode="HTML"
-                    )
-                    
-                    success_count += 1
-                    logger.info(f"✅ Backup автоматически отправлен админу {admin_id_int}")
-                    
-                    # Небольшая задержка между отправками
-                    await asyncio.sleep(0.5)
-                    
-                except Exception as e:
-                    error_count += 1
-                    logger.error(f"❌ Ошибка отправки админу {admin_id_int}: {e}")
+            # Файл загружается один раз, остальным админам - по file_id
+            result = await send_backup_file(
+                bot, admin_ids_list, backup_path,
+                caption=(
+                    f"📦 <b>Автоматический backup базы</b>\n\n"
+                    f"📁 Файл: {backup_name}\n"
+                    f"📊 Размер: {file_size_mb:.2f} MB\n"
+                    f"⏰ Дата: {datetime.now().strftime('%d.%m.%Y %H:%M')}\n\n"
+                    f"💾 Сохраните для восстановления"
+                ),
+                parse_mode="HTML"
+            )
             
             await bot.session.close()
             
-            logger.info(f"📤 Итог отправки: успешно {success_count}, ошибок {error_count}")
-            return success_count > 0
+            logger.info(f"📤 Итог отправки: успешно {result['sent']}, ошибок {len(result['errors'])}")
+            return result["sent"] > 0
             
         except Exception as e:
             logger.error(f"❌ Ошибка автоматической отправки backup: {e}")
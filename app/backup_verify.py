@@ -0,0 +1,137 @@
+"""
+Проверка целостности бэкапов без сканирования таблиц
+
+При создании бэкапа в манифест записываются SHA-256 файла и размер БД в страницах (из
+заголовка SQLite). Проверка пересчитывает хэш потоком (или через mmap) и сверяет
+заголовок - строки таблиц не читаются, время проверки упирается только в диск.
+PRAGMA quick_check открывает БД и проходит по всем страницам, поэтому запускается
+только по запросу.
+"""
+import os
+import mmap
+import time
+import hashlib
+import logging
+from typing import Any, Dict, List, Optional
+
+from app.backup_compression import backup_parts, connect_backup, is_compressed_backup, open_backup
+
+logger = logging.getLogger(__name__)
+
+# Хэшировать через mmap (меньше копирований для больших несжатых бэкапов)
+BACKUP_VERIFY_MMAP = os.getenv("BACKUP_VERIFY_MMAP", "false").lower() in ("1", "true", "yes", "on")
+
+SQLITE_MAGIC = b"SQLite format 3\x00"
+HEADER_SIZE = 100
+
+_READ_SIZE = 1024 * 1024
+
+
+def file_sha256(path: str, use_mmap: bool = BACKUP_VERIFY_MMAP) -> str:
+    """SHA-256 бэкапа (для многотомного - по всем частям подряд)"""
+    digest = hashlib.sha256()
+    for part in backup_parts(path):
+        with open(part, 'rb') as f:
+            if use_mmap and os.fstat(f.fileno()).st_size > 0:
+                with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                    view = memoryview(mapped)
+                    try:
+                        for offset in range(0, len(view), _READ_SIZE):
+                            digest.update(view[offset:offset + _READ_SIZE])
+                    finally:
+                        view.release()
+            else:
+                for block in iter(lambda: f.read(_READ_SIZE), b""):
+                    digest.update(block)
+    return digest.hexdigest()
+
+
+def read_header(path: str) -> Dict[str, Any]:
+    """
+    Размер страницы и число страниц из заголовка SQLite (сжатый бэкап распаковывается
+    только на первые 100 байт). page_count=None - в заголовке нет достоверного значения.
+    """
+    stream = open_backup(path)
+    try:
+        header = stream.read(HEADER_SIZE)
+    finally:
+        stream.close()
+    return parse_header(header)
+
+
+def parse_header(header: bytes) -> Dict[str, Any]:
+    """Размер страницы и число страниц из первых 100 байт файла SQLite (см. read_header)"""
+    if len(header) < HEADER_SIZE or not header.startswith(SQLITE_MAGIC):
+        raise ValueError("Файл не является базой данных SQLite")
+
+    page_size = int.from_bytes(header[16:18], 'big')
+    if page_size == 1:
+        page_size = 65536
+    if page_size < 512 or page_size & (page_size - 1):
+        raise ValueError(f"Некорректный размер страницы SQLite: {page_size}")
+    page_count = int.from_bytes(header[28:32], 'big')
+    # Число страниц в заголовке достоверно, только если его записала версия SQLite, сменившая счетчик
+    if not page_count or header[24:28] != header[92:96]:
+        page_count = None
+    return {"page_size": page_size, "page_count": page_count}
+
+
+def verify_backup(path: str, expected: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """
+    Проверка бэкапа: заголовок SQLite, размер файла по числу страниц и SHA-256.
+
+    expected - запись манифеста (sha256 / created_sha256, page_size, page_count), сохраненная
+    при создании.
+    Без нее проверяются только заголовок и размер.
+    """
+    started = time.perf_counter()
+    result = {
+        "ok": False,
+        "sha256": None,
+        "sha256_match": None,
+        "page_size": None,
+        "page_count": None,
+        "pages_match": None,
+        "error": None,
+        "seconds": 0.0,
+    }
+    expected = expected or {}
+
+    try:
+        result.update(read_header(path))
+        page_size, page_count = result["page_size"], result["page_count"]
+
+        if not is_compressed_backup(path):
+            file_size = os.path.getsize(path)
+            if page_count is None:
+                page_count = result["page_count"] = file_size // page_size
+            if file_size < page_size * page_count:
+                raise ValueError(f"Файл обрезан: {file_size:,} байт при {page_count} стр. x {page_size} байт")
+
+        if expected.get("page_count") is not None:
+            result["pages_match"] = (expected["page_count"], expected.get("page_size")) == (page_count, page_size)
+            if not result["pages_match"]:
+                raise ValueError(f"Число страниц {page_count}, в манифесте {expected['page_count']}")
+
+        result["sha256"] = file_sha256(path)
+        expected_sha256 = expected.get("created_sha256") or expected.get("sha256")
+        if expected_sha256:
+            result["sha256_match"] = result["sha256"] == expected_sha256
+            if not result["sha256_match"]:
+                raise ValueError("SHA-256 не совпадает с записанным при создании")
+
+        result["ok"] = True
+    except Exception as e:
+        result["error"] = str(e)
+
+    result["seconds"] = round(time.perf_counter() - started, 3)
+    return result
+
+
+def quick_check(path: str, max_errors: int = 10) -> List[str]:
+    """PRAGMA quick_check (по запросу: читает все страницы БД). ["ok"] - БД цела"""
+    conn = connect_backup(path)
+    try:
+        return [row[0] for row in conn.execute(f"PRAGMA quick_check({int(max_errors)})")]
+    finally:
+        conn.close()
@@ -17,6 +17,12 @@ class BotRestarter:
     def __init__(self):
         self.bot_process = None
         self.bot_script = self._find_bot_script()
+        self.supervisor = None  # Установлен, если бот работает в процессе supervisor.py
+    
+    def attach_supervisor(self, supervisor):
+        """Перезапуск и статус бота через супервизор (бот в том же процессе)"""
+        self.supervisor = supervisor
+        logger.info("✅ Перезапуск бота переключен на супервизор")
     
     def _find_bot_script(self):
         """Найти скрипт запуска бота"""
@@ -139,6 +145,9 @@ class BotRestarter:
         """Перезапустить бота"""
         logger.info("🔄 Начинаю перезапуск бота...")
         
+        if self.supervisor is not None:
+            return await self.supervisor.restart_service("bot")
+        
         # 1. Завершаем текущий процесс
         kill_success = await self.kill_bot()
         if not kill_success:
@@ -159,6 +168,18 @@ class BotRestarter:
     
     async def get_bot_status(self):
         """Получить статус бота"""
+        if self.supervisor is not None:
+            service_status = self.supervisor.get_service("bot").get_status()
+            proc = psutil.Process(os.getpid())
+            return {
+                "status": service_status["state"],
+                "pid": os.getpid(),
+                "running": service_status["state"] == "running",
+                "restarts": service_status["restarts"],
+                "memory_percent": proc.memory_percent(),
+                "create_time": datetime.fromtimestamp(proc.create_time()).isoformat(),
+            }
+        
         pid = await self.find_bot_pid()
         
         if not pid:
@@ -1,9 +1,11 @@
+import time
 import logging
 import asyncio
 from sqlalchemy.orm import Session
 from aiogram import Bot
 from app.database import get_db
 from app.models import User
+from app.metrics import broadcast_messages, broadcast_seconds, instrument_bot
 
 logger = logging.getLogger(__name__)
 
@@ -13,6 +15,7 @@ class BroadcastService:
 
     def set_bot(self, bot: Bot):
         """Установить бота для рассылки"""
+        instrument_bot(bot)
         self.bot = bot
 
     async def broadcast_to_all(self, message_text: str, admin_id: int):
@@ -37,6 +40,7 @@ class BroadcastService:
             )
 
             # Рассылка с задержкой чтобы не превысить лимиты Telegram
+            started = time.perf_counter()
             for user in users:
                 try:
                     await self.bot.send_message(
@@ -45,6 +49,7 @@ class BroadcastService:
                         parse_mode="HTML"
                     )
                     success += 1
+                    broadcast_messages.inc(result="sent")
                     
                     # Задержка между сообщениями
                     if success % 10 == 0:  # Каждые 10 сообщений
@@ -52,8 +57,11 @@ class BroadcastService:
                         
                 except Exception as e:
                     failed += 1
+                    broadcast_messages.inc(result="failed")
                     logger.error(f"❌ Ошибка отправки пользователю {user.telegram_id}: {e}")
 
+            broadcast_seconds.observe(time.perf_counter() - started)
+
             # Отчет админу
             report = (
                 f"📊 <b>Рассылка завершена</b>\n\n"
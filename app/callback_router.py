@@ -0,0 +1,208 @@
+"""
+Индекс callback_data: диспетчеризация по префиксному дереву вместо цепочек F.data.startswith()
+
+Все callback-хэндлеры регистрируются в одном индексе. Поиск хэндлера идет за O(длины callback_data)
+независимо от количества зарегистрированных кнопок, а разбор данных выполняют типизированные фабрики.
+"""
+import logging
+from collections import namedtuple
+from typing import Callable, Dict, Optional
+
+from aiogram import Router
+from aiogram.dispatcher.event.handler import CallableObject
+from aiogram.types import CallbackQuery
+
+logger = logging.getLogger(__name__)
+
+
+class CallbackFactory:
+    """
+    Типизированная фабрика callback_data в формате "<префикс><поле1>_<поле2>...".
+
+    Формат совместим со старыми кнопками (reply_15, admin_page_users_2), поэтому
+    клавиатуры, уже отправленные пользователям, продолжают работать.
+    Последнее поле забирает остаток строки целиком (имена файлов могут содержать "_").
+    """
+
+    def __init__(self, prefix: str, name: str = None, **fields: type):
+        self.prefix = prefix
+        self.fields = fields
+        self._field_names = list(fields.keys())
+        self._types = list(fields.values())
+        self.data_class = namedtuple(name or "CallbackData", self._field_names)
+
+    def pack(self, *args, **kwargs) -> str:
+        """Собрать callback_data"""
+        values = list(args)
+        for field_name in self._field_names[len(values):]:
+            values.append(kwargs[field_name])
+        return self.prefix + "_".join(str(value) for value in values)
+
+    def unpack(self, data: str):
+        """Разобрать callback_data в namedtuple с приведением типов"""
+        if not data.startswith(self.prefix):
+            raise ValueError(f"callback_data {data!r} не начинается с {self.prefix!r}")
+
+        rest = data[len(self.prefix):]
+        if not self._field_names:
+            return self.data_class()
+
+        parts = rest.split("_", len(self._field_names) - 1)
+        if len(parts) != len(self._field_names):
+            raise ValueError(f"callback_data {data!r} не соответствует полям {self._field_names}")
+
+        return self.data_class(*(field_type(part) for field_type, part in zip(self._types, parts)))
+
+
+class CallbackRoute:
+    """Зарегистрированный хэндлер"""
+
+    __slots__ = ("pattern", "exact", "callable", "factory")
+
+    def __init__(self, pattern: str, exact: bool, callback: Callable, factory: Optional[CallbackFactory] = None):
+        self.pattern = pattern
+        self.exact = exact
+        self.callable = CallableObject(callback=callback)
+        self.factory = factory
+
+
+class CallbackTrie:
+    """Префиксное дерево: точные совпадения и префиксы, побеждает самое длинное совпадение"""
+
+    __slots__ = ("children", "exact_route", "prefix_route")
+
+    def __init__(self):
+        self.children: Dict[str, "CallbackTrie"] = {}
+        self.exact_route: Optional[CallbackRoute] = None
+        self.prefix_route: Optional[CallbackRoute] = None
+
+    def insert(self, route: CallbackRoute) -> bool:
+        """Добавить маршрут. Возвращает False, если такой маршрут уже зарегистрирован"""
+        node = self
+        for char in route.pattern:
+            child = node.children.get(char)
+            if child is None:
+                child = CallbackTrie()
+                node.children[char] = child
+            node = child
+
+        if route.exact:
+            if node.exact_route is not None:
+                return False
+            node.exact_route = route
+        else:
+            if node.prefix_route is not None:
+                return False
+            node.prefix_route = route
+        return True
+
+    def resolve(self, data: str) -> Optional[CallbackRoute]:
+        """Найти хэндлер для callback_data"""
+        node = self
+        best = node.prefix_route
+        for char in data:
+            node = node.children.get(char)
+            if node is None:
+                return best
+            if node.prefix_route is not None:
+                best = node.prefix_route
+        return node.exact_route or best
+
+
+class CallbackIndex:
+    """
+    Единая точка регистрации callback-хэндлеров.
+
+    Использование:
+        @callback_index.exact("admin_main")
+        @callback_index.prefix("admin_price_")
+        @callback_index.factory(REPLY_CB)  # хэндлер получит callback_data=REPLY_CB.unpack(...)
+    """
+
+    def __init__(self, name: str = "callback_index"):
+        self.router = Router(name=name)
+        self._trie = CallbackTrie()
+        self._count = 0
+        self.router.callback_query.register(self._dispatch, self._resolve_filter)
+
+    def _add(self, route: CallbackRoute):
+        if self._trie.insert(route):
+            self._count += 1
+        else:
+            logger.warning(f"⚠️ callback_data '{route.pattern}' уже зарегистрирован, используется первый хэндлер")
+
+    def exact(self, value: str):
+        """Хэндлер для точного значения callback_data"""
+        def decorator(callback: Callable) -> Callable:
+            self._add(CallbackRoute(value, True, callback))
+            return callback
+        return decorator
+
+    def prefix(self, value: str):
+        """Хэндлер для всех callback_data с указанным префиксом"""
+        def decorator(callback: Callable) -> Callable:
+            self._add(CallbackRoute(value, False, callback))
+            return callback
+        return decorator
+
+    def factory(self, callback_factory: CallbackFactory):
+        """Хэндлер для фабрики: разобранные данные передаются аргументом callback_data"""
+        def decorator(callback: Callable) -> Callable:
+            self._add(CallbackRoute(callback_factory.prefix, False, callback, callback_factory))
+            return callback
+        return decorator
+
+    def resolve(self, data: str) -> Optional[CallbackRoute]:
+        """Найти маршрут для callback_data"""
+        return self._trie.resolve(data)
+
+    def __len__(self):
+        return self._count
+
+    async def _resolve_filter(self, callback: CallbackQuery):
+        if not callback.data:
+            return False
+
+        route = self._trie.resolve(callback.data)
+        if route is None:
+            return False
+
+        result = {"callback_route": route}
+        if route.factory is not None:
+            try:
+                result["callback_data"] = route.factory.unpack(callback.data)
+            except (ValueError, TypeError) as e:
+                logger.warning(f"⚠️ Некорректный callback_data '{callback.data}': {e}")
+                return False
+        return result
+
+    async def _dispatch(self, callback: CallbackQuery, callback_route: CallbackRoute, **kwargs):
+        return await callback_route.callable.call(callback, **kwargs)
+
+
+# Глобальный индекс, подключается в диспетчер первым роутером
+callback_index = CallbackIndex()
+
+
+# ==================== ФАБРИКИ CALLBACK_DATA ====================
+
+SEND_ANOTHER_CB = CallbackFactory("send_another_", "SendAnotherData", link_uid=str)
+REPLY_CB = CallbackFactory("reply_", "ReplyData", message_id=int)
+REVEAL_CB = CallbackFactory("reveal_", "RevealData", message_id=int)
+REPORT_CB = CallbackFactory("report_", "ReportData", message_id=int)
+
+ADMIN_PAGE_USERS_CB = CallbackFactory("admin_page_users_", "AdminPageUsersData", page=int)
+ADMIN_SET_REVEALS_CB = CallbackFactory("admin_user_set_reveals_", "AdminSetRevealsData", user_id=int)
+CONFIRM_RESTORE_CB = CallbackFactory("confirm_restore_", "ConfirmRestoreData", file_name=str)
+RESTORE_FROM_CHECK_CB = CallbackFactory("restore_from_check_", "RestoreFromCheckData", backup_index=int)
+DELETE_BACKUP_CB = CallbackFactory("delete_backup_", "DeleteBackupData", backup_index=int)
+CONFIRM_DELETE_CB = CallbackFactory("confirm_delete_", "ConfirmDeleteData", backup_index=int)
+
+ADMIN_VIEW_CONVERSATIONS_CB = CallbackFactory("admin_view_conversations_", "ViewConversationsData", user_id=int)
+ADMIN_VIEW_CONVERSATION_CB = CallbackFactory(
+    "admin_view_conversation_", "ViewConversationData", user1_id=int, user2_id=int
+)
+ADMIN_SEND_ANONYMOUS_TO_CB = CallbackFactory(
+    "admin_send_anonymous_to_", "SendAnonymousToData", user1_id=int, user2_id=int
+)
+
@@ -0,0 +1,466 @@
+"""
+Журнал изменений между бэкапами (point-in-time recovery)
+
+Каждая закоммиченная запись ORM (пользователи, сообщения, раскрытия, платежи) попадает
+в журнал как образ строки: таблица, первичный ключ и значения колонок в том виде, в
+котором они лежат в SQLite. Записи копятся в памяти и сбрасываются на диск пачками
+(раз в JOURNAL_FLUSH_INTERVAL секунд или по JOURNAL_BATCH_SIZE записей) в сегменты
+journal/journal_<seq>.jsonl рядом с файлом БД (на постоянном диске). Каждый полный бэкап
+запоминает номер последней записи журнала, поэтому БД восстанавливается как "последний
+бэкап + журнал после него".
+
+Восстановление и импорт начинают новую линию времени: в barriers.jsonl пишется граница
+с номером, и записи до нее к бэкапам, созданным раньше, больше не применяются (иначе
+point-in-time вернул бы изменения, которые админ откатил). Граница помнит, из какого
+бэкапа и каких диапазонов журнала собрана БД, - восстановление от этого бэкапа остается
+возможным.
+
+Повторное применение записи безопасно (upsert по первичному ключу), поэтому записи,
+попавшие и в бэкап, и в журнал, ничего не ломают.
+"""
+import os
+import json
+import time
+import atexit
+import shutil
+import logging
+import threading
+from datetime import datetime
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+JOURNAL_ENABLED = os.getenv("CHANGE_JOURNAL", "true").lower() in ("1", "true", "yes", "on")
+JOURNAL_FLUSH_INTERVAL = float(os.getenv("JOURNAL_FLUSH_INTERVAL", 1.0))
+JOURNAL_BATCH_SIZE = int(os.getenv("JOURNAL_BATCH_SIZE", 500))
+# Каталог журнала; по умолчанию - journal/ рядом с файлом БД
+JOURNAL_DIR = os.getenv("JOURNAL_DIR")
+
+_SEGMENT_PREFIX = "journal_"
+_SEGMENT_SUFFIX = ".jsonl"
+_BARRIERS_FILE = "barriers.jsonl"
+
+# Ключ session.info для изменений транзакции, которые еще не закоммичены
+_PENDING_KEY = "change_journal_pending"
+
+
+class ChangeJournal:
+    """Журнал изменений: append-only сегменты JSONL со сквозной нумерацией записей"""
+
+    def __init__(self, journal_dir: str = 'data/journal',
+                 flush_interval: float = JOURNAL_FLUSH_INTERVAL, batch_size: int = JOURNAL_BATCH_SIZE):
+        self.journal_dir = journal_dir
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+
+        self._lock = threading.Lock()       # буфер и нумерация
+        self._io_lock = threading.RLock()   # запись сегментов
+        self._buffer: List[Dict[str, Any]] = []
+        self._wakeup = threading.Event()
+        self._stopped = False
+        self._thread: Optional[threading.Thread] = None
+        self._segment = None
+
+        os.makedirs(self.journal_dir, exist_ok=True)
+        self.barriers = self._load_barriers()
+        self.last_seq = max(self._scan_last_seq(), self.barriers[-1]["seq"] if self.barriers else 0)
+        self.flushed_seq = self.last_seq
+
+    # ---------- сегменты ----------
+
+    def _segments(self) -> List[Tuple[int, str]]:
+        """Сегменты журнала (первый seq, путь) по порядку"""
+        segments = []
+        for filename in os.listdir(self.journal_dir):
+            if filename.startswith(_SEGMENT_PREFIX) and filename.endswith(_SEGMENT_SUFFIX):
+                try:
+                    first_seq = int(filename[len(_SEGMENT_PREFIX):-len(_SEGMENT_SUFFIX)])
+                except ValueError:
+                    continue
+                segments.append((first_seq, os.path.join(self.journal_dir, filename)))
+        return sorted(segments)
+
+    @staticmethod
+    def _read_segment(path: str) -> Iterator[Dict[str, Any]]:
+        with open(path, 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    yield json.loads(line)
+                except ValueError:
+                    # Недописанная строка (сбой во время записи) - пропускаем
+                    continue
+
+    def _scan_last_seq(self) -> int:
+        """Номер последней записи на диске (после перезапуска нумерация продолжается)"""
+        for first_seq, path in reversed(self._segments()):
+            last = first_seq - 1
+            for record in self._read_segment(path):
+                last = max(last, record.get("seq", last))
+            if last >= first_seq:
+                return last
+        return 0
+
+    def _load_barriers(self) -> List[Dict[str, Any]]:
+        path = os.path.join(self.journal_dir, _BARRIERS_FILE)
+        if not os.path.exists(path):
+            return []
+        return sorted(self._read_segment(path), key=lambda barrier: barrier["seq"])
+
+    def _open_segment(self, first_seq: int):
+        # После перезапуска пишем в новый сегмент: хвост старого мог остаться недописанным
+        path = os.path.join(self.journal_dir, f"{_SEGMENT_PREFIX}{first_seq:012d}{_SEGMENT_SUFFIX}")
+        self._segment = open(path, 'a', encoding='utf-8')
+
+    def _close_segment(self):
+        if self._segment is not None:
+            self._segment.close()
+            self._segment = None
+
+    # ---------- запись ----------
+
+    def append(self, changes: Iterable[Dict[str, Any]]):
+        """Добавить изменения закоммиченной транзакции (на диск попадут при ближайшем сбросе)"""
+        with self._lock:
+            ts = time.time()
+            for change in changes:
+                self.last_seq += 1
+                change["seq"] = self.last_seq
+                change["ts"] = ts
+                self._buffer.append(change)
+            pending = len(self._buffer)
+
+        self._ensure_thread()
+        if pending >= self.batch_size:
+            self._wakeup.set()
+
+    def flush(self) -> int:
+        """Сбросить буфер на диск (с fsync). Возвращает номер последней сохраненной записи"""
+        with self._io_lock:
+            with self._lock:
+                batch, self._buffer = self._buffer, []
+            if not batch:
+                return self.flushed_seq
+
+            if self._segment is None:
+                self._open_segment(batch[0]["seq"])
+            self._segment.write("".join(
+                json.dumps(change, ensure_ascii=False, default=str) + "\n" for change in batch
+            ))
+            self._segment.flush()
+            os.fsync(self._segment.fileno())
+            self.flushed_seq = batch[-1]["seq"]
+            return self.flushed_seq
+
+    def checkpoint(self) -> int:
+        """
+        Точка отсчета для бэкапа: сбросить буфер и начать новый сегмент.
+        Вызывается до снимка БД - все записи с меньшим номером в снимок уже попали.
+        """
+        with self._io_lock:
+            seq = self.flush()
+            self._close_segment()
+            return seq
+
+    def barrier(self, reason: str, base: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """
+        Граница линии времени после подмены БД (восстановление, импорт).
+
+        base - из чего собрана новая БД: {"backup": имя бэкапа, "journal_seq": позиция
+        журнала в нем, "ranges": [[после, по], ...] примененные диапазоны журнала}.
+        None - БД не воспроизводится по бэкапам (загруженный файл, импорт дампа).
+        Вызывается при закрытом шлюзе БД, чтобы ни одна запись не легла по обе стороны.
+        """
+        with self._io_lock:
+            with self._lock:
+                self.last_seq += 1
+                record = {"seq": self.last_seq, "ts": time.time(), "reason": reason, "base": base}
+            # Записи до границы - в старые сегменты, после нее - в новый
+            self.flush()
+            self._close_segment()
+
+            with open(os.path.join(self.journal_dir, _BARRIERS_FILE), 'a', encoding='utf-8') as f:
+                f.write(json.dumps(record, ensure_ascii=False) + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+            self.barriers.append(record)
+            self.flushed_seq = max(self.flushed_seq, record["seq"])
+
+        logger.info(f"📝 Журнал изменений: новая линия времени с #{record['seq']} ({reason})")
+        return record
+
+    def last_barrier(self, until: Optional[float] = None) -> Optional[Dict[str, Any]]:
+        """Последняя граница не позже until (unix time)"""
+        for barrier in reversed(self.barriers):
+            if until is None or barrier["ts"] <= until:
+                return barrier
+        return None
+
+    def ranges_for(self, backup_name: str, journal_seq: int,
+                   until: Optional[float] = None) -> Optional[List[List[Optional[int]]]]:
+        """
+        Диапазоны журнала [после, по] (по = None - до конца), которые нужно применить к бэкапу,
+        чтобы получить БД на момент until. None - бэкап относится к прежней линии времени.
+        """
+        barrier = self.last_barrier(until)
+        if barrier is None or journal_seq >= barrier["seq"]:
+            return [[journal_seq, None]]
+
+        # Бэкап старше границы годится, только если БД после границы собрана из него же
+        base = barrier.get("base") or {}
+        if base.get("backup") == backup_name and base.get("journal_seq") == journal_seq:
+            return [list(r) for r in base.get("ranges", [])] + [[barrier["seq"], None]]
+        return None
+
+    def replay(self, conn, ranges: List[List[Optional[int]]],
+               until: Optional[float] = None) -> Tuple[Dict[str, int], List[List[int]]]:
+        """
+        Применить диапазоны журнала к копии бэкапа (commit - на вызывающей стороне).
+        Возвращает статистику и примененные диапазоны для base новой границы.
+        """
+        stats = {"applied": 0, "skipped": 0}
+        replayed = []
+        for after_seq, upto_seq in ranges:
+            records = list(self.read(after_seq, until, upto_seq))
+            result = apply_changes(conn, records)
+            stats["applied"] += result["applied"]
+            stats["skipped"] += result["skipped"]
+            # Открытый диапазон закрывается последней примененной записью
+            if upto_seq is None:
+                upto_seq = records[-1]["seq"] if records else after_seq
+            replayed.append([after_seq, upto_seq])
+        return stats, replayed
+
+    def _ensure_thread(self):
+        if self._thread is None and not self._stopped:
+            with self._lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._run, name="change-journal", daemon=True)
+                    self._thread.start()
+                    atexit.register(self.close)
+
+    def _run(self):
+        while not self._stopped:
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            try:
+                self.flush()
+            except Exception as e:
+                logger.error(f"❌ Ошибка записи журнала изменений: {e}")
+
+    def close(self):
+        """Сбросить остаток буфера и остановить фоновый поток"""
+        self._stopped = True
+        self._wakeup.set()
+        try:
+            self.flush()
+        finally:
+            with self._io_lock:
+                self._close_segment()
+
+    # ---------- чтение и очистка ----------
+
+    def read(self, after_seq: int = 0, until: Optional[float] = None,
+             upto_seq: Optional[int] = None) -> Iterator[Dict[str, Any]]:
+        """Записи с номером больше after_seq (не больше upto_seq и не позже until, unix time) по порядку"""
+        self.flush()
+        segments = self._segments()
+        for index, (first_seq, path) in enumerate(segments):
+            next_first = segments[index + 1][0] if index + 1 < len(segments) else None
+            if next_first is not None and next_first <= after_seq + 1:
+                continue  # весь сегмент не новее after_seq
+            for record in self._read_segment(path):
+                if record["seq"] <= after_seq:
+                    continue
+                if upto_seq is not None and record["seq"] > upto_seq:
+                    return
+                if until is not None and record["ts"] > until:
+                    return
+                yield record
+
+    def prune(self, upto_seq: int) -> int:
+        """Удалить сегменты, все записи которых не новее upto_seq (уже есть в бэкапе)"""
+        removed = 0
+        with self._io_lock:
+            current = self._segment.name if self._segment is not None else None
+            segments = self._segments()
+            for index, (first_seq, path) in enumerate(segments[:-1]):
+                if path == current:
+                    continue
+                if segments[index + 1][0] <= upto_seq + 1:
+                    os.remove(path)
+                    removed += 1
+        if removed:
+            logger.info(f"🧹 Журнал изменений: удалено сегментов {removed} (до записи {upto_seq})")
+        return removed
+
+    def get_stats(self) -> Dict[str, Any]:
+        segments = self._segments()
+        return {
+            "enabled": JOURNAL_ENABLED,
+            "segments": len(segments),
+            "size_mb": round(sum(os.path.getsize(path) for _, path in segments) / (1024 * 1024), 2),
+            "last_seq": self.last_seq,
+            "flushed_seq": self.flushed_seq,
+            "barriers": len(self.barriers),
+            "pending": len(self._buffer),
+        }
+
+
+def apply_changes(conn, changes: Iterable[Dict[str, Any]]) -> Dict[str, int]:
+    """
+    Применить записи журнала к sqlite3 соединению (commit - на вызывающей стороне).
+    Строки вставляются upsert'ом по первичному ключу, поэтому повтор записи безопасен.
+    """
+    stats = {"applied": 0, "skipped": 0}
+    existing = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type='table'")}
+
+    for change in changes:
+        table, row, pk = change["table"], change["row"], change["pk"]
+        if table not in existing or not all(column in row for column in pk):
+            stats["skipped"] += 1
+            continue
+
+        try:
+            if change["op"] == "delete":
+                where = " AND ".join(f'"{column}" = ?' for column in pk)
+                conn.execute(f'DELETE FROM "{table}" WHERE {where}', [row[column] for column in pk])
+            else:
+                columns = list(row)
+                updates = [column for column in columns if column not in pk]
+                conflict = (
+                    "DO UPDATE SET " + ", ".join(f'"{column}" = excluded."{column}"' for column in updates)
+                    if updates else "DO NOTHING"
+                )
+                quoted = ", ".join(f'"{column}"' for column in columns)
+                quoted_pk = ", ".join(f'"{column}"' for column in pk)
+                placeholders = ", ".join("?" for _ in columns)
+                conn.execute(
+                    f'INSERT INTO "{table}" ({quoted}) VALUES ({placeholders}) '
+                    f'ON CONFLICT ({quoted_pk}) {conflict}',
+                    [row[column] for column in columns]
+                )
+            stats["applied"] += 1
+        except Exception as e:
+            logger.warning(f"⚠️ Запись журнала #{change.get('seq')} ({table}) не применена: {e}")
+            stats["skipped"] += 1
+
+    return stats
+
+
+def _row_change(obj, op: str, dialect) -> Dict[str, Any]:
+    """Образ строки ORM-объекта в значениях SQLite (только загруженные колонки)"""
+    from sqlalchemy import inspect as sa_inspect
+
+    state = sa_inspect(obj)
+    mapper = state.mapper
+    table = mapper.local_table
+    pk = [column.name for column in table.primary_key.columns]
+
+    row = {}
+    for column in table.columns:
+        if op == "delete" and column.name not in pk:
+            continue
+        try:
+            key = mapper.get_property_by_column(column).key
+        except Exception:
+            continue
+        if key not in state.dict:
+            continue
+        value = state.dict[key]
+        processor = column.type.bind_processor(dialect)
+        row[column.name] = processor(value) if processor else value
+
+    return {"table": table.name, "op": op, "pk": pk, "row": row}
+
+
+def journal_dir_for(db_path: str, legacy_dir: Optional[str] = None) -> str:
+    """
+    Каталог журнала для БД: JOURNAL_DIR или journal/ рядом с файлом БД.
+    Журнал из прежнего места (legacy_dir, раньше - backups/journal) переносится туда.
+    """
+    journal_dir = JOURNAL_DIR or os.path.join(os.path.dirname(os.path.abspath(db_path)), "journal")
+    if not legacy_dir or not os.path.isdir(legacy_dir) or os.path.abspath(legacy_dir) == os.path.abspath(journal_dir):
+        return journal_dir
+
+    try:
+        os.makedirs(journal_dir, exist_ok=True)
+        for name in os.listdir(legacy_dir):
+            target = os.path.join(journal_dir, name)
+            if not os.path.exists(target):
+                shutil.move(os.path.join(legacy_dir, name), target)
+        if not os.listdir(legacy_dir):
+            os.rmdir(legacy_dir)
+        logger.info(f"📝 Журнал изменений перенесен: {legacy_dir} -> {journal_dir}")
+    except Exception as e:
+        logger.warning(f"⚠️ Не удалось перенести журнал изменений из {legacy_dir}: {e}")
+    return journal_dir
+
+
+def bulk_delete(session, model, ids: Iterable[Any], chunk_size: int = 500) -> int:
+    """
+    Удалить строки модели по первичному ключу пачками и записать удаления в журнал.
+
+    Массовый query(...).delete() идет мимо событий сессии, поэтому удаления добавляются
+    к изменениям транзакции явно - в журнал они попадут при commit, при rollback пропадут.
+    """
+    ids = list(ids)
+    (pk_column,) = model.__table__.primary_key.columns
+    for start in range(0, len(ids), chunk_size):
+        chunk = ids[start:start + chunk_size]
+        session.query(model).filter(pk_column.in_(chunk)).delete(synchronize_session=False)
+
+    if JOURNAL_ENABLED and ids:
+        session.info.setdefault(_PENDING_KEY, []).extend(
+            {"table": model.__table__.name, "op": "delete", "pk": [pk_column.name], "row": {pk_column.name: value}}
+            for value in ids
+        )
+    return len(ids)
+
+
+_hooks_installed = False
+
+
+def install_session_hooks(journal: ChangeJournal):
+    """Подписать журнал на коммиты всех сессий SQLAlchemy (один раз на процесс)"""
+    global _hooks_installed
+    if _hooks_installed:
+        return
+    _hooks_installed = True
+
+    from sqlalchemy import event
+    from sqlalchemy.orm import Session
+
+    @event.listens_for(Session, "after_flush")
+    def _collect(session, flush_context):
+        # Коллекции new/dirty/deleted здесь еще в состоянии до flush
+        dialect = session.get_bind().dialect
+        pending = session.info.setdefault(_PENDING_KEY, [])
+        for obj in session.new:
+            pending.append(_row_change(obj, "upsert", dialect))
+        for obj in session.dirty:
+            if session.is_modified(obj, include_collections=False):
+                pending.append(_row_change(obj, "upsert", dialect))
+        for obj in session.deleted:
+            pending.append(_row_change(obj, "delete", dialect))
+
+    @event.listens_for(Session, "after_commit")
+    def _commit(session):
+        pending = session.info.pop(_PENDING_KEY, None)
+        if pending:
+            journal.append(pending)
+
+    @event.listens_for(Session, "after_rollback")
+    def _rollback(session):
+        session.info.pop(_PENDING_KEY, None)
+
+    logger.info(f"📝 Журнал изменений включен: {journal.journal_dir} (сброс раз в {journal.flush_interval} с)")
+
+
+def parse_point_in_time(value: str) -> Optional[float]:
+    """Момент восстановления из строки 'YYYY-MM-DD HH:MM[:SS]' (локальное время) в unix time"""
+    for fmt in ("%Y-%m-%d %H:%M:%S", "%Y-%m-%d %H:%M", "%d.%m.%Y %H:%M"):
+        try:
+            return datetime.strptime(value.strip(), fmt).timestamp()
+        except ValueError:
+            continue
+    return None
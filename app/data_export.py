@@ -0,0 +1,297 @@
+"""
+Потоковый экспорт БД: SQL (многострочные INSERT), CSV, JSONL
+
+Таблицы читаются пачками по EXPORT_BATCH_ROWS строк с пагинацией по rowid: каждая пачка -
+отдельный короткий запрос, поэтому память ограничена размером пачки, а запись в БД не
+ждет окончания всего экспорта. Результат пишется потоком (при необходимости через
+gzip/zstd) во временный .part файл и появляется под своим именем только целиком.
+
+CSV при экспорте нескольких таблиц упаковывается в zip - по файлу на таблицу.
+"""
+import io
+import os
+import csv
+import gzip
+import json
+import sqlite3
+import logging
+import zipfile
+import threading
+from datetime import datetime
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Sequence, TextIO
+
+from app.backup_compression import EXTENSIONS, resolve_method, zstandard
+
+logger = logging.getLogger(__name__)
+
+EXPORT_BATCH_ROWS = int(os.getenv("EXPORT_BATCH_ROWS", 500))
+
+EXPORT_FORMATS = ("sql", "csv", "jsonl")
+
+
+class ExportCancelled(Exception):
+    """Экспорт отменен"""
+
+
+def _sql_literal(value: Any) -> str:
+    if value is None:
+        return "NULL"
+    if isinstance(value, bool):
+        return "1" if value else "0"
+    if isinstance(value, (int, float)):
+        return repr(value)
+    if isinstance(value, bytes):
+        return f"X'{value.hex()}'"
+    return "'" + str(value).replace("'", "''") + "'"
+
+
+def _json_value(value: Any) -> Any:
+    return value.hex() if isinstance(value, bytes) else value
+
+
+def _open_text(path: str, method: Optional[str]) -> TextIO:
+    """Текстовый поток в файл, при необходимости через компрессор"""
+    if method == "gzip":
+        return gzip.open(path, 'wt', encoding='utf-8', newline='')
+    if method == "zstd":
+        raw = open(path, 'wb')
+        return io.TextIOWrapper(zstandard.ZstdCompressor().stream_writer(raw), encoding='utf-8', newline='')
+    return open(path, 'w', encoding='utf-8', newline='')
+
+
+def _list_tables(conn: sqlite3.Connection, tables: Optional[Sequence[str]] = None) -> List[str]:
+    names = [row[0] for row in conn.execute(
+        "SELECT name FROM sqlite_master WHERE type='table' AND name NOT LIKE 'sqlite_%' ORDER BY name"
+    )]
+    return [name for name in names if tables is None or name in tables]
+
+
+def _has_rowid(conn: sqlite3.Connection, table: str) -> bool:
+    try:
+        conn.execute(f'SELECT rowid FROM "{table}" LIMIT 0')
+        return True
+    except sqlite3.OperationalError:
+        return False  # WITHOUT ROWID
+
+
+def _estimate_rows(conn: sqlite3.Connection, table: str) -> int:
+    """Оценка числа строк для прогресса: MAX(rowid) - O(log n), без сканирования таблицы"""
+    if _has_rowid(conn, table):
+        return conn.execute(f'SELECT MAX(rowid) FROM "{table}"').fetchone()[0] or 0
+    return conn.execute(f'SELECT COUNT(*) FROM "{table}"').fetchone()[0]
+
+
+def iter_table_batches(conn: sqlite3.Connection, table: str,
+                       batch_rows: int = EXPORT_BATCH_ROWS) -> Iterator[tuple]:
+    """
+    Пачки строк таблицы: (колонки, строки).
+    Между пачками блокировка чтения снимается (пагинация WHERE rowid > последний).
+    """
+    if not _has_rowid(conn, table):
+        cursor = conn.execute(f'SELECT * FROM "{table}"')
+        columns = [description[0] for description in cursor.description]
+        while True:
+            rows = cursor.fetchmany(batch_rows)
+            if not rows:
+                return
+            yield columns, rows
+
+    last_rowid = None
+    columns = None
+    while True:
+        if last_rowid is None:
+            cursor = conn.execute(f'SELECT rowid, * FROM "{table}" ORDER BY rowid LIMIT ?', (batch_rows,))
+        else:
+            cursor = conn.execute(
+                f'SELECT rowid, * FROM "{table}" WHERE rowid > ? ORDER BY rowid LIMIT ?',
+                (last_rowid, batch_rows)
+            )
+        if columns is None:
+            columns = [description[0] for description in cursor.description[1:]]
+        rows = cursor.fetchall()
+        if not rows:
+            return
+        last_rowid = rows[-1][0]
+        yield columns, [row[1:] for row in rows]
+
+
+class _Progress:
+    """Счетчик строк с проверкой отмены"""
+
+    def __init__(self, total: int, callback: Optional[Callable[[int, int], None]],
+                 cancel_event: Optional[threading.Event]):
+        self.done = 0
+        self.total = total
+        self.callback = callback
+        self.cancel_event = cancel_event
+
+    def advance(self, rows: int):
+        if self.cancel_event is not None and self.cancel_event.is_set():
+            raise ExportCancelled()
+        self.done += rows
+        if self.callback:
+            self.callback(self.done, max(self.total, self.done))
+
+
+def _write_sql(conn: sqlite3.Connection, out: TextIO, tables: List[str], batch_rows: int, progress: _Progress):
+    out.write(f"-- SQL Export\n-- Export time: {datetime.now().isoformat()}\n")
+    out.write("BEGIN TRANSACTION;\n\n")
+
+    schema = {name: sql for name, sql in conn.execute(
+        "SELECT name, sql FROM sqlite_master WHERE type='table' AND sql IS NOT NULL"
+    )}
+    for table in tables:
+        out.write(schema[table] + ";\n\n")
+
+    for table in tables:
+        out.write(f"-- Data for table: {table}\n")
+        for columns, rows in iter_table_batches(conn, table, batch_rows):
+            column_list = ", ".join(f'"{column}"' for column in columns)
+            values = ",\n".join("(" + ", ".join(_sql_literal(value) for value in row) + ")" for row in rows)
+            out.write(f'INSERT INTO "{table}" ({column_list}) VALUES\n{values};\n')
+            progress.advance(len(rows))
+        out.write("\n")
+
+    # Индексы, триггеры и представления - после данных (вставка идет быстрее)
+    for (sql,) in conn.execute(
+        "SELECT sql FROM sqlite_master WHERE type IN ('index', 'trigger', 'view') "
+        "AND sql IS NOT NULL AND tbl_name NOT LIKE 'sqlite_%'"
+    ):
+        out.write(sql + ";\n")
+
+    out.write("COMMIT;\n")
+
+
+def _write_jsonl_rows(out: TextIO, table: Optional[str], columns: List[str], rows: Iterable[tuple]):
+    for row in rows:
+        record = {column: _json_value(value) for column, value in zip(columns, row)}
+        if table is not None:
+            record = {"table": table, "row": record}
+        out.write(json.dumps(record, ensure_ascii=False, default=str) + "\n")
+
+
+def _write_jsonl(conn: sqlite3.Connection, out: TextIO, tables: List[str], batch_rows: int, progress: _Progress):
+    for table in tables:
+        for columns, rows in iter_table_batches(conn, table, batch_rows):
+            _write_jsonl_rows(out, table, columns, rows)
+            progress.advance(len(rows))
+
+
+def _write_csv_table(conn: sqlite3.Connection, out: TextIO, table: str, batch_rows: int, progress: _Progress):
+    writer = csv.writer(out)
+    header_written = False
+    for columns, rows in iter_table_batches(conn, table, batch_rows):
+        if not header_written:
+            writer.writerow(columns)
+            header_written = True
+        writer.writerows([_json_value(value) for value in row] for row in rows)
+        progress.advance(len(rows))
+
+
+def export_path(dest_path: str, fmt: str, method: Optional[str], tables_count: int = 1) -> str:
+    """Итоговое имя файла экспорта с учетом формата и сжатия"""
+    if fmt == "csv" and tables_count > 1:
+        return f"{dest_path}.zip"
+    return f"{dest_path}.{fmt}{EXTENSIONS[method] if method else ''}"
+
+
+def export_database(db_path: str, dest_path: str, fmt: str = "sql", compression: Optional[str] = "none",
+                    tables: Optional[Sequence[str]] = None, batch_rows: int = EXPORT_BATCH_ROWS,
+                    progress_callback: Optional[Callable[[int, int], None]] = None,
+                    cancel_event: Optional[threading.Event] = None) -> Optional[Dict[str, Any]]:
+    """
+    Экспорт таблиц БД потоком.
+
+    dest_path - путь без расширения (расширение по формату и сжатию добавляется само).
+    progress_callback(строк_выгружено, оценка_всего). Возвращает {path, rows, tables, size}
+    или None при отмене.
+    """
+    if fmt not in EXPORT_FORMATS:
+        raise ValueError(f"Неизвестный формат экспорта: {fmt}")
+
+    conn = sqlite3.connect(f"file:{db_path}?mode=ro", uri=True)
+    part_path = None
+    try:
+        table_names = _list_tables(conn, tables)
+        method = None if fmt == "csv" and len(table_names) > 1 else resolve_method(compression)
+        path = export_path(dest_path, fmt, method, len(table_names))
+        part_path = f"{path}.part"
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+
+        progress = _Progress(sum(_estimate_rows(conn, table) for table in table_names),
+                             progress_callback, cancel_event)
+
+        if fmt == "csv" and len(table_names) > 1:
+            with zipfile.ZipFile(part_path, 'w', compression=zipfile.ZIP_DEFLATED) as archive:
+                for table in table_names:
+                    with archive.open(f"{table}.csv", 'w', force_zip64=True) as member:
+                        with io.TextIOWrapper(member, encoding='utf-8', newline='') as out:
+                            _write_csv_table(conn, out, table, batch_rows, progress)
+        else:
+            with _open_text(part_path, method) as out:
+                if fmt == "sql":
+                    _write_sql(conn, out, table_names, batch_rows, progress)
+                elif fmt == "jsonl":
+                    _write_jsonl(conn, out, table_names, batch_rows, progress)
+                else:
+                    for table in table_names:
+                        _write_csv_table(conn, out, table, batch_rows, progress)
+
+        os.replace(part_path, path)
+        size = os.path.getsize(path)
+        logger.info(f"📤 Экспорт {fmt}: {os.path.basename(path)} - {progress.done} строк, {size:,} байт")
+        return {"path": path, "rows": progress.done, "tables": table_names, "size": size}
+
+    except ExportCancelled:
+        logger.info(f"⏹️ Экспорт отменен: {dest_path}")
+        return None
+    finally:
+        conn.close()
+        if part_path and os.path.exists(part_path):
+            os.remove(part_path)
+
+
+def export_query(db_path: str, dest_path: str, query: str, params: Sequence[Any] = (),
+                 fmt: str = "csv", compression: Optional[str] = "none", batch_rows: int = EXPORT_BATCH_ROWS,
+                 progress_callback: Optional[Callable[[int, int], None]] = None,
+                 cancel_event: Optional[threading.Event] = None) -> Optional[Dict[str, Any]]:
+    """Экспорт результата запроса (CSV или JSONL) потоком через fetchmany"""
+    if fmt not in ("csv", "jsonl"):
+        raise ValueError(f"Формат {fmt} не поддерживается для экспорта запроса")
+
+    conn = sqlite3.connect(f"file:{db_path}?mode=ro", uri=True)
+    method = resolve_method(compression)
+    path = export_path(dest_path, fmt, method)
+    part_path = f"{path}.part"
+    try:
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        progress = _Progress(0, progress_callback, cancel_event)
+        cursor = conn.execute(query, params)
+        columns = [description[0] for description in cursor.description]
+
+        with _open_text(part_path, method) as out:
+            writer = csv.writer(out) if fmt == "csv" else None
+            if writer:
+                writer.writerow(columns)
+            while True:
+                rows = cursor.fetchmany(batch_rows)
+                if not rows:
+                    break
+                if writer:
+                    writer.writerows([_json_value(value) for value in row] for row in rows)
+                else:
+                    _write_jsonl_rows(out, None, columns, rows)
+                progress.advance(len(rows))
+
+        os.replace(part_path, path)
+        size = os.path.getsize(path)
+        logger.info(f"📤 Экспорт запроса {fmt}: {os.path.basename(path)} - {progress.done} строк, {size:,} байт")
+        return {"path": path, "rows": progress.done, "tables": [], "size": size}
+
+    except ExportCancelled:
+        logger.info(f"⏹️ Экспорт отменен: {dest_path}")
+        return None
+    finally:
+        conn.close()
+        if os.path.exists(part_path):
+            os.remove(part_path)
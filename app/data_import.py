@@ -0,0 +1,332 @@
+"""
+Потоковый импорт дампов БД: SQL и JSONL (в том числе .gz / .zst)
+
+Дамп читается построчно и применяется к новому файлу БД большими транзакциями, поэтому
+память не зависит от размера дампа. Подряд идущие INSERT в одну таблицу склеиваются в
+многострочные (до IMPORT_BATCH_ROWS инструкций), строки JSONL вставляются executemany.
+Индексы, триггеры и представления создаются в самом конце - вставка в таблицы без
+индексов идет в разы быстрее.
+
+Импорт собирает отдельную БД, а не пишет в рабочую: ошибка в середине дампа ничего не
+портит, а готовая БД подменяет рабочую тем же путем, что и восстановление из бэкапа.
+"""
+import io
+import os
+import re
+import gzip
+import json
+import sqlite3
+import logging
+import threading
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, TextIO, Tuple
+
+from app.backup_compression import EXTENSIONS, zstandard
+
+logger = logging.getLogger(__name__)
+
+# Сколько INSERT склеивать в одну инструкцию / строк JSONL в один executemany
+IMPORT_BATCH_ROWS = int(os.getenv("IMPORT_BATCH_ROWS", 500))
+# Размер транзакции в строках
+IMPORT_TRANSACTION_ROWS = int(os.getenv("IMPORT_TRANSACTION_ROWS", 100000))
+
+# Предел длины склеенной инструкции INSERT
+_MAX_STATEMENT_CHARS = 1024 * 1024
+
+IMPORT_FORMATS = ("sql", "jsonl")
+
+_SPECIAL_RE = re.compile(r"'|\"|`|\[|--|/\*|;")
+_CLOSERS = {"'": "'", '"': '"', "`": "`", "[": "]", "--": "\n", "/*": "*/"}
+_LEADING_COMMENTS_RE = re.compile(r"^(?:\s+|--[^\n]*(?:\n|$)|/\*.*?\*/)*", re.DOTALL)
+_TRANSACTION_RE = re.compile(r"^(?:BEGIN|COMMIT|END|ROLLBACK)\b", re.IGNORECASE)
+_DEFERRED_RE = re.compile(
+    r"^CREATE\s+(?:UNIQUE\s+INDEX|INDEX|(?:TEMP|TEMPORARY)\s+(?:TRIGGER|VIEW)|TRIGGER|VIEW)\b", re.IGNORECASE
+)
+_INSERT_RE = re.compile(
+    r"^((?:INSERT(?:\s+OR\s+\w+)?|REPLACE)\s+INTO\s+.+?\s+VALUES)\s*(\(.*\))\s*;?\s*$",
+    re.IGNORECASE | re.DOTALL
+)
+_INSERT_TAIL_RE = re.compile(r"\bON\s+CONFLICT\b|\bRETURNING\b", re.IGNORECASE)
+
+
+class ImportCancelled(Exception):
+    """Импорт отменен"""
+
+
+def dump_format(path: str) -> Tuple[Optional[str], Optional[str]]:
+    """Формат (sql / jsonl) и сжатие дампа по имени файла: dump.sql.gz -> ("sql", "gzip")"""
+    name = os.path.basename(path).lower()
+    method = None
+    for candidate, extension in EXTENSIONS.items():
+        if name.endswith(extension):
+            method = candidate
+            name = name[:-len(extension)]
+            break
+    for fmt in IMPORT_FORMATS:
+        if name.endswith(f".{fmt}"):
+            return fmt, method
+    return None, method
+
+
+def is_dump_filename(filename: str) -> bool:
+    return dump_format(filename)[0] is not None
+
+
+def _open_dump(raw, method: Optional[str]) -> TextIO:
+    """Текстовый поток из файла дампа, при необходимости через декомпрессор"""
+    if method == "gzip":
+        stream = gzip.GzipFile(fileobj=raw, mode='rb')
+    elif method == "zstd":
+        if zstandard is None:
+            raise RuntimeError("Для импорта .zst нужен пакет zstandard")
+        stream = io.BufferedReader(zstandard.ZstdDecompressor().stream_reader(raw))
+    else:
+        stream = raw
+    return io.TextIOWrapper(stream, encoding='utf-8', newline='')
+
+
+def iter_sql_statements(lines: Iterable[str]) -> Iterator[str]:
+    """
+    Инструкции SQL из потока строк.
+    ';' внутри строковых литералов, идентификаторов, комментариев и тел триггеров
+    инструкцию не завершает.
+    """
+    buffer: List[str] = []
+    closer = None  # чем закончится текущий литерал / комментарий
+    for line in lines:
+        # Частый случай - одна целая инструкция в строке (iterdump, старый экспорт): без посимвольного разбора
+        if (not buffer and closer is None and line.count(";") == 1
+                and line.rstrip().endswith(";") and sqlite3.complete_statement(line)):
+            if line[0] in " \t\r\n-/":
+                line = _LEADING_COMMENTS_RE.sub("", line, count=1)
+            if line.strip(" \t\r\n;"):
+                yield line
+            continue
+
+        pos = start = 0
+        length = len(line)
+        while pos < length:
+            if closer is not None:
+                end = line.find(closer, pos)
+                if end == -1:
+                    break
+                pos = end + len(closer)
+                closer = None
+                continue
+
+            match = _SPECIAL_RE.search(line, pos)
+            if match is None:
+                break
+            token = match.group()
+            pos = match.end()
+            if token != ";":
+                closer = _CLOSERS[token]
+                continue
+
+            buffer.append(line[start:pos])
+            start = pos
+            statement = "".join(buffer)
+            # Тело триггера (BEGIN ... END;) содержит ';' - копим до конца всей инструкции
+            if sqlite3.complete_statement(statement):
+                buffer = []
+                statement = _LEADING_COMMENTS_RE.sub("", statement, count=1)
+                if statement.strip(" \t\r\n;"):
+                    yield statement
+
+        buffer.append(line[start:])
+
+    tail = _LEADING_COMMENTS_RE.sub("", "".join(buffer), count=1)
+    if tail.strip():
+        yield tail
+
+
+class _Importer:
+    """Применение инструкций к БД: транзакции, склейка INSERT, отложенные индексы"""
+
+    def __init__(self, conn: sqlite3.Connection, batch_rows: int,
+                 progress: Callable[[], None]):
+        self.conn = conn
+        self.batch_rows = batch_rows
+        self.progress = progress
+        self.rows = 0
+        self.statements = 0
+        self.deferred: List[str] = []
+        self._insert_prefix: Optional[str] = None
+        self._insert_values: List[str] = []
+        self._insert_chars = 0
+        self._uncommitted = 0
+
+    def _execute(self, sql: str, params: Any = ()):
+        before = self.conn.total_changes
+        self.conn.execute(sql, params)
+        self._count(self.conn.total_changes - before)
+
+    def _count(self, rows: int):
+        self.rows += rows
+        self.statements += 1
+        self._uncommitted += rows
+        if self._uncommitted >= IMPORT_TRANSACTION_ROWS:
+            self.conn.commit()
+            self._uncommitted = 0
+        self.progress()
+
+    def flush_inserts(self):
+        if self._insert_prefix is None:
+            return
+        sql = f"{self._insert_prefix} " + ",\n".join(self._insert_values)
+        self._insert_prefix = None
+        self._insert_values = []
+        self._insert_chars = 0
+        self._execute(sql)
+
+    def add_statement(self, statement: str):
+        if _TRANSACTION_RE.match(statement):
+            return  # транзакциями управляет импорт
+        if _DEFERRED_RE.match(statement):
+            self.deferred.append(statement)
+            return
+
+        match = _INSERT_RE.match(statement)
+        if match and not _INSERT_TAIL_RE.search(match.group(2)):
+            prefix, values = match.group(1), match.group(2)
+            if prefix != self._insert_prefix:
+                self.flush_inserts()
+                self._insert_prefix = prefix
+            self._insert_values.append(values)
+            self._insert_chars += len(values)
+            if len(self._insert_values) >= self.batch_rows or self._insert_chars >= _MAX_STATEMENT_CHARS:
+                self.flush_inserts()
+            return
+
+        self.flush_inserts()
+        self._execute(statement)
+
+    def add_rows(self, table: str, columns: List[str], rows: List[tuple]):
+        if not rows:
+            return
+        self.flush_inserts()
+        quoted = ", ".join(f'"{column}"' for column in columns)
+        placeholders = ", ".join("?" for _ in columns)
+        before = self.conn.total_changes
+        self.conn.executemany(f'INSERT INTO "{table}" ({quoted}) VALUES ({placeholders})', rows)
+        self._count(self.conn.total_changes - before)
+
+    def finish(self):
+        self.flush_inserts()
+        self.conn.commit()
+        for statement in self.deferred:
+            self.conn.execute(statement)
+        self.conn.commit()
+
+
+def _blob_columns(conn: sqlite3.Connection, table: str) -> set:
+    return {
+        row[1] for row in conn.execute(f'PRAGMA table_info("{table}")')
+        if "BLOB" in (row[2] or "").upper()
+    }
+
+
+def _import_jsonl(lines: Iterable[str], importer: _Importer, batch_rows: int):
+    """Строки {"table": ..., "row": {...}} (формат экспорта JSONL) пачками через executemany"""
+    blobs: Dict[str, set] = {}
+    key = None
+    batch: List[tuple] = []
+    for line in lines:
+        if not line.strip():
+            continue
+        record = json.loads(line)
+        table, row = record.get("table"), record.get("row")
+        if not table or not isinstance(row, dict):
+            raise ValueError("В JSONL нет поля table/row - это не дамп таблиц")
+
+        columns = tuple(row)
+        if (table, columns) != key or len(batch) >= batch_rows:
+            if batch:
+                importer.add_rows(key[0], list(key[1]), batch)
+            key, batch = (table, columns), []
+
+        if table not in blobs:
+            blobs[table] = _blob_columns(importer.conn, table)
+        batch.append(tuple(
+            bytes.fromhex(value) if column in blobs[table] and isinstance(value, str) else value
+            for column, value in row.items()
+        ))
+
+    if batch:
+        importer.add_rows(key[0], list(key[1]), batch)
+
+
+def _copy_schema(conn: sqlite3.Connection, schema_db: str, importer: _Importer):
+    """Таблицы - из схемы рабочей БД сразу, индексы и триггеры - после данных"""
+    source = sqlite3.connect(f"file:{schema_db}?mode=ro", uri=True)
+    try:
+        for kind, sql in source.execute(
+            "SELECT type, sql FROM sqlite_master WHERE sql IS NOT NULL AND name NOT LIKE 'sqlite_%' "
+            "ORDER BY CASE type WHEN 'table' THEN 0 ELSE 1 END"
+        ):
+            if kind == "table":
+                conn.execute(sql)
+            else:
+                importer.deferred.append(sql)
+    finally:
+        source.close()
+
+
+def import_dump(dump_path: str, dest_db: str, schema_db: Optional[str] = None,
+                batch_rows: int = IMPORT_BATCH_ROWS,
+                progress_callback: Optional[Callable[[int, int], None]] = None,
+                cancel_event: Optional[threading.Event] = None) -> Optional[Dict[str, Any]]:
+    """
+    Собрать БД dest_db из дампа dump_path (формат и сжатие - по имени файла).
+
+    JSONL содержит только строки, поэтому схема берется из schema_db (обычно рабочая БД).
+    progress_callback(байт_прочитано, размер_файла). Возвращает {path, rows, statements}
+    или None при отмене. При ошибке dest_db не создается.
+    """
+    fmt, method = dump_format(dump_path)
+    if fmt is None:
+        raise ValueError(f"Неизвестный формат дампа: {os.path.basename(dump_path)}")
+    if fmt == "jsonl" and not schema_db:
+        raise ValueError("Для импорта JSONL нужна БД со схемой (schema_db)")
+
+    total = os.path.getsize(dump_path)
+    part_path = f"{dest_db}.part"
+    if os.path.exists(part_path):
+        os.remove(part_path)
+
+    conn = sqlite3.connect(part_path, isolation_level="DEFERRED")
+    # Файл временный: при сбое он просто удаляется, журнал и fsync не нужны
+    conn.execute("PRAGMA journal_mode=OFF")
+    conn.execute("PRAGMA synchronous=OFF")
+    conn.execute("PRAGMA cache_size=-65536")
+
+    try:
+        with open(dump_path, 'rb') as raw:
+            def progress():
+                if cancel_event is not None and cancel_event.is_set():
+                    raise ImportCancelled()
+                if progress_callback:
+                    progress_callback(raw.tell(), total)
+
+            importer = _Importer(conn, batch_rows, progress)
+            with _open_dump(raw, method) as lines:
+                if fmt == "jsonl":
+                    _copy_schema(conn, schema_db, importer)
+                    _import_jsonl(lines, importer, batch_rows)
+                else:
+                    for statement in iter_sql_statements(lines):
+                        importer.add_statement(statement)
+                importer.finish()
+
+        conn.close()
+        os.replace(part_path, dest_db)
+        logger.info(f"📥 Импорт {fmt}: {os.path.basename(dump_path)} - {importer.rows} строк, "
+                    f"{importer.statements} инструкций")
+        return {"path": dest_db, "rows": importer.rows, "statements": importer.statements}
+
+    except ImportCancelled:
+        logger.info(f"⏹️ Импорт отменен: {dump_path}")
+        return None
+    finally:
+        conn.close()
+        if os.path.exists(part_path):
+            os.remove(part_path)
@@ -9,6 +9,8 @@ from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import close_all_sessions
 import logging
 
+from app.startup import FAST_START, STARTUP_HEALTH
+
 logger = logging.getLogger(__name__)
 
 # Создаем Base здесь для импорта в другие модули
@@ -36,6 +38,9 @@ def get_engine():
     """Получить или создать engine"""
     global _engine, engine
     if _engine is None:
+        # Число и время SQL-запросов всех engine процесса (/metrics веб-панели)
+        from app.metrics import instrument_sqlalchemy
+        instrument_sqlalchemy()
         _engine = create_engine(
             DATABASE_URL,
             echo=False,
@@ -178,6 +183,131 @@ def create_tables():
         traceback.print_exc()
         return False
 
+def read_sqlite_health(cursor) -> dict:
+    """
+    Метаданные SQLite без сканирования данных: размер страниц, число страниц,
+    список таблиц и оценка количества строк из sqlite_stat1 (если ANALYZE выполнялся).
+    Принимает DB-API курсор (sqlite3 или raw_connection SQLAlchemy).
+    """
+    cursor.execute("PRAGMA page_size")
+    page_size = cursor.fetchone()[0]
+    cursor.execute("PRAGMA page_count")
+    page_count = cursor.fetchone()[0]
+    cursor.execute("PRAGMA freelist_count")
+    freelist_count = cursor.fetchone()[0]
+    
+    cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name NOT LIKE 'sqlite_%'")
+    tables = [row[0] for row in cursor.fetchall()]
+    
+    # sqlite_stat1: первое число в поле stat - оценка количества строк таблицы
+    row_estimates = {table: None for table in tables}
+    cursor.execute("SELECT 1 FROM sqlite_master WHERE type='table' AND name='sqlite_stat1'")
+    has_stats = cursor.fetchone() is not None
+    if has_stats:
+        cursor.execute("SELECT tbl, stat FROM sqlite_stat1")
+        for table, stat in cursor.fetchall():
+            if table in row_estimates and stat:
+                try:
+                    row_estimates[table] = max(row_estimates[table] or 0, int(str(stat).split()[0]))
+                except ValueError:
+                    pass
+    
+    return {
+        "page_size": page_size,
+        "page_count": page_count,
+        "freelist_count": freelist_count,
+        "size": page_size * page_count,
+        "tables": tables,
+        "row_estimates": row_estimates,
+        "has_stats": has_stats,
+    }
+
+def get_startup_health() -> dict:
+    """Быстрая проверка БД для запуска: O(1) метаданные вместо COUNT(*)"""
+    raw_conn = get_engine().raw_connection()
+    try:
+        return read_sqlite_health(raw_conn.cursor())
+    finally:
+        raw_conn.close()
+
+def refresh_table_stats(analysis_limit: int = 1000) -> bool:
+    """
+    Обновить sqlite_stat1 приблизительным ANALYZE.
+    analysis_limit ограничивает число просматриваемых строк на индекс, поэтому
+    обновление не зависит от размера таблиц.
+    """
+    if "sqlite" not in DATABASE_URL:
+        return False
+    
+    try:
+        raw_conn = get_engine().raw_connection()
+        try:
+            cursor = raw_conn.cursor()
+            cursor.execute(f"PRAGMA analysis_limit={int(analysis_limit)}")
+            cursor.execute("ANALYZE")
+            raw_conn.commit()
+        finally:
+            raw_conn.close()
+        logger.info("📊 Статистика таблиц (sqlite_stat1) обновлена")
+        return True
+    except Exception as e:
+        logger.warning(f"⚠️ Не удалось обновить статистику таблиц: {e}")
+        return False
+
+def log_db_diagnostics():
+    """Вывести в лог структуру таблиц и количество записей"""
+    if STARTUP_HEALTH != "full" and "sqlite" in DATABASE_URL:
+        log_startup_health()
+        return
+    
+    engine = get_engine()
+    inspector = inspect(engine)
+    tables = inspector.get_table_names()
+    
+    logger.info(f"📊 Итоговая структура БД: {len(tables)} таблиц")
+    for table in tables:
+        logger.info(f"  - {table}")
+        
+        # Показываем структуру таблицы
+        try:
+            columns = inspector.get_columns(table)
+            logger.info(f"    Колонки: {len(columns)}")
+            for col in columns[:3]:  # Первые 3 колонки для краткости
+                logger.info(f"      - {col['name']} ({col['type']})")
+            if len(columns) > 3:
+                logger.info(f"      - ... и еще {len(columns) - 3} колонок")
+        except:
+            pass
+    
+    # Проверяем количество записей
+    logger.info("📈 Проверка записей в таблицах:")
+    with engine.connect() as conn:
+        for table in tables:
+            try:
+                result = conn.execute(text(f"SELECT COUNT(*) FROM {table}"))
+                count = result.scalar() or 0
+                logger.info(f"  - {table}: {count} записей")
+            except Exception as e:
+                logger.warning(f"  - {table}: ошибка чтения ({e})")
+
+def log_startup_health():
+    """Вывести в лог быстрые метаданные БД (без сканирования таблиц)"""
+    try:
+        health = get_startup_health()
+    except Exception as e:
+        logger.warning(f"⚠️ Не удалось получить метаданные БД: {e}")
+        return
+    
+    logger.info(
+        f"📊 БД: {len(health['tables'])} таблиц, {health['page_count']} страниц по {health['page_size']} байт "
+        f"({health['size'] / (1024 * 1024):.2f} MB, свободных страниц: {health['freelist_count']})"
+    )
+    if health["has_stats"]:
+        for table, estimate in health["row_estimates"].items():
+            logger.info(f"  - {table}: ~{estimate if estimate is not None else 0} записей (sqlite_stat1)")
+    else:
+        logger.info("  ℹ️ sqlite_stat1 еще нет, оценка записей появится после ANALYZE")
+
 def init_db():
     """Инициализация базы данных - основная функция для запуска"""
     logger.info("🚀 ИНИЦИАЛИЗАЦИЯ БАЗЫ ДАННЫХ...")
@@ -189,36 +319,11 @@ def init_db():
     success = create_tables()
     
     if success:
-        # Проверяем структуру
-        engine = get_engine()
-        inspector = inspect(engine)
-        tables = inspector.get_table_names()
-        
-        logger.info(f"📊 Итоговая структура БД: {len(tables)} таблиц")
-        for table in tables:
-            logger.info(f"  - {table}")
-            
-            # Показываем структуру таблицы
-            try:
-                columns = inspector.get_columns(table)
-                logger.info(f"    Колонки: {len(columns)}")
-                for col in columns[:3]:  # Первые 3 колонки для краткости
-                    logger.info(f"      - {col['name']} ({col['type']})")
-                if len(columns) > 3:
-                    logger.info(f"      - ... и еще {len(columns) - 3} колонок")
-            except:
-                pass
-        
-        # Проверяем количество записей
-        logger.info("📈 Проверка записей в таблицах:")
-        with engine.connect() as conn:
-            for table in tables:
-                try:
-                    result = conn.execute(text(f"SELECT COUNT(*) FROM {table}"))
-                    count = result.scalar() or 0
-                    logger.info(f"  - {table}: {count} записей")
-                except Exception as e:
-                    logger.warning(f"  - {table}: ошибка чтения ({e})")
+        if FAST_START:
+            # Метаданные БД выводятся позже, в фоне; COUNT(*) по таблицам - только по запросу админа
+            logger.info("⚡ Быстрый старт: диагностика БД отложена")
+        else:
+            log_db_diagnostics()
         
         logger.info("✅ База данных успешно инициализирована!")
     else:
@@ -226,13 +331,24 @@ def init_db():
     
     return success
 
+def reset_connections():
+    """
+    Закрыть соединения пула, не пересоздавая engine.
+    Новые сессии откроют соединения заново; занятые соединения закроются при возврате в пул.
+    """
+    global _last_reconnect
+    if _engine is not None:
+        _engine.dispose()
+    _last_reconnect = time.time()
+
 def force_reconnect():
     """
     Принудительно переподключиться к базе данных
-    Полезно после восстановления БД из бэкапа
-    """
-    global _engine, engine, _SessionLocal, _scoped_session, _last_reconnect
     
+    Engine и sessionmaker остаются прежними (на них ссылаются другие модули), закрываются
+    только соединения пула. После восстановления из бэкапа вызывать не нужно:
+    DatabaseManager.restore_from_backup делает это сам внутри шлюза БД (app.db_gate).
+    """
     logger.info("🔁 ПРИНУДИТЕЛЬНОЕ ПЕРЕПОДКЛЮЧЕНИЕ К БД...")
     
     try:
@@ -243,46 +359,11 @@ def force_reconnect():
         except Exception as e:
             logger.warning(f"⚠️ Ошибка при закрытии сессий: {e}")
         
-        # 2. Закрываем старый engine если существует
-        if _engine:
-            try:
-                _engine.dispose()
-                logger.info("✅ Старый engine закрыт")
-            except Exception as e:
-                logger.warning(f"⚠️ Ошибка при закрытии engine: {e}")
-        
-        # 3. Сбрасываем ВЕСЬ кэш SQLAlchemy
-        try:
-            # Очищаем кэш метаданных
-            Base.metadata.clear()
-            logger.info("✅ Кэш метаданных очищен")
-        except Exception as e:
-            logger.warning(f"⚠️ Ошибка очистки кэша метаданных: {e}")
-        
-        # 4. Сбрасываем все глобальные переменные
-        _engine = None
-        engine = None
-        _SessionLocal = None
-        _scoped_session = None
+        # 2. Закрываем соединения пула
+        reset_connections()
         
-        # 5. Даем время на закрытие всех соединений
-        time.sleep(2)
-        
-        logger.info("🔄 Создаю новое подключение...")
-        
-        # 6. Создаем новый engine
-        new_engine = create_engine(
-            DATABASE_URL,
-            echo=False,
-            pool_pre_ping=True,
-            connect_args={
-                "check_same_thread": False,
-                "timeout": 30
-            } if "sqlite" in DATABASE_URL else {}
-        )
-        
-        # 7. Тестируем подключение С ИСПОЛЬЗОВАНИЕМ text()
-        with new_engine.connect() as conn:
+        # 3. Тестируем подключение С ИСПОЛЬЗОВАНИЕМ text()
+        with get_engine().connect() as conn:
             result = conn.execute(text("SELECT 1"))
             logger.info(f"✅ Тест подключения: {result.scalar()}")
             
@@ -293,19 +374,16 @@ def force_reconnect():
             
             # Если есть таблица users, показываем статистику
             if 'users' in tables:
-                result = conn.execute(text("SELECT COUNT(*) FROM users"))
-                user_count = result.scalar()
-                logger.info(f"👥 Пользователей в БД: {user_count}")
-        
-        # 8. Обновляем глобальные переменные
-        _engine = new_engine
-        engine = new_engine
-        _SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=_engine)
-        _scoped_session = scoped_session(_SessionLocal)
-        
-        _last_reconnect = time.time()
+                if STARTUP_HEALTH == "full":
+                    result = conn.execute(text("SELECT COUNT(*) FROM users"))
+                    logger.info(f"👥 Пользователей в БД: {result.scalar()}")
+                else:
+                    health = read_sqlite_health(conn.connection.cursor())
+                    estimate = health["row_estimates"].get("users")
+                    if estimate is not None:
+                        logger.info(f"👥 Пользователей в БД: ~{estimate} (sqlite_stat1)")
         
-        logger.info("✅ БД успешно переподключена, все кэши очищены")
+        logger.info("✅ БД успешно переподключена")
         return True
         
     except Exception as e:
@@ -396,6 +474,12 @@ __all__ = [
     'get_scoped_session',
     'create_tables',
     'init_db',  # <-- ДОБАВЛЕНО
+    'log_db_diagnostics',
+    'log_startup_health',
+    'read_sqlite_health',
+    'get_startup_health',
+    'refresh_table_stats',
+    'reset_connections',
     'force_reconnect',
     'check_database_connection',
     'get_database_info',
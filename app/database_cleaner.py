@@ -1,11 +1,15 @@
+import logging
 import os
 import asyncio
 from datetime import datetime, timedelta
 from sqlalchemy.orm import Session
 from app.database import get_db
+from app.change_journal import bulk_delete
 from app.models import AnonMessage, Payment
 from app.backup_service import backup_service
 
+logger = logging.getLogger(__name__)
+
 
 class DatabaseCleaner:
     def __init__(self):
@@ -16,24 +20,26 @@ class DatabaseCleaner:
         """Автоматическая очистка старых данных"""
         db = next(get_db())
         try:
-            # Удаляем старые сообщения
+            # Удаляем старые сообщения (по id - чтобы удаления попали в журнал изменений)
             messages_cutoff = datetime.utcnow() - timedelta(days=self.keep_messages_days)
-            deleted_messages = db.query(AnonMessage).filter(
+            message_ids = [row.id for row in db.query(AnonMessage.id).filter(
                 AnonMessage.timestamp < messages_cutoff
-            ).delete()
+            )]
+            deleted_messages = bulk_delete(db, AnonMessage, message_ids)
 
             # Удаляем старые pending платежи (старше 7 дней)
             payments_cutoff = datetime.utcnow() - timedelta(days=7)
-            deleted_payments = db.query(Payment).filter(
+            payment_ids = [row.id for row in db.query(Payment.id).filter(
                 Payment.status == "pending",
                 Payment.created_at < payments_cutoff
-            ).delete()
+            )]
+            deleted_payments = bulk_delete(db, Payment, payment_ids)
 
             db.commit()
 
             # Логируем результат
             if deleted_messages > 0 or deleted_payments > 0:
-                print(f"🗑️ Очистка: удалено {deleted_messages} сообщений, {deleted_payments} платежей")
+                logger.info(f"🗑️ Очистка: удалено {deleted_messages} сообщений, {deleted_payments} платежей")
 
                 # Отправляем уведомление админу
                 await self.send_cleanup_notification(deleted_messages, deleted_payments)
@@ -42,7 +48,7 @@ class DatabaseCleaner:
 
         except Exception as e:
             db.rollback()
-            print(f"❌ Ошибка очистки базы: {e}")
+            logger.error(f"❌ Ошибка очистки базы: {e}")
             return 0, 0
         finally:
             db.close()
@@ -64,7 +70,7 @@ class DatabaseCleaner:
             try:
                 await bot.send_message(admin_id, message, parse_mode="Markdown")
             except Exception as e:
-                print(f"❌ Ошибка уведомления админа: {e}")
+                logger.error(f"❌ Ошибка уведомления админа: {e}")
 
 
 # Глобальный экземпляр
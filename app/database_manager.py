@@ -11,10 +11,31 @@ import logging
 from typing import Optional, List, Dict, Any
 import traceback
 import time
+import threading
+
+from app.startup import FAST_START
+from app.db_gate import db_gate
+from app.incremental_backup import IncrementalBackupStore
+from app.data_export import export_database, export_query
+from app.data_import import import_dump
+from app.change_journal import (
+    JOURNAL_ENABLED, ChangeJournal, install_session_hooks, journal_dir_for
+)
+from app.backup_manifest import BackupManifest, estimate_row_counts, inspect_backup
+from app.backup_delivery import fan_out_document, normalize_admin_ids
+from app.backup_verify import verify_backup, quick_check as run_quick_check
+from app.backup_compression import (
+    EXTENSIONS, backup_parts, backup_size, compress_db, connect_backup, decompress_to, is_backup_filename,
+    is_compressed_backup, materialized_backup, resolve_method
+)
 
 logger = logging.getLogger(__name__)
 
 
+class BackupCancelled(Exception):
+    """Создание бэкапа отменено"""
+
+
 class DatabaseManager:
     """Класс для управления базой данных с бэкапами"""
     
@@ -22,7 +43,10 @@ class DatabaseManager:
         self.db_path = self._find_or_create_db(db_path)
         self.backup_dir = 'backups'
         self.metadata_file = 'data/db_metadata.json'
+        self.manifest_file = os.path.join(self.backup_dir, 'manifest.json')
+        self.manifest = BackupManifest(self.manifest_file)
         self.bot = None  # Будет установлен позже
+        self.loop = None  # Цикл событий бота (для отправки бэкапов из фонового потока)
         
         # Создаем необходимые директории
         os.makedirs(os.path.dirname(self.db_path), exist_ok=True)
@@ -34,6 +58,19 @@ class DatabaseManager:
         self.auto_restore_on_start = True
         self.max_backups = 10
         self.min_db_size = 1024  # 1KB минимальный размер для бэкапа
+        self.backup_step_pages = int(os.getenv("BACKUP_STEP_PAGES", 256))  # Страниц за один шаг backup()
+        
+        # Инкрементальные бэкапы (чанки по хэшу + манифесты снимков)
+        self.incremental = IncrementalBackupStore(self.backup_dir)
+        
+        # Выгрузки данных (SQL / CSV / JSONL)
+        self.export_dir = os.path.join(os.path.dirname(self.metadata_file), 'exports')
+        
+        # Журнал изменений между полными бэкапами (point-in-time recovery) - на том же
+        # постоянном диске, что и БД: записи после последнего бэкапа должны пережить деплой
+        self.journal = ChangeJournal(journal_dir_for(self.db_path, os.path.join(self.backup_dir, 'journal')))
+        if JOURNAL_ENABLED:
+            install_session_hooks(self.journal)
         
         logger.info(f"📊 Менеджер БД инициализирован: {self.db_path}")
         logger.info(f"📁 Директория бэкапов: {self.backup_dir}")
@@ -44,8 +81,26 @@ class DatabaseManager:
     def set_bot(self, bot):
         """Установить бота для отправки уведомлений"""
         self.bot = bot
+        try:
+            self.loop = asyncio.get_running_loop()
+        except RuntimeError:
+            pass
         logger.info(f"✅ Бот установлен для менеджера БД")
     
+    def _schedule_coroutine(self, coro):
+        """Запустить корутину в цикле бота - из самого цикла или из фонового потока"""
+        try:
+            return asyncio.get_running_loop().create_task(coro)
+        except RuntimeError:
+            pass
+        
+        if self.loop is not None and self.loop.is_running():
+            return asyncio.run_coroutine_threadsafe(coro, self.loop)
+        
+        coro.close()
+        logger.warning("⚠️ Цикл событий бота недоступен, отправка пропущена")
+        return None
+    
     def _find_or_create_db(self, db_path: str = None) -> str:
         """Найти существующую БД или определить путь для новой"""
         if db_path and os.path.exists(db_path):
@@ -139,6 +194,62 @@ class DatabaseManager:
             logger.error(f"❌ Ошибка получения информации о БД: {e}")
             return {"exists": False, "error": str(e), "status": "error"}
     
+    def get_db_quick_info(self) -> Dict[str, Any]:
+        """
+        Быстрая информация о БД для запуска: размер по page_count и оценка записей
+        из sqlite_stat1 без сканирования таблиц (значения приблизительные)
+        """
+        if not os.path.exists(self.db_path):
+            return {"exists": False, "size": 0, "tables": [], "error": "Файл не найден"}
+        
+        try:
+            from app.database import read_sqlite_health
+            
+            conn = sqlite3.connect(f"file:{self.db_path}?mode=ro", uri=True)
+            try:
+                health = read_sqlite_health(conn.cursor())
+            finally:
+                conn.close()
+            
+            size = os.path.getsize(self.db_path)
+            table_stats = {table: count or 0 for table, count in health["row_estimates"].items()}
+            
+            return {
+                "exists": True,
+                "path": self.db_path,
+                "size": size,
+                "size_mb": round(size / (1024 * 1024), 2),
+                "page_size": health["page_size"],
+                "page_count": health["page_count"],
+                "freelist_count": health["freelist_count"],
+                "tables": health["tables"],
+                "table_count": len(health["tables"]),
+                "table_stats": table_stats,
+                "total_records": sum(table_stats.values()),
+                "approximate": True,
+                "has_stats": health["has_stats"],
+                "last_modified": datetime.fromtimestamp(os.path.getmtime(self.db_path)),
+                "status": "ok"
+            }
+        except Exception as e:
+            logger.error(f"❌ Ошибка получения быстрой информации о БД: {e}")
+            return {"exists": False, "error": str(e), "status": "error"}
+    
+    def _has_data(self) -> bool:
+        """Есть ли в БД хотя бы одна запись: по одной строке из каждой таблицы, без COUNT(*)"""
+        try:
+            conn = sqlite3.connect(f"file:{self.db_path}?mode=ro", uri=True)
+            try:
+                tables = [row[0] for row in conn.execute(
+                    "SELECT name FROM sqlite_master WHERE type='table' AND name NOT LIKE 'sqlite_%'"
+                )]
+                return any(conn.execute(f'SELECT 1 FROM "{table}" LIMIT 1').fetchone() for table in tables)
+            finally:
+                conn.close()
+        except Exception as e:
+            logger.warning(f"⚠️ Не удалось проверить наличие данных в БД: {e}")
+            return False
+    
     def save_metadata(self):
         """Сохранить метаданные базы данных"""
         try:
@@ -146,7 +257,7 @@ class DatabaseManager:
                 "db_path": self.db_path,
                 "last_backup": datetime.now().isoformat(),
                 "backup_count": len(self.list_backups()),
-                "db_info": self.get_db_info(),
+                "db_info": self.get_db_quick_info(),
                 "version": "1.0",
                 "timestamp": datetime.now().isoformat()
             }
@@ -175,8 +286,20 @@ class DatabaseManager:
             logger.error(f"❌ Ошибка загрузки метаданных: {e}")
             return None
     
-    def create_backup(self, backup_name: Optional[str] = None, send_to_admins: bool = True) -> Optional[str]:
-        """Создать резервную копию базы данных с использованием sqlite3 backup API"""
+    def create_backup(self, backup_name: Optional[str] = None, send_to_admins: bool = True,
+                      progress_callback=None, cancel_event: Optional[threading.Event] = None,
+                      compression: Optional[str] = None) -> Optional[str]:
+        """
+        Создать резервную копию базы данных с использованием sqlite3 backup API
+        
+        Копирование идет шагами по backup_step_pages страниц: между шагами вызывается
+        progress_callback(скопировано_страниц, всего_страниц) и проверяется cancel_event.
+        Бэкап пишется во временный .part файл и появляется в списке только целиком.
+        С compression (или BACKUP_COMPRESSION) = gzip/zstd/auto снимок БД сжимается потоком
+        в .db.gz/.db.zst (с разбиением на части), возвращается путь к первой части.
+        Метод блокирующий - из асинхронного кода используйте app.backup_jobs.
+        """
+        backup_path = None
         try:
             # Проверяем существует ли файл БД
             if not os.path.exists(self.db_path):
@@ -189,9 +312,8 @@ class DatabaseManager:
                 logger.warning(f"⚠️ БД слишком мала ({db_size:,} байт < {self.min_db_size:,}), пропускаю бэкап")
                 return None
             
-            # Получаем информацию о БД перед бэкапом
-            db_info = self.get_db_info()
-            if db_info.get("total_records", 0) == 0 and db_info.get("table_count", 0) <= 1:
+            # Пустую БД не бэкапим (по одной строке из таблицы, без COUNT(*))
+            if not self._has_data():
                 logger.warning("⚠️ БД почти пустая, пропускаю бэкап")
                 return None
             
@@ -201,12 +323,24 @@ class DatabaseManager:
                 backup_name = f"backup_{timestamp}.db"
             
             backup_path = os.path.join(self.backup_dir, backup_name)
+            part_path = f"{backup_path}.part"
+            
+            # Записи журнала до этой точки уже попадут в снимок, после нее - реплеятся поверх бэкапа
+            journal_seq = self.journal.checkpoint() if JOURNAL_ENABLED else None
+            
+            method = resolve_method(compression)
+            if method:
+                return self._create_compressed_backup(
+                    backup_path, method, send_to_admins, progress_callback, cancel_event, journal_seq
+                )
             
             logger.info(f"💾 Создание бэкапа: {backup_name}")
             
-            # КРИТИЧЕСКОЕ ИСПРАВЛЕНИЕ: Используем правильный метод копирования
-            # Закрываем все возможные соединения перед копированием
-            time.sleep(0.5)  # Даем время на завершение операций
+            def on_step(status, remaining, total):
+                if cancel_event is not None and cancel_event.is_set():
+                    raise BackupCancelled()
+                if progress_callback:
+                    progress_callback(total - remaining, total)
             
             # Метод 1: Используем sqlite3 backup API (рекомендуемый)
             source_conn = None
@@ -217,24 +351,30 @@ class DatabaseManager:
                 source_conn = sqlite3.connect(self.db_path)
                 
                 # Создаем новую БД для бэкапа
-                backup_conn = sqlite3.connect(backup_path)
+                backup_conn = sqlite3.connect(part_path)
                 
-                # Копируем ВСЮ базу данных (структура + данные)
-                source_conn.backup(backup_conn)
+                # Копируем ВСЮ базу данных (структура + данные) шагами, не держа блокировку целиком
+                source_conn.backup(backup_conn, pages=self.backup_step_pages, progress=on_step)
                 
                 logger.info(f"✅ Бэкап создан через backup API: {backup_name}")
                 
+            except BackupCancelled:
+                raise
             except Exception as backup_api_error:
                 logger.warning(f"⚠️ Backup API не сработал: {backup_api_error}, пробую альтернативный метод...")
                 
                 # Закрываем соединения если открыты
                 if source_conn:
                     source_conn.close()
+                    source_conn = None
                 if backup_conn:
                     backup_conn.close()
+                    backup_conn = None
+                if os.path.exists(part_path):
+                    os.remove(part_path)
                 
                 # Метод 2: Пробуем через временный файл с прямым копированием
-                return self._create_backup_direct(backup_path, db_size)
+                return self._create_backup_direct(backup_path, db_size, progress_callback, cancel_event, journal_seq)
             
             finally:
                 # Закрываем соединения если они открыты
@@ -243,6 +383,8 @@ class DatabaseManager:
                 if backup_conn:
                     backup_conn.close()
             
+            os.replace(part_path, backup_path)
+            
             # Проверяем что файл создался и не пустой
             if os.path.exists(backup_path):
                 file_size = os.path.getsize(backup_path)
@@ -255,12 +397,12 @@ class DatabaseManager:
                         os.remove(backup_path)
                     
                     # Пробуем альтернативный метод
-                    return self._create_backup_direct(backup_path, db_size)
+                    return self._create_backup_direct(backup_path, db_size, progress_callback, cancel_event, journal_seq)
                 
                 logger.info(f"✅ Бэкап создан: {backup_name} ({file_size:,} байт)")
                 
-                # Проверяем валидность бэкапа
-                if not self.validate_backup_full(backup_path):
+                # Проверяем валидность бэкапа и записываем его в манифест
+                if not self._verify_new_backup(backup_path, journal_seq):
                     logger.error(f"❌ Бэкап не прошел проверку: {backup_path}")
                     
                     if os.path.exists(backup_path):
@@ -269,7 +411,7 @@ class DatabaseManager:
                 
                 # Отправляем админам если есть бот
                 if send_to_admins and self.bot:
-                    asyncio.create_task(self._send_backup_to_admins(backup_path))
+                    self._schedule_coroutine(self._send_backup_to_admins(backup_path))
                 
                 # Сохраняем метаданные
                 self.save_metadata()
@@ -283,32 +425,110 @@ class DatabaseManager:
             else:
                 logger.error(f"❌ Файл бэкапа не создался: {backup_path}")
                 return None
-                
+        
+        except BackupCancelled:
+            logger.info(f"⏹️ Создание бэкапа отменено: {backup_name}")
+            if backup_path and os.path.exists(f"{backup_path}.part"):
+                os.remove(f"{backup_path}.part")
+            return None
         except Exception as e:
             logger.error(f"❌ Ошибка создания бэкапа: {e}")
             traceback.print_exc()
             return None
     
-    def _create_backup_direct(self, backup_path: str, original_size: int) -> Optional[str]:
+    def _create_compressed_backup(self, backup_path: str, method: str, send_to_admins: bool = True,
+                                  progress_callback=None, cancel_event: Optional[threading.Event] = None,
+                                  journal_seq: Optional[int] = None) -> Optional[str]:
+        """Сжатый бэкап: снимок БД потоком через компрессор, без несжатой временной копии"""
+        backup_path = f"{backup_path}{EXTENSIONS[method]}"
+        db_size = os.path.getsize(self.db_path)
+        conn = sqlite3.connect(f"file:{self.db_path}?mode=ro", uri=True)
+        try:
+            page_size = conn.execute("PRAGMA page_size").fetchone()[0]
+            # Число записей для манифеста - по исходной БД, чтобы не распаковывать бэкап ради подсчета
+            row_counts = estimate_row_counts(conn)
+        finally:
+            conn.close()
+        
+        def on_progress(done, total):
+            if progress_callback:
+                progress_callback(done // page_size, max(total, db_size) // page_size)
+        
+        parts = compress_db(
+            self.db_path, backup_path, method,
+            progress_callback=on_progress, cancel_event=cancel_event
+        )
+        if parts is None:
+            logger.info(f"⏹️ Создание бэкапа отменено: {os.path.basename(backup_path)}")
+            return None
+        
+        first_part = parts[0]
+        compressed_size = backup_size(first_part)
+        logger.info(
+            f"✅ Сжатый бэкап создан ({method}): {os.path.basename(first_part)} - "
+            f"{compressed_size:,} байт из {db_size:,}, частей: {len(parts)}"
+        )
+        
+        if not self._verify_new_backup(first_part, journal_seq, row_counts):
+            logger.error(f"❌ Бэкап не прошел проверку: {first_part}")
+            self._remove_backup_files(first_part)
+            return None
+        
+        if send_to_admins and self.bot:
+            self._schedule_coroutine(self._send_backup_to_admins(first_part))
+        
+        self.save_metadata()
+        self.cleanup_old_backups()
+        return first_part
+    
+    def _verify_new_backup(self, backup_path: str, journal_seq: Optional[int] = None,
+                           row_counts: Optional[Dict[str, Optional[int]]] = None) -> bool:
+        """Проверка только что созданного бэкапа: одно открытие файла, результат сразу в манифест"""
+        entry = self.record_backup(backup_path, journal_seq, row_counts)
+        if entry["error"] or not entry["tables"]:
+            logger.error(f"❌ Бэкап не открывается или в нем нет таблиц: {entry['error'] or ''}")
+            return False
+        if entry["total_records"] == 0:
+            logger.error("❌ В бэкапе нет данных")
+            return False
+        
+        logger.info(
+            f"🔍 Проверка бэкапа: {len(entry['tables'])} таблиц, {entry['total_records']} записей, "
+            f"sha256 {entry['sha256'][:12]}"
+        )
+        return True
+    
+    def _remove_backup_files(self, backup_path: str):
+        """Удалить бэкап вместе со всеми частями"""
+        for part in backup_parts(backup_path):
+            if os.path.exists(part):
+                os.remove(part)
+        self.manifest.remove(os.path.basename(backup_path))
+    
+    def _create_backup_direct(self, backup_path: str, original_size: int,
+                              progress_callback=None, cancel_event: Optional[threading.Event] = None,
+                              journal_seq: Optional[int] = None) -> Optional[str]:
         """Альтернативный метод создания бэкапа через прямое копирование"""
+        temp_path = f"{backup_path}.tmp"
         try:
             logger.warning(f"⚠️ Использую прямой метод копирования: {backup_path}")
             
-            # Закрываем все соединения и копируем файл напрямую
-            time.sleep(1)
-            
-            # Пытаемся скопировать через временный файл
-            temp_path = f"{backup_path}.tmp"
-            
-            # Копируем с проверкой
+            # Копируем с проверкой через временный файл
+            copied = 0
+            chunk_size = 1024 * 1024
             with open(self.db_path, 'rb') as src, open(temp_path, 'wb') as dst:
-                chunk = src.read(8192)
+                chunk = src.read(chunk_size)
                 while chunk:
+                    if cancel_event is not None and cancel_event.is_set():
+                        raise BackupCancelled()
                     dst.write(chunk)
-                    chunk = src.read(8192)
+                    copied += len(chunk)
+                    if progress_callback:
+                        progress_callback(copied, original_size)
+                    chunk = src.read(chunk_size)
             
             # Переименовываем временный файл
-            os.rename(temp_path, backup_path)
+            os.replace(temp_path, backup_path)
             
             # Проверяем результат
             if os.path.exists(backup_path):
@@ -316,6 +536,10 @@ class DatabaseManager:
                 
                 if file_size > self.min_db_size and file_size >= original_size * 0.8:
                     logger.info(f"✅ Бэкап создан через прямое копирование: {backup_path} ({file_size:,} байт)")
+                    if not self._verify_new_backup(backup_path, journal_seq):
+                        logger.error(f"❌ Бэкап не прошел проверку: {backup_path}")
+                        self._remove_backup_files(backup_path)
+                        return None
                     return backup_path
                 else:
                     logger.error(f"❌ Бэкап слишком мал: {file_size:,} байт")
@@ -325,122 +549,223 @@ class DatabaseManager:
             else:
                 logger.error(f"❌ Файл не создан: {backup_path}")
                 return None
-                
+        
+        except BackupCancelled:
+            logger.info(f"⏹️ Создание бэкапа отменено: {os.path.basename(backup_path)}")
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            return None
         except Exception as e:
             logger.error(f"❌ Ошибка в прямом методе: {e}")
             return None
     
-    def validate_backup_full(self, backup_path: str) -> bool:
-        """Полная проверка бэкапа на наличие данных"""
+    def validate_backup_full(self, backup_path: str, verified: Optional[Dict[str, Any]] = None) -> bool:
+        """
+        Полная проверка бэкапа перед восстановлением.
+        
+        Бэкап из манифеста проверяется по SHA-256 и числу страниц, записанным при создании,
+        а наличие данных - по сохраненному числу записей: таблицы не сканируются. Для файла
+        без записи в манифесте (загруженного, собранного импортом) проверяются заголовок и
+        наличие хотя бы одной строки в таблицах.
+        
+        verified - результат проверки, уже сделанной при загрузке файла (app.db_upload):
+        заголовок и SHA-256 тогда повторно не считаются.
+        """
+        if not os.path.exists(backup_path):
+            logger.error(f"❌ Файл бэкапа не найден: {backup_path}")
+            return False
+        
         try:
-            if not os.path.exists(backup_path):
-                logger.error(f"❌ Файл бэкапа не найден: {backup_path}")
-                return False
+            entry = self.manifest.entry_for(backup_path) if self._in_backup_dir(backup_path) else None
+            if entry is not None and entry.get("sha256"):
+                result = self.verify_backup(backup_path)
+                if not result["ok"]:
+                    logger.error(f"❌ Бэкап поврежден: {result['error']}")
+                    return False
+                if not entry.get("total_records"):
+                    logger.error("❌ В бэкапе нет данных")
+                    return False
+                logger.info(f"✅ Бэкап прошел проверку за {result['seconds']:.2f} сек: "
+                            f"{os.path.basename(backup_path)} ({entry['total_records']} записей)")
+                return True
             
-            file_size = os.path.getsize(backup_path)
-            if file_size < self.min_db_size:
-                logger.error(f"❌ Бэкап слишком мал: {file_size:,} байт")
+            if not is_compressed_backup(backup_path) and os.path.getsize(backup_path) < self.min_db_size:
+                logger.error(f"❌ Бэкап слишком мал: {os.path.getsize(backup_path):,} байт")
                 return False
             
-            # Подключаемся к бэкапу
-            conn = sqlite3.connect(backup_path)
-            cursor = conn.cursor()
-            
-            # Получаем все таблицы
-            cursor.execute("SELECT name FROM sqlite_master WHERE type='table' ORDER BY name")
-            tables = [row[0] for row in cursor.fetchall()]
-            
-            if not tables:
-                logger.error("❌ В бэкапе нет таблиц")
-                conn.close()
+            result = verified if verified and verified.get("ok") else verify_backup(backup_path)
+            if not result["ok"]:
+                logger.error(f"❌ Бэкап поврежден: {result['error']}")
                 return False
             
-            # Проверяем наличие данных в основных таблицах
-            table_stats = {}
-            has_data = False
-            
-            for table in tables:
-                try:
-                    cursor.execute(f"SELECT COUNT(*) FROM {table}")
-                    count = cursor.fetchone()[0]
-                    table_stats[table] = count
-                    
-                    if count > 0:
-                        has_data = True
-                except Exception as e:
-                    logger.warning(f"⚠️ Не удалось проверить таблицу {table}: {e}")
-                    table_stats[table] = 0
-            
-            conn.close()
-            
-            # Логируем результаты проверки
-            total_records = sum(table_stats.values())
-            logger.info(f"🔍 Проверка бэкапа: {len(tables)} таблиц, {total_records} записей")
+            conn = connect_backup(backup_path)
+            try:
+                tables = [row[0] for row in conn.execute(
+                    "SELECT name FROM sqlite_master WHERE type='table' AND name NOT LIKE 'sqlite_%'"
+                )]
+                if not tables:
+                    logger.error("❌ В бэкапе нет таблиц")
+                    return False
+                # Достаточно одной строки в любой таблице - COUNT(*) не нужен
+                has_data = any(
+                    conn.execute(f'SELECT 1 FROM "{table}" LIMIT 1').fetchone() for table in tables
+                )
+            finally:
+                conn.close()
             
-            # Критерии валидности
-            if total_records == 0:
+            if not has_data:
                 logger.error("❌ В бэкапе нет данных")
                 return False
             
-            logger.info(f"✅ Бэкап прошел проверку: {os.path.basename(backup_path)}")
+            logger.info(f"✅ Бэкап прошел проверку: {os.path.basename(backup_path)} ({len(tables)} таблиц)")
             return True
             
         except Exception as e:
             logger.error(f"❌ Ошибка проверки бэкапа: {e}")
             return False
     
-    async def _send_backup_to_admins(self, backup_path: str):
-        """Отправить бэкап всем админам"""
+    def _in_backup_dir(self, path: str) -> bool:
+        return os.path.dirname(os.path.abspath(path)) == os.path.abspath(self.backup_dir)
+    
+    def verify_backup(self, backup_path: str, quick: bool = False) -> Dict[str, Any]:
+        """
+        Проверка целостности бэкапа по SHA-256 и числу страниц из манифеста (потоковое
+        чтение файла, без запросов к таблицам). quick=True дополнительно выполняет
+        PRAGMA quick_check - это уже чтение всей БД, поэтому только по запросу.
+        """
+        result = verify_backup(backup_path, self.manifest.entry_for(backup_path))
+        
+        if quick and result["ok"]:
+            try:
+                messages = run_quick_check(backup_path)
+            except Exception as e:
+                messages = [str(e)]
+            result["quick_check"] = messages
+            if messages != ["ok"]:
+                result["ok"] = False
+                result["error"] = "; ".join(messages[:3])
+        
+        self.manifest.set_verification(backup_path, result)
+        if result["ok"]:
+            logger.info(f"🔐 Бэкап {os.path.basename(backup_path)} цел ({result['seconds']:.2f} сек)")
+        else:
+            logger.error(f"❌ Бэкап {os.path.basename(backup_path)} не прошел проверку: {result['error']}")
+        return result
+    
+    def _prepare_upload(self, backup_path: str) -> Dict[str, Any]:
+        """
+        Подготовить бэкап к загрузке в Telegram: обычный .db сжимается потоком во временную
+        директорию и при необходимости делится на части до лимита загрузки.
+        """
+        info = {"parts": backup_parts(backup_path), "temporary": False, "original_size": None, "stats": ""}
+        
+        if is_compressed_backup(backup_path):
+            return info
+        
+        info["original_size"] = os.path.getsize(backup_path)
+        # Число записей - из манифеста, записанного при создании бэкапа
+        entry = self.manifest.entry_for(backup_path) or {}
+        row_counts = entry.get("row_counts") or {}
+        if "users" in row_counts:
+            info["stats"] = (
+                f"👥 Пользователей: {row_counts.get('users') or 0}\n"
+                f"✉️ Сообщений: {row_counts.get('anon_messages') or 0}\n"
+            )
+        
+        method = resolve_method() or resolve_method("auto")
+        outgoing_dir = os.path.join(self.backup_dir, 'outgoing')
+        os.makedirs(outgoing_dir, exist_ok=True)
+        dest = os.path.join(outgoing_dir, os.path.basename(backup_path) + EXTENSIONS[method])
+        info["parts"] = compress_db(backup_path, dest, method, snapshot=False)
+        info["temporary"] = True
+        return info
+    
+    async def _send_backup_to_admins(self, backup_path: str, use_cache: bool = True):
+        """
+        Отправить бэкап всем админам (сжатым, частями не больше лимита Telegram).
+        
+        Каждая часть загружается один раз, остальным админам уходит по file_id. file_id
+        сохраняются в манифесте бэкапов: повторная отправка того же бэкапа не загружает
+        и не сжимает файл заново.
+        """
+        upload = None
         try:
             from app.config import ADMIN_IDS
             
-            if not ADMIN_IDS:
+            admin_ids = normalize_admin_ids(ADMIN_IDS)
+            if not admin_ids:
                 logger.warning("⚠️ ADMIN_IDS не настроены, не могу отправить бэкап")
                 return
             
-            file_size = os.path.getsize(backup_path)
-            file_size_mb = file_size / (1024 * 1024)
+            cached = self.manifest.get_telegram_cache(backup_path, self.bot.id) if use_cache else None
+            if cached:
+                upload = {
+                    "parts": [None] * len(cached["file_ids"]),
+                    "temporary": False,
+                    "original_size": cached.get("original_size"),
+                    "stats": cached.get("stats", "")
+                }
+                names = cached["names"]
+                file_ids = cached["file_ids"]
+                compressed_size = cached["size"]
+            else:
+                upload = await asyncio.to_thread(self._prepare_upload, backup_path)
+                names = [os.path.basename(part) for part in upload["parts"]]
+                file_ids = [None] * len(upload["parts"])
+                compressed_size = sum(os.path.getsize(part) for part in upload["parts"])
             
-            # Получаем информацию о бэкапе
-            backup_info = ""
-            try:
-                conn = sqlite3.connect(backup_path)
-                cursor = conn.cursor()
-                cursor.execute("SELECT COUNT(*) FROM users")
-                user_count = cursor.fetchone()[0]
-                cursor.execute("SELECT COUNT(*) FROM anon_messages")
-                msg_count = cursor.fetchone()[0]
-                conn.close()
-                backup_info = f"👥 Пользователей: {user_count}\n✉️ Сообщений: {msg_count}\n"
-            except:
-                backup_info = ""
+            size_line = f"📊 Размер: {compressed_size / (1024 * 1024):.2f} MB"
+            if upload["original_size"]:
+                size_line += f" (без сжатия {upload['original_size'] / (1024 * 1024):.2f} MB)"
+            if len(names) > 1:
+                size_line += f"\n📦 Частей: {len(names)} (файлы склеиваются по порядку номеров)"
             
             caption = (
                 f"💾 <b>Новый бекап базы данных</b>\n\n"
                 f"📁 Имя: <code>{os.path.basename(backup_path)}</code>\n"
-                f"📊 Размер: {file_size_mb:.2f} MB\n"
-                f"{backup_info}"
+                f"{size_line}\n"
+                f"{upload['stats']}"
                 f"⏰ Время: {datetime.now().strftime('%H:%M:%S')}\n\n"
                 f"💡 Для восстановления используйте команду:\n"
                 f"<code>/restore_{os.path.basename(backup_path).replace('.db', '')}</code>"
             )
             
-            from aiogram.types import FSInputFile
+            # Части идут по порядку: каждая загружается один раз и рассылается по file_id
+            sent_ids = []
+            for index, (part, name, file_id) in enumerate(zip(upload["parts"], names, file_ids), 1):
+                part_caption = caption if index == 1 else f"📦 Часть {index}/{len(names)}: <code>{name}</code>"
+                result = await fan_out_document(self.bot, admin_ids, part, part_caption, "HTML", file_id=file_id)
+                
+                if result["sent"] == 0:
+                    if cached:
+                        # Telegram больше не принимает сохраненный file_id - отправляем заново
+                        self.manifest.set_telegram_cache(backup_path, self.bot.id, None)
+                        return await self._send_backup_to_admins(backup_path, use_cache=False)
+                    logger.error(f"❌ Часть {name} не отправлена ни одному админу")
+                    return
+                sent_ids.append(result["file_id"])
+            
+            logger.info(
+                f"📤 Бэкап отправлен админам ({len(admin_ids)}), частей: {len(names)}, "
+                f"{'без загрузки (file_id из манифеста)' if cached else 'каждая часть загружена один раз'}"
+            )
             
-            for admin_id in ADMIN_IDS:
-                try:
-                    await self.bot.send_document(
-                        chat_id=admin_id,
-                        document=FSInputFile(backup_path),
-                        caption=caption,
-                        parse_mode="HTML"
-                    )
-                    logger.info(f"📤 Бэкап отправлен админу {admin_id}")
-                except Exception as e:
-                    logger.error(f"❌ Ошибка отправки бэкапа админу {admin_id}: {e}")
+            if not cached:
+                self.manifest.set_telegram_cache(backup_path, self.bot.id, {
+                    "file_ids": sent_ids,
+                    "names": names,
+                    "size": compressed_size,
+                    "original_size": upload["original_size"],
+                    "stats": upload["stats"],
+                })
             
         except Exception as e:
             logger.error(f"❌ Ошибка отправки бэкапа админам: {e}")
+        finally:
+            if upload and upload["temporary"]:
+                for part in upload["parts"] or []:
+                    if os.path.exists(part):
+                        os.remove(part)
     
     def create_backup_on_exit(self):
         """Создать бэкап при выходе из приложения"""
@@ -467,8 +792,7 @@ class DatabaseManager:
             return
         
         # Проверяем есть ли данные в БД
-        db_info = self.get_db_info()
-        if db_info.get("total_records", 0) == 0:
+        if not self._has_data():
             logger.warning("⚠️ БД пустая, пропускаю бэкап")
             return
         
@@ -478,18 +802,53 @@ class DatabaseManager:
         else:
             logger.warning("⚠️ Не удалось создать бэкап перед выходом")
     
-    def restore_from_backup(self, backup_path: str) -> bool:
-        """Восстановить базу данных из бэкапа"""
-        try:
-            if not os.path.exists(backup_path):
-                logger.error(f"❌ Файл бэкапа не найден: {backup_path}")
-                return False
-            
-            # Проверяем валидность бэкапа
-            if not self.validate_backup_full(backup_path):
-                logger.error(f"❌ Бэкап поврежден: {backup_path}")
+    def restore_from_backup(self, backup_path: str, verified: Optional[Dict[str, Any]] = None,
+                            journal_base: Optional[Dict[str, Any]] = None) -> bool:
+        """
+        Восстановить базу данных из бэкапа (сжатый бэкап предварительно распаковывается).
+        
+        journal_base - из чего собран файл для границы журнала изменений (см.
+        ChangeJournal.barrier); по умолчанию - сам бэкап, если у него есть позиция журнала.
+        """
+        if journal_base is None:
+            journal_base = self._journal_base(backup_path)
+        
+        # Проверяем валидность бэкапа (сжатый - по checksum из манифеста, до распаковки)
+        if not self.validate_backup_full(backup_path, verified):
+            logger.error(f"❌ Бэкап поврежден: {backup_path}")
+            return False
+        
+        if is_compressed_backup(backup_path):
+            try:
+                with materialized_backup(backup_path) as db_file:
+                    return self._restore_validated(db_file, journal_base)
+            except Exception as e:
+                logger.error(f"❌ Ошибка распаковки бэкапа {backup_path}: {e}")
                 return False
-            
+        
+        return self._restore_validated(backup_path, journal_base)
+    
+    def _journal_base(self, backup_path: str) -> Optional[Dict[str, Any]]:
+        """Основа для границы журнала: бэкап из backup_dir с известной позицией журнала"""
+        if os.path.dirname(os.path.abspath(backup_path)) != os.path.abspath(self.backup_dir):
+            return None
+        try:
+            name = os.path.basename(backup_path)
+            entry = self.manifest.get(name, backup_size(backup_path), os.stat(backup_path).st_mtime)
+        except OSError:
+            return None
+        if not entry or entry.get("journal_seq") is None:
+            return None
+        return {"backup": name, "journal_seq": entry["journal_seq"], "ranges": []}
+    
+    def _restore_validated(self, backup_path: str, journal_base: Optional[Dict[str, Any]] = None) -> bool:
+        """
+        Подмена рабочей БД уже проверенным несжатым бэкапом.
+        
+        Сразу после подмены, еще при закрытом шлюзе, в журнал изменений пишется граница:
+        записи до нее относятся к прежней линии времени и больше не применяются.
+        """
+        try:
             # Создаем бэкап текущей БД (если существует)
             if os.path.exists(self.db_path) and os.path.getsize(self.db_path) > self.min_db_size:
                 timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
@@ -500,47 +859,11 @@ class DatabaseManager:
                 except Exception as e:
                     logger.warning(f"⚠️ Не удалось сохранить текущую БД: {e}")
             
-            # Останавливаем все соединения с БД
-            time.sleep(1)  # Даем время на закрытие соединений
-            
-            # Восстанавливаем из бэкапа с помощью sqlite3 backup API
+            # Подменяем БД внутри шлюза: новые запросы ждут, текущие успевают завершиться
             logger.info(f"🔄 Восстановление БД из бэкапа: {backup_path}")
-            
-            source_conn = None
-            target_conn = None
-            
-            try:
-                # Подключаемся к бэкапу
-                source_conn = sqlite3.connect(backup_path)
-                
-                # Подключаемся к целевой БД
-                target_conn = sqlite3.connect(self.db_path)
-                
-                # Копируем данные из бэкапа в целевую БД
-                source_conn.backup(target_conn)
-                
-                logger.info(f"✅ БД восстановлена из бэкапа через backup API")
-                
-            except Exception as e:
-                logger.warning(f"⚠️ Backup API не сработал при восстановлении: {e}")
-                
-                # Закрываем соединения
-                if source_conn:
-                    source_conn.close()
-                if target_conn:
-                    target_conn.close()
-                
-                # Пробуем прямое копирование
-                time.sleep(1)
-                shutil.copy2(backup_path, self.db_path)
-                logger.info(f"✅ БД восстановлена через прямое копирование")
-            
-            finally:
-                # Закрываем соединения
-                if source_conn:
-                    source_conn.close()
-                if target_conn:
-                    target_conn.close()
+            with db_gate.exclusive():
+                self._swap_database(backup_path)
+                self.journal.barrier(f"restore {os.path.basename(backup_path)}", journal_base)
             
             # Проверяем что восстановление успешно
             if os.path.exists(self.db_path):
@@ -555,6 +878,43 @@ class DatabaseManager:
             logger.error(f"❌ Ошибка восстановления из бэкапа: {e}")
             return False
     
+    def _swap_database(self, backup_path: str):
+        """
+        Заменить содержимое рабочей БД бэкапом (вызывается при закрытом шлюзе БД).
+        
+        Основной путь - sqlite backup API прямо в рабочую БД: открытые соединения остаются
+        валидными и сразу видят новые данные. Если backup API не сработал (например, в WAL
+        нельзя сменить размер страницы), файл подменяется атомарным переименованием.
+        """
+        from app.database import reset_connections
+        
+        source_conn = sqlite3.connect(f"file:{backup_path}?mode=ro", uri=True)
+        target_conn = sqlite3.connect(self.db_path, timeout=30)
+        try:
+            source_conn.backup(target_conn)
+            logger.info("✅ БД восстановлена из бэкапа через backup API")
+            return
+        except Exception as e:
+            logger.warning(f"⚠️ Backup API не сработал при восстановлении: {e}")
+            # Содержимое WAL старой БД не должно попасть в подмененный файл
+            try:
+                target_conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+            except sqlite3.Error:
+                pass
+        finally:
+            source_conn.close()
+            target_conn.close()
+            # Соединения пула переоткрываются уже на новых данных
+            reset_connections()
+        
+        tmp_path = f"{self.db_path}.restore.tmp"
+        shutil.copyfile(backup_path, tmp_path)
+        with open(tmp_path, 'rb') as f:
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.db_path)
+        reset_connections()
+        logger.info("✅ БД восстановлена атомарной заменой файла")
+    
     def auto_restore_on_startup(self) -> bool:
         """Автоматическое восстановление при запуске"""
         if not self.auto_restore_on_start:
@@ -563,19 +923,19 @@ class DatabaseManager:
         
         logger.info("🔍 Проверка необходимости восстановления БД при запуске...")
         
-        # Проверяем состояние текущей БД
-        db_info = self.get_db_info()
-        
-        # Если БД существует и содержит данные
-        if db_info["exists"] and db_info.get("total_records", 0) > 0:
+        # Если БД существует и содержит данные (по одной строке из таблицы, без COUNT(*))
+        if os.path.exists(self.db_path) and self._has_data():
             logger.info("✅ Текущая БД в порядке, восстановление не требуется")
             return False
         
         # Ищем последний бэкап
         backups = self.list_backups()
         if not backups:
-            logger.warning("⚠️ Бэкапы не найдены, восстановление невозможно")
-            return False
+            return self._restore_latest_incremental("⚠️ Бэкапы не найдены, восстановление невозможно")
+        
+        # Есть журнал изменений - восстанавливаемся на момент последней записи в нем
+        if JOURNAL_ENABLED and self.journal.last_seq > 0 and self.restore_point_in_time():
+            return True
         
         # Берем последний валидный бэкап
         for backup in reversed(backups):
@@ -584,8 +944,144 @@ class DatabaseManager:
                 logger.info(f"🔄 Восстанавливаю БД из последнего валидного бэкапа: {os.path.basename(latest_backup)}")
                 return self.restore_from_backup(latest_backup)
         
-        logger.warning("⚠️ Валидные бэкапы не найдены")
-        return False
+        return self._restore_latest_incremental("⚠️ Валидные бэкапы не найдены")
+    
+    def _restore_latest_incremental(self, reason: str) -> bool:
+        """Восстановление из последнего инкрементального снимка, если полных бэкапов нет"""
+        snapshots = self.list_incremental_backups()
+        if not snapshots:
+            logger.warning(reason)
+            return False
+        
+        latest = snapshots[-1]["name"]
+        logger.info(f"🔄 Восстанавливаю БД из инкрементального снимка: {latest}")
+        return self.restore_from_incremental(latest)
+    
+    def restore_point_in_time(self, until: Optional[float] = None, backup_path: Optional[str] = None) -> bool:
+        """
+        Восстановить БД на момент until (unix time, по умолчанию - последняя запись журнала):
+        полный бэкап + записи журнала изменений после него.
+        
+        Без backup_path берется последний валидный бэкап с позицией журнала, созданный не
+        позже until и относящийся к текущей линии времени (после последнего восстановления
+        или импорта). Журнал применяется к временной копии бэкапа, которая затем подменяет
+        рабочую БД через restore_from_backup (шлюз БД).
+        """
+        if backup_path is None:
+            candidates = []
+            for backup in self.list_backups():
+                if not backup["is_valid"] or backup.get("journal_seq") is None:
+                    continue
+                if until is not None and backup["modified"].timestamp() > until:
+                    continue
+                ranges = self.journal.ranges_for(backup["name"], backup["journal_seq"], until)
+                if ranges is not None:
+                    candidates.append((backup, ranges))
+            if not candidates:
+                logger.warning("⚠️ Нет бэкапов с позицией журнала изменений, point-in-time восстановление невозможно")
+                return False
+            base, ranges = candidates[-1]
+            backup_path, journal_seq = base["path"], base["journal_seq"]
+        else:
+            stat = os.stat(backup_path)
+            entry = self.manifest.get(os.path.basename(backup_path), backup_size(backup_path), stat.st_mtime)
+            journal_seq = (entry or {}).get("journal_seq")
+            if journal_seq is None:
+                logger.warning(f"⚠️ У бэкапа {os.path.basename(backup_path)} нет позиции журнала, восстанавливаю без него")
+                return self.restore_from_backup(backup_path)
+            ranges = self.journal.ranges_for(os.path.basename(backup_path), journal_seq, until)
+            if ranges is None:
+                logger.error(
+                    f"❌ Бэкап {os.path.basename(backup_path)} создан до последнего восстановления БД, "
+                    f"журнал изменений к нему неприменим"
+                )
+                return False
+        
+        # Базовый бэкап сверяется с checksum до распаковки и применения журнала
+        if not self.verify_backup(backup_path)["ok"]:
+            return False
+        
+        backup_name = os.path.basename(backup_path)
+        work_path = os.path.join(self.backup_dir, f"{backup_name}.pitr.tmp")
+        try:
+            if is_compressed_backup(backup_path):
+                decompress_to(backup_path, work_path)
+            else:
+                shutil.copyfile(backup_path, work_path)
+            
+            conn = sqlite3.connect(work_path)
+            try:
+                applied, replayed = self.journal.replay(conn, ranges, until)
+                conn.commit()
+            finally:
+                conn.close()
+            
+            logger.info(
+                f"📝 Журнал изменений применен к {backup_name}: записей {applied['applied']}, "
+                f"пропущено {applied['skipped']} (диапазоны {ranges})"
+            )
+            return self.restore_from_backup(
+                work_path, journal_base={"backup": backup_name, "journal_seq": journal_seq, "ranges": replayed}
+            )
+        except Exception as e:
+            logger.error(f"❌ Ошибка point-in-time восстановления: {e}")
+            return False
+        finally:
+            if os.path.exists(work_path):
+                os.remove(work_path)
+    
+    def prune_journal(self, backups: Optional[List[Dict[str, Any]]] = None) -> int:
+        """Удалить сегменты журнала, которые уже покрыты всеми оставшимися бэкапами"""
+        positions = [
+            backup["journal_seq"] for backup in (backups if backups is not None else self.list_backups())
+            if backup.get("journal_seq") is not None
+        ]
+        if not positions:
+            return 0
+        return self.journal.prune(min(positions))
+    
+    def create_incremental_backup(self, backup_name: Optional[str] = None, progress_callback=None,
+                                  cancel_event: Optional[threading.Event] = None) -> Optional[str]:
+        """
+        Создать инкрементальный бэкап: на диск пишутся только изменившиеся чанки БД.
+        Возвращает имя снимка. Метод блокирующий - из асинхронного кода используйте app.backup_jobs.
+        """
+        try:
+            if not os.path.exists(self.db_path):
+                logger.warning(f"⚠️ Файл БД не найден: {self.db_path}")
+                return None
+            
+            snapshot = self.incremental.create_snapshot(
+                self.db_path, backup_name, progress_callback, cancel_event
+            )
+            if snapshot is None:
+                return None
+            
+            self.save_metadata()
+            return snapshot["name"]
+        except Exception as e:
+            logger.error(f"❌ Ошибка создания инкрементального бэкапа: {e}")
+            return None
+    
+    def list_incremental_backups(self) -> List[Dict[str, Any]]:
+        """Список инкрементальных снимков (старые сначала)"""
+        try:
+            return self.incremental.list_snapshots()
+        except Exception as e:
+            logger.error(f"❌ Ошибка получения списка снимков: {e}")
+            return []
+    
+    def restore_from_incremental(self, snapshot_name: str) -> bool:
+        """Восстановить БД из инкрементального снимка"""
+        # Временный файл без расширения .db, чтобы не попасть в список обычных бэкапов
+        assembled_path = os.path.join(self.backup_dir, f"{snapshot_name}.restore.tmp")
+        try:
+            if not self.incremental.restore_snapshot(snapshot_name, assembled_path):
+                return False
+            return self.restore_from_backup(assembled_path)
+        finally:
+            if os.path.exists(assembled_path):
+                os.remove(assembled_path)
     
     def get_last_backup_time(self) -> Optional[datetime]:
         """Получить время последнего бэкапа"""
@@ -596,8 +1092,25 @@ class DatabaseManager:
         latest_backup = backups[-1]
         return latest_backup.get("created")
     
-    def list_backups(self) -> List[Dict[str, Any]]:
-        """Получить список всех бэкапов"""
+    def record_backup(self, backup_path: str, journal_seq: Optional[int] = None,
+                      row_counts: Optional[Dict[str, Optional[int]]] = None) -> Dict[str, Any]:
+        """
+        Проверить бэкап (checksum, таблицы, оценка числа записей) и записать результат в манифест.
+        journal_seq - номер последней записи журнала изменений, которая уже есть в бэкапе;
+        row_counts - оценка числа записей по исходной БД (иначе - по самому бэкапу).
+        """
+        if journal_seq is None:
+            return self.manifest.record(backup_path, row_counts=row_counts)
+        return self.manifest.record(backup_path, row_counts=row_counts, journal_seq=journal_seq)
+    
+    def list_backups(self, revalidate: bool = False) -> List[Dict[str, Any]]:
+        """
+        Получить список всех бэкапов.
+        
+        Данные берутся из манифеста (backups/manifest.json), который обновляется при создании
+        бэкапа. Файл открывается заново, только если изменились его размер или mtime
+        (или revalidate=True), поэтому листинг не открывает каждый бэкап.
+        """
         backups = []
         
         if not os.path.exists(self.backup_dir):
@@ -605,37 +1118,72 @@ class DatabaseManager:
             return backups
         
         try:
-            for filename in sorted(os.listdir(self.backup_dir)):
-                if filename.endswith('.db'):
+            with self.manifest.lock:
+                entries = self.manifest.load()
+                manifest_changed = False
+                seen = set()
+                
+                for filename in sorted(os.listdir(self.backup_dir)):
+                    if not is_backup_filename(filename):
+                        continue
+                    
                     filepath = os.path.join(self.backup_dir, filename)
                     try:
                         stat = os.stat(filepath)
+                        compressed = is_compressed_backup(filename)
+                        parts = backup_parts(filepath)
+                        size = sum(os.path.getsize(part) for part in parts) if compressed else stat.st_size
                         
-                        # Пропускаем слишком маленькие файлы
-                        if stat.st_size < self.min_db_size:
+                        # Пропускаем слишком маленькие файлы (сжатые бэкапы бывают очень маленькими)
+                        if not compressed and size < self.min_db_size:
                             continue
                         
-                        # Проверяем валидность бэкапа
-                        is_valid = self.validate_backup(filepath)
+                        seen.add(filename)
+                        
+                        entry = entries.get(filename)
+                        if revalidate or not self.manifest.is_fresh(entry, size, stat.st_mtime):
+                            entry = self.manifest.carry_over(
+                                entries.get(filename), inspect_backup(filepath, previous=entries.get(filename))
+                            )
+                            entries[filename] = entry
+                            manifest_changed = True
                         
-                        backup_info = {
+                        created = datetime.fromtimestamp(stat.st_ctime)
+                        backups.append({
                             "name": filename,
                             "path": filepath,
-                            "size": stat.st_size,
-                            "size_mb": round(stat.st_size / (1024 * 1024), 2),
-                            "created": datetime.fromtimestamp(stat.st_ctime),
+                            "size": size,
+                            "size_mb": round(size / (1024 * 1024), 2),
+                            "compressed": compressed,
+                            "parts": len(parts),
+                            "created": created,
                             "modified": datetime.fromtimestamp(stat.st_mtime),
-                            "is_valid": is_valid,
-                            "age_days": (datetime.now() - datetime.fromtimestamp(stat.st_ctime)).days
-                        }
-                        
-                        backups.append(backup_info)
+                            "is_valid": entry["is_valid"],
+                            "sha256": entry["sha256"],
+                            "page_count": entry.get("page_count"),
+                            "verify_ok": entry.get("verify_ok"),
+                            "verified_at": entry.get("verified_at"),
+                            "tables": entry["tables"],
+                            "row_counts": entry["row_counts"],
+                            "total_records": entry["total_records"],
+                            "journal_seq": entry.get("journal_seq"),
+                            "age_days": (datetime.now() - created).days
+                        })
                     except Exception as e:
                         logger.warning(f"⚠️ Ошибка чтения бэкапа {filename}: {e}")
+                
+                # Удаляем из манифеста записи об удаленных файлах
+                for filename in list(entries.keys()):
+                    if filename not in seen:
+                        del entries[filename]
+                        manifest_changed = True
+                
+                if manifest_changed:
+                    self.manifest.save(entries)
             
             # Сортируем по дате создания (старые сначала)
             backups.sort(key=lambda x: x["created"])
-            logger.debug(f"ℹ️ Найдено {len(backups)} валидных бэкапов")
+            logger.debug(f"ℹ️ Найдено {len(backups)} бэкапов")
             return backups
             
         except Exception as e:
@@ -647,6 +1195,14 @@ class DatabaseManager:
         if not os.path.exists(backup_path):
             return False
         
+        if is_compressed_backup(backup_path):
+            try:
+                with materialized_backup(backup_path) as db_file:
+                    return self.validate_backup(db_file)
+            except Exception as e:
+                logger.debug(f"⚠️ Бэкап невалиден {backup_path}: {e}")
+                return False
+        
         try:
             # Проверяем размер файла
             file_size = os.path.getsize(backup_path)
@@ -696,7 +1252,7 @@ class DatabaseManager:
                     if backup.get("is_valid", False) and len(backups) <= self.max_backups * 2:
                         continue
                     
-                    os.remove(backup["path"])
+                    self._remove_backup_files(backup["path"])
                     deleted_count += 1
                     logger.debug(f"🗑️ Удален старый бэкап: {backup['name']}")
                 except Exception as e:
@@ -704,119 +1260,112 @@ class DatabaseManager:
             
             if deleted_count > 0:
                 logger.info(f"🧹 Удалено старых бэкапов: {deleted_count}")
+                self.prune_journal()
             return deleted_count
             
         except Exception as e:
             logger.error(f"❌ Ошибка очистки бэкапов: {e}")
             return 0
     
-    async def async_create_backup(self) -> Optional[str]:
-        """Асинхронное создание бэкапа"""
-        return await asyncio.get_event_loop().run_in_executor(
-            None, self.create_backup
-        )
+    async def async_create_backup(self, backup_name: Optional[str] = None,
+                                  send_to_admins: bool = True) -> Optional[str]:
+        """Асинхронное создание бэкапа в фоновом потоке бэкапов (без блокировки цикла событий)"""
+        from app.backup_jobs import backup_jobs
+        
+        job = backup_jobs.submit(backup_name, send_to_admins=send_to_admins)
+        await backup_jobs.wait(job)
+        return job.result_path
     
-    async def async_restore_from_backup(self, backup_path: str) -> bool:
-        """Асинхронное восстановление из бэкапа"""
-        return await asyncio.get_event_loop().run_in_executor(
-            None, self.restore_from_backup, backup_path
-        )
+    async def async_restore_from_backup(self, backup_path: str, verified: Optional[Dict[str, Any]] = None) -> bool:
+        """
+        Асинхронное восстановление из бэкапа.
+        Выполняется в потоке: пока шлюз БД ждет завершения текущих запросов, цикл событий свободен.
+        """
+        return await asyncio.to_thread(self.restore_from_backup, backup_path, verified)
+    
+    def export_data(self, fmt: str = "sql", compression: Optional[str] = "none", name: str = "database_export",
+                    query: Optional[str] = None, params: tuple = (), progress_callback=None,
+                    cancel_event: Optional[threading.Event] = None) -> Optional[str]:
+        """
+        Потоковый экспорт БД (или результата query) в data/exports/.
+        
+        fmt - sql / csv / jsonl, compression - none / gzip / zstd / auto. Таблицы читаются
+        пачками, память не зависит от размера БД. Возвращает путь к файлу экспорта.
+        Метод блокирующий - из асинхронного кода используйте app.backup_jobs (submit_export).
+        """
+        if not os.path.exists(self.db_path):
+            logger.error(f"❌ Файл БД не найден: {self.db_path}")
+            return None
+        
+        dest_path = os.path.join(self.export_dir, name)
+        try:
+            if query is not None:
+                result = export_query(
+                    self.db_path, dest_path, query, params, fmt=fmt, compression=compression,
+                    progress_callback=progress_callback, cancel_event=cancel_event
+                )
+            else:
+                result = export_database(
+                    self.db_path, dest_path, fmt=fmt, compression=compression,
+                    progress_callback=progress_callback, cancel_event=cancel_event
+                )
+            return result["path"] if result else None
+        except Exception as e:
+            logger.error(f"❌ Ошибка экспорта ({fmt}): {e}")
+            return None
     
     def export_to_sql(self, sql_file: str = 'data/database_export.sql') -> bool:
-        """Экспорт базы данных в SQL файл"""
+        """Экспорт базы данных в SQL файл (потоково, многострочными INSERT)"""
         try:
-            if not os.path.exists(self.db_path):
-                logger.error(f"❌ Файл БД не найден: {self.db_path}")
-                return False
-            
-            conn = sqlite3.connect(self.db_path)
-            
-            os.makedirs(os.path.dirname(sql_file), exist_ok=True)
-            
-            with open(sql_file, 'w', encoding='utf-8') as f:
-                # Пишем информацию о бэкапе
-                f.write(f"-- SQL Export from {self.db_path}\n")
-                f.write(f"-- Export time: {datetime.now().isoformat()}\n")
-                f.write("BEGIN TRANSACTION;\n\n")
-                
-                # Экспортируем схему
-                cursor = conn.cursor()
-                cursor.execute("SELECT sql FROM sqlite_master WHERE type='table' AND name NOT LIKE 'sqlite_%'")
-                
-                for row in cursor.fetchall():
-                    if row[0]:
-                        f.write(row[0] + ";\n\n")
-                
-                # Экспортируем данные
-                cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name NOT LIKE 'sqlite_%'")
-                tables = [row[0] for row in cursor.fetchall()]
-                
-                for table in tables:
-                    cursor.execute(f"SELECT * FROM {table}")
-                    columns = [description[0] for description in cursor.description]
-                    
-                    f.write(f"-- Data for table: {table}\n")
-                    
-                    cursor.execute(f"SELECT COUNT(*) FROM {table}")
-                    count = cursor.fetchone()[0]
-                    f.write(f"-- Records: {count}\n")
-                    
-                    for row in cursor.fetchall():
-                        values = []
-                        for value in row:
-                            if value is None:
-                                values.append("NULL")
-                            elif isinstance(value, (int, float)):
-                                values.append(str(value))
-                            else:
-                                # Экранируем одинарные кавычки
-                                escaped_value = str(value).replace("'", "''")
-                                values.append(f"'{escaped_value}'")
-                        
-                        insert_sql = f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({', '.join(values)});\n"
-                        f.write(insert_sql)
-                    
-                    f.write("\n")
-                
-                f.write("COMMIT;\n")
-            
-            conn.close()
-            
-            file_size = os.path.getsize(sql_file) if os.path.exists(sql_file) else 0
+            result = export_database(self.db_path, sql_file[:-4] if sql_file.endswith('.sql') else sql_file, fmt="sql")
+            file_size = result["size"] if result else 0
             logger.info(f"✅ БД экспортирована в SQL: {sql_file} ({file_size:,} байт)")
-            return True
+            return result is not None
             
         except Exception as e:
             logger.error(f"❌ Ошибка экспорта в SQL: {e}")
             return False
     
-    def import_from_sql(self, sql_file: str) -> bool:
-        """Импорт базы данных из SQL файл"""
+    def import_data(self, dump_path: str, progress_callback=None,
+                    cancel_event: Optional[threading.Event] = None) -> bool:
+        """
+        Потоковый импорт дампа (SQL или JSONL, в том числе .gz / .zst) вместо текущей БД.
+        
+        Дамп применяется к отдельному файлу большими транзакциями, индексы создаются в конце.
+        Готовая БД подменяет рабочую как при восстановлении из бэкапа (текущая сохраняется
+        в before_restore_*). Метод блокирующий - из асинхронного кода используйте
+        app.backup_jobs (submit_import).
+        """
+        if not os.path.exists(dump_path):
+            logger.error(f"❌ Файл дампа не найден: {dump_path}")
+            return False
+        
+        build_path = f"{self.db_path}.import"
         try:
-            if not os.path.exists(sql_file):
-                logger.error(f"❌ SQL файл не найден: {sql_file}")
+            result = import_dump(
+                dump_path, build_path,
+                schema_db=self.db_path if os.path.exists(self.db_path) else None,
+                progress_callback=progress_callback, cancel_event=cancel_event
+            )
+            if result is None:
                 return False
             
-            # Создаем бэкап перед импортом
-            self.create_backup("before_import.db", send_to_admins=False)
-            
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-            
-            with open(sql_file, 'r', encoding='utf-8') as f:
-                sql_script = f.read()
-            
-            # Выполняем SQL скрипт
-            cursor.executescript(sql_script)
-            conn.commit()
-            conn.close()
+            if not self.restore_from_backup(build_path):
+                return False
             
-            logger.info(f"✅ БД импортирована из SQL: {sql_file}")
+            logger.info(f"✅ БД импортирована из дампа: {dump_path} ({result['rows']:,} строк)")
             return True
             
         except Exception as e:
-            logger.error(f"❌ Ошибка импорта из SQL: {e}")
+            logger.error(f"❌ Ошибка импорта дампа {dump_path}: {e}")
             return False
+        finally:
+            if os.path.exists(build_path):
+                os.remove(build_path)
+    
+    def import_from_sql(self, sql_file: str) -> bool:
+        """Импорт базы данных из SQL файла (потоково, см. import_data)"""
+        return self.import_data(sql_file)
     
     def compare_with_backup(self, backup_path: str) -> Dict[str, Any]:
         """Сравнить текущую БД с бэкапом"""
@@ -896,11 +1445,30 @@ db_manager = DatabaseManager()
 # Инициализация при импорте
 _db_initialized = False
 
+def ensure_initial_backup():
+    """Создать начальный бэкап, если БД содержит данные, а бэкапов еще нет"""
+    # Список бэкапов берется из манифеста, наличие данных - по одной строке из таблицы
+    if db_manager.list_backups():
+        logger.info("✅ Бэкапы уже существуют")
+        return
+    
+    if db_manager._has_data():
+        logger.info("📝 Создание начального бэкапа...")
+        result = db_manager.create_backup("initial_backup.db")
+        if result:
+            logger.info(f"✅ Начальный бэкап создан: {result}")
+        else:
+            logger.warning("⚠️ Не удалось создать начальный бэкап")
+
+
 def init_database_manager(bot = None) -> bool:
     """Инициализация менеджера БД при запуске"""
     global _db_initialized
     
     if _db_initialized:
+        # Менеджер мог быть инициализирован при импорте без бота
+        if bot:
+            db_manager.set_bot(bot)
         logger.debug("ℹ️ Менеджер БД уже инициализирован")
         return False
     
@@ -914,22 +1482,13 @@ def init_database_manager(bot = None) -> bool:
     # Автоматическое восстановление при запуске
     restored = db_manager.auto_restore_on_startup()
     
-    # Ждем инициализации таблиц
-    time.sleep(2)
-    
-    # Создаем начальный бэкап если БД содержит данные
-    db_info = db_manager.get_db_info()
-    backups = db_manager.list_backups()
-    
-    if db_info.get("total_records", 0) > 0 and len(backups) == 0:
-        logger.info("📝 Создание начального бэкапа...")
-        result = db_manager.create_backup("initial_backup.db")
-        if result:
-            logger.info(f"✅ Начальный бэкап создан: {result}")
-        else:
-            logger.warning("⚠️ Не удалось создать начальный бэкап")
-    elif db_info.get("total_records", 0) > 0:
-        logger.info("✅ Бэкапы уже существуют")
+    if FAST_START:
+        # Проверка начального бэкапа выполняется в фоне после старта поллинга
+        logger.info("⚡ Быстрый старт: проверка начального бэкапа отложена")
+    else:
+        # Ждем инициализации таблиц
+        time.sleep(2)
+        ensure_initial_backup()
     
     logger.info("✅ Менеджер БД готов к работе")
     return restored
@@ -0,0 +1,180 @@
+"""
+Шлюз БД для горячего восстановления
+
+Каждый апдейт бота и каждый запрос веб-панели проходит через шлюз. Восстановление
+закрывает шлюз: новые запросы ждут (асинхронно, цикл событий не блокируется), текущие
+успевают завершиться, после чего БД подменяется и шлюз открывается. Ожидавшие запросы
+продолжают работу уже на новых данных, записи не теряются.
+"""
+import os
+import time
+import asyncio
+import logging
+import threading
+import contextvars
+from contextlib import asynccontextmanager, contextmanager
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+# Сколько восстановление ждет завершения текущих запросов
+RESTORE_QUIESCE_TIMEOUT = float(os.getenv("RESTORE_QUIESCE_TIMEOUT", 5))
+
+# Текущий контекст находится внутри запроса, прошедшего через шлюз
+_inside_request = contextvars.ContextVar("inside_db_request", default=False)
+
+
+class GateBusyError(RuntimeError):
+    """Текущие запросы не завершились за quiesce_timeout - подмена БД отменена"""
+
+
+class DatabaseGate:
+    """Счетчик активных запросов и флаг закрытия на время подмены БД"""
+
+    def __init__(self, quiesce_timeout: float = RESTORE_QUIESCE_TIMEOUT):
+        self.quiesce_timeout = quiesce_timeout
+        self._cond = threading.Condition()
+        self._active = 0
+        self._closed = False
+        self.last_swap_ms: Optional[float] = None
+        # Апдейты бота, которые сейчас обрабатываются (глубина очереди бота)
+        self.bot_updates = 0
+
+    @property
+    def active(self) -> int:
+        return self._active
+
+    @property
+    def closed(self) -> bool:
+        return self._closed
+
+    def leave(self):
+        with self._cond:
+            self._active -= 1
+            self._cond.notify_all()
+
+    def _try_enter(self) -> bool:
+        with self._cond:
+            if self._closed:
+                return False
+            self._active += 1
+            return True
+
+    @contextmanager
+    def try_request(self):
+        """
+        Синхронный вход без ожидания (для коротких проверок из потока): внутри блока
+        True, если шлюз открыт, и False, если сейчас подменяется БД.
+        """
+        entered = self._try_enter()
+        try:
+            yield entered
+        finally:
+            if entered:
+                self.leave()
+
+    @asynccontextmanager
+    async def request(self):
+        """Обернуть обработку запроса: пока идет восстановление, запрос ждет"""
+        if _inside_request.get():
+            # Вложенный вызов в рамках того же запроса
+            yield
+            return
+
+        # Ожидание опросом: не занимает поток и безопасно при отмене задачи
+        while not self._try_enter():
+            await asyncio.sleep(0.01)
+
+        token = _inside_request.set(True)
+        try:
+            yield
+        finally:
+            _inside_request.reset(token)
+            self.leave()
+
+    @contextmanager
+    def exclusive(self):
+        """
+        Закрыть шлюз на время подмены БД.
+
+        Ждет завершения текущих запросов не дольше quiesce_timeout (запрос, из которого
+        запущено восстановление, не учитывается). Если они не успели, шлюз открывается
+        снова и выбрасывается GateBusyError: подменять БД под выполняющимися запросами
+        нельзя, их записи потерялись бы. Для ожидания восстановление нужно вызывать вне
+        цикла событий - через asyncio.to_thread.
+        """
+        own = 1 if _inside_request.get() else 0
+
+        with self._cond:
+            # Одновременно выполняется только одна подмена
+            self._cond.wait_for(lambda: not self._closed)
+            self._closed = True
+            start = time.perf_counter()
+            drained = self._cond.wait_for(lambda: self._active <= own, timeout=self.quiesce_timeout)
+            if not drained:
+                busy = self._active - own
+                self._closed = False
+                self._cond.notify_all()
+
+        if not drained:
+            logger.warning(f"⚠️ Активных запросов к БД: {busy} за {self.quiesce_timeout:g} с, восстановление отменено")
+            raise GateBusyError(
+                f"Не дождались завершения {busy} запросов к БД за {self.quiesce_timeout:g} с, "
+                f"восстановление отменено"
+            )
+
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._closed = False
+                self._cond.notify_all()
+            self.last_swap_ms = (time.perf_counter() - start) * 1000
+            logger.info(f"🚪 Шлюз БД открыт, запросы были приостановлены на {self.last_swap_ms:.0f} мс")
+
+
+class DatabaseGateMiddleware:
+    """Outer middleware апдейтов aiogram: апдейт обрабатывается внутри шлюза БД"""
+
+    def __init__(self, gate: DatabaseGate):
+        self.gate = gate
+
+    async def __call__(
+        self,
+        handler: Callable[[Any, Dict[str, Any]], Awaitable[Any]],
+        event: Any,
+        data: Dict[str, Any]
+    ) -> Any:
+        self.gate.bot_updates += 1
+        try:
+            async with self.gate.request():
+                return await handler(event, data)
+        finally:
+            self.gate.bot_updates -= 1
+
+
+def gate_exempt(handler):
+    """
+    Отметить хэндлер веб-панели, который не обращается к БД и не должен держать шлюз
+    (долгие потоки вроде SSE иначе задерживали бы каждое восстановление).
+    """
+    handler.db_gate_exempt = True
+    return handler
+
+
+def create_web_middleware(gate: DatabaseGate):
+    """Middleware aiohttp: запрос веб-панели обрабатывается внутри шлюза БД"""
+    from aiohttp import web
+
+    @web.middleware
+    async def db_gate_middleware(request, handler):
+        if getattr(request.match_info.handler, "db_gate_exempt", False):
+            return await handler(request)
+        async with gate.request():
+            return await handler(request)
+
+    return db_gate_middleware
+
+
+# Глобальный шлюз БД
+db_gate = DatabaseGate()
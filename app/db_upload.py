@@ -0,0 +1,197 @@
+"""
+Потоковая загрузка базы данных (веб-панель и документ в боте)
+
+Файл проходит по данным один раз: каждый кусок сразу дописывается во временный файл
+uploads/<имя>.part, попадает в SHA-256 и учитывается в лимите размера. Заголовок SQLite
+(сигнатура, размер страницы) проверяется, как только пришли первые 100 байт, - неверный
+файл и превышение лимита обрывают загрузку, не дожидаясь конца. После последнего куска
+проверяется размер по числу страниц, файл сбрасывается на диск и атомарно
+переименовывается в итоговый.
+
+Результат проверки запоминается для готового файла (по размеру и mtime), и
+восстановление (DatabaseManager.restore_from_backup(verified=...)) не перечитывает
+файл ради повторного SHA-256.
+"""
+import os
+import time
+import hashlib
+import logging
+import threading
+from dataclasses import dataclass, asdict
+from typing import Any, Dict, Optional
+
+from app.backup_verify import HEADER_SIZE, parse_header
+
+logger = logging.getLogger(__name__)
+
+UPLOAD_DIR = "uploads"
+# Наибольший размер загружаемой БД или дампа
+DB_UPLOAD_MAX_BYTES = int(os.getenv("DB_UPLOAD_MAX_MB", 100)) * 1024 * 1024
+# Размер куска, которым веб-панель читает multipart-поле
+DB_UPLOAD_CHUNK_SIZE = 1024 * 1024
+
+
+class UploadRejected(ValueError):
+    """Загрузка отклонена: файл слишком большой или не является БД SQLite"""
+
+    def __init__(self, message: str, too_large: bool = False):
+        super().__init__(message)
+        self.too_large = too_large
+
+
+@dataclass
+class StagedUpload:
+    """Загруженный и проверенный файл, готовый к восстановлению"""
+    path: str
+    size: int
+    sha256: str
+    page_size: Optional[int] = None
+    page_count: Optional[int] = None
+    seconds: float = 0.0
+
+    def verify_result(self) -> Dict[str, Any]:
+        """Результат в формате app.backup_verify.verify_backup"""
+        result = asdict(self)
+        result.update(ok=True, error=None, sha256_match=None, pages_match=None)
+        return result
+
+
+def _too_large_message(max_bytes: int) -> str:
+    return f"Файл слишком большой. Максимальный размер: {max_bytes // (1024 * 1024)}MB"
+
+
+class DatabaseUploadWriter:
+    """
+    Файлоподобный приемник загрузки: write() пишет кусок, считает SHA-256 и проверяет
+    лимит и заголовок. Подходит как destination для Bot.download_file (seek=False).
+    """
+
+    def __init__(self, target_path: str, max_bytes: int = DB_UPLOAD_MAX_BYTES,
+                 expected_size: Optional[int] = None, validate_sqlite: bool = True):
+        if expected_size is not None and expected_size > max_bytes:
+            raise UploadRejected(_too_large_message(max_bytes), too_large=True)
+
+        self.target_path = target_path
+        self.part_path = target_path + ".part"
+        self.max_bytes = max_bytes
+        self.validate_sqlite = validate_sqlite
+        self.size = 0
+        self.header: Optional[Dict[str, Any]] = None
+
+        self._digest = hashlib.sha256()
+        self._head = b""
+        self._started = time.perf_counter()
+        os.makedirs(os.path.dirname(os.path.abspath(target_path)), exist_ok=True)
+        self._file = open(self.part_path, "wb")
+
+    def write(self, chunk: bytes) -> int:
+        self.size += len(chunk)
+        if self.size > self.max_bytes:
+            raise UploadRejected(_too_large_message(self.max_bytes), too_large=True)
+
+        if self.validate_sqlite and self.header is None:
+            self._head += chunk[:HEADER_SIZE - len(self._head)]
+            if len(self._head) >= HEADER_SIZE:
+                try:
+                    self.header = parse_header(self._head)
+                except ValueError as e:
+                    raise UploadRejected(str(e)) from None
+
+        self._digest.update(chunk)
+        self._file.write(chunk)
+        return len(chunk)
+
+    def flush(self):
+        # Bot.download_file вызывает flush после каждого куска; на диск файл сбрасывается в finish()
+        pass
+
+    def seek(self, offset: int, whence: int = 0) -> int:
+        return self.size
+
+    def finish(self) -> StagedUpload:
+        """Проверить размер по заголовку, сбросить файл на диск и переименовать в итоговый"""
+        try:
+            page_size = page_count = None
+            if self.validate_sqlite:
+                if self.header is None:
+                    raise UploadRejected("Файл не является базой данных SQLite")
+                page_size, page_count = self.header["page_size"], self.header["page_count"]
+                if page_count is None:
+                    page_count = self.size // page_size
+                if self.size < page_size * page_count:
+                    raise UploadRejected(
+                        f"Файл обрезан: {self.size:,} байт при {page_count} стр. x {page_size} байт")
+            elif not self.size:
+                raise UploadRejected("Файл пустой")
+
+            self._file.flush()
+            os.fsync(self._file.fileno())
+            self._file.close()
+            os.replace(self.part_path, self.target_path)
+        except Exception:
+            self.abort()
+            raise
+
+        staged = StagedUpload(
+            path=self.target_path, size=self.size, sha256=self._digest.hexdigest(),
+            page_size=page_size, page_count=page_count,
+            seconds=round(time.perf_counter() - self._started, 3),
+        )
+        staged_uploads.add(staged)
+        logger.info(f"📁 Файл загружен: {self.target_path} ({self.size:,} байт, sha256 {staged.sha256[:12]}…)")
+        return staged
+
+    def abort(self):
+        """Прервать загрузку и удалить временный файл"""
+        if not self._file.closed:
+            self._file.close()
+        if os.path.exists(self.part_path):
+            os.remove(self.part_path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is not None:
+            self.abort()
+
+
+class StagedUploads:
+    """Проверенные загрузки: путь -> результат, пока файл не изменился"""
+
+    def __init__(self):
+        self._items: Dict[str, tuple] = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _stamp(path: str) -> Optional[tuple]:
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return None
+        return stat.st_size, stat.st_mtime_ns
+
+    def add(self, staged: StagedUpload):
+        with self._lock:
+            self._items[os.path.abspath(staged.path)] = (self._stamp(staged.path), staged)
+
+    def get(self, path: str) -> Optional[StagedUpload]:
+        """Результат проверки файла, если после загрузки файл не менялся"""
+        key = os.path.abspath(path)
+        with self._lock:
+            item = self._items.get(key)
+            if item is None:
+                return None
+            stamp, staged = item
+            if stamp is None or stamp != self._stamp(path):
+                del self._items[key]
+                return None
+            return staged
+
+    def discard(self, path: str):
+        with self._lock:
+            self._items.pop(os.path.abspath(path), None)
+
+
+# Глобальный экземпляр
+staged_uploads = StagedUploads()
@@ -1,10 +1,23 @@
-"""
-Инициализация обработчиков
-"""
-
-from .admin_panel import router as admin_router
-from .admin_handlers import router as admin_handlers_router
-from .conversations_admin import router as conversations_router
-
-# Экспортируем все роутеры
-__all__ = ['admin_router', 'admin_handlers_router', 'conversations_router']
+"""
+Инициализация обработчиков
+
+Роутеры экспортируются лениво: импорт пакета app.handlers не тянет за собой
+тяжелые админские модули (важно для быстрого старта).
+"""
+import importlib
+
+_LAZY_ROUTERS = {
+    'admin_router': '.admin_panel',
+    'admin_handlers_router': '.admin_handlers',
+    'conversations_router': '.conversations_admin',
+}
+
+# Экспортируем все роутеры
+__all__ = ['admin_router', 'admin_handlers_router', 'conversations_router']
+
+
+def __getattr__(name):
+    if name in _LAZY_ROUTERS:
+        module = importlib.import_module(_LAZY_ROUTERS[name], __name__)
+        return module.router
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -6,6 +6,7 @@ from sqlalchemy.orm import Session
 from sqlalchemy import func
 from aiogram.types import InputFile
 import os
+import logging
 from datetime import datetime
 from app.database import get_db
 from app.models import User, AnonMessage, Payment
@@ -16,6 +17,7 @@ from app.payment_service import payment_service
 from app.price_service import price_service
 from app.broadcast_service import broadcast_service
 
+logger = logging.getLogger(__name__)
 router = Router()
 
 class BroadcastStates(StatesGroup):
@@ -273,7 +275,7 @@ async def confirm_payment_command(message: types.Message):
                     parse_mode="HTML"
                 )
             except Exception as e:
-                print(f"❌ Ошибка уведомления пользователя: {e}")
+                logger.error(f"❌ Ошибка уведомления пользователя: {e}")
 
             await message.answer(
                 f"✅ <b>Платеж подтвержден</b>\n\n"
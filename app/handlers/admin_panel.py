@@ -4,7 +4,6 @@
 from aiogram import F, Router, types, Bot
 import os
 import sys
-import time
 from aiogram.filters import Command
 from aiogram.fsm.context import FSMContext
 from aiogram.fsm.state import State, StatesGroup
@@ -14,8 +13,14 @@ from datetime import datetime, timedelta
 import asyncio
 from aiogram.types import Message, CallbackQuery, FSInputFile
 import json
+import html
 from app.database_manager import db_manager
+from app.backup_jobs import backup_jobs
+from app.backup_compression import backup_parts, connect_backup
+from app.data_import import is_dump_filename
+from app.db_upload import UPLOAD_DIR, DatabaseUploadWriter, UploadRejected, staged_uploads
 from app.database import get_db, force_reconnect, get_engine, get_session_local
+from app.change_journal import bulk_delete
 from app.models import User, AnonMessage, Payment
 from app.config import ADMIN_IDS
 from app.keyboards_admin import (
@@ -25,11 +30,19 @@ from app.keyboards_admin import (
     exit_admin_keyboard, admin_settings_menu, admin_conversations_menu
 )
 from app.keyboards import main_menu
+from app.callback_router import (
+    callback_index,
+    ADMIN_PAGE_USERS_CB,
+    ADMIN_SET_REVEALS_CB,
+    CONFIRM_RESTORE_CB,
+    RESTORE_FROM_CHECK_CB,
+    DELETE_BACKUP_CB,
+    CONFIRM_DELETE_CB
+)
 from app.price_service import price_service
 from app.broadcast_service import broadcast_service
 from app.payment_service import payment_service
 from app.database_utils import (
-    safe_execute_query,
     safe_execute_query_fetchone,
     safe_execute_query_fetchall,
     safe_execute_scalar,
@@ -150,9 +163,6 @@ async def cmd_reload_db(message: Message):
         # Перезагружаем подключение
         force_reconnect()
         
-        # Ждем перезагрузки
-        await asyncio.sleep(1)
-        
         # Получаем актуальную статистику
         engine = get_engine()
         with engine.connect() as conn:
@@ -191,13 +201,58 @@ async def cmd_reload_db(message: Message):
     except Exception as e:
         await message.answer(f"❌ Ошибка перезагрузки БД: {str(e)}")
 
+async def run_backup_job_with_progress(message: Message, title: str, backup_name: str = None,
+                                      send_to_admins: bool = True, incremental: bool = False):
+    """Поставить бэкап в очередь и показывать прогресс, редактируя одно сообщение"""
+    job = backup_jobs.submit(backup_name, send_to_admins=send_to_admins, incremental=incremental)
+    status_message = await message.answer(f"{title}\n⏳ В очереди (задача <code>{job.id}</code>)", parse_mode="HTML")
+    
+    async def on_progress(job):
+        await status_message.edit_text(
+            f"{title}\n📊 {job.progress:.0f}% ({job.pages_done}/{job.pages_total} стр.)\n"
+            f"⏹️ Отмена: <code>/backup_cancel {job.id}</code>",
+            parse_mode="HTML"
+        )
+    
+    await backup_jobs.wait(job, poll_interval=1.0, on_progress=on_progress)
+    
+    if job.state == "cancelled":
+        await status_message.edit_text(f"⏹️ Бэкап отменен (задача <code>{job.id}</code>)", parse_mode="HTML")
+    return job
+
+async def run_import_job_with_progress(message: Message, dump_path: str):
+    """Импорт дампа в очереди фоновых задач с прогрессом по прочитанным байтам"""
+    title = f"📥 Импорт дампа <code>{os.path.basename(dump_path)}</code>..."
+    job = backup_jobs.submit_import(dump_path)
+    status_message = await message.answer(f"{title}\n⏳ В очереди (задача <code>{job.id}</code>)", parse_mode="HTML")
+    
+    async def on_progress(job):
+        await status_message.edit_text(
+            f"{title}\n📊 {job.progress:.0f}% "
+            f"({job.pages_done / (1024 * 1024):.1f} из {job.pages_total / (1024 * 1024):.1f} MB)\n"
+            f"⏹️ Отмена: <code>/backup_cancel {job.id}</code>",
+            parse_mode="HTML"
+        )
+    
+    await backup_jobs.wait(job, poll_interval=1.0, on_progress=on_progress)
+    
+    if job.state == "cancelled":
+        await status_message.edit_text(f"⏹️ Импорт отменен (задача <code>{job.id}</code>)", parse_mode="HTML")
+    elif job.state != "done":
+        await status_message.edit_text(f"❌ Ошибка импорта: {job.error or 'неизвестная ошибка'}")
+    else:
+        await status_message.edit_text(f"{title}\n✅ Дамп применен", parse_mode="HTML")
+    return job
+
 @router.message(Command("backup"), admin_filter)
 async def cmd_backup(message: Message):
     """Создать бэкап БД"""
     try:
-        await message.answer("💾 Создание бэкапа...")
+        job = await run_backup_job_with_progress(message, "💾 Создание бэкапа...")
+        if job.state == "cancelled":
+            return
         
-        backup_path = db_manager.create_backup()
+        backup_path = job.result_path
         
         if backup_path:
             backup_name = os.path.basename(backup_path)
@@ -311,14 +366,9 @@ async def cmd_restore_selected(message: Message):
         
         selected_backup = list(reversed(backups[-5:]))[backup_index - 1]
         
-        success = db_manager.restore_from_backup(selected_backup["path"])
+        success = await db_manager.async_restore_from_backup(selected_backup["path"])
         
         if success:
-            await message.answer("🔄 Перезагружаю подключение к БД...")
-            force_reconnect()
-            
-            await asyncio.sleep(2)
-            
             db_info = db_manager.get_db_info()
             
             engine = get_engine()
@@ -355,27 +405,32 @@ async def handle_database_upload(message: types.Message, bot: Bot):
 
     document = message.document
     
-    if not document.file_name or not document.file_name.endswith('.db'):
-        await message.answer("❌ Можно загружать только файлы баз данных (.db)")
+    is_dump = bool(document.file_name) and is_dump_filename(document.file_name)
+    if not document.file_name or not (document.file_name.endswith('.db') or is_dump):
+        await message.answer(
+            "❌ Можно загружать только файлы баз данных (.db) "
+            "или дампы (.sql, .jsonl, в том числе .gz / .zst)"
+        )
         return
     
-    MAX_SIZE = 100 * 1024 * 1024
-    if document.file_size > MAX_SIZE:
-        await message.answer(f"❌ Файл слишком большой. Максимальный размер: {MAX_SIZE // (1024*1024)}MB")
+    file_name = os.path.basename(document.file_name)
+    file_path = os.path.join(UPLOAD_DIR, file_name)
+    try:
+        # Лимит размера проверяется до скачивания, заголовок SQLite - по первым байтам
+        writer = DatabaseUploadWriter(file_path, expected_size=document.file_size, validate_sqlite=not is_dump)
+    except UploadRejected as e:
+        await message.answer(f"❌ {e}")
         return
     
-    await message.answer("💾 Загружаю файл базы данных...")
-    
     try:
-        upload_dir = 'uploads'
-        os.makedirs(upload_dir, exist_ok=True)
-        
-        file_path = os.path.join(upload_dir, document.file_name)
-        
-        file = await bot.get_file(document.file_id)
-        await bot.download_file(file.file_path, file_path)
-        
-        if not db_manager.validate_backup(file_path):
+        with writer:
+            await message.answer("💾 Загружаю файл базы данных...")
+            file = await bot.get_file(document.file_id)
+            await bot.download_file(file.file_path, writer, seek=False)
+            await asyncio.to_thread(writer.finish)
+        
+        if not is_dump and not db_manager.validate_backup(file_path):
+            staged_uploads.discard(file_path)
             os.remove(file_path)
             await message.answer("❌ Файл не является валидной базой данных SQLite")
             return
@@ -384,7 +439,7 @@ async def handle_database_upload(message: types.Message, bot: Bot):
         
         await message.answer(
             f"📁 <b>Файл загружен:</b>\n\n"
-            f"📦 Имя: <code>{document.file_name}</code>\n"
+            f"📦 Имя: <code>{file_name}</code>\n"
             f"📊 Размер: {file_size_mb:.2f} MB\n\n"
             f"⚠️ <b>Внимание:</b> Текущая база данных будет заменена!\n\n"
             f"Подтвердите восстановление:",
@@ -394,7 +449,7 @@ async def handle_database_upload(message: types.Message, bot: Bot):
                     [
                         types.InlineKeyboardButton(
                             text="✅ Восстановить", 
-                            callback_data=f"confirm_restore_{document.file_name}"
+                            callback_data=CONFIRM_RESTORE_CB.pack(file_name)
                         ),
                         types.InlineKeyboardButton(
                             text="❌ Отмена", 
@@ -405,19 +460,21 @@ async def handle_database_upload(message: types.Message, bot: Bot):
             )
         )
         
+    except UploadRejected as e:
+        await message.answer(f"❌ {e}")
     except Exception as e:
         logger.error(f"❌ Ошибка загрузки файла: {e}")
         await message.answer(f"❌ Ошибка загрузки файла: {str(e)[:200]}")
 
-@router.callback_query(F.data.startswith("confirm_restore_"))
-async def confirm_restore_database(callback: types.CallbackQuery, bot: Bot):
+@callback_index.factory(CONFIRM_RESTORE_CB)
+async def confirm_restore_database(callback: types.CallbackQuery, bot: Bot, callback_data):
     """Подтверждение восстановления из загруженного файла"""
     if not is_admin(callback.from_user.id):
         await callback.answer("❌ Доступ запрещен")
         return
 
-    file_name = callback.data.replace("confirm_restore_", "")
-    file_path = os.path.join('uploads', file_name)
+    file_name = os.path.basename(callback_data.file_name)
+    file_path = os.path.join(UPLOAD_DIR, file_name)
     
     if not os.path.exists(file_path):
         await callback.answer("❌ Файл не найден")
@@ -427,21 +484,22 @@ async def confirm_restore_database(callback: types.CallbackQuery, bot: Bot):
     
     try:
         await callback.message.answer("💾 Создаю резервную копию текущей БД...")
-        current_backup = db_manager.create_backup("before_upload_backup.db", send_to_admins=False)
+        current_backup = await db_manager.async_create_backup("before_upload_backup.db", send_to_admins=False)
         
         if current_backup:
             await callback.message.answer(f"✅ Текущая БД сохранена: {os.path.basename(current_backup)}")
         
-        await callback.message.answer("🔄 Восстанавливаю базу данных...")
-        
-        success = db_manager.restore_from_backup(file_path)
+        if is_dump_filename(file_name):
+            job = await run_import_job_with_progress(callback.message, file_path)
+            success = job.state == "done"
+        else:
+            await callback.message.answer("🔄 Восстанавливаю базу данных...")
+            # Файл уже проверен и захеширован при скачивании - повторно не перечитываем
+            staged = staged_uploads.get(file_path)
+            success = await db_manager.async_restore_from_backup(
+                file_path, verified=staged.verify_result() if staged else None)
         
         if success:
-            await callback.message.answer("🔄 Перезагружаю подключение к БД...")
-            force_reconnect()
-            
-            await asyncio.sleep(2)
-            
             db_info = db_manager.get_db_info()
             
             engine = get_engine()
@@ -452,7 +510,7 @@ async def confirm_restore_database(callback: types.CallbackQuery, bot: Bot):
                 result = conn.execute(text("SELECT COUNT(*) FROM anon_messages"))
                 message_count = result.scalar() or 0
             
-            new_backup = db_manager.create_backup("after_restore_backup.db")
+            new_backup = await db_manager.async_create_backup("after_restore_backup.db")
             
             response_message = (
                 f"✅ <b>База данных успешно восстановлена и перезагружена!</b>\n\n"
@@ -506,7 +564,7 @@ async def confirm_restore_database(callback: types.CallbackQuery, bot: Bot):
     finally:
         await callback.answer()
 
-@router.callback_query(F.data == "cancel_restore")
+@callback_index.exact("cancel_restore")
 async def cancel_restore_database(callback: types.CallbackQuery):
     """Отмена восстановления"""
     if not is_admin(callback.from_user.id):
@@ -560,7 +618,7 @@ async def admin_users(message: types.Message):
         logger.error(f"Ошибка в admin_users: {e}")
         await message.answer(f"❌ Ошибка получения статистики: {str(e)[:200]}")
 
-@router.callback_query(F.data == "admin_users")
+@callback_index.exact("admin_users")
 async def admin_users_callback(callback: types.CallbackQuery):
     """Callback для управления пользователями"""
     if not is_admin(callback.from_user.id):
@@ -593,7 +651,7 @@ async def admin_users_callback(callback: types.CallbackQuery):
         logger.error(f"Ошибка в admin_users_callback: {e}")
         await callback.answer("❌ Произошла ошибка")
 
-@router.callback_query(F.data == "admin_users_list")
+@callback_index.exact("admin_users_list")
 async def admin_users_list(callback: types.CallbackQuery):
     """Список пользователей с пагинацией"""
     if not is_admin(callback.from_user.id):
@@ -669,15 +727,15 @@ async def admin_users_list(callback: types.CallbackQuery):
         logger.error(f"Ошибка в admin_users_list: {e}", exc_info=True)
         await callback.answer("❌ Произошла ошибка при загрузке списка")
 
-@router.callback_query(F.data.startswith("admin_page_users_"))
-async def admin_users_page(callback: types.CallbackQuery):
+@callback_index.factory(ADMIN_PAGE_USERS_CB)
+async def admin_users_page(callback: types.CallbackQuery, callback_data):
     """Пагинация списка пользователей"""
     if not is_admin(callback.from_user.id):
         await callback.answer("❌ Доступ запрещен")
         return
 
     try:
-        page = int(callback.data.split("_")[3])
+        page = callback_data.page
         users_per_page = 5
         offset = (page - 1) * users_per_page
         
@@ -737,7 +795,7 @@ async def admin_users_page(callback: types.CallbackQuery):
         logger.error(f"Ошибка в admin_users_page: {e}", exc_info=True)
         await callback.answer("❌ Произошла ошибка")
 
-@router.callback_query(F.data == "admin_users_search")
+@callback_index.exact("admin_users_search")
 async def admin_users_search_start(callback: types.CallbackQuery, state: FSMContext):
     """Начать поиск пользователя"""
     if not is_admin(callback.from_user.id):
@@ -881,14 +939,14 @@ async def admin_users_search_result(message: types.Message, state: FSMContext):
         await message.answer(f"❌ Ошибка поиска: {str(e)[:100]}")
         await state.clear()
 
-@router.callback_query(F.data.startswith("admin_user_set_reveals_"))
-async def admin_user_set_reveals_start(callback: types.CallbackQuery, state: FSMContext):
+@callback_index.factory(ADMIN_SET_REVEALS_CB)
+async def admin_user_set_reveals_start(callback: types.CallbackQuery, state: FSMContext, callback_data):
     """Начало установки раскрытий пользователю"""
     if not is_admin(callback.from_user.id):
         await callback.answer("❌ Доступ запрещен")
         return
 
-    user_id = int(callback.data.replace("admin_user_set_reveals_", ""))
+    user_id = callback_data.user_id
     
     await state.update_data(target_user_id=user_id)
     await state.set_state(AdminStates.waiting_reveals_count)
@@ -963,7 +1021,7 @@ async def admin_prices(message: types.Message):
     
     await message.answer(prices_message, parse_mode="HTML", reply_markup=admin_prices_menu())
 
-@router.callback_query(F.data == "admin_prices")
+@callback_index.exact("admin_prices")
 async def admin_prices_callback(callback: types.CallbackQuery):
     """Обработчик кнопки 'Управление ценами'"""
     if not is_admin(callback.from_user.id):
@@ -983,7 +1041,7 @@ async def admin_prices_callback(callback: types.CallbackQuery):
     await callback.message.edit_text(prices_message, parse_mode="HTML", reply_markup=admin_prices_menu())
     await callback.answer()
 
-@router.callback_query(F.data.startswith("admin_price_"))
+@callback_index.prefix("admin_price_")
 async def admin_price_actions(callback: types.CallbackQuery):
     """Действия с ценами - ОБЩИЙ ОБРАБОТЧИК"""
     if not is_admin(callback.from_user.id):
@@ -1193,7 +1251,7 @@ async def admin_stats(message: types.Message):
         logger.error(f"Ошибка в admin_stats: {e}")
         await message.answer(f"❌ Ошибка получения статистики: {str(e)[:200]}")
 
-@router.callback_query(F.data == "admin_stats")
+@callback_index.exact("admin_stats")
 async def admin_stats_callback(callback: types.CallbackQuery):
     """Обработчик кнопки статистики"""
     if not is_admin(callback.from_user.id):
@@ -1285,7 +1343,7 @@ async def admin_broadcast(message: types.Message):
         logger.error(f"Ошибка в admin_broadcast: {e}")
         await message.answer(f"❌ Ошибка получения статистики: {str(e)[:200]}")
 
-@router.callback_query(F.data == "admin_broadcast")
+@callback_index.exact("admin_broadcast")
 async def admin_broadcast_callback(callback: types.CallbackQuery):
     """Обработчик кнопки рассылки"""
     if not is_admin(callback.from_user.id):
@@ -1315,7 +1373,7 @@ async def admin_broadcast_callback(callback: types.CallbackQuery):
         logger.error(f"Ошибка в admin_broadcast_callback: {e}")
         await callback.answer("❌ Произошла ошибка")
 
-@router.callback_query(F.data == "admin_broadcast_all")
+@callback_index.exact("admin_broadcast_all")
 async def admin_broadcast_all_start(callback: types.CallbackQuery, state: FSMContext):
     """Начать рассылку всем пользователям"""
     if not is_admin(callback.from_user.id):
@@ -1361,7 +1419,7 @@ async def admin_broadcast_all_send(message: types.Message, state: FSMContext):
     
     await state.clear()
 
-@router.callback_query(F.data == "admin_broadcast_user")
+@callback_index.exact("admin_broadcast_user")
 async def admin_broadcast_user_start(callback: types.CallbackQuery, state: FSMContext):
     """Начать рассылку конкретному пользователю"""
     if not is_admin(callback.from_user.id):
@@ -1427,7 +1485,7 @@ async def admin_settings(message: types.Message):
     
     await message.answer(settings_message, parse_mode="HTML", reply_markup=admin_settings_menu())
 
-@router.callback_query(F.data == "admin_backup")
+@callback_index.exact("admin_backup")
 async def admin_backup_callback(callback: types.CallbackQuery):
     """Создание бэкапа БД"""
     if not is_admin(callback.from_user.id):
@@ -1437,7 +1495,7 @@ async def admin_backup_callback(callback: types.CallbackQuery):
     await cmd_backup(callback.message)
     await callback.answer()
 
-@router.callback_query(F.data == "admin_restore")
+@callback_index.exact("admin_restore")
 async def admin_restore_callback(callback: types.CallbackQuery):
     """Восстановление БД"""
     if not is_admin(callback.from_user.id):
@@ -1447,7 +1505,7 @@ async def admin_restore_callback(callback: types.CallbackQuery):
     await cmd_restore(callback.message)
     await callback.answer()
 
-@router.callback_query(F.data == "admin_db_status")
+@callback_index.exact("admin_db_status")
 async def admin_db_status_callback(callback: types.CallbackQuery):
     """Статус БД"""
     if not is_admin(callback.from_user.id):
@@ -1457,7 +1515,7 @@ async def admin_db_status_callback(callback: types.CallbackQuery):
     await db_status_command(callback.message)
     await callback.answer()
 
-@router.callback_query(F.data == "admin_cleanup")
+@callback_index.exact("admin_cleanup")
 async def admin_cleanup_callback(callback: types.CallbackQuery):
     """Очистка данных"""
     if not is_admin(callback.from_user.id):
@@ -1467,7 +1525,7 @@ async def admin_cleanup_callback(callback: types.CallbackQuery):
     await cleanup_old_data_command(callback.message)
     await callback.answer()
 
-@router.callback_query(F.data == "admin_backups_list")
+@callback_index.exact("admin_backups_list")
 async def admin_backups_list_callback(callback: types.CallbackQuery):
     """Список бэкапов"""
     if not is_admin(callback.from_user.id):
@@ -1477,41 +1535,81 @@ async def admin_backups_list_callback(callback: types.CallbackQuery):
     await cmd_backups(callback.message)
     await callback.answer()
 
-@router.callback_query(F.data == "admin_export")
+async def run_export_job_with_progress(message: Message, title: str, caption: str, **export):
+    """
+    Потоковый экспорт в очереди фоновых задач: прогресс в одном сообщении, файл - документом.
+    export - параметры DatabaseManager.export_data (fmt, compression, name, query, params).
+    """
+    job = backup_jobs.submit_export(**export)
+    status_message = await message.answer(f"{title}\n⏳ В очереди (задача <code>{job.id}</code>)", parse_mode="HTML")
+    
+    async def on_progress(job):
+        await status_message.edit_text(
+            f"{title}\n📊 {job.progress:.0f}% ({job.pages_done:,} строк)\n"
+            f"⏹️ Отмена: <code>/backup_cancel {job.id}</code>",
+            parse_mode="HTML"
+        )
+    
+    await backup_jobs.wait(job, poll_interval=1.0, on_progress=on_progress)
+    
+    if job.state == "cancelled":
+        await status_message.edit_text(f"⏹️ Экспорт отменен (задача <code>{job.id}</code>)", parse_mode="HTML")
+        return job
+    if job.state != "done":
+        await status_message.edit_text(f"❌ Ошибка экспорта: {job.error or 'неизвестная ошибка'}")
+        return job
+    
+    file_size_mb = os.path.getsize(job.result_path) / (1024 * 1024)
+    await status_message.edit_text(
+        f"✅ <b>Экспорт завершен!</b>\n\n"
+        f"📁 Файл: <code>{os.path.basename(job.result_path)}</code>\n"
+        f"📊 Размер: {file_size_mb:.2f} MB, строк: {job.pages_done:,}",
+        parse_mode="HTML"
+    )
+    
+    if file_size_mb < 50:
+        await message.answer_document(FSInputFile(job.result_path), caption=caption)
+    else:
+        await message.answer("⚠️ Файл больше 50 MB - Telegram не примет его. Используйте сжатие (gzip/zstd).")
+    return job
+
+@callback_index.exact("admin_export")
 async def admin_export_callback(callback: types.CallbackQuery):
-    """Экспорт данных"""
+    """Экспорт данных (SQL, потоково, без блокировки бота)"""
     if not is_admin(callback.from_user.id):
         await callback.answer("❌ Доступ запрещен")
         return
     
+    await callback.answer()
     try:
-        from app.database_manager import db_manager
-        sql_file = 'data/database_export.sql'
-        
-        success = db_manager.export_to_sql(sql_file)
-        
-        if success and os.path.exists(sql_file):
-            file_size = os.path.getsize(sql_file)
-            file_size_mb = file_size / (1024 * 1024)
-            
-            await callback.message.answer(
-                f"✅ <b>Экспорт завершен!</b>\n\n"
-                f"📁 Файл: <code>{os.path.basename(sql_file)}</code>\n"
-                f"📊 Размер: {file_size_mb:.2f} MB",
-                parse_mode="HTML"
-            )
-            
-            if file_size_mb < 50:
-                await callback.message.answer_document(
-                    FSInputFile(sql_file),
-                    caption="📁 Экспорт базы данных в SQL"
-                )
-        else:
-            await callback.message.answer("❌ Ошибка экспорта данных")
+        await run_export_job_with_progress(
+            callback.message, "📤 Экспорт базы данных в SQL...", "📁 Экспорт базы данных в SQL",
+            fmt="sql", compression="none", name="database_export"
+        )
     except Exception as e:
         await callback.message.answer(f"❌ Ошибка: {str(e)[:200]}")
+
+@router.message(Command("export"), admin_filter)
+async def cmd_export(message: Message):
+    """Экспорт БД: /export [sql|csv|jsonl] [none|gzip|zstd]"""
+    from app.data_export import EXPORT_FORMATS
     
-    await callback.answer()
+    args = message.text.split()
+    fmt = args[1].lower() if len(args) > 1 else "sql"
+    compression = args[2].lower() if len(args) > 2 else "none"
+    if fmt not in EXPORT_FORMATS or compression not in ("none", "gzip", "zstd", "auto"):
+        await message.answer(
+            "❌ Формат: <code>/export [sql|csv|jsonl] [none|gzip|zstd]</code>", parse_mode="HTML"
+        )
+        return
+    
+    try:
+        await run_export_job_with_progress(
+            message, f"📤 Экспорт базы данных ({fmt})...", f"📁 Экспорт базы данных ({fmt})",
+            fmt=fmt, compression=compression, name="database_export"
+        )
+    except Exception as e:
+        await message.answer(f"❌ Ошибка: {str(e)[:200]}")
 
 # ==================== УПРАВЛЕНИЕ ПЕРЕПИСКАМИ ====================
 
@@ -1595,7 +1693,7 @@ async def exit_admin_panel(message: types.Message):
         reply_markup=exit_admin_keyboard()
     )
 
-@router.callback_query(F.data == "exit_admin")
+@callback_index.exact("exit_admin")
 async def exit_admin_callback(callback: types.CallbackQuery):
     if not is_admin(callback.from_user.id):
         await callback.answer("❌ Доступ запрещен")
@@ -1609,7 +1707,7 @@ async def exit_admin_callback(callback: types.CallbackQuery):
     )
     await callback.answer()
 
-@router.callback_query(F.data == "confirm_exit_admin")
+@callback_index.exact("confirm_exit_admin")
 async def confirm_exit_admin(callback: types.CallbackQuery):
     if not is_admin(callback.from_user.id):
         await callback.answer("❌ Доступ запрещен")
@@ -1623,7 +1721,7 @@ async def confirm_exit_admin(callback: types.CallbackQuery):
     )
     await callback.answer()
 
-@router.callback_query(F.data == "admin_cancel_exit_admin")
+@callback_index.exact("admin_cancel_exit_admin")
 async def admin_cancel_exit(callback: types.CallbackQuery):
     if not is_admin(callback.from_user.id):
         await callback.answer("❌ Доступ запрещен")
@@ -1632,7 +1730,7 @@ async def admin_cancel_exit(callback: types.CallbackQuery):
     await admin_panel(callback.message)
     await callback.answer("✅ Выход отменен")
 
-@router.callback_query(F.data == "admin_main")
+@callback_index.exact("admin_main")
 async def admin_back_to_main(callback: types.CallbackQuery):
     if not is_admin(callback.from_user.id):
         await callback.answer("❌ Доступ запрещен")
@@ -1646,10 +1744,12 @@ async def admin_back_to_main(callback: types.CallbackQuery):
 @router.message(Command("backup_now"), admin_filter)
 async def backup_now_command(message: types.Message):
     """Немедленное создание backup"""
-    await message.answer("🔄 Создаю резервную копию...")
-    
     try:
-        backup_path = db_manager.create_backup()
+        job = await run_backup_job_with_progress(message, "🔄 Создаю резервную копию...")
+        if job.state == "cancelled":
+            return
+        
+        backup_path = job.result_path
         
         if backup_path:
             backup_name = os.path.basename(backup_path)
@@ -1669,6 +1769,151 @@ async def backup_now_command(message: types.Message):
     except Exception as e:
         await message.answer(f"❌ Ошибка: {e}")
 
+@router.message(Command("backup_status"), admin_filter)
+async def backup_status_command(message: types.Message):
+    """Статус фоновых задач бэкапа"""
+    jobs = backup_jobs.list_jobs()[:5]
+    if not jobs:
+        await message.answer("📭 Задач бэкапа еще не было")
+        return
+    
+    icons = {"queued": "⏳", "running": "🔄", "done": "✅", "failed": "❌", "cancelled": "⏹️"}
+    response = "📦 <b>Задачи бэкапа:</b>\n\n"
+    for job in jobs:
+        name = os.path.basename(job.result_path) if job.result_path else (job.backup_name or "авто")
+        response += (
+            f"{icons.get(job.state, '•')} <code>{job.id}</code> {'📤 ' if job.export else ''}{name}\n"
+            f"   {job.state}, {job.progress:.0f}%, {job.created_at.strftime('%H:%M:%S')}\n"
+        )
+        if job.error:
+            response += f"   ⚠️ {job.error[:100]}\n"
+    
+    await message.answer(response, parse_mode="HTML")
+
+@router.message(Command("backup_cancel"), admin_filter)
+async def backup_cancel_command(message: types.Message):
+    """Отменить фоновый бэкап: /backup_cancel [ID задачи]"""
+    args = message.text.split()
+    if len(args) > 1:
+        job_id = args[1]
+    else:
+        active = backup_jobs.get_active()
+        if active is None:
+            await message.answer("ℹ️ Нет активных задач бэкапа")
+            return
+        job_id = active.id
+    
+    if backup_jobs.cancel(job_id):
+        await message.answer(f"⏹️ Отмена бэкапа <code>{job_id}</code> запрошена", parse_mode="HTML")
+    else:
+        await message.answer(f"❌ Задача <code>{job_id}</code> не найдена или уже завершена", parse_mode="HTML")
+
+@router.message(Command("inc_backup"), admin_filter)
+async def inc_backup_command(message: types.Message):
+    """Создать инкрементальный бэкап (сохраняются только изменившиеся чанки БД)"""
+    try:
+        job = await run_backup_job_with_progress(message, "🧩 Инкрементальный бэкап...", incremental=True)
+        if job.state == "cancelled":
+            return
+        
+        if not job.result_path:
+            await message.answer(f"❌ Ошибка инкрементального бэкапа: {job.error or 'неизвестная ошибка'}")
+            return
+        
+        snapshot = db_manager.incremental.load_snapshot(job.result_path)
+        stats = await asyncio.to_thread(db_manager.incremental.get_stats)
+        await message.answer(
+            f"✅ <b>Инкрементальный бэкап создан!</b>\n\n"
+            f"📁 Снимок: <code>{snapshot['name']}</code>\n"
+            f"🧩 Чанков: {len(snapshot['chunks'])}, новых: {snapshot['new_chunks']}\n"
+            f"📝 Записано: {snapshot['new_bytes'] / 1024:.0f} KB из {snapshot['db_size'] / 1024:.0f} KB\n"
+            f"⏱️ Время: {snapshot['duration_sec']:.2f} сек\n\n"
+            f"📦 Хранилище: {stats['snapshots']} снимков, {stats['stored_mb']:.2f} MB "
+            f"(логически {stats['logical_mb']:.2f} MB)",
+            parse_mode="HTML"
+        )
+    except Exception as e:
+        await message.answer(f"❌ Ошибка: {e}")
+
+@router.message(Command("inc_backups"), admin_filter)
+async def inc_backups_command(message: types.Message):
+    """Список инкрементальных снимков"""
+    snapshots = await asyncio.to_thread(db_manager.list_incremental_backups)
+    if not snapshots:
+        await message.answer("📭 Инкрементальных снимков нет. Создайте: /inc_backup")
+        return
+    
+    response = "🧩 <b>Инкрементальные снимки:</b>\n\n"
+    for snapshot in reversed(snapshots[-10:]):
+        created = datetime.fromisoformat(snapshot["created"]).strftime("%d.%m.%Y %H:%M")
+        response += (
+            f"<code>{snapshot['name']}</code>\n"
+            f"   📅 {created} | 📊 {snapshot['db_size'] / (1024 * 1024):.2f} MB | "
+            f"+{snapshot['new_bytes'] / 1024:.0f} KB\n"
+        )
+    
+    stats = await asyncio.to_thread(db_manager.incremental.get_stats)
+    response += (
+        f"\n📦 Всего снимков: {stats['snapshots']}\n"
+        f"💾 На диске: {stats['stored_mb']:.2f} MB (логически {stats['logical_mb']:.2f} MB)\n\n"
+        f"Восстановление: <code>/inc_restore имя</code>"
+    )
+    await message.answer(response, parse_mode="HTML")
+
+@router.message(Command("inc_restore"), admin_filter)
+async def inc_restore_command(message: types.Message):
+    """Восстановить БД из инкрементального снимка: /inc_restore имя"""
+    args = message.text.split()
+    if len(args) < 2:
+        await message.answer("❌ Укажите снимок: <code>/inc_restore имя</code> (список: /inc_backups)", parse_mode="HTML")
+        return
+    
+    name = args[1]
+    status_message = await message.answer(f"🔄 Восстанавливаю БД из снимка <code>{name}</code>...", parse_mode="HTML")
+    
+    success = await asyncio.to_thread(db_manager.restore_from_incremental, name)
+    if not success:
+        await status_message.edit_text("❌ Не удалось восстановить БД из снимка")
+        return
+    
+    db_info = await asyncio.to_thread(db_manager.get_db_quick_info)
+    await status_message.edit_text(
+        f"✅ <b>БД восстановлена из снимка</b> <code>{name}</code>\n"
+        f"📊 Размер: {db_info.get('size_mb', 0):.2f} MB",
+        parse_mode="HTML"
+    )
+
+@router.message(Command("pitr"), admin_filter)
+async def pitr_command(message: types.Message):
+    """Восстановить БД на момент времени: /pitr [ГГГГ-ММ-ДД ЧЧ:ММ] (без даты - на последнюю запись журнала)"""
+    from app.change_journal import parse_point_in_time
+    
+    args = message.text.split(maxsplit=1)
+    until = None
+    if len(args) > 1:
+        until = parse_point_in_time(args[1])
+        if until is None:
+            await message.answer("❌ Формат: <code>/pitr 2024-01-31 18:45</code>", parse_mode="HTML")
+            return
+    
+    stats = db_manager.journal.get_stats()
+    status_message = await message.answer(
+        f"🔄 Восстанавливаю БД {'на ' + args[1] if until else 'на последнюю запись журнала'}...\n"
+        f"📝 Журнал: записей до #{stats['last_seq']}, сегментов {stats['segments']} ({stats['size_mb']} MB)"
+    )
+    
+    success = await asyncio.to_thread(db_manager.restore_point_in_time, until)
+    if not success:
+        await status_message.edit_text("❌ Не удалось восстановить БД (нет бэкапа с позицией журнала?)")
+        return
+    
+    db_info = await asyncio.to_thread(db_manager.get_db_quick_info)
+    await status_message.edit_text(
+        f"✅ <b>БД восстановлена</b> {'на ' + args[1] if until else 'на последнюю запись журнала'}\n"
+        f"📊 Размер: {db_info.get('size_mb', 0):.2f} MB",
+        parse_mode="HTML"
+    )
+
 @router.message(Command("payment_status"), admin_filter)
 async def payment_status_command(message: types.Message):
     """Статус платежной системы"""
@@ -1853,35 +2098,23 @@ async def cleanup_old_data_command(message: Message):
     """Очистка старых данных"""
     await message.answer("🔄 Очищаю старые данные...")
     
+    db = next(get_db())
     try:
-        # Удаляем сообщения старше 6 месяцев
+        # Удаляем сообщения старше 6 месяцев (по id - чтобы удаления попали в журнал изменений)
         six_months_ago = datetime.now() - timedelta(days=180)
-        deleted_messages = safe_execute_scalar(
-            "SELECT COUNT(*) FROM anon_messages WHERE timestamp < :six_months_ago",
-            {"six_months_ago": six_months_ago}
-        )
-        
-        result = safe_execute_query(
-            "DELETE FROM anon_messages WHERE timestamp < :six_months_ago",
-            {"six_months_ago": six_months_ago}
-        )
+        message_ids = [row.id for row in db.query(AnonMessage.id).filter(AnonMessage.timestamp < six_months_ago)]
+        deleted_messages = bulk_delete(db, AnonMessage, message_ids)
         
         # Удаляем неактивные пользователи (без сообщений и без ссылок)
-        deleted_users = safe_execute_scalar("""
-            SELECT COUNT(*) FROM users 
-            WHERE anon_link_uid IS NULL 
-            AND id NOT IN (SELECT DISTINCT sender_id FROM anon_messages WHERE sender_id IS NOT NULL)
-            AND id NOT IN (SELECT DISTINCT receiver_id FROM anon_messages)
-            AND created_at < datetime('now', '-30 days')
-        """)
-        
-        result = safe_execute_query("""
-            DELETE FROM users 
+        user_ids = [row[0] for row in db.execute(text("""
+            SELECT id FROM users 
             WHERE anon_link_uid IS NULL 
             AND id NOT IN (SELECT DISTINCT sender_id FROM anon_messages WHERE sender_id IS NOT NULL)
             AND id NOT IN (SELECT DISTINCT receiver_id FROM anon_messages)
             AND created_at < datetime('now', '-30 days')
-        """)
+        """))]
+        deleted_users = bulk_delete(db, User, user_ids)
+        db.commit()
         
         db_info = db_manager.get_db_info()
         
@@ -1894,7 +2127,10 @@ async def cleanup_old_data_command(message: Message):
         )
         
     except Exception as e:
+        db.rollback()
         await message.answer(f"❌ Ошибка очистки данных: {e}")
+    finally:
+        db.close()
 
 @router.message(Command("upload_db"), admin_filter)
 async def upload_db_command(message: Message):
@@ -1902,7 +2138,8 @@ async def upload_db_command(message: Message):
     await message.answer(
         "📁 <b>Загрузка базы данных</b>\n\n"
         "Для загрузки новой базы данных:\n"
-        "1. Отправьте мне файл <code>.db</code>\n"
+        "1. Отправьте мне файл <code>.db</code> или дамп <code>.sql</code> / <code>.jsonl</code> "
+        "(можно сжатый <code>.gz</code> / <code>.zst</code>)\n"
         "2. Подтвердите восстановление\n"
         "3. Подключение к БД автоматически перезагрузится\n\n"
         "⚠️ <b>Внимание:</b>\n"
@@ -1941,6 +2178,36 @@ async def stats_command(message: Message):
     except Exception as e:
         await message.answer(f"❌ Ошибка получения статистики: {e}")
 
+@router.message(Command("antispam"), admin_filter)
+async def antispam_stats_command(message: Message):
+    """Счетчики антиспама"""
+    from app.rate_limiter import anon_rate_limiter
+
+    args = message.text.split()
+    if len(args) > 1 and args[1] == "reset":
+        anon_rate_limiter.reset()
+        await message.answer("✅ Счетчики антиспама сброшены")
+        return
+
+    stats = anon_rate_limiter.get_stats()
+    lines = [
+        "🛡️ <b>Антиспам</b>\n",
+        f"Статус: <b>{'✅ Включен' if stats['enabled'] else '❌ Выключен'}</b>\n",
+    ]
+    for title, key in (("👤 По отправителю", "sender"), ("👥 По паре отправитель → получатель", "pair")):
+        limiter_stats = stats[key]
+        lines.append(
+            f"\n<b>{title}</b>\n"
+            f"• Лимит: {limiter_stats['rate']} за {limiter_stats['period']:.0f} сек (burst {limiter_stats['burst']})\n"
+            f"• Активных ключей: {limiter_stats['active_keys']} / {limiter_stats['max_keys']}\n"
+            f"• Пропущено: {limiter_stats['allowed']}\n"
+            f"• Заблокировано: <b>{limiter_stats['blocked']}</b>\n"
+            f"• Вытеснено ключей: {limiter_stats['evicted']}\n"
+        )
+    lines.append("\n💡 <code>/antispam reset</code> - сбросить счетчики")
+
+    await message.answer("".join(lines), parse_mode="HTML")
+
 @router.message(Command("check_backups"), admin_filter)
 async def check_backups_command(message: Message):
     """Проверить все бэкапы на наличие данных"""
@@ -1955,27 +2222,10 @@ async def check_backups_command(message: Message):
         
         for backup in backups[-15:]:  # Последние 15 бэкапов
             try:
-                import sqlite3
-                conn = sqlite3.connect(backup["path"])
-                cursor = conn.cursor()
-                
-                # Проверяем таблицы
-                cursor.execute("SELECT name FROM sqlite_master WHERE type='table' ORDER BY name")
-                tables = [row[0] for row in cursor.fetchall()]
-                
-                # Проверяем пользователей
-                user_count = 0
-                if 'users' in tables:
-                    cursor.execute("SELECT COUNT(*) FROM users")
-                    user_count = cursor.fetchone()[0]
-                
-                # Проверяем сообщения
-                msg_count = 0
-                if 'anon_messages' in tables:
-                    cursor.execute("SELECT COUNT(*) FROM anon_messages")
-                    msg_count = cursor.fetchone()[0]
-                
-                conn.close()
+                # Таблицы и число записей берутся из манифеста бэкапов, файлы не открываются
+                tables = backup["tables"]
+                user_count = backup["row_counts"].get("users") or 0
+                msg_count = backup["row_counts"].get("anon_messages") or 0
                 
                 # Проверяем размер
                 backup_size_kb = backup["size"] / 1024
@@ -1990,6 +2240,12 @@ async def check_backups_command(message: Message):
                 
                 created_time = backup["created"].strftime("%d.%m %H:%M")
                 
+                # Результат последней проверки целостности (/check_backup N)
+                if backup.get("verify_ok") is False:
+                    status += " 🔓 ПОВРЕЖДЕН"
+                elif backup.get("verify_ok"):
+                    status += " 🔐"
+                
                 response += (
                     f"📁 <code>{backup['name']}</code>\n"
                     f"   📅 {created_time} | 📊 {backup['size_mb']:.1f} MB\n"
@@ -2024,11 +2280,6 @@ async def check_backups_command(message: Message):
 async def full_backup_command(message: Message):
     """Создать полный бэкап с данными (исправленный метод)"""
     try:
-        await message.answer("💾 <b>Создаю ПОЛНЫЙ бэкап с данными...</b>\n\n"
-                           "⚠️ <b>Внимание:</b> Бот будет приостановлен на время создания бэкапа", 
-                           parse_mode="HTML")
-        
-        import sqlite3
         import datetime
         
         # Создаем уникальное имя
@@ -2037,7 +2288,7 @@ async def full_backup_command(message: Message):
         backup_path = os.path.join('backups', backup_name)
         
         # Показываем информацию о текущей БД
-        current_info = db_manager.get_db_info()
+        current_info = await asyncio.to_thread(db_manager.get_db_info)
         await message.answer(
             f"📊 <b>Информация о текущей БД:</b>\n"
             f"Файл: <code>{os.path.basename(db_manager.db_path)}</code>\n"
@@ -2047,72 +2298,25 @@ async def full_backup_command(message: Message):
             parse_mode="HTML"
         )
         
-        # Используем правильный метод копирования
-        source_conn = None
-        backup_conn = None
-        
-        try:
-            # Подключаемся к исходной БД
-            source_conn = sqlite3.connect(db_manager.db_path)
-            
-            # Создаем новую БД для бэкапа
-            backup_conn = sqlite3.connect(backup_path)
-            
-            # Копируем ВСЮ базу данных (структура + данные)
-            source_conn.backup(backup_conn)
-            
-            logger.info(f"✅ Бэкап создан через backup API: {backup_name}")
-            
-        except Exception as backup_api_error:
-            await message.answer(f"⚠️ Backup API не сработал: {backup_api_error}\n"
-                               "Пробую альтернативный метод...")
-            
-            # Закрываем соединения если открыты
-            if source_conn:
-                source_conn.close()
-            if backup_conn:
-                backup_conn.close()
-            
-            # Метод 2: Используем shutil с задержкой
-            import time
-            time.sleep(2)  # Даем время на закрытие всех соединений
-            
-            import shutil
-            shutil.copy2(db_manager.db_path, backup_path)
-            logger.info(f"✅ Бэкап создан через прямое копирование: {backup_name}")
-        
-        finally:
-            # Закрываем соединения
-            if source_conn:
-                source_conn.close()
-            if backup_conn:
-                backup_conn.close()
+        # Копирование идет в фоновом потоке бэкапов, бот продолжает отвечать
+        job = await run_backup_job_with_progress(
+            message, "💾 <b>Создаю ПОЛНЫЙ бэкап с данными...</b>",
+            backup_name=backup_name, send_to_admins=False
+        )
+        if job.state == "cancelled":
+            return
+        if job.result_path:
+            backup_path = job.result_path
         
         # Проверяем результат
         if os.path.exists(backup_path):
-            backup_size = os.path.getsize(backup_path)
+            backup_size = sum(os.path.getsize(part) for part in backup_parts(backup_path))
             
-            # Подключаемся к бэкапу для проверки
-            check_conn = sqlite3.connect(backup_path)
-            cursor = check_conn.cursor()
-            
-            # Проверяем таблицы
-            cursor.execute("SELECT name FROM sqlite_master WHERE type='table'")
-            tables = [row[0] for row in cursor.fetchall()]
-            
-            # Проверяем пользователей
-            user_count = 0
-            if 'users' in tables:
-                cursor.execute("SELECT COUNT(*) FROM users")
-                user_count = cursor.fetchone()[0]
-            
-            # Проверяем сообщения
-            msg_count = 0
-            if 'anon_messages' in tables:
-                cursor.execute("SELECT COUNT(*) FROM anon_messages")
-                msg_count = cursor.fetchone()[0]
-            
-            check_conn.close()
+            # Таблицы и число записей записаны в манифест при создании бэкапа
+            entry = db_manager.manifest.entry_for(backup_path) or {}
+            tables = entry.get("tables", [])
+            user_count = entry.get("row_counts", {}).get("users") or 0
+            msg_count = entry.get("row_counts", {}).get("anon_messages") or 0
             
             backup_size_kb = backup_size / 1024
             backup_size_mb = backup_size / (1024 * 1024)
@@ -2158,9 +2362,13 @@ async def check_specific_backup_command(message: Message):
     """Проверить конкретный бэкап по номеру"""
     try:
         cmd_parts = message.text.split()
-        if len(cmd_parts) != 2:
-            await message.answer("❌ Использование: /check_backup номер_бэкапа")
+        if len(cmd_parts) not in (2, 3) or (len(cmd_parts) == 3 and cmd_parts[2].lower() != "quick"):
+            await message.answer(
+                "❌ Использование: /check_backup номер_бэкапа [quick]\n"
+                "quick - дополнительно PRAGMA quick_check (читает всю БД)"
+            )
             return
+        run_quick_check = len(cmd_parts) == 3
         
         try:
             backup_index = int(cmd_parts[1])
@@ -2180,28 +2388,14 @@ async def check_specific_backup_command(message: Message):
         selected_backup = backups[backup_index - 1]
         
         try:
-            import sqlite3
-            conn = sqlite3.connect(selected_backup["path"])
-            cursor = conn.cursor()
-            
-            # Получаем все таблицы
-            cursor.execute("SELECT name FROM sqlite_master WHERE type='table' ORDER BY name")
-            tables = [row[0] for row in cursor.fetchall()]
-            
-            # Собираем статистику по всем таблицам
-            table_stats = {}
-            total_records = 0
-            
-            for table in tables:
-                try:
-                    cursor.execute(f"SELECT COUNT(*) FROM {table}")
-                    count = cursor.fetchone()[0]
-                    table_stats[table] = count
-                    total_records += count
-                except:
-                    table_stats[table] = 0
-            
-            conn.close()
+            # Целостность - по SHA-256 и числу страниц из манифеста (чтение файла без запросов
+            # к таблицам), число записей - из манифеста, записанного при создании бэкапа
+            verification = await asyncio.to_thread(
+                db_manager.verify_backup, selected_backup["path"], run_quick_check
+            )
+            tables = selected_backup["tables"]
+            table_stats = {table: count or 0 for table, count in selected_backup["row_counts"].items()}
+            total_records = selected_backup["total_records"]
             
             created_time = selected_backup["created"].strftime("%d.%m.%Y %H:%M:%S")
             modified_time = selected_backup["modified"].strftime("%d.%m.%Y %H:%M:%S")
@@ -2213,10 +2407,18 @@ async def check_specific_backup_command(message: Message):
                 f"📅 Создан: {created_time}\n"
                 f"🔄 Изменен: {modified_time}\n"
                 f"📊 Таблиц: {len(tables)}\n"
-                f"📝 Всего записей: {total_records}\n\n"
-                f"📋 <b>Таблицы и записи:</b>\n"
+                f"📝 Всего записей: {total_records}\n"
             )
             
+            if verification["ok"]:
+                response += (
+                    f"🔐 Целостность: ✅ SHA-256 {'совпадает' if verification['sha256_match'] else 'не записан'}"
+                    f"{', quick_check ok' if run_quick_check else ''} ({verification['seconds']:.2f} сек)\n\n"
+                )
+            else:
+                response += f"🔐 Целостность: ❌ {html.escape(str(verification['error']))}\n\n"
+            response += "📋 <b>Таблицы и записи:</b>\n"
+            
             # Показываем основные таблицы
             main_tables = ['users', 'anon_messages', 'payments']
             for table in main_tables:
@@ -2258,13 +2460,13 @@ async def check_specific_backup_command(message: Message):
                     [
                         InlineKeyboardButton(
                             text="🔄 Восстановить из этого бэкапа", 
-                            callback_data=f"restore_from_check_{backup_index}"
+                            callback_data=RESTORE_FROM_CHECK_CB.pack(backup_index)
                         )
                     ],
                     [
                         InlineKeyboardButton(
                             text="🗑️ Удалить этот бэкап", 
-                            callback_data=f"delete_backup_{backup_index}"
+                            callback_data=DELETE_BACKUP_CB.pack(backup_index)
                         )
                     ]
                 ]
@@ -2279,11 +2481,11 @@ async def check_specific_backup_command(message: Message):
         logger.error(f"❌ Ошибка команды check_backup: {e}")
         await message.answer(f"❌ Ошибка: {str(e)[:200]}")
 
-@router.callback_query(F.data.startswith("restore_from_check_"))
-async def restore_from_check_callback(callback: CallbackQuery):
+@callback_index.factory(RESTORE_FROM_CHECK_CB)
+async def restore_from_check_callback(callback: CallbackQuery, callback_data):
     """Восстановить из бэкапа проверенного командой /check_backup"""
     try:
-        backup_index = int(callback.data.replace("restore_from_check_", ""))
+        backup_index = callback_data.backup_index
         
         backups = db_manager.list_backups()
         if not 1 <= backup_index <= len(backups):
@@ -2298,7 +2500,7 @@ async def restore_from_check_callback(callback: CallbackQuery):
         
         # Создаем бэкап текущей БД
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        current_backup = db_manager.create_backup(f"before_restore_{timestamp}.db", send_to_admins=False)
+        current_backup = await db_manager.async_create_backup(f"before_restore_{timestamp}.db", send_to_admins=False)
         
         if current_backup:
             await callback.message.answer(f"💾 <b>Текущая БД сохранена:</b>\n"
@@ -2306,16 +2508,10 @@ async def restore_from_check_callback(callback: CallbackQuery):
                                         parse_mode="HTML")
         
         # Восстанавливаем
-        success = db_manager.restore_from_backup(selected_backup["path"])
+        success = await db_manager.async_restore_from_backup(selected_backup["path"])
         
         if success:
-            await callback.message.answer("✅ <b>БД восстановлена!</b>\n"
-                                        "🔄 Перезагружаю подключение...", 
-                                        parse_mode="HTML")
-            
-            # Перезагружаем подключение
-            force_reconnect()
-            await asyncio.sleep(2)
+            await callback.message.answer("✅ <b>БД восстановлена!</b>", parse_mode="HTML")
             
             # Проверяем результат
             db_info = db_manager.get_db_info()
@@ -2344,11 +2540,11 @@ async def restore_from_check_callback(callback: CallbackQuery):
         await callback.message.answer(f"❌ Ошибка: {str(e)[:200]}")
         await callback.answer()
 
-@router.callback_query(F.data.startswith("delete_backup_"))
-async def delete_backup_callback(callback: CallbackQuery):
+@callback_index.factory(DELETE_BACKUP_CB)
+async def delete_backup_callback(callback: CallbackQuery, callback_data):
     """Удалить бэкап"""
     try:
-        backup_index = int(callback.data.replace("delete_backup_", ""))
+        backup_index = callback_data.backup_index
         
         backups = db_manager.list_backups()
         if not 1 <= backup_index <= len(backups):
@@ -2365,7 +2561,7 @@ async def delete_backup_callback(callback: CallbackQuery):
                 [
                     InlineKeyboardButton(
                         text="✅ Да, удалить", 
-                        callback_data=f"confirm_delete_{backup_index}"
+                        callback_data=CONFIRM_DELETE_CB.pack(backup_index)
                     ),
                     InlineKeyboardButton(
                         text="❌ Отмена", 
@@ -2391,11 +2587,11 @@ async def delete_backup_callback(callback: CallbackQuery):
         logger.error(f"❌ Ошибка удаления бэкапа: {e}")
         await callback.answer("❌ Ошибка")
 
-@router.callback_query(F.data.startswith("confirm_delete_"))
-async def confirm_delete_backup_callback(callback: CallbackQuery):
+@callback_index.factory(CONFIRM_DELETE_CB)
+async def confirm_delete_backup_callback(callback: CallbackQuery, callback_data):
     """Подтверждение удаления бэкапа"""
     try:
-        backup_index = int(callback.data.replace("confirm_delete_", ""))
+        backup_index = callback_data.backup_index
         
         backups = db_manager.list_backups()
         if not 1 <= backup_index <= len(backups):
@@ -2426,7 +2622,7 @@ async def confirm_delete_backup_callback(callback: CallbackQuery):
         logger.error(f"❌ Ошибка подтверждения удаления бэкапа: {e}")
         await callback.answer("❌ Ошибка")
 
-@router.callback_query(F.data == "cancel_delete")
+@callback_index.exact("cancel_delete")
 async def cancel_delete_backup_callback(callback: CallbackQuery):
     """Отмена удаления бэкапа"""
     await callback.message.answer("❌ Удаление отменено")
@@ -2438,75 +2634,51 @@ async def fix_backups_command(message: Message):
     try:
         await message.answer("🔧 <b>Начинаю исправление бэкапов...</b>", parse_mode="HTML")
         
-        # Сначала создаем правильный полный бэкап
-        await message.answer("💾 <b>Создаю правильный полный бэкап...</b>", parse_mode="HTML")
-        
-        import sqlite3
-        import datetime
-        import shutil
-        
-        timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
+        # Сначала создаем правильный полный бэкап (в фоновом потоке бэкапов)
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
         fixed_backup_name = f"FIXED_backup_{timestamp}.db"
-        fixed_backup_path = os.path.join('backups', fixed_backup_name)
         
-        # Метод 1: Используем sqlite3 backup API
-        try:
-            source_conn = sqlite3.connect(db_manager.db_path)
-            backup_conn = sqlite3.connect(fixed_backup_path)
-            source_conn.backup(backup_conn)
-            source_conn.close()
-            backup_conn.close()
-            method = "backup API"
-        except Exception as e:
-            # Метод 2: Используем прямое копирование с задержкой
-            await message.answer(f"⚠️ Backup API не сработал, пробую прямое копирование...")
-            time.sleep(3)  # Большая задержка
-            shutil.copy2(db_manager.db_path, fixed_backup_path)
-            method = "прямое копирование"
+        job = await run_backup_job_with_progress(
+            message, "💾 <b>Создаю правильный полный бэкап...</b>",
+            backup_name=fixed_backup_name, send_to_admins=False
+        )
+        if job.state == "cancelled":
+            return
+        fixed_backup_path = job.result_path
         
         # Проверяем созданный бэкап
-        if os.path.exists(fixed_backup_path):
-            # Проверяем данные в бэкапе
-            check_conn = sqlite3.connect(fixed_backup_path)
-            cursor = check_conn.cursor()
-            
-            cursor.execute("SELECT COUNT(*) FROM users")
-            user_count = cursor.fetchone()[0]
-            
-            cursor.execute("SELECT COUNT(*) FROM anon_messages")
-            msg_count = cursor.fetchone()[0]
+        if fixed_backup_path and os.path.exists(fixed_backup_path):
+            def count_backup_rows():
+                """Данные в новом бэкапе и количество пустых старых (вне цикла событий)"""
+                check_conn = connect_backup(fixed_backup_path)
+                cursor = check_conn.cursor()
+                cursor.execute("SELECT COUNT(*) FROM users")
+                users = cursor.fetchone()[0]
+                cursor.execute("SELECT COUNT(*) FROM anon_messages")
+                messages = cursor.fetchone()[0]
+                check_conn.close()
+                
+                empty = 0
+                for backup in db_manager.list_backups():
+                    # Число записей из манифеста бэкапов, без открытия файлов
+                    old_user_count = backup["row_counts"].get("users") or 0
+                    if old_user_count == 0 and backup["size"] < 10240:  # Меньше 10KB
+                        empty += 1
+                return users, messages, empty
             
-            check_conn.close()
+            user_count, msg_count, empty_count = await asyncio.to_thread(count_backup_rows)
             
             backup_size = os.path.getsize(fixed_backup_path) / (1024 * 1024)
             
             await message.answer(
                 f"✅ <b>Исправленный бэкап создан!</b>\n\n"
                 f"📁 Файл: <code>{fixed_backup_name}</code>\n"
-                f"🔧 Метод: {method}\n"
                 f"👥 Пользователей: <b>{user_count}</b>\n"
                 f"✉️ Сообщений: <b>{msg_count}</b>\n"
                 f"📦 Размер: <b>{backup_size:.1f} MB</b>\n\n",
                 parse_mode="HTML"
             )
             
-            # Проверяем старые бэкапы
-            backups = db_manager.list_backups()
-            empty_count = 0
-            
-            for backup in backups:
-                try:
-                    conn = sqlite3.connect(backup["path"])
-                    cursor = conn.cursor()
-                    cursor.execute("SELECT COUNT(*) FROM users")
-                    old_user_count = cursor.fetchone()[0]
-                    conn.close()
-                    
-                    if old_user_count == 0 and backup["size"] < 10240:  # Меньше 10KB
-                        empty_count += 1
-                except:
-                    pass
-            
             if empty_count > 0:
                 await message.answer(
                     f"⚠️ <b>Обнаружено {empty_count} пустых бэкапов!</b>\n\n"
@@ -2657,25 +2829,24 @@ async def emergency_fix_db_command(message: Message):
         
         conn.close()
         
-        # Добавляем администратора
+        # Перезагружаем подключение к БД
+        force_reconnect()
+        
+        # Добавляем администратора (через сессию ORM - запись попадает в журнал изменений)
         if ADMIN_IDS:
             admin_id = ADMIN_IDS[0]
+            db = next(get_db())
             try:
-                conn = sqlite3.connect(db_path)
-                cursor = conn.cursor()
-                cursor.execute('''
-                INSERT OR IGNORE INTO users (telegram_id, first_name, username, anon_link_uid)
-                VALUES (?, ?, ?, ?)
-                ''', (admin_id, 'Администратор', 'admin', f'admin_{admin_id}'))
-                conn.commit()
-                conn.close()
+                if db.query(User.id).filter(User.telegram_id == admin_id).first() is None:
+                    db.add(User(telegram_id=admin_id, first_name='Администратор', username='admin',
+                                anon_link_uid=f'admin_{admin_id}'))
+                    db.commit()
                 await message.answer(f"✅ Администратор добавлен (ID: {admin_id})")
             except Exception as e:
+                db.rollback()
                 await message.answer(f"⚠️ Не удалось добавить администратора: {e}")
-        
-        # Перезагружаем подключение к БД
-        force_reconnect()
-        await asyncio.sleep(2)
+            finally:
+                db.close()
         
         # Получаем финальную статистику
         engine = get_engine()
@@ -2791,7 +2962,6 @@ async def force_backup_command(message: Message):
         
         # Закрываем все соединения
         force_reconnect()
-        await asyncio.sleep(3)  # Даем время на закрытие
         
         import sqlite3
         import datetime
@@ -2810,8 +2980,8 @@ async def force_backup_command(message: Message):
         
         await message.answer("💾 <b>Копирую файл БД...</b>", parse_mode="HTML")
         
-        # Простое копирование файла (самый надежный метод)
-        shutil.copy2(db_path, backup_path)
+        # Простое копирование файла (самый надежный метод), вне цикла событий
+        await asyncio.to_thread(shutil.copy2, db_path, backup_path)
         
         # Проверяем бэкап
         if os.path.exists(backup_path):
@@ -2887,11 +3057,19 @@ async def help_admin_command(message: Message):
 <b>Основные команды:</b>
 <code>/admin</code> - Открыть админ-панель
 <code>/stats</code> - Быстрая статистика
+<code>/antispam</code> - Счетчики антиспама
 <code>/user_info ID</code> - Информация о пользователе
 <code>/set_reveals ID количество</code> - Установить раскрытия
 
 <b>Управление БД:</b>
 <code>/backup_now</code> - Создать бэкап сейчас
+<code>/backup_status</code> - Статус фоновых бэкапов
+<code>/backup_cancel [ID]</code> - Отменить фоновый бэкап
+<code>/inc_backup</code> - Инкрементальный бэкап
+<code>/inc_backups</code> - Список инкрементальных снимков
+<code>/inc_restore имя</code> - Восстановить из снимка
+<code>/pitr [дата время]</code> - Восстановить на момент времени (бэкап + журнал)
+<code>/export [sql|csv|jsonl] [сжатие]</code> - Потоковый экспорт БД
 <code>/backups</code> - Список бэкапов
 <code>/restore</code> - Восстановить БД
 <code>/reload_db</code> - Перезагрузить подключение к БД
@@ -2903,7 +3081,7 @@ async def help_admin_command(message: Message):
 <code>/full_backup</code> - Полный бэкап с данными
 <code>/force_backup</code> - Принудительный бэкап
 <code>/check_backups</code> - Проверить все бэкапы
-<code>/check_backup номер</code> - Проверить конкретный бэкап
+<code>/check_backup номер [quick]</code> - Проверить конкретный бэкап (SHA-256, quick - PRAGMA quick_check)
 <code>/fix_backups</code> - Исправить бэкапы
 
 <b>Очистка и обслуживание:</b>
@@ -1,4 +1,5 @@
 import uuid
+import logging
 from aiogram import F, Router, Bot
 from aiogram.types import Message, CallbackQuery
 from aiogram.fsm.context import FSMContext
@@ -11,8 +12,12 @@ from app.keyboards import main_menu, message_actions_keyboard, recreate_link_key
 from app.config import ADMIN_IDS
 from app.payment_service import payment_service
 from app.anon_service import anon_service
+from app.rate_limiter import AntiSpamMiddleware, anon_rate_limiter
+from app.callback_router import callback_index, SEND_ANOTHER_CB, REPLY_CB, REVEAL_CB, REPORT_CB
 
+logger = logging.getLogger(__name__)
 router = Router()
+router.message.middleware(AntiSpamMiddleware(anon_rate_limiter))
 
 class AnonStates(StatesGroup):
     waiting_for_message = State()
@@ -23,7 +28,7 @@ async def delete_previous_messages(callback: CallbackQuery):
     try:
         await callback.message.delete()
     except Exception as e:
-        print(f"⚠️ Не удалось удалить сообщение: {e}")
+        logger.warning(f"⚠️ Не удалось удалить сообщение: {e}")
         pass
 
 @router.message(F.text == "/start")
@@ -115,7 +120,7 @@ async def handle_anon_link(message: Message, state: FSMContext):
     finally:
         db.close()
 
-@router.message(AnonStates.waiting_for_message)
+@router.message(AnonStates.waiting_for_message, flags={"anon_send": "target_user_id"})
 async def send_anon_message(message: Message, state: FSMContext):
     if not message.text or message.text.strip() == "":
         await message.answer("❌ Сообщение не может быть пустым. Введите текст сообщения:")
@@ -167,10 +172,10 @@ async def send_anon_message(message: Message, state: FSMContext):
     finally:
         db.close()
 
-@router.callback_query(F.data.startswith("send_another_"))
-async def send_another_message(callback: CallbackQuery, state: FSMContext):
+@callback_index.factory(SEND_ANOTHER_CB)
+async def send_another_message(callback: CallbackQuery, state: FSMContext, callback_data):
     """Обработчик кнопки 'Написать еще сообщение'"""
-    target_link_uid = callback.data.replace("send_another_", "")
+    target_link_uid = callback_data.link_uid
     
     db = next(get_db())
     try:
@@ -194,9 +199,9 @@ async def send_another_message(callback: CallbackQuery, state: FSMContext):
     finally:
         db.close()
 
-@router.callback_query(F.data.startswith("reply_"))
-async def start_reply(callback: CallbackQuery, state: FSMContext):
-    message_id = int(callback.data.split("_")[1])
+@callback_index.factory(REPLY_CB)
+async def start_reply(callback: CallbackQuery, state: FSMContext, callback_data):
+    message_id = callback_data.message_id
 
     db = next(get_db())
     try:
@@ -235,7 +240,7 @@ async def start_reply(callback: CallbackQuery, state: FSMContext):
     finally:
         db.close()
 
-@router.message(AnonStates.waiting_for_reply)
+@router.message(AnonStates.waiting_for_reply, flags={"anon_send": "reply_receiver_id"})
 async def send_reply_message(message: Message, state: FSMContext):
     if not message.text or message.text.strip() == "":
         await message.answer("❌ Ответ не может быть пустым. Введите текст ответа:")
@@ -294,9 +299,9 @@ async def send_reply_message(message: Message, state: FSMContext):
     finally:
         db.close()
 
-@router.callback_query(F.data.startswith("reveal_"))
-async def reveal_sender(callback: CallbackQuery):
-    message_id = int(callback.data.split("_")[1])
+@callback_index.factory(REVEAL_CB)
+async def reveal_sender(callback: CallbackQuery, callback_data):
+    message_id = callback_data.message_id
 
     db = next(get_db())
     try:
@@ -340,9 +345,9 @@ async def reveal_sender(callback: CallbackQuery):
     finally:
         db.close()
 
-@router.callback_query(F.data.startswith("report_"))
-async def report_message(callback: CallbackQuery):
-    message_id = int(callback.data.split("_")[1])
+@callback_index.factory(REPORT_CB)
+async def report_message(callback: CallbackQuery, callback_data):
+    message_id = callback_data.message_id
 
     db = next(get_db())
     try:
@@ -394,7 +399,7 @@ async def recreate_link(message: Message):
     finally:
         db.close()
 
-@router.callback_query(F.data == "recreate_link_confirm")
+@callback_index.exact("recreate_link_confirm")
 async def confirm_recreate_link(callback: CallbackQuery):
     await delete_previous_messages(callback)
     
@@ -422,7 +427,7 @@ async def confirm_recreate_link(callback: CallbackQuery):
     finally:
         db.close()
 
-@router.callback_query(F.data == "recreate_link_cancel")
+@callback_index.exact("recreate_link_cancel")
 async def cancel_recreate_link(callback: CallbackQuery):
     await delete_previous_messages(callback)
     
@@ -462,14 +467,14 @@ async def show_my_profile(message: Message):
     finally:
         db.close()
 
-@router.callback_query(F.data == "premium_menu")
+@callback_index.exact("premium_menu")
 async def premium_menu_callback(callback: CallbackQuery):
     """Обработчик кнопки премиум меню из профиля"""
     from app.handlers.payment_handlers import show_premium_menu
     await show_premium_menu(callback.message)
     await callback.answer()
 
-@router.callback_query(F.data == "my_link")
+@callback_index.exact("my_link")
 async def my_link_callback(callback: CallbackQuery):
     """Обработчик кнопки 'Моя ссылка' из профиля"""
     db = next(get_db())
@@ -495,9 +500,3 @@ async def my_link_callback(callback: CallbackQuery):
         await callback.answer()
     finally:
         db.close()
-
-@router.callback_query(F.data == "back_to_main")
-async def back_to_main_callback(callback: CallbackQuery):
-    """Обработчик кнопки 'Назад' в главное меню"""
-    await callback.message.answer("Главное меню:", reply_markup=main_menu())
-    await callback.answer()
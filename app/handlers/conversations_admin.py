@@ -13,13 +13,13 @@ from aiogram.filters import Command
 from aiogram.fsm.context import FSMContext
 from aiogram.fsm.state import State, StatesGroup
 
-from app.database import get_engine
+from app.database import get_db, get_engine
 from app.database_utils import (
     safe_execute_query_fetchall, 
     safe_execute_query_fetchone, 
-    safe_execute_scalar,
-    safe_execute_query
+    safe_execute_scalar
 )
+from app.models import AnonMessage
 from app.config import ADMIN_IDS
 from app.keyboards_admin import (
     admin_conversations_menu, 
@@ -28,6 +28,12 @@ from app.keyboards_admin import (
     admin_main_menu
 )
 from app.keyboards import main_menu
+from app.callback_router import (
+    callback_index,
+    ADMIN_VIEW_CONVERSATIONS_CB,
+    ADMIN_VIEW_CONVERSATION_CB,
+    ADMIN_SEND_ANONYMOUS_TO_CB
+)
 
 logger = logging.getLogger(__name__)
 
@@ -51,6 +57,20 @@ def admin_filter(message: types.Message) -> bool:
     """Фильтр для админских команд"""
     return message.from_user.id in ADMIN_IDS
 
+def save_admin_message(sender_id: Optional[int], receiver_id: int, message_text: str) -> bool:
+    """Сохранить сообщение от админа через сессию ORM (попадает в журнал изменений)"""
+    db = next(get_db())
+    try:
+        db.add(AnonMessage(sender_id=sender_id, receiver_id=receiver_id, text=message_text, is_revealed=False))
+        db.commit()
+        return True
+    except Exception as e:
+        db.rollback()
+        logger.error(f"❌ Ошибка сохранения сообщения: {e}")
+        return False
+    finally:
+        db.close()
+
 # ==================== МЕНЮ ПЕРЕПИСОК ====================
 
 @router.message(F.text == "💬 Переписки")
@@ -132,7 +152,7 @@ async def admin_conversations(message: types.Message):
         logger.error(f"Ошибка в admin_conversations: {e}", exc_info=True)
         await message.answer(f"❌ Ошибка получения статистики: {str(e)[:200]}")
 
-@router.callback_query(F.data == "admin_conversations")
+@callback_index.exact("admin_conversations")
 async def admin_conversations_callback(callback: types.CallbackQuery):
     """Callback для меню переписок"""
     if not is_admin(callback.from_user.id):
@@ -176,7 +196,7 @@ async def admin_conversations_callback(callback: types.CallbackQuery):
 
 # ==================== СПИСОК ПОЛЬЗОВАТЕЛЕЙ С ПЕРЕПИСКАМИ ====================
 
-@router.callback_query(F.data == "admin_conversations_list")
+@callback_index.exact("admin_conversations_list")
 async def admin_conversations_list(callback: types.CallbackQuery):
     """Список пользователей с переписками (ИСПРАВЛЕННЫЙ ЗАПРОС)"""
     if not is_admin(callback.from_user.id):
@@ -300,7 +320,7 @@ async def admin_conversations_list(callback: types.CallbackQuery):
 
 # ==================== ПОИСК ПОЛЬЗОВАТЕЛЯ ДЛЯ ПРОСМОТРА ПЕРЕПИСОК ====================
 
-@router.callback_query(F.data == "admin_conversations_search")
+@callback_index.exact("admin_conversations_search")
 async def admin_conversations_search_start(callback: types.CallbackQuery, state: FSMContext):
     """Начать поиск пользователя для просмотра переписок"""
     if not is_admin(callback.from_user.id):
@@ -612,16 +632,15 @@ async def show_user_conversations(message: types.Message, user_id: int):
         logger.error(f"Ошибка в show_user_conversations: {e}", exc_info=True)
         await message.answer(f"❌ Ошибка загрузки переписок: {str(e)[:200]}")
 
-@router.callback_query(F.data.startswith("admin_view_conversations_"))
-async def admin_view_conversations_callback(callback: types.CallbackQuery):
+@callback_index.factory(ADMIN_VIEW_CONVERSATIONS_CB)
+async def admin_view_conversations_callback(callback: types.CallbackQuery, callback_data):
     """Callback для просмотра переписок пользователя"""
     if not is_admin(callback.from_user.id):
         await callback.answer("❌ Доступ запрещен")
         return
 
     try:
-        user_id = int(callback.data.replace("admin_view_conversations_", ""))
-        await show_user_conversations(callback.message, user_id)
+        await show_user_conversations(callback.message, callback_data.user_id)
         await callback.answer()
         
     except Exception as e:
@@ -630,24 +649,83 @@ async def admin_view_conversations_callback(callback: types.CallbackQuery):
 
 # ==================== ПРОСМОТР КОНКРЕТНОЙ ПЕРЕПИСКИ ====================
 
-@router.callback_query(F.data.startswith("admin_view_conversation_"))
-async def admin_view_conversation_detail(callback: types.CallbackQuery):
+# Переписки для экспорта: отправитель и получатель с telegram_id и именами
+CONVERSATIONS_EXPORT_QUERY = """
+    SELECT
+        am.id,
+        am.timestamp,
+        s.telegram_id AS sender_telegram_id,
+        s.first_name AS sender_name,
+        r.telegram_id AS receiver_telegram_id,
+        r.first_name AS receiver_name,
+        am.text,
+        am.is_anonymous,
+        am.is_revealed,
+        am.reply_to_message_id
+    FROM anon_messages am
+    LEFT JOIN users s ON s.id = am.sender_id
+    LEFT JOIN users r ON r.id = am.receiver_id
+"""
+
+@callback_index.exact("admin_export_conversations")
+async def admin_export_conversations(callback: types.CallbackQuery):
+    """Экспорт всех переписок в CSV (потоково, в очереди фоновых задач)"""
+    if not is_admin(callback.from_user.id):
+        await callback.answer("❌ Доступ запрещен")
+        return
+    
+    from app.handlers.admin_panel import run_export_job_with_progress
+    
+    await callback.answer()
+    try:
+        await run_export_job_with_progress(
+            callback.message, "💾 Экспорт переписок...", "💬 Все переписки (CSV)",
+            fmt="csv", compression="none", name="conversations",
+            query=CONVERSATIONS_EXPORT_QUERY + " ORDER BY am.id"
+        )
+    except Exception as e:
+        logger.error(f"Ошибка экспорта переписок: {e}", exc_info=True)
+        await callback.message.answer(f"❌ Ошибка экспорта: {str(e)[:200]}")
+
+@callback_index.prefix("admin_export_conversation_")
+async def admin_export_conversation(callback: types.CallbackQuery):
+    """Экспорт переписки двух пользователей в CSV"""
+    if not is_admin(callback.from_user.id):
+        await callback.answer("❌ Доступ запрещен")
+        return
+    
+    try:
+        user1_id, user2_id = map(int, callback.data[len("admin_export_conversation_"):].split("_"))
+    except ValueError:
+        await callback.answer("❌ Неверные данные")
+        return
+    
+    from app.handlers.admin_panel import run_export_job_with_progress
+    
+    await callback.answer()
+    try:
+        await run_export_job_with_progress(
+            callback.message, "📥 Экспорт переписки...", f"💬 Переписка {user1_id} ↔ {user2_id} (CSV)",
+            fmt="csv", compression="none", name=f"conversation_{user1_id}_{user2_id}",
+            query=CONVERSATIONS_EXPORT_QUERY + """
+                WHERE (am.sender_id = ? AND am.receiver_id = ?) OR (am.sender_id = ? AND am.receiver_id = ?)
+                ORDER BY am.id
+            """,
+            params=(user1_id, user2_id, user2_id, user1_id)
+        )
+    except Exception as e:
+        logger.error(f"Ошибка экспорта переписки: {e}", exc_info=True)
+        await callback.message.answer(f"❌ Ошибка экспорта: {str(e)[:200]}")
+
+@callback_index.factory(ADMIN_VIEW_CONVERSATION_CB)
+async def admin_view_conversation_detail(callback: types.CallbackQuery, callback_data):
     """Просмотр конкретной переписки между двумя пользователями"""
     if not is_admin(callback.from_user.id):
         await callback.answer("❌ Доступ запрещен")
         return
 
     try:
-        # Формат: admin_view_conversation_{user1_id}_{user2_id}
-        data_parts = callback.data.split("_")
-        if len(data_parts) != 5:
-            await callback.answer("❌ Неверный формат запроса")
-            return
-        
-        user1_id = int(data_parts[3])
-        user2_id = int(data_parts[4])
-        
-        await show_conversation_detail(callback.message, user1_id, user2_id)
+        await show_conversation_detail(callback.message, callback_data.user1_id, callback_data.user2_id)
         await callback.answer()
         
     except Exception as e:
@@ -799,11 +877,11 @@ async def show_conversation_detail(message: types.Message, user1_id: int, user2_
         
         keyboard = InlineKeyboardMarkup(inline_keyboard=[
             [
-                InlineKeyboardButton(text="🕵️‍♂️ Отпр. анонимно", callback_data=f"admin_send_anonymous_to_{user1_db_id}_{user2_db_id}"),
+                InlineKeyboardButton(text="🕵️‍♂️ Отпр. анонимно", callback_data=ADMIN_SEND_ANONYMOUS_TO_CB.pack(user1_db_id, user2_db_id)),
                 InlineKeyboardButton(text="🔍 Поиск", callback_data=f"admin_search_in_{user1_db_id}_{user2_db_id}")
             ],
             [
-                InlineKeyboardButton(text="◀️ Назад", callback_data=f"admin_view_conversations_{user1_db_id}")
+                InlineKeyboardButton(text="◀️ Назад", callback_data=ADMIN_VIEW_CONVERSATIONS_CB.pack(user1_db_id))
             ]
         ])
         
@@ -831,7 +909,7 @@ async def show_conversation_detail(message: types.Message, user1_id: int, user2_
 
 # ==================== ПОИСК ПО СОДЕРЖАНИЮ СООБЩЕНИЙ (ИСПРАВЛЕННЫЙ) ====================
 
-@router.callback_query(F.data == "admin_search_messages")
+@callback_index.exact("admin_search_messages")
 async def admin_search_messages_start(callback: types.CallbackQuery, state: FSMContext):
     """Поиск по содержанию сообщений (ИСПРАВЛЕННЫЙ)"""
     if not is_admin(callback.from_user.id):
@@ -961,7 +1039,7 @@ async def admin_search_messages_result(message: types.Message, state: FSMContext
 
 # ==================== НОВАЯ ФУНКЦИЯ: ОТПРАВКА АНОНИМНЫХ СООБЩЕНИЙ ====================
 
-@router.callback_query(F.data == "admin_send_anonymous")
+@callback_index.exact("admin_send_anonymous")
 async def admin_send_anonymous_start(callback: types.CallbackQuery, state: FSMContext):
     """Начать отправку анонимного сообщения от имени админа"""
     if not is_admin(callback.from_user.id):
@@ -979,22 +1057,16 @@ async def admin_send_anonymous_start(callback: types.CallbackQuery, state: FSMCo
     await state.set_state(ConversationStates.waiting_send_anonymous)
     await callback.answer()
 
-@router.callback_query(F.data.startswith("admin_send_anonymous_to_"))
-async def admin_send_anonymous_to_conversation(callback: types.CallbackQuery, state: FSMContext):
+@callback_index.factory(ADMIN_SEND_ANONYMOUS_TO_CB)
+async def admin_send_anonymous_to_conversation(callback: types.CallbackQuery, state: FSMContext, callback_data):
     """Отправить анонимное сообщение в существующую переписку"""
     if not is_admin(callback.from_user.id):
         await callback.answer("❌ Доступ запрещен")
         return
 
     try:
-        # Формат: admin_send_anonymous_to_{user1_id}_{user2_id}
-        data_parts = callback.data.split("_")
-        if len(data_parts) != 7:
-            await callback.answer("❌ Неверный формат запроса")
-            return
-        
-        user1_id = int(data_parts[4])
-        user2_id = int(data_parts[5])
+        user1_id = callback_data.user1_id
+        user2_id = callback_data.user2_id
         
         await state.update_data(user1_id=user1_id, user2_id=user2_id, mode="existing")
         
@@ -1173,13 +1245,7 @@ async def admin_send_anonymous_final(message: types.Message, state: FSMContext,
             receiver_name = data.get("receiver_name")
             
             # Вставляем сообщение в БД (sender_id = NULL для анонимности)
-            result = safe_execute_query(
-                """
-                INSERT INTO anon_messages (sender_id, receiver_id, text, timestamp, is_revealed)
-                VALUES (NULL, :receiver_id, :message_text, datetime('now'), 0)
-                """,  # ИСПРАВЛЕНО: text вместо message_text
-                {"receiver_id": receiver_id, "message_text": message_text}
-            )
+            result = save_admin_message(None, receiver_id, message_text)
             
             if result:
                 # Отправляем уведомление получателю
@@ -1218,13 +1284,7 @@ async def admin_send_anonymous_final(message: types.Message, state: FSMContext,
             receiver_name = data.get("receiver_name")
             
             # Вставляем сообщение в БД
-            result = safe_execute_query(
-                """
-                INSERT INTO anon_messages (sender_id, receiver_id, text, timestamp, is_revealed)
-                VALUES (:sender_id, :receiver_id, :message_text, datetime('now'), 0)
-                """,  
-                {"sender_id": sender_id, "receiver_id": receiver_id, "message_text": message_text}
-            )
+            result = save_admin_message(sender_id, receiver_id, message_text)
             
             if result:
                 # Отправляем уведомление получателю
@@ -1285,13 +1345,7 @@ async def admin_send_anonymous_final(message: types.Message, state: FSMContext,
             receiver_info = user2 if receiver_id == user2_id else user1
             
             # Вставляем сообщение в БД
-            result = safe_execute_query(
-                """
-                INSERT INTO anon_messages (sender_id, receiver_id, text, timestamp, is_revealed)
-                VALUES (:sender_id, :receiver_id, :message_text, datetime('now'), 0)
-                """,  
-                {"sender_id": sender_id, "receiver_id": receiver_id, "message_text": message_text}
-            )
+            result = save_admin_message(sender_id, receiver_id, message_text)
             
             if result:
                 # Отправляем уведомление получателю
@@ -1569,7 +1623,7 @@ async def check_messages_command(message: types.Message):
 
 # ==================== ВСПОМОГАТЕЛЬНЫЕ ФУНКЦИИ ====================
 
-@router.callback_query(F.data == "back_to_conversations")
+@callback_index.exact("back_to_conversations")
 async def back_to_conversations(callback: types.CallbackQuery):
     """Вернуться к меню переписок"""
     if not is_admin(callback.from_user.id):
@@ -1579,7 +1633,7 @@ async def back_to_conversations(callback: types.CallbackQuery):
     await admin_conversations(callback.message)
     await callback.answer()
 
-@router.callback_query(F.data == "back_to_admin")
+@callback_index.exact("back_to_admin")
 async def back_to_admin(callback: types.CallbackQuery):
     """Вернуться к админ-панели"""
     if not is_admin(callback.from_user.id):
@@ -1,7 +1,9 @@
+import logging
 from aiogram import F, Router, types
 from aiogram.filters import Command
 from app.keyboards import main_menu
 
+logger = logging.getLogger(__name__)
 router = Router()
 
 @router.message(Command("help"))
@@ -37,5 +39,5 @@ async def back_to_main(message: types.Message):
     try:
         await message.answer("Главное меню:", reply_markup=main_menu())
     except Exception as e:
-        print(f"❌ Ошибка возврата в меню: {e}")
+        logger.error(f"❌ Ошибка возврата в меню: {e}")
         await message.answer("❌ Произошла ошибка")
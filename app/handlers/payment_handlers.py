@@ -8,6 +8,7 @@ from app.models import User, AnonMessage
 from app.keyboards import premium_menu, main_menu
 from app.payment_service import payment_service
 from app.config import ADMIN_IDS
+from app.callback_router import callback_index
 
 router = Router()
 
@@ -49,7 +50,7 @@ async def premium_menu_handler(message: types.Message):
     await show_premium_menu(message)
 
 # Обработчики кнопок покупки - ВРЕМЕННО ОТКЛЮЧЕНЫ
-@router.callback_query(F.data == "buy_reveal_1")
+@callback_index.exact("buy_reveal_1")
 async def buy_reveal_1_handler(callback: types.CallbackQuery):
     await callback.message.edit_text(
         "⚠️ <b>Платежная система временно недоступна</b>\n\n"
@@ -63,7 +64,7 @@ async def buy_reveal_1_handler(callback: types.CallbackQuery):
     )
     await callback.answer()
 
-@router.callback_query(F.data == "buy_reveal_10")
+@callback_index.exact("buy_reveal_10")
 async def buy_reveal_10_handler(callback: types.CallbackQuery):
     await callback.message.edit_text(
         "⚠️ <b>Платежная система временно недоступна</b>\n\n"
@@ -77,7 +78,7 @@ async def buy_reveal_10_handler(callback: types.CallbackQuery):
     )
     await callback.answer()
 
-@router.callback_query(F.data == "buy_reveal_30")
+@callback_index.exact("buy_reveal_30")
 async def buy_reveal_30_handler(callback: types.CallbackQuery):
     await callback.message.edit_text(
         "⚠️ <b>Платежная система временно недоступна</b>\n\n"
@@ -91,7 +92,7 @@ async def buy_reveal_30_handler(callback: types.CallbackQuery):
     )
     await callback.answer()
 
-@router.callback_query(F.data == "buy_reveal_50")
+@callback_index.exact("buy_reveal_50")
 async def buy_reveal_50_handler(callback: types.CallbackQuery):
     await callback.message.edit_text(
         "⚠️ <b>Платежная система временно недоступна</b>\n\n"
@@ -105,7 +106,7 @@ async def buy_reveal_50_handler(callback: types.CallbackQuery):
     )
     await callback.answer()
 
-@router.callback_query(F.data == "my_status")
+@callback_index.exact("my_status")
 async def show_my_status(callback: types.CallbackQuery):
     db = next(get_db())
     try:
@@ -128,7 +129,7 @@ async def show_my_status(callback: types.CallbackQuery):
     finally:
         db.close()
 
-@router.callback_query(F.data == "user_info")
+@callback_index.exact("user_info")
 async def show_user_info(callback: types.CallbackQuery):
     """Обработчик кнопки 'Информация о себе'"""
     db = next(get_db())
@@ -163,12 +164,12 @@ async def show_user_info(callback: types.CallbackQuery):
     finally:
         db.close()
 
-@router.callback_query(F.data == "back_to_main")
+@callback_index.exact("back_to_main")
 async def back_to_main_from_premium(callback: types.CallbackQuery):
     await callback.message.answer("Главное меню:", reply_markup=main_menu())
     await callback.answer()
 
-@router.callback_query(F.data == "check_payment")
+@callback_index.exact("check_payment")
 async def check_payment_handler(callback: types.CallbackQuery):
     await callback.message.edit_text(
         "⚠️ <b>Платежная система временно недоступна</b>\n\n"
@@ -178,7 +179,7 @@ async def check_payment_handler(callback: types.CallbackQuery):
     )
     await callback.answer()
 
-@router.callback_query(F.data == "cancel_payment")
+@callback_index.exact("cancel_payment")
 async def cancel_payment_handler(callback: types.CallbackQuery, state: FSMContext):
     await callback.message.edit_text("❌ Оплата отменена")
     await state.clear()
@@ -0,0 +1,207 @@
+"""
+Проверки живости и готовности (/health/live, /health/ready)
+
+Все значения берутся из памяти: пульс поллинга пишет middleware сессии бота (каждый
+ответ getUpdates), задержку цикла событий - фоновый сборщик метрик, а проверка БД -
+короткий SELECT 1 без обращения к таблицам, результат которого кэшируется на
+HEALTH_DB_PROBE_TTL секунд. Поэтому эндпоинты можно опрашивать раз в несколько
+секунд хоть из нескольких мест.
+
+- liveness: цикл событий отвечает без большой задержки, поллинг Telegram не завис;
+- readiness: живость + БД отвечает и не подменяется восстановлением.
+"""
+import os
+import time
+import asyncio
+import logging
+from typing import Any, Dict, Optional
+
+from app.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+# Поллинг считается зависшим, если ответа getUpdates не было дольше (0 - не проверять)
+HEALTH_POLL_STALE = float(os.getenv("HEALTH_POLL_STALE", 90))
+# Сколько после запуска процесса ждать первого ответа getUpdates (восстановление БД, инициализация)
+HEALTH_STARTUP_GRACE = float(os.getenv("HEALTH_STARTUP_GRACE", 300))
+# Допустимая задержка цикла событий, мс
+HEALTH_LOOP_LAG_MS = float(os.getenv("HEALTH_LOOP_LAG_MS", 2000))
+# Сколько секунд переиспользуется результат проверки БД
+HEALTH_DB_PROBE_TTL = float(os.getenv("HEALTH_DB_PROBE_TTL", 5))
+HEALTH_DB_PROBE_TIMEOUT = float(os.getenv("HEALTH_DB_PROBE_TIMEOUT", 2))
+
+
+def _age(timestamp: Optional[float]) -> Optional[float]:
+    return round(time.time() - timestamp, 1) if timestamp else None
+
+
+class HealthMonitor:
+    """Пульс поллинга, исходящие запросы к Bot API и кэш проверки БД"""
+
+    def __init__(self, poll_stale: float = HEALTH_POLL_STALE, startup_grace: float = HEALTH_STARTUP_GRACE,
+                 loop_lag_ms: float = HEALTH_LOOP_LAG_MS, db_probe_ttl: float = HEALTH_DB_PROBE_TTL,
+                 db_probe_timeout: float = HEALTH_DB_PROBE_TIMEOUT):
+        self.poll_stale = poll_stale
+        self.startup_grace = startup_grace
+        self.loop_lag_ms = loop_lag_ms
+        self.db_probe_ttl = db_probe_ttl
+        self.db_probe_timeout = db_probe_timeout
+
+        self.started_at = time.time()
+        self.last_poll: Optional[float] = None
+        self.last_poll_error: Optional[str] = None
+        self.last_update: Optional[float] = None
+        self.updates_received = 0
+        # Запросы к Bot API (кроме getUpdates), которые сейчас выполняются
+        self.api_in_flight = 0
+
+        self._db_probe: Optional[Dict[str, Any]] = None
+        self._db_checked = 0.0
+        self._db_task: Optional[asyncio.Future] = None
+
+    # ---------- пульс бота ----------
+
+    def watch_bot(self, bot):
+        """Подключить пульс к сессии бота (один раз на сессию)"""
+        session = bot.session
+        if getattr(session, "_health_watched", False):
+            return
+        session.middleware(HeartbeatRequestMiddleware(self))
+        session._health_watched = True
+
+    def record_poll(self, updates: int = 0, error: Optional[str] = None):
+        now = time.time()
+        self.last_poll = now
+        self.last_poll_error = error
+        if updates:
+            self.last_update = now
+            self.updates_received += updates
+
+    def polling_status(self) -> Dict[str, Any]:
+        if self.last_poll is None:
+            # Бот еще запускается: до первого ответа getUpdates действует запас на старт
+            ok = time.time() - self.started_at <= max(self.startup_grace, self.poll_stale)
+        else:
+            ok = time.time() - self.last_poll <= self.poll_stale
+        ok = ok or self.poll_stale <= 0
+        return {
+            "ok": ok,
+            "last_poll_age": _age(self.last_poll),
+            "last_poll_error": self.last_poll_error,
+            "last_update_age": _age(self.last_update),
+            "updates_received": self.updates_received,
+        }
+
+    # ---------- цикл событий и очереди ----------
+
+    def loop_status(self) -> Dict[str, Any]:
+        from app.metrics_sampler import metrics_sampler
+
+        sample = metrics_sampler.latest()
+        lag = sample["loop_lag_ms"] if sample else None
+        return {"ok": lag is None or lag <= self.loop_lag_ms, "lag_ms": lag}
+
+    def queue_status(self) -> Dict[str, Any]:
+        from app.db_gate import db_gate
+
+        return {
+            "bot_updates": db_gate.bot_updates,
+            "api_in_flight": self.api_in_flight,
+            "db_requests": db_gate.active,
+        }
+
+    # ---------- БД ----------
+
+    @staticmethod
+    def _run_db_probe() -> Optional[float]:
+        """SELECT 1 через общий engine; None - шлюз закрыт (идет восстановление БД)"""
+        from sqlalchemy import text
+        from app.database import get_engine
+        from app.db_gate import db_gate
+
+        with db_gate.try_request() as entered:
+            if not entered:
+                return None
+            started = time.perf_counter()
+            with get_engine().connect() as connection:
+                connection.execute(text("SELECT 1"))
+            return (time.perf_counter() - started) * 1000
+
+    async def database_status(self) -> Dict[str, Any]:
+        """Результат проверки БД (не чаще раза в db_probe_ttl, одна проверка одновременно)"""
+        if self._db_probe is not None and time.monotonic() - self._db_checked < self.db_probe_ttl:
+            return self._db_probe
+
+        if self._db_task is None or self._db_task.done():
+            self._db_task = asyncio.ensure_future(asyncio.to_thread(self._run_db_probe))
+            # Ошибка зависшей проверки забирается здесь, если ее уже никто не ждет
+            self._db_task.add_done_callback(lambda task: task.cancelled() or task.exception())
+
+        try:
+            latency_ms = await asyncio.wait_for(asyncio.shield(self._db_task), self.db_probe_timeout)
+            if latency_ms is None:
+                result = {"ok": False, "state": "restoring"}
+            else:
+                result = {"ok": True, "latency_ms": round(latency_ms, 2)}
+        except asyncio.TimeoutError:
+            result = {"ok": False, "error": f"нет ответа за {self.db_probe_timeout:g} с"}
+        except Exception as e:
+            result = {"ok": False, "error": str(e)}
+
+        self._db_probe = result
+        self._db_checked = time.monotonic()
+        return result
+
+    # ---------- сводка ----------
+
+    def liveness(self) -> Dict[str, Any]:
+        checks = {"loop": self.loop_status(), "polling": self.polling_status()}
+        return {
+            "alive": all(check["ok"] for check in checks.values()),
+            "uptime": round(time.time() - self.started_at),
+            "checks": checks,
+        }
+
+    async def readiness(self) -> Dict[str, Any]:
+        result = self.liveness()
+        result["checks"]["database"] = await self.database_status()
+        result["ready"] = all(check["ok"] for check in result["checks"].values())
+        result["queues"] = self.queue_status()
+        return result
+
+
+class HeartbeatRequestMiddleware:
+    """Middleware сессии бота: каждый ответ getUpdates - пульс поллинга"""
+
+    def __init__(self, monitor: HealthMonitor):
+        self.monitor = monitor
+
+    async def __call__(self, make_request, bot, method):
+        from aiogram.methods import GetUpdates
+
+        if not isinstance(method, GetUpdates):
+            self.monitor.api_in_flight += 1
+            try:
+                return await make_request(bot, method)
+            finally:
+                self.monitor.api_in_flight -= 1
+
+        try:
+            response = await make_request(bot, method)
+        except Exception as e:
+            self.monitor.record_poll(error=f"{type(e).__name__}: {e}")
+            raise
+        # make_request возвращает уже распакованный результат метода - list[Update]
+        self.monitor.record_poll(updates=len(response or []))
+        return response
+
+
+# Глобальный экземпляр
+health_monitor = HealthMonitor()
+
+metrics.callback("bot_last_poll_age_seconds", "Секунд с последнего ответа getUpdates",
+                 lambda: _age(health_monitor.last_poll))
+metrics.callback("bot_last_update_age_seconds", "Секунд с последнего полученного апдейта",
+                 lambda: _age(health_monitor.last_update))
+metrics.callback("telegram_api_in_flight", "Запросы к Bot API в процессе (кроме getUpdates)",
+                 lambda: health_monitor.api_in_flight)
@@ -0,0 +1,270 @@
+"""
+Инкрементальные бэкапы: хранилище чанков по хэшу и манифесты снимков
+
+Файл БД режется на чанки фиксированного размера (кратного размеру страницы SQLite).
+Каждый чанк хранится один раз под своим SHA-256 в backups/chunks/, а бэкап - это
+JSON-манифест со списком хэшей в backups/incremental/. Новый снимок записывает на диск
+только изменившиеся чанки, поэтому место и время записи растут с объемом изменений,
+а не с размером БД. Любой снимок собирается обратно в обычный файл .db.
+"""
+import os
+import json
+import sqlite3
+import hashlib
+import logging
+import threading
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional
+
+from app.backup_compression import consistent_db_file
+
+logger = logging.getLogger(__name__)
+
+
+class IncrementalBackupStore:
+    """Хранилище инкрементальных бэкапов"""
+
+    def __init__(self, backup_dir: str = 'backups', chunk_size: Optional[int] = None,
+                 max_snapshots: Optional[int] = None):
+        self.chunks_dir = os.path.join(backup_dir, 'chunks')
+        self.snapshots_dir = os.path.join(backup_dir, 'incremental')
+        self.chunk_size = chunk_size or int(os.getenv("INCREMENTAL_CHUNK_SIZE", 64 * 1024))
+        self.max_snapshots = max_snapshots or int(os.getenv("INCREMENTAL_KEEP", 50))
+        self._lock = threading.Lock()
+
+        os.makedirs(self.chunks_dir, exist_ok=True)
+        os.makedirs(self.snapshots_dir, exist_ok=True)
+
+    # ---------- чанки ----------
+
+    def _chunk_path(self, digest: str) -> str:
+        return os.path.join(self.chunks_dir, digest[:2], digest)
+
+    def _store_chunk(self, digest: str, data: bytes) -> bool:
+        """Сохранить чанк, если его еще нет. Возвращает True, если чанк новый"""
+        path = self._chunk_path(digest)
+        if os.path.exists(path):
+            return False
+
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+        return True
+
+    def _read_chunk(self, digest: str) -> bytes:
+        with open(self._chunk_path(digest), 'rb') as f:
+            data = f.read()
+        if hashlib.sha256(data).hexdigest() != digest:
+            raise ValueError(f"Чанк поврежден: {digest}")
+        return data
+
+    # ---------- снимки ----------
+
+    def _snapshot_path(self, name: str) -> str:
+        return os.path.join(self.snapshots_dir, f"{name}.json")
+
+    def _effective_chunk_size(self, page_size: int) -> int:
+        """Размер чанка, кратный странице SQLite (изменение страницы затрагивает один чанк)"""
+        return max(page_size, self.chunk_size // page_size * page_size)
+
+    def create_snapshot(self, db_path: str, name: Optional[str] = None,
+                        progress_callback: Optional[Callable[[int, int], None]] = None,
+                        cancel_event: Optional[threading.Event] = None) -> Optional[Dict[str, Any]]:
+        """
+        Создать инкрементальный снимок БД.
+
+        Чанки читаются из согласованного снимка (consistent_db_file): он снимается backup
+        API шагами, и запись в БД не ждет, пока чанки хэшируются и сохраняются.
+        """
+        if name is None:
+            name = f"inc_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
+
+        started = datetime.now()
+        conn = sqlite3.connect(f"file:{db_path}?mode=ro", uri=True)
+        try:
+            page_size = conn.execute("PRAGMA page_size").fetchone()[0]
+        finally:
+            conn.close()
+
+        chunk_size = self._effective_chunk_size(page_size)
+        db_size = os.path.getsize(db_path)
+        file_hash = hashlib.sha256()
+        chunks: List[str] = []
+        new_chunks = 0
+        new_bytes = 0
+        done = 0
+
+        with consistent_db_file(db_path) as f:
+            while True:
+                if cancel_event is not None and cancel_event.is_set():
+                    logger.info(f"⏹️ Инкрементальный бэкап отменен: {name}")
+                    return None
+
+                data = f.read(chunk_size)
+                if not data:
+                    break
+
+                digest = hashlib.sha256(data).hexdigest()
+                file_hash.update(data)
+                if self._store_chunk(digest, data):
+                    new_chunks += 1
+                    new_bytes += len(data)
+                chunks.append(digest)
+
+                done += len(data)
+                if progress_callback:
+                    progress_callback(done // page_size, db_size // page_size)
+
+        snapshot = {
+            "name": name,
+            "created": started.isoformat(),
+            "db_size": done,
+            "page_size": page_size,
+            "chunk_size": chunk_size,
+            "sha256": file_hash.hexdigest(),
+            "chunks": chunks,
+            "new_chunks": new_chunks,
+            "new_bytes": new_bytes,
+            "duration_sec": round((datetime.now() - started).total_seconds(), 3),
+        }
+
+        with self._lock:
+            tmp_path = f"{self._snapshot_path(name)}.tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(snapshot, f, ensure_ascii=False)
+            os.replace(tmp_path, self._snapshot_path(name))
+
+        logger.info(
+            f"✅ Инкрементальный бэкап {name}: {len(chunks)} чанков, новых {new_chunks} "
+            f"({new_bytes / 1024:.0f} KB из {done / 1024:.0f} KB) за {snapshot['duration_sec']:.2f} сек"
+        )
+
+        self.prune()
+        return snapshot
+
+    def load_snapshot(self, name: str) -> Optional[Dict[str, Any]]:
+        try:
+            with open(self._snapshot_path(name), 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError) as e:
+            logger.warning(f"⚠️ Не удалось прочитать снимок {name}: {e}")
+            return None
+
+    def list_snapshots(self) -> List[Dict[str, Any]]:
+        """Снимки от старых к новым (без списка чанков)"""
+        snapshots = []
+        for filename in os.listdir(self.snapshots_dir):
+            if not filename.endswith('.json'):
+                continue
+            snapshot = self.load_snapshot(filename[:-len('.json')])
+            if snapshot is None:
+                continue
+            snapshot = dict(snapshot)
+            snapshot["chunk_count"] = len(snapshot.pop("chunks", []))
+            snapshots.append(snapshot)
+
+        snapshots.sort(key=lambda s: s["created"])
+        return snapshots
+
+    def restore_snapshot(self, name: str, target_path: str) -> bool:
+        """Собрать снимок в файл БД (через временный файл, с проверкой SHA-256)"""
+        snapshot = self.load_snapshot(name)
+        if snapshot is None:
+            return False
+
+        tmp_path = f"{target_path}.part"
+        try:
+            file_hash = hashlib.sha256()
+            with open(tmp_path, 'wb') as f:
+                for digest in snapshot["chunks"]:
+                    data = self._read_chunk(digest)
+                    file_hash.update(data)
+                    f.write(data)
+
+            if file_hash.hexdigest() != snapshot["sha256"]:
+                raise ValueError("контрольная сумма собранного файла не совпадает")
+
+            os.replace(tmp_path, target_path)
+            logger.info(f"✅ Снимок {name} собран: {target_path} ({snapshot['db_size']:,} байт)")
+            return True
+
+        except Exception as e:
+            logger.error(f"❌ Ошибка сборки снимка {name}: {e}")
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            return False
+
+    def delete_snapshot(self, name: str) -> bool:
+        path = self._snapshot_path(name)
+        if not os.path.exists(path):
+            return False
+        os.remove(path)
+        self.collect_garbage()
+        return True
+
+    # ---------- очистка ----------
+
+    def prune(self) -> int:
+        """Оставить последние max_snapshots снимков и удалить ненужные чанки"""
+        snapshots = self.list_snapshots()
+        to_delete = snapshots[:-self.max_snapshots] if len(snapshots) > self.max_snapshots else []
+        for snapshot in to_delete:
+            try:
+                os.remove(self._snapshot_path(snapshot["name"]))
+                logger.debug(f"🗑️ Удален старый снимок: {snapshot['name']}")
+            except OSError as e:
+                logger.warning(f"⚠️ Ошибка удаления снимка {snapshot['name']}: {e}")
+
+        if to_delete:
+            self.collect_garbage()
+        return len(to_delete)
+
+    def collect_garbage(self) -> int:
+        """Удалить чанки, на которые не ссылается ни один снимок"""
+        with self._lock:
+            referenced = set()
+            for filename in os.listdir(self.snapshots_dir):
+                if filename.endswith('.json'):
+                    snapshot = self.load_snapshot(filename[:-len('.json')])
+                    if snapshot is None:
+                        # Нечитаемый манифест - не рискуем удалить его чанки
+                        return 0
+                    referenced.update(snapshot["chunks"])
+
+            removed = 0
+            freed = 0
+            for prefix in os.listdir(self.chunks_dir):
+                prefix_dir = os.path.join(self.chunks_dir, prefix)
+                if not os.path.isdir(prefix_dir):
+                    continue
+                for digest in os.listdir(prefix_dir):
+                    if digest not in referenced:
+                        path = os.path.join(prefix_dir, digest)
+                        freed += os.path.getsize(path)
+                        os.remove(path)
+                        removed += 1
+
+        if removed:
+            logger.info(f"🧹 Удалено неиспользуемых чанков: {removed} ({freed / 1024:.0f} KB)")
+        return removed
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Размер хранилища и суммарный логический размер снимков"""
+        chunk_count = 0
+        stored_bytes = 0
+        for root, _, files in os.walk(self.chunks_dir):
+            for filename in files:
+                chunk_count += 1
+                stored_bytes += os.path.getsize(os.path.join(root, filename))
+
+        snapshots = self.list_snapshots()
+        logical_bytes = sum(s["db_size"] for s in snapshots)
+        return {
+            "snapshots": len(snapshots),
+            "chunks": chunk_count,
+            "stored_mb": round(stored_bytes / (1024 * 1024), 2),
+            "logical_mb": round(logical_bytes / (1024 * 1024), 2),
+            "dedup_ratio": round(logical_bytes / stored_bytes, 2) if stored_bytes else 0,
+        }
@@ -3,6 +3,7 @@ from aiogram.types import (
     InlineKeyboardMarkup, InlineKeyboardButton
 )
 from app.price_service import price_service
+from app.callback_router import SEND_ANOTHER_CB, REPLY_CB, REVEAL_CB, REPORT_CB
 
 # Главное меню
 def main_menu():
@@ -18,14 +19,14 @@ def main_menu():
 def message_actions_keyboard(message_id: int, can_reveal: bool = True):
     buttons = [
         [
-            InlineKeyboardButton(text="💬 Ответить", callback_data=f"reply_{message_id}"),
-            InlineKeyboardButton(text="🚫 Пожаловаться", callback_data=f"report_{message_id}")
+            InlineKeyboardButton(text="💬 Ответить", callback_data=REPLY_CB.pack(message_id)),
+            InlineKeyboardButton(text="🚫 Пожаловаться", callback_data=REPORT_CB.pack(message_id))
         ]
     ]
 
     if can_reveal:
         buttons.append([
-            InlineKeyboardButton(text="👁️ Раскрыть отправителя", callback_data=f"reveal_{message_id}")
+            InlineKeyboardButton(text="👁️ Раскрыть отправителя", callback_data=REVEAL_CB.pack(message_id))
         ])
     else:
         buttons.append([
@@ -47,7 +48,7 @@ def recreate_link_keyboard():
 def send_another_message_keyboard(target_link_uid: str):
     return InlineKeyboardMarkup(
         inline_keyboard=[
-            [InlineKeyboardButton(text="✉️ Написать еще сообщение", callback_data=f"send_another_{target_link_uid}")],
+            [InlineKeyboardButton(text="✉️ Написать еще сообщение", callback_data=SEND_ANOTHER_CB.pack(target_link_uid))],
             [InlineKeyboardButton(text="◀️ В главное меню", callback_data="back_to_main")]
         ]
     )
@@ -3,6 +3,7 @@ from aiogram.types import (
     InlineKeyboardMarkup, InlineKeyboardButton
 )
 from app.price_service import price_service
+from app.callback_router import ADMIN_SET_REVEALS_CB, ADMIN_VIEW_CONVERSATIONS_CB
 from aiogram.types import InlineKeyboardMarkup, InlineKeyboardButton
 
 
@@ -107,7 +108,7 @@ def admin_user_actions_menu(user_id: int):
     return InlineKeyboardMarkup(
         inline_keyboard=[
             [
-                InlineKeyboardButton(text="👁️ Установить раскрытия", callback_data=f"admin_user_set_reveals_{user_id}"),
+                InlineKeyboardButton(text="👁️ Установить раскрытия", callback_data=ADMIN_SET_REVEALS_CB.pack(user_id)),
             ],
             [
                 InlineKeyboardButton(text="◀️ Назад к пользователям", callback_data="admin_users"),
@@ -202,7 +203,7 @@ def admin_user_conversations_menu(user_id: int, conversations_count: int = 0):
     buttons = [
         [
             InlineKeyboardButton(text="📋 Все переписки", 
-                               callback_data=f"admin_view_conversations_{user_id}"),
+                               callback_data=ADMIN_VIEW_CONVERSATIONS_CB.pack(user_id)),
         ],
         [
             InlineKeyboardButton(text="📊 Статистика сообщений", 
@@ -0,0 +1,215 @@
+"""
+Логирование: очередь, ротация и JSON-записи
+
+Хэндлеры бота не пишут в файл и stdout сами: корневой логгер получает только
+QueueHandler, который кладет запись в очередь (без ввода-вывода), а QueueListener в
+отдельном потоке форматирует и пишет ее в консоль и в файл logs/bot.log с ротацией
+по размеру или по времени.
+
+В файл пишутся JSON-строки: время, уровень, логгер, сообщение, traceback и контекст
+апдейта (update_id, user_id, время обработки). Частые отладочные записи горячего пути
+помечаются extra={"sampled": True} и пропускаются в лог только каждая N-я.
+"""
+import os
+import sys
+import copy
+import time
+import json
+import atexit
+import logging
+import threading
+import contextvars
+import logging.handlers
+from queue import SimpleQueue
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+LOG_DIR = os.getenv("LOG_DIR", "logs")
+LOG_FILE = os.getenv("LOG_FILE", os.path.join(LOG_DIR, "bot.log"))
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+# json - одна JSON-запись на строку, text - прежний формат "время - логгер - уровень - сообщение"
+LOG_FILE_FORMAT = os.getenv("LOG_FILE_FORMAT", "json").lower()
+# size - по размеру файла, time - по времени (LOG_ROTATE_WHEN)
+LOG_ROTATION = os.getenv("LOG_ROTATION", "size").lower()
+LOG_MAX_BYTES = int(os.getenv("LOG_MAX_BYTES", 10 * 1024 * 1024))
+LOG_BACKUP_COUNT = int(os.getenv("LOG_BACKUP_COUNT", 5))
+LOG_ROTATE_WHEN = os.getenv("LOG_ROTATE_WHEN", "midnight")
+# Из записей с extra={"sampled": True} в лог попадает каждая N-я (для каждого места вызова)
+LOG_SAMPLE_EVERY = max(int(os.getenv("LOG_SAMPLE_EVERY", 100)), 1)
+# Апдейты, обработанные дольше, логируются как WARNING
+LOG_SLOW_UPDATE_MS = float(os.getenv("LOG_SLOW_UPDATE_MS", 1000))
+
+TEXT_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+
+# Контекст текущего апдейта бота (переносится в записи, сделанные во время его обработки)
+_update_context: contextvars.ContextVar[Optional[Dict[str, Any]]] = contextvars.ContextVar(
+    "log_update_context", default=None
+)
+
+_listener: Optional[logging.handlers.QueueListener] = None
+
+
+class ContextFilter(logging.Filter):
+    """Добавляет к записи контекст апдейта и прореживает частые отладочные записи"""
+
+    def __init__(self, sample_every: int = LOG_SAMPLE_EVERY):
+        super().__init__()
+        self.sample_every = sample_every
+        self._counters: Dict[tuple, int] = {}
+        self._lock = threading.Lock()
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if getattr(record, "sampled", False) and self.sample_every > 1:
+            key = (record.pathname, record.lineno)
+            with self._lock:
+                count = self._counters.get(key, 0)
+                self._counters[key] = count + 1
+            if count % self.sample_every:
+                return False
+            record.sample_rate = self.sample_every
+
+        context = _update_context.get()
+        if context:
+            for key, value in context.items():
+                if not hasattr(record, key):
+                    setattr(record, key, value)
+        return True
+
+
+class LogQueueHandler(logging.handlers.QueueHandler):
+    """
+    QueueHandler, который не теряет traceback как отдельное поле: сообщение и
+    traceback готовятся в потоке вызова (аргументы могут измениться), а форматирование
+    под файл и консоль делает поток QueueListener.
+    """
+
+    _exception_formatter = logging.Formatter()
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record = copy.copy(record)
+        record.message = record.getMessage()
+        record.msg = record.message
+        record.args = None
+        if record.exc_info:
+            record.exc_text = self._exception_formatter.formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+class JsonFormatter(logging.Formatter):
+    """Одна JSON-запись на строку (порядок первых полей постоянный - по нему читает log_reader)"""
+
+    # Поля, которые переносятся в JSON из extra / контекста апдейта
+    EXTRA_FIELDS = ("update_id", "user_id", "event", "handler_ms", "sample_rate")
+
+    def format(self, record: logging.LogRecord) -> str:
+        data = {
+            "time": self.formatTime(record),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        for field in self.EXTRA_FIELDS:
+            value = getattr(record, field, None)
+            if value is not None:
+                data[field] = value
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            data["exc"] = record.exc_text
+        if record.threadName != "MainThread":
+            data["thread"] = record.threadName
+        return json.dumps(data, ensure_ascii=False, default=str)
+
+
+def _file_handler() -> logging.Handler:
+    os.makedirs(os.path.dirname(LOG_FILE) or ".", exist_ok=True)
+    if LOG_ROTATION == "time":
+        handler = logging.handlers.TimedRotatingFileHandler(
+            LOG_FILE, when=LOG_ROTATE_WHEN, backupCount=LOG_BACKUP_COUNT, encoding="utf-8"
+        )
+    else:
+        handler = logging.handlers.RotatingFileHandler(
+            LOG_FILE, maxBytes=LOG_MAX_BYTES, backupCount=LOG_BACKUP_COUNT, encoding="utf-8"
+        )
+    handler.setFormatter(JsonFormatter() if LOG_FILE_FORMAT == "json" else logging.Formatter(TEXT_FORMAT))
+    return handler
+
+
+def setup_logging() -> Optional[logging.handlers.QueueListener]:
+    """
+    Настроить логирование процесса (повторный вызов ничего не делает).
+
+    Консоль и файл обслуживает поток QueueListener; при выходе из процесса очередь
+    дописывается до конца.
+    """
+    global _listener
+    if _listener is not None:
+        return _listener
+
+    console = logging.StreamHandler(sys.stdout)
+    console.setFormatter(logging.Formatter(TEXT_FORMAT))
+    handlers = [console]
+    try:
+        handlers.append(_file_handler())
+    except OSError as e:
+        print(f"⚠️ Файл лога {LOG_FILE} недоступен, логи только в консоль: {e}", file=sys.stderr)
+
+    queue = SimpleQueue()
+    queue_handler = LogQueueHandler(queue)
+    queue_handler.addFilter(ContextFilter())
+
+    root = logging.getLogger()
+    for handler in root.handlers[:]:
+        root.removeHandler(handler)
+    root.addHandler(queue_handler)
+    root.setLevel(LOG_LEVEL)
+
+    _listener = logging.handlers.QueueListener(queue, *handlers, respect_handler_level=True)
+    _listener.start()
+    atexit.register(stop_logging)
+    return _listener
+
+
+def stop_logging():
+    """Дописать очередь и остановить поток записи"""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+class UpdateLogContextMiddleware:
+    """
+    Outer middleware апдейтов aiogram: записи, сделанные при обработке апдейта, получают
+    update_id и user_id, а по завершении пишется время обработки (медленные - WARNING,
+    остальные - DEBUG с прореживанием).
+    """
+
+    def __init__(self, slow_ms: float = LOG_SLOW_UPDATE_MS):
+        self.slow_ms = slow_ms
+        self.logger = logging.getLogger("app.updates")
+
+    async def __call__(
+        self,
+        handler: Callable[[Any, Dict[str, Any]], Awaitable[Any]],
+        event: Any,
+        data: Dict[str, Any]
+    ) -> Any:
+        user = data.get("event_from_user")
+        token = _update_context.set({
+            "update_id": getattr(event, "update_id", None),
+            "user_id": user.id if user else None,
+        })
+        started = time.perf_counter()
+        try:
+            return await handler(event, data)
+        finally:
+            handler_ms = round((time.perf_counter() - started) * 1000, 1)
+            event_type = getattr(event, "event_type", None)
+            if handler_ms >= self.slow_ms:
+                self.logger.warning(f"🐢 Медленный апдейт ({event_type}): {handler_ms:.0f} мс",
+                                    extra={"event": event_type, "handler_ms": handler_ms})
+            elif self.logger.isEnabledFor(logging.DEBUG):
+                self.logger.debug(f"Апдейт ({event_type}) обработан за {handler_ms} мс",
+                                  extra={"event": event_type, "handler_ms": handler_ms, "sampled": True})
+            _update_context.reset(token)
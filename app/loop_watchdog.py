@@ -0,0 +1,254 @@
+"""
+Сторож цикла событий: задержки и блокирующие вызовы
+
+Задача в цикле событий отмечается каждые LOOP_WATCHDOG_TICK секунд, а отдельный поток
+проверяет, давно ли была отметка. Если цикл не отвечает дольше
+LOOP_WATCHDOG_THRESHOLD_MS, поток снимает стек потока цикла событий - в этот момент
+он выполняет как раз блокирующий код - и запоминает, чья задача выполняется: хэндлер
+бота или маршрут веб-панели (метки ставят middleware). Когда цикл освобождается,
+остановка с длительностью, меткой и стеком пишется в лог, в метрики (/metrics) и в
+список последних остановок (/api/loop_stalls).
+"""
+import os
+import sys
+import time
+import asyncio
+import logging
+import threading
+import traceback
+import weakref
+from collections import deque
+from contextlib import contextmanager
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from app.metrics import metrics, handler_labels
+
+logger = logging.getLogger(__name__)
+
+LOOP_WATCHDOG_ENABLED = os.getenv("LOOP_WATCHDOG", "1") != "0"
+# Остановка цикла событий дольше порога считается блокировкой
+LOOP_WATCHDOG_THRESHOLD_MS = float(os.getenv("LOOP_WATCHDOG_THRESHOLD_MS", 250))
+LOOP_WATCHDOG_TICK = float(os.getenv("LOOP_WATCHDOG_TICK", 0.05))
+# Если цикл заблокирован дольше, запись в лог делается сразу, не дожидаясь освобождения
+LOOP_WATCHDOG_HANG_SECONDS = float(os.getenv("LOOP_WATCHDOG_HANG_SECONDS", 10))
+LOOP_WATCHDOG_HISTORY = int(os.getenv("LOOP_WATCHDOG_HISTORY", 50))
+LOOP_WATCHDOG_STACK_DEPTH = int(os.getenv("LOOP_WATCHDOG_STACK_DEPTH", 12))
+
+_PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+loop_stalls = metrics.counter(
+    "event_loop_stalls_total", "Блокировки цикла событий дольше порога сторожа", ["where"])
+loop_stall_seconds = metrics.histogram(
+    "event_loop_stall_seconds", "Длительность блокировок цикла событий", ["where"],
+    buckets=(0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0))
+
+
+def _is_project_frame(filename: str) -> bool:
+    return (filename.startswith(_PROJECT_ROOT) and "site-packages" not in filename
+            and os.path.abspath(filename) != os.path.abspath(__file__))
+
+
+class LoopWatchdog:
+    """Отметки цикла событий, поток-наблюдатель и журнал последних блокировок"""
+
+    def __init__(self, threshold_ms: float = LOOP_WATCHDOG_THRESHOLD_MS, tick: float = LOOP_WATCHDOG_TICK,
+                 hang_seconds: float = LOOP_WATCHDOG_HANG_SECONDS, history: int = LOOP_WATCHDOG_HISTORY,
+                 stack_depth: int = LOOP_WATCHDOG_STACK_DEPTH):
+        self.threshold = threshold_ms / 1000
+        self.tick = tick
+        self.hang_seconds = hang_seconds
+        self.stack_depth = stack_depth
+        self.stalls: deque = deque(maxlen=history)
+        self.max_lag_ms = 0.0
+
+        self._labels: "weakref.WeakKeyDictionary[asyncio.Task, str]" = weakref.WeakKeyDictionary()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._loop_thread_id: Optional[int] = None
+        self._last_tick = 0.0
+        self._task: Optional[asyncio.Task] = None
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+        # Снимок текущей блокировки (заполняет поток-наблюдатель)
+        self._pending: Optional[Dict[str, Any]] = None
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def start(self):
+        """Запустить сторожа для текущего цикла событий (повторный вызов ничего не делает)"""
+        if not LOOP_WATCHDOG_ENABLED or self.running:
+            return
+        self._loop = asyncio.get_running_loop()
+        self._loop_thread_id = threading.get_ident()
+        self._last_tick = time.monotonic()
+        self._stop.clear()
+        self._task = asyncio.create_task(self._run())
+        self._thread = threading.Thread(target=self._watch, name="loop-watchdog", daemon=True)
+        self._thread.start()
+        logger.info(f"🐕 Сторож цикла событий запущен (порог {self.threshold * 1000:.0f} мс)")
+
+    async def stop(self):
+        self._stop.set()
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self._thread is not None:
+            await asyncio.to_thread(self._thread.join, 1)
+            self._thread = None
+
+    # ---------- метки задач ----------
+
+    @contextmanager
+    def activity(self, label: str):
+        """Пометить текущую задачу: блокировка внутри блока будет отнесена к label"""
+        task = asyncio.current_task()
+        if task is None:
+            yield
+            return
+        previous = self._labels.get(task)
+        self._labels[task] = label
+        try:
+            yield
+        finally:
+            if previous is None:
+                self._labels.pop(task, None)
+            else:
+                self._labels[task] = previous
+
+    # ---------- цикл событий ----------
+
+    async def _run(self):
+        while True:
+            expected = time.monotonic() + self.tick
+            await asyncio.sleep(self.tick)
+            now = time.monotonic()
+            self._last_tick = now
+            lag = now - expected
+            self.max_lag_ms = max(self.max_lag_ms, lag * 1000)
+            if lag >= self.threshold:
+                self._finish_stall(lag)
+
+    def _finish_stall(self, lag: float):
+        with self._lock:
+            stall, self._pending = self._pending, None
+        if stall is None:
+            # Поток не успел снять стек (блокировка чуть выше порога)
+            stall = {"where": "unknown", "task": None, "frame": None, "stack": [], "reported": False}
+
+        stall["duration_ms"] = round(lag * 1000, 1)
+        stall["ts"] = time.time() - lag
+        reported = stall.pop("reported")
+        self.stalls.append(stall)
+        loop_stalls.inc(where=stall["where"])
+        loop_stall_seconds.observe(lag, where=stall["where"])
+
+        if reported:
+            logger.warning(f"🐌 Цикл событий освободился через {lag:.1f} с ({stall['where']})")
+        else:
+            self._log_stall(stall, f"{stall['duration_ms']:.0f} мс")
+
+    def _log_stall(self, stall: Dict[str, Any], duration: str):
+        frame = f" в {stall['frame']}" if stall["frame"] else ""
+        task = f" [{stall['task']}]" if stall["task"] else ""
+        stack = "\n" + "".join(stall["stack"]).rstrip() if stall["stack"] else ""
+        logger.warning(f"🐌 Цикл событий заблокирован на {duration}: {stall['where']}{task}{frame}{stack}",
+                       extra={"event": "loop_stall"})
+
+    # ---------- поток-наблюдатель ----------
+
+    def _watch(self):
+        interval = min(self.tick, self.threshold / 2)
+        while not self._stop.wait(interval):
+            blocked = time.monotonic() - self._last_tick - self.tick
+            if blocked < self.threshold:
+                continue
+            with self._lock:
+                if self._pending is None:
+                    self._pending = self._capture()
+                stall = self._pending
+            if not stall["reported"] and blocked >= self.hang_seconds:
+                # Цикл может не освободиться вовсе - пишем сразу
+                stall["reported"] = True
+                self._log_stall(stall, f"{blocked:.1f} с и продолжается")
+
+    def _capture(self) -> Dict[str, Any]:
+        """Стек потока цикла событий и метка выполняемой задачи"""
+        frame = sys._current_frames().get(self._loop_thread_id)
+        stack = traceback.extract_stack(frame, limit=self.stack_depth) if frame is not None else []
+
+        blocking = next((entry for entry in reversed(stack) if _is_project_frame(entry.filename)), None)
+        task = asyncio.current_task(self._loop) if self._loop is not None else None
+        where = self._labels.get(task) if task is not None else None
+        return {
+            # Метка метрики - только из ограниченного набора: имя задачи ("Task-1234") - лишь в лог
+            "where": where or (_coroutine_label(task) if task is not None else "callback"),
+            "task": task.get_name() if task is not None else None,
+            "frame": (f"{blocking.name} ({os.path.relpath(blocking.filename, _PROJECT_ROOT)}:{blocking.lineno})"
+                      if blocking else None),
+            "stack": traceback.format_list(stack),
+            "reported": False,
+        }
+
+    def recent(self) -> List[Dict[str, Any]]:
+        """Последние блокировки, новые первыми"""
+        return list(reversed(self.stalls))
+
+
+def _coroutine_label(task: asyncio.Task) -> str:
+    """Метка задачи без activity(): имя функции корутины (их число ограничено кодом)"""
+    name = getattr(task.get_coro(), "__qualname__", None)
+    return f"task:{name}" if name else "unlabeled"
+
+
+class HandlerLabelMiddleware:
+    """Inner middleware aiogram: задача апдейта помечается именем хэндлера"""
+
+    def __init__(self, watchdog: LoopWatchdog):
+        self.watchdog = watchdog
+
+    async def __call__(
+        self,
+        handler: Callable[[Any, Dict[str, Any]], Awaitable[Any]],
+        event: Any,
+        data: Dict[str, Any]
+    ) -> Any:
+        router, name = handler_labels(data)
+        with self.watchdog.activity(f"bot:{router}.{name}"):
+            return await handler(event, data)
+
+
+def label_dispatcher(dp, watchdog: Optional[LoopWatchdog] = None):
+    """Метки хэндлеров бота для всех роутеров диспетчера"""
+    middleware = HandlerLabelMiddleware(watchdog or loop_watchdog)
+    for name, observer in dp.observers.items():
+        if name not in ("update", "error"):
+            observer.middleware(middleware)
+
+
+def create_web_middleware(watchdog: Optional[LoopWatchdog] = None):
+    """Middleware aiohttp: задача запроса помечается маршрутом веб-панели"""
+    from aiohttp import web
+
+    watchdog = watchdog or loop_watchdog
+
+    @web.middleware
+    async def loop_watchdog_middleware(request, handler):
+        resource = request.match_info.route.resource
+        path = resource.canonical if resource is not None else request.path
+        with watchdog.activity(f"web:{request.method} {path}"):
+            return await handler(request)
+
+    return loop_watchdog_middleware
+
+
+# Глобальный экземпляр
+loop_watchdog = LoopWatchdog()
+
+metrics.callback("event_loop_max_lag_seconds", "Наибольшая задержка цикла событий с запуска сторожа",
+                 lambda: loop_watchdog.max_lag_ms / 1000 if loop_watchdog.running else None)
@@ -0,0 +1,385 @@
+"""
+Метрики приложения в текстовом формате Prometheus (/metrics веб-панели)
+
+Счетчики и гистограммы пишутся без блокировок: у каждого потока свой шард
+(словарь значений по меткам), запись идет только в шард своего потока, а
+суммирование по шардам выполняется при чтении /metrics. Блокировка берется
+один раз - при появлении нового потока.
+
+Собирается:
+- время обработки апдейтов по типу и по роутеру/хэндлеру (middleware aiogram);
+- число и время SQL-запросов по типу (события SQLAlchemy);
+- время, ошибки и 429 запросов к Telegram API (middleware сессии бота);
+- рассылки, длительность задач бэкапа, попадания кэша ответов панели;
+- снимок фонового сборщика метрик процесса (CPU, память, задержка цикла событий).
+"""
+import bisect
+import logging
+import threading
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Границы гистограмм времени, секунды
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+DURATION_BUCKETS = (0.1, 0.5, 1.0, 5.0, 10.0, 30.0, 60.0, 300.0, 900.0, 3600.0)
+
+
+def _escape(value: Any) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[Any], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    value = float(value)
+    if value == float("inf"):
+        return "+Inf"
+    return str(int(value)) if value.is_integer() else repr(value)
+
+
+class _Metric:
+    """Метрика с шардами по потокам"""
+
+    type_name = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._shards: Dict[int, Dict[Tuple, Any]] = {}
+        self._lock = threading.Lock()
+
+    def _shard(self) -> Dict[Tuple, Any]:
+        ident = threading.get_ident()
+        shard = self._shards.get(ident)
+        if shard is None:
+            with self._lock:
+                shard = self._shards.setdefault(ident, {})
+        return shard
+
+    def _key(self, labels: Dict[str, Any]) -> Tuple:
+        return tuple(str(labels.get(name, "")) for name in self.labelnames)
+
+    def _snapshot(self) -> List[Dict[Tuple, Any]]:
+        # Копия словаря - одна операция под GIL, поток-владелец может писать дальше
+        return [dict(shard) for shard in list(self._shards.values())]
+
+    def render(self) -> List[str]:
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.type_name}"]
+
+
+class Counter(_Metric):
+    """Монотонный счетчик"""
+
+    type_name = "counter"
+
+    def inc(self, amount: float = 1, **labels):
+        shard = self._shard()
+        key = self._key(labels)
+        shard[key] = shard.get(key, 0) + amount
+
+    def values(self) -> Dict[Tuple, float]:
+        totals: Dict[Tuple, float] = {}
+        for shard in self._snapshot():
+            for key, value in shard.items():
+                totals[key] = totals.get(key, 0) + value
+        return totals
+
+    def render(self) -> List[str]:
+        lines = super().render()
+        for key, value in sorted(self.values().items()):
+            lines.append(f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}")
+        return lines
+
+
+class Histogram(_Metric):
+    """Гистограмма с фиксированными границами (значения в шарде - [счетчики корзин..., сумма])"""
+
+    type_name = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, **labels):
+        shard = self._shard()
+        key = self._key(labels)
+        cells = shard.get(key)
+        if cells is None:
+            # Последняя корзина - +Inf, за ней сумма
+            cells = shard[key] = [0] * (len(self.buckets) + 1) + [0.0]
+        cells[bisect.bisect_left(self.buckets, value)] += 1
+        cells[-1] += value
+
+    def values(self) -> Dict[Tuple, List[float]]:
+        totals: Dict[Tuple, List[float]] = {}
+        for shard in self._snapshot():
+            for key, cells in shard.items():
+                total = totals.setdefault(key, [0] * len(cells))
+                for i, value in enumerate(list(cells)):
+                    total[i] += value
+        return totals
+
+    def render(self) -> List[str]:
+        lines = super().render()
+        bounds = ['le="%s"' % _format_value(bound) for bound in self.buckets] + ['le="+Inf"']
+        for key, cells in sorted(self.values().items()):
+            cumulative = 0
+            for bound, count in zip(bounds, cells):
+                cumulative += count
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, bound)} {cumulative}")
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {round(cells[-1], 6)}")
+            lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+
+class CallbackMetric(_Metric):
+    """Метрика, значения которой читаются из уже существующих счетчиков при выдаче /metrics"""
+
+    def __init__(self, name: str, documentation: str, callback: Callable[[], Any],
+                 labelnames: Sequence[str] = (), type_name: str = "gauge"):
+        super().__init__(name, documentation, labelnames)
+        self.callback = callback
+        self.type_name = type_name
+
+    def render(self) -> List[str]:
+        try:
+            value = self.callback()
+        except Exception as e:
+            logger.debug(f"Метрика {self.name} недоступна: {e}")
+            return []
+        if value is None:
+            return []
+        items = value.items() if isinstance(value, dict) else [((), value)]
+        lines = super().render()
+        for key, item in items:
+            key = key if isinstance(key, tuple) else (key,)
+            lines.append(f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(item)}")
+        return lines
+
+
+class MetricsRegistry:
+    """Набор метрик процесса"""
+
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+
+    def _register(self, metric: _Metric) -> _Metric:
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self._register(Counter(name, documentation, labelnames))
+
+    def histogram(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                  buckets: Sequence[float] = LATENCY_BUCKETS) -> Histogram:
+        return self._register(Histogram(name, documentation, labelnames, buckets))
+
+    def callback(self, name: str, documentation: str, callback: Callable[[], Any],
+                 labelnames: Sequence[str] = (), type_name: str = "gauge") -> CallbackMetric:
+        return self._register(CallbackMetric(name, documentation, callback, labelnames, type_name))
+
+    def render(self) -> str:
+        lines: List[str] = []
+        for metric in self._metrics.values():
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+# Глобальный экземпляр
+metrics = MetricsRegistry()
+
+# ==================== МЕТРИКИ ====================
+
+bot_update_seconds = metrics.histogram(
+    "bot_update_seconds", "Время обработки апдейта бота", ["event"])
+bot_handler_seconds = metrics.histogram(
+    "bot_handler_seconds", "Время работы хэндлера бота", ["router", "handler"])
+bot_handler_errors = metrics.counter(
+    "bot_handler_errors_total", "Исключения в хэндлерах бота", ["router", "handler", "error"])
+
+db_statement_seconds = metrics.histogram(
+    "db_statement_seconds", "Время выполнения SQL-запроса", ["statement"])
+db_statement_errors = metrics.counter(
+    "db_statement_errors_total", "Ошибки SQL-запросов", ["statement"])
+
+telegram_api_seconds = metrics.histogram(
+    "telegram_api_seconds", "Время запроса к Telegram Bot API", ["method"])
+telegram_api_errors = metrics.counter(
+    "telegram_api_errors_total", "Ошибки запросов к Telegram Bot API (TelegramRetryAfter - ответ 429)",
+    ["method", "error"])
+telegram_api_retry_after = metrics.counter(
+    "telegram_api_retry_after_seconds_total", "Суммарное время ожидания, запрошенное Telegram в ответах 429",
+    ["method"])
+
+broadcast_messages = metrics.counter(
+    "broadcast_messages_total", "Сообщения рассылок", ["result"])
+broadcast_seconds = metrics.histogram(
+    "broadcast_seconds", "Длительность рассылки", buckets=DURATION_BUCKETS)
+
+backup_job_seconds = metrics.histogram(
+    "backup_job_seconds", "Длительность задач бэкапа, экспорта и импорта", ["kind", "state"],
+    buckets=DURATION_BUCKETS)
+
+
+def _response_cache_stats() -> Dict[Tuple, int]:
+    from web.utils.response_cache import response_cache
+    stats = response_cache.stats()
+    return {("hit",): stats["hits"], ("miss",): stats["misses"], ("not_modified",): stats["not_modified"]}
+
+
+def _sample_value(key: str, scale: float = 1) -> Callable[[], Optional[float]]:
+    def read():
+        from app.metrics_sampler import metrics_sampler
+        sample = metrics_sampler.latest()
+        return sample[key] * scale if sample and key in sample else None
+    return read
+
+
+def _db_gate_value(attribute: str) -> Callable[[], float]:
+    def read():
+        from app.db_gate import db_gate
+        return getattr(db_gate, attribute)
+    return read
+
+
+metrics.callback("web_cache_requests_total", "Запросы к кэшируемым страницам панели по результату",
+                 _response_cache_stats, ["result"], type_name="counter")
+metrics.callback("bot_updates_in_progress", "Апдейты бота в обработке", _db_gate_value("bot_updates"))
+metrics.callback("db_requests_in_progress", "Запросы к БД внутри шлюза", _db_gate_value("active"))
+metrics.callback("process_cpu_percent", "Загрузка CPU процессом, %", _sample_value("cpu_percent"))
+metrics.callback("process_resident_memory_bytes", "Память процесса (RSS)", _sample_value("rss"))
+metrics.callback("process_threads", "Потоки процесса", _sample_value("threads"))
+metrics.callback("event_loop_lag_seconds", "Задержка цикла событий", _sample_value("loop_lag_ms", 0.001))
+metrics.callback("db_size_bytes", "Размер файла БД", _sample_value("db_size"))
+
+
+# ==================== ИНСТРУМЕНТИРОВАНИЕ ====================
+
+def _statement_kind(statement: str) -> str:
+    word = statement.lstrip().split(None, 1)[0].upper() if statement.strip() else ""
+    return word if word in ("SELECT", "INSERT", "UPDATE", "DELETE", "PRAGMA", "BEGIN", "COMMIT") else "OTHER"
+
+
+_sqlalchemy_instrumented = False
+
+
+def instrument_sqlalchemy():
+    """Считать SQL-запросы всех engine процесса (повторный вызов ничего не делает)"""
+    global _sqlalchemy_instrumented
+    if _sqlalchemy_instrumented:
+        return
+    from sqlalchemy import event
+    from sqlalchemy.engine import Engine
+
+    @event.listens_for(Engine, "before_cursor_execute")
+    def _before_execute(conn, cursor, statement, parameters, context, executemany):
+        context._metrics_started = time.perf_counter()
+
+    @event.listens_for(Engine, "after_cursor_execute")
+    def _after_execute(conn, cursor, statement, parameters, context, executemany):
+        started = getattr(context, "_metrics_started", None)
+        if started is not None:
+            db_statement_seconds.observe(time.perf_counter() - started, statement=_statement_kind(statement))
+
+    @event.listens_for(Engine, "handle_error")
+    def _on_error(exception_context):
+        db_statement_errors.inc(statement=_statement_kind(exception_context.statement or ""))
+
+    _sqlalchemy_instrumented = True
+
+
+def handler_labels(data: Dict[str, Any]) -> Tuple[str, str]:
+    """(роутер, хэндлер): модуль и имя функции; для индекса callback - найденный в нем хэндлер"""
+    route = data.get("callback_route")
+    handler = data.get("handler")
+    callback = route.callable.callback if route is not None else getattr(handler, "callback", None)
+    if callback is None:
+        return "unknown", "unknown"
+    module = getattr(callback, "__module__", "") or ""
+    return module.rsplit(".", 1)[-1], getattr(callback, "__qualname__", repr(callback))
+
+
+class HandlerMetricsMiddleware:
+    """Inner middleware aiogram: время и исключения каждого хэндлера"""
+
+    async def __call__(
+        self,
+        handler: Callable[[Any, Dict[str, Any]], Awaitable[Any]],
+        event: Any,
+        data: Dict[str, Any]
+    ) -> Any:
+        router, name = handler_labels(data)
+        started = time.perf_counter()
+        try:
+            return await handler(event, data)
+        except Exception as e:
+            bot_handler_errors.inc(router=router, handler=name, error=type(e).__name__)
+            raise
+        finally:
+            bot_handler_seconds.observe(time.perf_counter() - started, router=router, handler=name)
+
+
+class UpdateMetricsMiddleware:
+    """Outer middleware апдейтов: полное время обработки по типу апдейта"""
+
+    async def __call__(
+        self,
+        handler: Callable[[Any, Dict[str, Any]], Awaitable[Any]],
+        event: Any,
+        data: Dict[str, Any]
+    ) -> Any:
+        started = time.perf_counter()
+        try:
+            return await handler(event, data)
+        finally:
+            bot_update_seconds.observe(time.perf_counter() - started,
+                                       event=getattr(event, "event_type", "unknown"))
+
+
+class TelegramApiMetricsMiddleware:
+    """Middleware сессии бота: время и ошибки запросов к Bot API"""
+
+    async def __call__(self, make_request, bot, method):
+        name = type(method).__name__
+        started = time.perf_counter()
+        try:
+            return await make_request(bot, method)
+        except Exception as e:
+            telegram_api_errors.inc(method=name, error=type(e).__name__)
+            retry_after = getattr(e, "retry_after", None)
+            if retry_after:
+                telegram_api_retry_after.inc(retry_after, method=name)
+            raise
+        finally:
+            telegram_api_seconds.observe(time.perf_counter() - started, method=name)
+
+
+def instrument_bot(bot) -> None:
+    """Подключить метрики Bot API к сессии бота (один раз на сессию)"""
+    session = bot.session
+    if getattr(session, "_metrics_instrumented", False):
+        return
+    session.middleware(TelegramApiMetricsMiddleware())
+    session._metrics_instrumented = True
+
+
+def instrument_dispatcher(dp) -> None:
+    """Метрики апдейтов и хэндлеров для диспетчера и всех вложенных роутеров"""
+    dp.update.outer_middleware(UpdateMetricsMiddleware())
+    handler_middleware = HandlerMetricsMiddleware()
+    # Inner middleware диспетчера применяются к хэндлерам всех дочерних роутеров
+    for name, observer in dp.observers.items():
+        if name not in ("update", "error"):
+            observer.middleware(handler_middleware)
@@ -0,0 +1,132 @@
+"""
+Фоновый сборщик метрик процесса
+
+Один цикл раз в METRICS_INTERVAL секунд снимает загрузку CPU и память процесса,
+задержку цикла событий, размер БД и число апдейтов бота в обработке и складывает
+снимки в кольцевой буфер. Страница мониторинга и API читают готовые снимки, а
+подписчики потока (SSE) просыпаются на каждый новый снимок - сколько бы вкладок ни
+было открыто, psutil опрашивается один раз за интервал.
+"""
+import os
+import time
+import asyncio
+import logging
+from collections import deque
+from typing import Any, AsyncIterator, Dict, List, Optional
+
+import psutil
+
+logger = logging.getLogger(__name__)
+
+METRICS_INTERVAL = float(os.getenv("METRICS_INTERVAL", 2))
+# Сколько снимков хранить (по умолчанию 10 минут при интервале 2 секунды)
+METRICS_HISTORY = int(os.getenv("METRICS_HISTORY", 300))
+
+
+class MetricsSampler:
+    """Цикл сбора метрик с кольцевым буфером и рассылкой подписчикам"""
+
+    def __init__(self, interval: float = METRICS_INTERVAL, history: int = METRICS_HISTORY):
+        self.interval = interval
+        self.samples: deque = deque(maxlen=history)
+        self._process = psutil.Process()
+        self._task: Optional[asyncio.Task] = None
+        self._new_sample: Optional[asyncio.Event] = None
+        self.subscribers = 0
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def start(self):
+        """Запустить цикл сбора в текущем цикле событий (повторный вызов ничего не делает)"""
+        if self.running:
+            return
+        self._new_sample = asyncio.Event()
+        # Первый вызов cpu_percent(None) только запоминает точку отсчета
+        self._process.cpu_percent(None)
+        psutil.cpu_percent(None)
+        self._task = asyncio.create_task(self._run(), name="metrics-sampler")
+        logger.info(f"📈 Сбор метрик: каждые {self.interval:g} с, история {self.samples.maxlen} снимков")
+
+    async def stop(self):
+        if not self.running:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+        # Подписчики получают None и закрывают поток
+        self._publish()
+
+    def latest(self) -> Optional[Dict[str, Any]]:
+        return self.samples[-1] if self.samples else None
+
+    def history(self) -> List[Dict[str, Any]]:
+        return list(self.samples)
+
+    async def subscribe(self) -> AsyncIterator[Dict[str, Any]]:
+        """Новые снимки по мере появления (без собственной очереди у подписчика)"""
+        self.subscribers += 1
+        try:
+            while self.running:
+                event = self._new_sample
+                await event.wait()
+                sample = self.latest()
+                if not self.running or sample is None:
+                    return
+                yield sample
+        finally:
+            self.subscribers -= 1
+
+    def _publish(self):
+        event, self._new_sample = self._new_sample, asyncio.Event()
+        if event is not None:
+            event.set()
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            started = loop.time()
+            await asyncio.sleep(self.interval)
+            # Насколько позже запланированного цикл событий вернулся к задаче
+            lag_ms = max(loop.time() - started - self.interval, 0.0) * 1000
+            try:
+                self.samples.append(self.collect(lag_ms))
+                self._publish()
+            except Exception as e:
+                logger.warning(f"⚠️ Ошибка сбора метрик: {e}")
+
+    def collect(self, loop_lag_ms: float = 0.0) -> Dict[str, Any]:
+        """Один снимок метрик (все вызовы неблокирующие)"""
+        from app.db_gate import db_gate
+        from app.database_manager import db_manager
+
+        with self._process.oneshot():
+            cpu_percent = self._process.cpu_percent(None)
+            rss = self._process.memory_info().rss
+            threads = self._process.num_threads()
+
+        try:
+            db_size = os.path.getsize(db_manager.db_path)
+        except OSError:
+            db_size = 0
+
+        return {
+            "ts": time.time(),
+            "cpu_percent": round(cpu_percent, 1),
+            "system_cpu_percent": psutil.cpu_percent(None),
+            "memory_percent": psutil.virtual_memory().percent,
+            "rss": rss,
+            "threads": threads,
+            "loop_lag_ms": round(loop_lag_ms, 1),
+            "db_size": db_size,
+            "bot_queue": db_gate.bot_updates,
+            "db_requests": db_gate.active,
+        }
+
+
+# Глобальный экземпляр
+metrics_sampler = MetricsSampler()
@@ -0,0 +1,223 @@
+"""
+Антиспам: ограничение частоты отправки анонимных сообщений
+"""
+import os
+import time
+import logging
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+from aiogram import BaseMiddleware
+from aiogram.dispatcher.flags import get_flag
+from aiogram.types import Message
+
+logger = logging.getLogger(__name__)
+
+
+class TokenBucketLimiter:
+    """
+    Token bucket с вытеснением неактивных ключей.
+
+    На каждый активный ключ хранится только [токены, время последнего обращения, флаг предупреждения],
+    поэтому память O(1) на ключ. Ключи упорядочены по последнему обращению (LRU),
+    старые ключи с полностью восстановленным бакетом удаляются при каждом обращении.
+    """
+
+    def __init__(self, rate: int, period: float, burst: Optional[int] = None, max_keys: int = 10000):
+        self.rate = rate  # Сколько сообщений разрешено за период
+        self.period = period  # Период в секундах
+        self.capacity = float(burst if burst is not None else rate)
+        self.refill_per_second = rate / period
+        self.max_keys = max_keys
+
+        # Время, за которое пустой бакет восстанавливается полностью
+        self.idle_ttl = self.capacity / self.refill_per_second
+
+        self._buckets: "OrderedDict[Any, list]" = OrderedDict()
+
+        # Счетчики для админки
+        self.allowed = 0
+        self.blocked = 0
+        self.evicted = 0
+
+    def _evict(self, now: float):
+        """Удалить неактивные ключи и ключи сверх лимита"""
+        while self._buckets:
+            key, bucket = next(iter(self._buckets.items()))
+            if now - bucket[1] < self.idle_ttl and len(self._buckets) <= self.max_keys:
+                break
+            self._buckets.popitem(last=False)
+            self.evicted += 1
+
+    def hit(self, key: Any, now: Optional[float] = None) -> Tuple[bool, bool]:
+        """
+        Зарегистрировать попытку отправки.
+
+        Возвращает (разрешено, нужно_предупредить). Предупреждение выдается
+        только на первый отказ подряд, чтобы флуд не тратил лимиты Telegram на ответы.
+        """
+        if now is None:
+            now = time.monotonic()
+
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            bucket = [self.capacity, now, False]
+            self._buckets[key] = bucket
+        else:
+            elapsed = now - bucket[1]
+            bucket[0] = min(self.capacity, bucket[0] + elapsed * self.refill_per_second)
+            bucket[1] = now
+            self._buckets.move_to_end(key)
+
+        self._evict(now)
+
+        if bucket[0] >= 1:
+            bucket[0] -= 1
+            bucket[2] = False
+            self.allowed += 1
+            return True, False
+
+        self.blocked += 1
+        should_warn = not bucket[2]
+        bucket[2] = True
+        return False, should_warn
+
+    def retry_after(self, key: Any) -> float:
+        """Через сколько секунд ключ снова сможет отправить сообщение"""
+        bucket = self._buckets.get(key)
+        if bucket is None or bucket[0] >= 1:
+            return 0.0
+        return (1 - bucket[0]) / self.refill_per_second
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Статистика лимитера"""
+        return {
+            "rate": self.rate,
+            "period": self.period,
+            "burst": int(self.capacity),
+            "active_keys": len(self._buckets),
+            "max_keys": self.max_keys,
+            "allowed": self.allowed,
+            "blocked": self.blocked,
+            "evicted": self.evicted,
+        }
+
+    def reset(self):
+        """Сбросить состояние и счетчики"""
+        self._buckets.clear()
+        self.allowed = 0
+        self.blocked = 0
+        self.evicted = 0
+
+
+class AntiSpamLimiter:
+    """Два лимита: на отправителя и на пару (отправитель, получатель)"""
+
+    def __init__(self):
+        self.enabled = os.getenv("ANTISPAM_ENABLED", "true").lower() != "false"
+        max_keys = int(os.getenv("ANTISPAM_MAX_KEYS", 10000))
+
+        self.sender_limiter = TokenBucketLimiter(
+            rate=int(os.getenv("ANTISPAM_SENDER_RATE", 20)),
+            period=float(os.getenv("ANTISPAM_SENDER_PERIOD", 60)),
+            burst=int(os.getenv("ANTISPAM_SENDER_BURST", 10)),
+            max_keys=max_keys
+        )
+        self.pair_limiter = TokenBucketLimiter(
+            rate=int(os.getenv("ANTISPAM_PAIR_RATE", 5)),
+            period=float(os.getenv("ANTISPAM_PAIR_PERIOD", 60)),
+            burst=int(os.getenv("ANTISPAM_PAIR_BURST", 3)),
+            max_keys=max_keys
+        )
+
+    def check(self, sender_id: int, receiver_key: Any = None) -> Tuple[bool, bool, float]:
+        """
+        Проверить, можно ли отправителю отправить сообщение получателю.
+
+        Возвращает (разрешено, нужно_предупредить, секунд_до_повтора).
+        """
+        if not self.enabled:
+            return True, False, 0.0
+
+        allowed, warn = self.sender_limiter.hit(sender_id)
+        if not allowed:
+            return False, warn, self.sender_limiter.retry_after(sender_id)
+
+        if receiver_key is not None:
+            pair_key = (sender_id, receiver_key)
+            allowed, warn = self.pair_limiter.hit(pair_key)
+            if not allowed:
+                return False, warn, self.pair_limiter.retry_after(pair_key)
+
+        return True, False, 0.0
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Счетчики для админ-панели"""
+        return {
+            "enabled": self.enabled,
+            "sender": self.sender_limiter.get_stats(),
+            "pair": self.pair_limiter.get_stats(),
+        }
+
+    def reset(self):
+        """Сбросить все лимиты"""
+        self.sender_limiter.reset()
+        self.pair_limiter.reset()
+
+
+class AntiSpamMiddleware(BaseMiddleware):
+    """
+    Middleware для роутера анонимных сообщений.
+
+    Срабатывает до хэндлера, поэтому отклоненные сообщения не доходят
+    ни до БД, ни до отправки получателю. Лимит расходуют только хэндлеры отправки,
+    помеченные флагом anon_send (имя поля FSM с id получателя): переход по ссылке
+    и кнопки меню в состоянии ожидания сообщения не считаются.
+    """
+
+    def __init__(self, limiter: "AntiSpamLimiter"):
+        self.limiter = limiter
+
+    async def _get_receiver_key(self, event: Message, data: Dict[str, Any]) -> Tuple[bool, Any]:
+        """Определить, отправляет ли сообщение анонимку, и кому она адресована (id пользователя в БД)"""
+        receiver_field = get_flag(data, "anon_send")
+        if receiver_field is None or not (event.text or "").strip():
+            return False, None
+
+        state = data.get("state")
+        if state is None:
+            return True, None
+
+        state_data = await state.get_data()
+        return True, state_data.get(receiver_field)
+
+    async def __call__(
+        self,
+        handler: Callable[[Message, Dict[str, Any]], Awaitable[Any]],
+        event: Message,
+        data: Dict[str, Any]
+    ) -> Any:
+        if not self.limiter.enabled or not event.from_user:
+            return await handler(event, data)
+
+        is_anon_send, receiver_key = await self._get_receiver_key(event, data)
+        if not is_anon_send:
+            return await handler(event, data)
+
+        allowed, warn, retry_after = self.limiter.check(event.from_user.id, receiver_key)
+        if allowed:
+            return await handler(event, data)
+
+        logger.debug(f"🚫 Антиспам: отклонено сообщение от {event.from_user.id} (получатель {receiver_key})")
+        if warn:
+            try:
+                await event.answer(
+                    f"⏳ Слишком много сообщений. Попробуйте снова через {max(1, int(retry_after + 0.5))} сек."
+                )
+            except Exception as e:
+                logger.warning(f"⚠️ Не удалось отправить предупреждение антиспама: {e}")
+        return None
+
+
+# Глобальный экземпляр
+anon_rate_limiter = AntiSpamLimiter()
@@ -0,0 +1,181 @@
+"""
+Профилирование запуска и быстрый старт (ленивая загрузка админских роутеров)
+"""
+import os
+import json
+import time
+import asyncio
+import logging
+import importlib
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Быстрый старт: админские роутеры загружаются после старта поллинга, подсчет записей - по запросу
+FAST_START = os.getenv("FAST_START", "false").lower() == "true"
+
+# Диагностика БД при запуске: "quick" - метаданные (page_count, sqlite_stat1, манифест бэкапов),
+# "full" - COUNT(*) по всем таблицам и открытие каждого бэкапа
+STARTUP_HEALTH = os.getenv("STARTUP_HEALTH", "quick").lower()
+
+
+class StartupProfiler:
+    """Замер времени фаз запуска (импорты, инициализация БД, регистрация роутеров)"""
+
+    def __init__(self, report_file: str = 'data/startup_profile.json'):
+        self.report_file = report_file
+        self.started_at = time.perf_counter()
+        self.phases: List[Dict[str, Any]] = []
+        self.ready_at: Optional[float] = None
+
+    @contextmanager
+    def phase(self, name: str, kind: str = "init"):
+        """Замерить фазу запуска"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.phases.append({
+                "name": name,
+                "kind": kind,
+                "offset_ms": round((start - self.started_at) * 1000, 1),
+                "duration_ms": round((time.perf_counter() - start) * 1000, 1),
+            })
+
+    def import_module(self, module_path: str):
+        """Импортировать модуль с замером времени"""
+        with self.phase(module_path, kind="import"):
+            return importlib.import_module(module_path)
+
+    def mark_ready(self):
+        """Отметить момент перед запуском поллинга"""
+        self.ready_at = time.perf_counter()
+
+    def get_report(self) -> Dict[str, Any]:
+        """Отчет о запуске"""
+        total = (self.ready_at or time.perf_counter()) - self.started_at
+        imports = [p for p in self.phases if p["kind"] == "import"]
+        return {
+            "fast_start": FAST_START,
+            "total_ms": round(total * 1000, 1),
+            "imports_ms": round(sum(p["duration_ms"] for p in imports), 1),
+            "phases": sorted(self.phases, key=lambda p: p["duration_ms"], reverse=True),
+            "timestamp": datetime.now().isoformat(),
+        }
+
+    def log_report(self):
+        """Вывести отчет в лог и сохранить в файл"""
+        report = self.get_report()
+        logger.info(
+            f"⏱️ Запуск до поллинга: {report['total_ms']:.0f} мс "
+            f"(импорты: {report['imports_ms']:.0f} мс, быстрый старт: {'да' if FAST_START else 'нет'})"
+        )
+        for phase in report["phases"][:10]:
+            logger.info(f"  - [{phase['kind']}] {phase['name']}: {phase['duration_ms']:.1f} мс")
+
+        try:
+            os.makedirs(os.path.dirname(self.report_file), exist_ok=True)
+            with open(self.report_file, 'w', encoding='utf-8') as f:
+                json.dump(report, f, indent=2, ensure_ascii=False)
+        except Exception as e:
+            logger.warning(f"⚠️ Не удалось сохранить отчет о запуске: {e}")
+
+        return report
+
+
+class LazyRouterLoader:
+    """
+    Отложенная загрузка тяжелых роутеров.
+
+    В диспетчер сразу включается пустой роутер-заглушка на нужной позиции. Реальный роутер
+    импортируется при первом апдейте от админа (или фоновым прогревом после старта поллинга)
+    и подключается внутрь заглушки, поэтому порядок обработки роутеров сохраняется.
+    Импорт выполняется в пуле потоков, цикл событий в это время обслуживает остальных.
+    """
+
+    def __init__(self, profiler: Optional[StartupProfiler] = None):
+        self.profiler = profiler
+        self._slots: List[Dict[str, Any]] = []
+        self._loading: Optional[asyncio.Future] = None
+        self.loaded = False
+
+    def placeholder(self, module_path: str):
+        """Создать заглушку для роутера из модуля"""
+        from aiogram import Router
+
+        slot_router = Router(name=f"lazy:{module_path}")
+        self._slots.append({"module": module_path, "router": slot_router})
+        return slot_router
+
+    def _import_modules(self) -> List[Any]:
+        """Импорт модулей роутеров (выполняется в пуле потоков)"""
+        modules = []
+        for slot in self._slots:
+            try:
+                if self.profiler:
+                    modules.append(self.profiler.import_module(slot["module"]))
+                else:
+                    modules.append(importlib.import_module(slot["module"]))
+            except Exception as e:
+                logger.error(f"❌ Ошибка отложенной загрузки роутера {slot['module']}: {e}")
+                modules.append(None)
+        return modules
+
+    async def _load(self, reason: str):
+        start = time.perf_counter()
+        modules = await asyncio.get_running_loop().run_in_executor(None, self._import_modules)
+
+        # Роутеры подключаются в цикле событий, между обработкой апдейтов
+        for slot, module in zip(self._slots, modules):
+            if module is not None:
+                slot["router"].include_router(module.router)
+
+        self.loaded = True
+        logger.info(
+            f"📋 Отложенные роутеры загружены за {(time.perf_counter() - start) * 1000:.0f} мс"
+            + (f" ({reason})" if reason else "")
+        )
+
+    async def load(self, reason: str = "") -> bool:
+        """Импортировать и подключить все отложенные роутеры (одновременные вызовы ждут один импорт)"""
+        if self.loaded:
+            return False
+        if self._loading is None:
+            self._loading = asyncio.ensure_future(self._load(reason))
+        await asyncio.shield(self._loading)
+        return True
+
+    async def warmup(self, delay: float = 30):
+        """Фоновый прогрев: загрузить роутеры, когда бот уже принимает сообщения"""
+        await asyncio.sleep(delay)
+        await self.load("прогрев")
+
+
+class LazyRouterMiddleware:
+    """
+    Outer middleware апдейтов: загружает отложенные роутеры при первом событии от админа.
+
+    Модуль не импортирует aiogram на верхнем уровне, чтобы профайлер мог замерить его импорт.
+    """
+
+    def __init__(self, loader: LazyRouterLoader, admin_ids: List[int]):
+        self.loader = loader
+        self.admin_ids = set(admin_ids)
+
+    async def __call__(
+        self,
+        handler: Callable[[Any, Dict[str, Any]], Awaitable[Any]],
+        event: Any,
+        data: Dict[str, Any]
+    ) -> Any:
+        if not self.loader.loaded:
+            user = data.get("event_from_user")
+            if user is not None and user.id in self.admin_ids:
+                await self.loader.load(f"первый запрос от админа {user.id}")
+        return await handler(event, data)
+
+
+# Глобальный профайлер запуска
+startup_profiler = StartupProfiler()
@@ -8,7 +8,12 @@ import logging
 import sqlite3
 import shutil
 from datetime import datetime
-import requests
+
+from app.backup_compression import (
+    backup_size, decompress_to, is_backup_filename, is_compressed_backup, materialized_backup
+)
+from app.backup_manifest import BackupManifest
+from app.change_journal import ChangeJournal, journal_dir_for
 
 # Настройка логирования
 logging.basicConfig(
@@ -23,6 +28,7 @@ class AutoRestore:
         self.db_path = 'data/bot.db'
         self.uploads_dir = 'uploads'
         self.latest_backup_url = None  # URL для скачивания бэкапа
+        self._journal = None
         
         # Создаем директории
         os.makedirs(self.backup_dir, exist_ok=True)
@@ -62,37 +68,48 @@ class AutoRestore:
             logger.warning("⚠️ Директория бэкапов не найдена")
             return None
         
+        manifest = BackupManifest(os.path.join(self.backup_dir, 'manifest.json'))
         backups = []
         for filename in sorted(os.listdir(self.backup_dir)):
-            if filename.endswith('.db'):
+            if is_backup_filename(filename):
                 filepath = os.path.join(self.backup_dir, filename)
                 try:
-                    # Проверяем валидность
-                    conn = sqlite3.connect(f"file:{filepath}?mode=ro", uri=True)
-                    cursor = conn.cursor()
-                    cursor.execute("SELECT name FROM sqlite_master WHERE type='table'")
-                    tables = [row[0] for row in cursor.fetchall()]
-                    conn.close()
+                    stat = os.stat(filepath)
+                    entry = manifest.get(filename, backup_size(filepath), stat.st_mtime)
+                    journal_seq = entry.get("journal_seq") if entry is not None else None
+                    if entry is not None:
+                        # Файл не менялся с последней проверки - берем таблицы из манифеста
+                        tables = entry["tables"]
+                    else:
+                        # Проверяем валидность (сжатый бэкап распаковывается во временный файл)
+                        with materialized_backup(filepath) as db_file:
+                            conn = sqlite3.connect(f"file:{db_file}?mode=ro", uri=True)
+                            cursor = conn.cursor()
+                            cursor.execute("SELECT name FROM sqlite_master WHERE type='table'")
+                            tables = [row[0] for row in cursor.fetchall()]
+                            conn.close()
                     
                     # Проверяем обязательные таблицы
                     required_tables = ['users', 'anon_messages', 'payments']
                     found_tables = [t for t in required_tables if t in tables]
                     
                     if len(found_tables) >= 2:  # Хотя бы 2 из 3 таблиц
-                        stat = os.stat(filepath)
                         backups.append({
                             'path': filepath,
                             'name': filename,
-                            'size': stat.st_size,
+                            'size': backup_size(filepath),
                             'created': datetime.fromtimestamp(stat.st_ctime),
-                            'tables': tables
+                            'tables': tables,
+                            'journal_seq': journal_seq,
+                            'journal_ranges': self._journal_ranges(filename, journal_seq),
                         })
                 except Exception:
                     continue
         
         if backups:
-            # Сортируем по дате создания (новые сначала)
-            backups.sort(key=lambda x: x['created'], reverse=True)
+            # Сортируем по дате создания (новые сначала); бэкапы, к которым применим журнал
+            # изменений, - впереди: записи после них не теряются
+            backups.sort(key=lambda x: (x['journal_ranges'] is not None, x['created']), reverse=True)
             latest = backups[0]
             logger.info(f"📂 Найден бэкап: {latest['name']} ({latest['size']:,} байт)")
             return latest
@@ -100,8 +117,30 @@ class AutoRestore:
             logger.warning("⚠️ Валидные бэкапы не найдены")
             return None
     
-    def restore_from_backup(self, backup_path):
-        """Восстанавливает БД из бэкапа"""
+    @property
+    def journal(self):
+        """Журнал изменений (открывается до запуска бота, пока его не открыл менеджер БД)"""
+        if self._journal is None:
+            self._journal = ChangeJournal(journal_dir_for(self.db_path, os.path.join(self.backup_dir, 'journal')))
+        return self._journal
+    
+    def _journal_ranges(self, filename, journal_seq):
+        """Диапазоны журнала для бэкапа или None, если журнал к нему неприменим"""
+        if journal_seq is None:
+            return None
+        try:
+            return self.journal.ranges_for(filename, journal_seq)
+        except Exception as e:
+            logger.warning(f"⚠️ Журнал изменений недоступен: {e}")
+            return None
+    
+    def restore_from_backup(self, backup_path, journal_seq=None, journal_ranges=None):
+        """
+        Восстанавливает БД из бэкапа. Если у бэкапа есть позиция журнала изменений, записи
+        после нее применяются к копии бэкапа до подмены - как в point-in-time восстановлении.
+        """
+        name = os.path.basename(backup_path)
+        work_path = f"{self.db_path}.auto_restore.tmp"
         try:
             # Создаем копию текущей БД (если есть)
             if os.path.exists(self.db_path):
@@ -110,14 +149,38 @@ class AutoRestore:
                 shutil.copy2(self.db_path, old_backup)
                 logger.info(f"💾 Сохранена текущая БД: {os.path.basename(old_backup)}")
             
-            # Восстанавливаем
-            logger.info(f"🔄 Восстановление из {os.path.basename(backup_path)}...")
-            shutil.copy2(backup_path, self.db_path)
+            # Восстанавливаем во временный файл
+            logger.info(f"🔄 Восстановление из {name}...")
+            if is_compressed_backup(backup_path):
+                decompress_to(backup_path, work_path)
+            else:
+                shutil.copy2(backup_path, work_path)
+            
+            base = None
+            if journal_ranges is not None:
+                conn = sqlite3.connect(work_path)
+                try:
+                    stats, replayed = self.journal.replay(conn, journal_ranges)
+                    conn.commit()
+                finally:
+                    conn.close()
+                logger.info(
+                    f"📝 Журнал изменений применен: записей {stats['applied']}, "
+                    f"пропущено {stats['skipped']} (диапазоны {journal_ranges})"
+                )
+                base = {"backup": name, "journal_seq": journal_seq, "ranges": replayed}
+            
+            # WAL прежней БД не должен примениться к восстановленному файлу
+            for suffix in ("-wal", "-shm"):
+                if os.path.exists(self.db_path + suffix):
+                    os.remove(self.db_path + suffix)
+            os.replace(work_path, self.db_path)
             
             # Проверяем восстановление
             if self.check_db_exists():
                 size = os.path.getsize(self.db_path)
                 logger.info(f"✅ БД восстановлена! Размер: {size:,} байт")
+                self.write_journal_barrier(name, base)
                 return True
             else:
                 logger.error("❌ Восстановление не удалось")
@@ -126,10 +189,23 @@ class AutoRestore:
         except Exception as e:
             logger.error(f"❌ Ошибка восстановления: {e}")
             return False
+        finally:
+            if os.path.exists(work_path):
+                os.remove(work_path)
+    
+    def write_journal_barrier(self, name, base):
+        """Граница в журнале изменений: записи до восстановления к прежним бэкапам не применяются"""
+        try:
+            self.journal.barrier(f"auto_restore {name}", base)
+        except Exception as e:
+            logger.warning(f"⚠️ Не удалось записать границу в журнал изменений: {e}")
     
     def download_from_url(self, url):
         """Скачивает БД с URL"""
         try:
+            # requests нужен только для скачивания, поэтому импортируется здесь
+            import requests
+            
             logger.info(f"🌐 Скачиваю БД с {url}")
             response = requests.get(url, timeout=30)
             response.raise_for_status()
@@ -188,7 +264,7 @@ class AutoRestore:
         
         # 3. Ищем локальный бэкап
         backup = self.get_latest_backup()
-        if backup and self.restore_from_backup(backup['path']):
+        if backup and self.restore_from_backup(backup['path'], backup['journal_seq'], backup['journal_ranges']):
             logger.info("✅ Восстановлено из локального бэкапа")
             return True
         
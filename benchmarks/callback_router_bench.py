@@ -0,0 +1,50 @@
+"""
+Бенчмарк диспетчеризации callback_data: линейная цепочка startswith против префиксного дерева
+
+Запуск из корня проекта:
+    python benchmarks/callback_router_bench.py
+"""
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.callback_router import CallbackRoute, CallbackTrie
+
+
+def _noop(callback):
+    pass
+
+
+def benchmark(sizes=(10, 50, 100, 500, 1000, 5000), lookups: int = 20000):
+    """Стоимость поиска хэндлера в наносекундах для разного числа зарегистрированных префиксов"""
+    print(f"{'хэндлеров':>10} | {'startswith, нс':>15} | {'trie, нс':>10}")
+    print("-" * 42)
+
+    for size in sizes:
+        patterns = [f"admin_feature_{i}_" for i in range(size)]
+        # Худший случай для цепочки: нужный хэндлер зарегистрирован последним
+        data = f"{patterns[-1]}12345"
+
+        trie = CallbackTrie()
+        for pattern in patterns:
+            trie.insert(CallbackRoute(pattern, False, _noop))
+
+        start = time.perf_counter()
+        for _ in range(lookups):
+            for pattern in patterns:
+                if data.startswith(pattern):
+                    break
+        linear_ns = (time.perf_counter() - start) / lookups * 1e9
+
+        start = time.perf_counter()
+        for _ in range(lookups):
+            trie.resolve(data)
+        trie_ns = (time.perf_counter() - start) / lookups * 1e9
+
+        print(f"{size:>10} | {linear_ns:>15.0f} | {trie_ns:>10.0f}")
+
+
+if __name__ == "__main__":
+    benchmark()
@@ -12,13 +12,14 @@ from datetime import datetime
 import signal
 import subprocess
 
-# Настройка логирования
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-)
+# Настройка логирования (очередь + отдельный поток записи, см. app/logging_setup.py)
+from app.logging_setup import setup_logging
+setup_logging()
 logger = logging.getLogger(__name__)
 
+from app.db_gate import gate_exempt
+from app.health import health_monitor
+
 # Глобальные переменные
 START_TIME = datetime.now()
 
@@ -123,6 +124,21 @@ async def on_cleanup(app):
     await asyncio.sleep(1)
     logger.info("✅ Приложение остановлено")
 
+async def start_monitoring(app):
+    """Запуск фонового сбора метрик и сторожа цикла событий"""
+    from app.metrics_sampler import metrics_sampler
+    from app.loop_watchdog import loop_watchdog
+    metrics_sampler.start()
+    loop_watchdog.start()
+
+async def stop_monitoring(app):
+    """Остановка сбора метрик (открытые потоки SSE закрываются) и сторожа цикла событий"""
+    from app.metrics_sampler import metrics_sampler
+    from app.loop_watchdog import loop_watchdog
+    await metrics_sampler.stop()
+    await loop_watchdog.stop()
+
+@gate_exempt
 async def ping_handler(request):
     """Простой пинг-эндпоинт"""
     return web.Response(
@@ -130,25 +146,64 @@ async def ping_handler(request):
         headers={'Content-Type': 'text/plain'}
     )
 
+@gate_exempt
 async def health_handler(request):
-    """Health check для Render"""
+    """Сводный статус: сервисы супервизора (или пульс бота и БД) и проверки готовности"""
+    readiness = await health_monitor.readiness()
+    supervisor = request.app.get('supervisor')
+    if supervisor is not None:
+        # Единый процесс: статус собирается из сервисов супервизора
+        health = supervisor.get_health()
+        health["timestamp"] = datetime.now().isoformat()
+        health["checks"] = readiness["checks"]
+        health["queues"] = readiness["queues"]
+        return web.json_response(health, status=200 if health["healthy"] else 503)
+    
     health_status = {
-        "status": "OK",
+        "status": "OK" if readiness["ready"] else "DEGRADED",
         "timestamp": datetime.now().isoformat(),
         "uptime": str(datetime.now() - START_TIME),
-        "bot_running": True,
-        "tables_created": True
+        "bot_running": readiness["checks"]["polling"]["ok"],
+        "database_ok": readiness["checks"]["database"]["ok"],
+        "checks": readiness["checks"],
+        "queues": readiness["queues"],
     }
     
-    return web.json_response(health_status)
+    return web.json_response(health_status, status=200 if readiness["alive"] else 503)
+
+@gate_exempt
+async def liveness_handler(request):
+    """Liveness: цикл событий отвечает, поллинг Telegram не завис (503 - процесс пора перезапустить)"""
+    liveness = health_monitor.liveness()
+    return web.json_response(liveness, status=200 if liveness["alive"] else 503,
+                             headers={'Cache-Control': 'no-store'})
+
+@gate_exempt
+async def readiness_handler(request):
+    """Readiness: живость + БД отвечает и не подменяется (503 - временно не принимать трафик)"""
+    readiness = await health_monitor.readiness()
+    return web.json_response(readiness, status=200 if readiness["ready"] else 503,
+                             headers={'Cache-Control': 'no-store'})
 
-def create_app():
-    """Создание aiohttp приложения"""
-    app = web.Application()
+def create_app(supervised: bool = False):
+    """
+    Создание aiohttp приложения
+    
+    supervised=True - приложение запускается супервизором (supervisor.py), который сам
+    выполняет восстановление БД и запускает бота, поэтому хуки on_startup/on_cleanup не нужны.
+    """
+    from app.db_gate import db_gate, create_web_middleware
+    from app.loop_watchdog import create_web_middleware as create_watchdog_middleware
+    
+    # Запросы ждут, пока идет подмена БД при восстановлении; блокировки цикла событий
+    # относятся к маршруту, который их вызвал
+    app = web.Application(middlewares=[create_watchdog_middleware(), create_web_middleware(db_gate)])
     
     # Базовые маршруты
     app.router.add_get('/ping', ping_handler)
     app.router.add_get('/health', health_handler)
+    app.router.add_get('/health/live', liveness_handler)
+    app.router.add_get('/health/ready', readiness_handler)
     
     # Загружаем веб-панель
     try:
@@ -169,11 +224,23 @@ def create_app():
     # Статические файлы
     static_path = os.path.join(os.path.dirname(__file__), 'web', 'static')
     if os.path.exists(static_path):
-        app.router.add_static('/static/', static_path, show_index=True)
+        try:
+            # Файлы с хэшем в имени и заранее сжатыми версиями
+            from web.utils.assets import assets
+            assets.setup(app, static_path)
+        except Exception as e:
+            logger.warning(f"⚠️ Сборка статики не удалась, файлы отдаются как есть: {e}")
+            app.router.add_static('/static/', static_path, show_index=True)
         logger.info(f"✅ Статические файлы подключены: {static_path}")
     
-    app.on_startup.append(on_startup)
-    app.on_cleanup.append(on_cleanup)
+    if not supervised:
+        app.on_startup.append(on_startup)
+        app.on_cleanup.append(on_cleanup)
+    
+    # Сбор метрик живет столько же, сколько веб-приложение (остановка - до ожидания
+    # открытых соединений, чтобы потоки SSE не задерживали выключение)
+    app.on_startup.append(start_monitoring)
+    app.on_shutdown.append(stop_monitoring)
     
     return app
 
@@ -182,13 +249,19 @@ def signal_handler(signum, frame):
     logger.info(f"📶 Получен сигнал {signum}, завершаем работу...")
     sys.exit(0)
 
-signal.signal(signal.SIGINT, signal_handler)
-signal.signal(signal.SIGTERM, signal_handler)
-
-# Создаем приложение для gunicorn
-app = create_app()
+def __getattr__(name):
+    """Приложение для gunicorn (render_server:app) создается при первом обращении"""
+    if name == "app":
+        global app
+        app = create_app()
+        return app
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 if __name__ == "__main__":
+    signal.signal(signal.SIGINT, signal_handler)
+    signal.signal(signal.SIGTERM, signal_handler)
+    app = create_app()
+
     port = int(os.getenv("PORT", 8080))
     logger.info(f"🚀 Локальный запуск на порту {port}")
     
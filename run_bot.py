@@ -14,17 +14,17 @@ import time
 current_dir = os.path.dirname(os.path.abspath(__file__))
 sys.path.insert(0, current_dir)
 
-# Настройка логирования
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.StreamHandler(sys.stdout),
-        logging.FileHandler('bot.log')
-    ]
-)
+# Настройка логирования: запись в консоль и logs/bot.log идет из отдельного потока
+from app.logging_setup import setup_logging, UpdateLogContextMiddleware
+setup_logging()
 logger = logging.getLogger(__name__)
 
+from app.startup import FAST_START, STARTUP_HEALTH, LazyRouterLoader, LazyRouterMiddleware, startup_profiler
+
+# Загрузчик отложенных роутеров (быстрый старт) и фоновые задачи после запуска
+lazy_router_loader = None
+_background_tasks = set()
+
 # ============ НОВОЕ: Функции для предотвращения дублирования бота ============
 
 def check_if_bot_already_running():
@@ -104,8 +104,8 @@ def setup_directories():
         os.makedirs(directory, exist_ok=True)
         logger.info(f"📁 Создана директория: {directory}")
 
-async def initialize_bot():
-    """Инициализация бота"""
+async def initialize_bot(skip_init_db: bool = False):
+    """Инициализация бота (skip_init_db - таблицы уже созданы супервизором)"""
     try:
         logger.info("🔄 Инициализация бота...")
         
@@ -127,19 +127,23 @@ async def initialize_bot():
         # ============ КОНЕЦ НОВОГО КОДА ============
         
         # ============ КРИТИЧЕСКОЕ ИЗМЕНЕНИЕ: ИНИЦИАЛИЗАЦИЯ БД ПЕРВОЙ ============
-        logger.info("🚀 ИНИЦИАЛИЗАЦИЯ БАЗЫ ДАННЫХ...")
-        try:
-            from app.database import init_db
-            if not init_db():
-                logger.error("❌ Не удалось инициализировать базу данных!")
-                # НЕ ЗАВЕРШАЕМ, пробуем продолжить, возможно таблицы уже есть
-        except Exception as e:
-            logger.error(f"❌ Ошибка инициализации БД: {e}")
-            import traceback
-            traceback.print_exc()
+        if not skip_init_db:
+            logger.info("🚀 ИНИЦИАЛИЗАЦИЯ БАЗЫ ДАННЫХ...")
+            try:
+                startup_profiler.import_module("app.database")
+                with startup_profiler.phase("init_db"):
+                    from app.database import init_db
+                    if not init_db():
+                        logger.error("❌ Не удалось инициализировать базу данных!")
+                        # НЕ ЗАВЕРШАЕМ, пробуем продолжить, возможно таблицы уже есть
+            except Exception as e:
+                logger.error(f"❌ Ошибка инициализации БД: {e}")
+                import traceback
+                traceback.print_exc()
         # ============ КОНЕЦ КРИТИЧЕСКОГО ИЗМЕНЕНИЯ ============
         
         # Загружаем конфигурацию
+        startup_profiler.import_module("app.config")
         from app.config import BOT_TOKEN, ADMIN_IDS
         
         if not BOT_TOKEN:
@@ -149,14 +153,24 @@ async def initialize_bot():
         logger.info(f"✅ Админы: {ADMIN_IDS}")
         
         # Создаем бота
+        startup_profiler.import_module("aiogram")
         from aiogram import Bot
         bot = Bot(token=BOT_TOKEN)
         
+        # Время, ошибки и 429 запросов к Telegram API (/metrics веб-панели)
+        from app.metrics import instrument_bot, instrument_dispatcher
+        instrument_bot(bot)
+        # Пульс поллинга и исходящие запросы для /health/live и /health/ready
+        from app.health import health_monitor
+        health_monitor.watch_bot(bot)
+        
         # Инициализируем менеджер БД с ботом
         logger.info("💾 Инициализация менеджера БД...")
         try:
-            from app.database_manager import init_database_manager
-            init_database_manager(bot)  # Передаем бота для отправки уведомлений
+            with startup_profiler.phase("init_database_manager"):
+                startup_profiler.import_module("app.database_manager")
+                from app.database_manager import init_database_manager
+                init_database_manager(bot)  # Передаем бота для отправки уведомлений
             logger.info("✅ Менеджер БД инициализирован с ботом")
         except Exception as e:
             logger.error(f"❌ Ошибка инициализации менеджера БД: {e}")
@@ -171,48 +185,50 @@ async def initialize_bot():
         # Регистрируем роутеры
         logger.info("📋 Регистрация роутеров...")
         
-        from app.handlers.main_handlers import router as main_router
-        from app.handlers.admin_panel import router as admin_router
-        from app.handlers.payment_handlers import router as payment_router
-        from app.handlers.anon_handlers import router as anon_router
-        from app.handlers.debug_handlers import router as debug_router
-        from app.handlers.conversations_admin import router as conversations_router
+        global lazy_router_loader
+        with startup_profiler.phase("register_routers"):
+            main_router = startup_profiler.import_module("app.handlers.main_handlers").router
+            payment_router = startup_profiler.import_module("app.handlers.payment_handlers").router
+            anon_router = startup_profiler.import_module("app.handlers.anon_handlers").router
+            debug_router = startup_profiler.import_module("app.handlers.debug_handlers").router
+            from app.callback_router import callback_index
+            
+            if FAST_START:
+                # Админские модули подключаются в заглушки при первом запросе админа
+                lazy_router_loader = LazyRouterLoader(startup_profiler)
+                conversations_router = lazy_router_loader.placeholder("app.handlers.conversations_admin")
+                admin_router = lazy_router_loader.placeholder("app.handlers.admin_panel")
+                dp.update.outer_middleware(LazyRouterMiddleware(lazy_router_loader, ADMIN_IDS))
+            else:
+                conversations_router = startup_profiler.import_module("app.handlers.conversations_admin").router
+                admin_router = startup_profiler.import_module("app.handlers.admin_panel").router
 
-        
-        dp.include_router(conversations_router)        
-        dp.include_router(main_router)
-        dp.include_router(admin_router)
-        dp.include_router(payment_router)
-        dp.include_router(anon_router)
-        dp.include_router(debug_router)
+            # Апдейты ждут, пока идет подмена БД при восстановлении
+            from app.db_gate import db_gate, DatabaseGateMiddleware
+            dp.update.outer_middleware(DatabaseGateMiddleware(db_gate))
+            
+            # update_id / user_id в записях лога и время обработки апдейта
+            dp.update.outer_middleware(UpdateLogContextMiddleware())
+            
+            # Время обработки апдейтов и хэндлеров всех роутеров (/metrics веб-панели)
+            instrument_dispatcher(dp)
+            # Блокировки цикла событий относятся к хэндлеру, который их вызвал
+            from app.loop_watchdog import label_dispatcher
+            label_dispatcher(dp)
+
+            # Индекс callback-хэндлеров всех модулей: один поиск по префиксному дереву
+            dp.include_router(callback_index.router)
+            dp.include_router(conversations_router)        
+            dp.include_router(main_router)
+            dp.include_router(admin_router)
+            dp.include_router(payment_router)
+            dp.include_router(anon_router)
+            dp.include_router(debug_router)
         
         logger.info("✅ Все роутеры зарегистрированы")
         
-        # Получаем информацию о боте
-        bot_info = await bot.get_me()
-        logger.info(f"✅ Bot: @{bot_info.username} ({bot_info.first_name})")
-        
-        # Отправляем уведомление админам
-        try:
-            from app.database_manager import db_manager
-            db_info = db_manager.get_db_info()
-            backup_count = len(db_manager.list_backups())
-            
-            message = (
-                f"🚀 <b>Бот запущен на Render!</b>\n\n"
-                f"🤖 @{bot_info.username}\n"
-                f"⏰ {datetime.now().strftime('%d.%m.%Y %H:%M')}\n"
-                f"👥 Админов: {len(ADMIN_IDS)}\n"
-                f"💾 БД: {db_info.get('size_mb', 0):.2f} MB\n"
-                f"📂 Бэкапов: {backup_count}\n\n"
-                f"✅ Готов к работе!"
-            )
-            
-            for admin_id in ADMIN_IDS:
-                await bot.send_message(admin_id, message, parse_mode="HTML")
-                logger.info(f"📨 Уведомление отправлено админу {admin_id}")
-        except Exception as e:
-            logger.error(f"❌ Ошибка отправки уведомления: {e}")
+        if not FAST_START:
+            await notify_admins_on_startup(bot)
         
         return bot, dp
         
@@ -222,6 +238,94 @@ async def initialize_bot():
         traceback.print_exc()
         raise
 
+async def notify_admins_on_startup(bot):
+    """Получить информацию о боте и отправить уведомление админам"""
+    from app.config import ADMIN_IDS
+
+    # Получаем информацию о боте
+    bot_info = await bot.get_me()
+    logger.info(f"✅ Bot: @{bot_info.username} ({bot_info.first_name})")
+    
+    # Отправляем уведомление админам
+    try:
+        from app.database_manager import db_manager
+        # В быстром режиме размер берется из метаданных, список бэкапов - из манифеста
+        if STARTUP_HEALTH == "full":
+            db_info = db_manager.get_db_info()
+        else:
+            db_info = db_manager.get_db_quick_info()
+        backup_count = len(db_manager.list_backups())
+        
+        message = (
+            f"🚀 <b>Бот запущен на Render!</b>\n\n"
+            f"🤖 @{bot_info.username}\n"
+            f"⏰ {datetime.now().strftime('%d.%m.%Y %H:%M')}\n"
+            f"👥 Админов: {len(ADMIN_IDS)}\n"
+            f"💾 БД: {db_info.get('size_mb', 0):.2f} MB\n"
+            f"📂 Бэкапов: {backup_count}\n\n"
+            f"✅ Готов к работе!"
+        )
+        
+        for admin_id in ADMIN_IDS:
+            await bot.send_message(admin_id, message, parse_mode="HTML")
+            logger.info(f"📨 Уведомление отправлено админу {admin_id}")
+    except Exception as e:
+        logger.error(f"❌ Ошибка отправки уведомления: {e}")
+
+async def run_deferred_startup(bot):
+    """Быстрый старт: то, что отложено до начала поллинга"""
+    loop = asyncio.get_running_loop()
+    
+    try:
+        # Только метаданные БД: COUNT(*) по таблицам выполняется, когда админ запросит статистику
+        from app.database import log_startup_health
+        from app.database_manager import ensure_initial_backup
+        await loop.run_in_executor(None, log_startup_health)
+        await loop.run_in_executor(None, ensure_initial_backup)
+    except Exception as e:
+        logger.error(f"❌ Ошибка отложенной диагностики БД: {e}")
+    
+    try:
+        await notify_admins_on_startup(bot)
+    except Exception as e:
+        logger.error(f"❌ Ошибка отложенного уведомления о запуске: {e}")
+    
+    if lazy_router_loader is not None:
+        await lazy_router_loader.warmup(delay=float(os.getenv("FAST_START_WARMUP_DELAY", 30)))
+
+def start_background_task(aw):
+    """Запустить фоновую задачу и сохранить ссылку на нее до завершения"""
+    task = asyncio.ensure_future(aw)
+    _background_tasks.add(task)
+    task.add_done_callback(_background_tasks.discard)
+    return task
+
+async def stop_background_tasks():
+    """Отменить фоновые задачи запуска (при остановке из супервизора)"""
+    for task in list(_background_tasks):
+        task.cancel()
+    if _background_tasks:
+        await asyncio.gather(*_background_tasks, return_exceptions=True)
+
+async def prepare_polling(bot):
+    """Подготовка к поллингу: вебхук, отчет о запуске и фоновые задачи"""
+    # Удаляем вебхук если был (чтобы не было конфликтов)
+    await bot.delete_webhook(drop_pending_updates=True)
+    
+    startup_profiler.mark_ready()
+    startup_profiler.log_report()
+    
+    # Сторож цикла событий (с веб-панелью он уже запущен ее on_startup)
+    from app.loop_watchdog import loop_watchdog
+    loop_watchdog.start()
+    
+    if FAST_START:
+        start_background_task(run_deferred_startup(bot))
+    
+    # Обновляем sqlite_stat1 для быстрых оценок количества записей при следующем запуске
+    from app.database import refresh_table_stats
+    start_background_task(asyncio.get_running_loop().run_in_executor(None, refresh_table_stats))
+
 async def run_bot():
     """Запуск бота"""
     try:
@@ -233,8 +337,7 @@ async def run_bot():
             return
         # ============ КОНЕЦ НОВОГО КОДА ============
         
-        # Удаляем вебхук если был (чтобы не было конфликтов)
-        await bot.delete_webhook(drop_pending_updates=True)
+        await prepare_polling(bot)
         
         logger.info("🚀 Бот начал работу (поллинг)...")
         
@@ -0,0 +1,364 @@
+"""
+Единый процесс ShadowTalk: восстановление БД, инициализация, бот и веб-панель
+
+Вместо run_bot.py в фоне + gunicorn + подпроцесса auto_restore.py все части работают
+как asyncio-сервисы в одном процессе: один engine БД, один кэш, один поллер.
+Сервисы запускаются по порядку, останавливаются в обратном порядке, а их состояние
+доступно веб-панели через /health.
+"""
+import os
+import sys
+import asyncio
+import signal
+import logging
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+# Настройка пути
+current_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, current_dir)
+
+# run_bot настраивает логирование (stdout + logs/bot.log) и профайлер запуска
+import run_bot
+
+logger = logging.getLogger("supervisor")
+
+
+class Service:
+    """Базовый сервис супервизора"""
+
+    name = "service"
+    critical = True  # Падение критичного сервиса останавливает процесс
+
+    def __init__(self, supervisor: "Supervisor"):
+        self.supervisor = supervisor
+        self.state = "pending"
+        self.started_at: Optional[datetime] = None
+        self.error: Optional[str] = None
+        self.restarts = 0
+
+    async def start(self):
+        """Запустить сервис. Возвращается, когда сервис готов"""
+
+    async def stop(self):
+        """Остановить сервис"""
+
+    def is_healthy(self) -> bool:
+        return self.state in ("running", "completed")
+
+    def get_status(self) -> Dict[str, Any]:
+        return {
+            "state": self.state,
+            "healthy": self.is_healthy(),
+            "critical": self.critical,
+            "started_at": self.started_at.isoformat() if self.started_at else None,
+            "restarts": self.restarts,
+            "error": self.error,
+        }
+
+
+class RestoreService(Service):
+    """Автовосстановление БД из бэкапа (бывший подпроцесс auto_restore.py)"""
+
+    name = "restore"
+    critical = False
+
+    async def start(self):
+        from auto_restore import AutoRestore
+
+        success = await asyncio.get_running_loop().run_in_executor(None, AutoRestore().run)
+        if not success:
+            raise RuntimeError("Автовосстановление не выполнено")
+        self.state = "completed"
+
+
+class DatabaseService(Service):
+    """Создание таблиц и общий engine БД для бота и веб-панели"""
+
+    name = "database"
+
+    async def start(self):
+        run_bot.startup_profiler.import_module("app.database")
+        with run_bot.startup_profiler.phase("init_db"):
+            from app.database import init_db
+            success = await asyncio.get_running_loop().run_in_executor(None, init_db)
+        if not success:
+            raise RuntimeError("Не удалось инициализировать базу данных")
+
+    async def stop(self):
+        from sqlalchemy.orm import close_all_sessions
+        from app.database import get_engine
+
+        close_all_sessions()
+        get_engine().dispose()
+        logger.info("✅ Соединения с БД закрыты")
+
+
+class BotService(Service):
+    """Telegram-бот: поллинг с перезапуском при сбоях"""
+
+    name = "bot"
+
+    def __init__(self, supervisor: "Supervisor"):
+        super().__init__(supervisor)
+        self.bot = None
+        self.dp = None
+        self.task: Optional[asyncio.Task] = None
+        self.max_restarts = int(os.getenv("BOT_MAX_RESTARTS", 5))
+        self._stopping = False
+        self._restart_requested = False
+        self._stop_event = asyncio.Event()
+
+    async def start(self):
+        # init_db уже выполнен сервисом database
+        self.bot, self.dp = await run_bot.initialize_bot(skip_init_db=True)
+        if self.bot is None or self.dp is None:
+            raise RuntimeError("Бот не был инициализирован")
+
+        await run_bot.prepare_polling(self.bot)
+        self.task = asyncio.create_task(self._polling_loop())
+
+    async def _polling_loop(self):
+        delay = 5
+        while not self._stopping:
+            try:
+                self.state = "running"
+                logger.info("🚀 Бот начал работу (поллинг)...")
+                await self.dp.start_polling(self.bot, handle_signals=False, close_bot_session=False)
+
+                if self._stopping:
+                    break
+                if self._restart_requested:
+                    self._restart_requested = False
+                    self.restarts += 1
+                    continue
+                raise RuntimeError("Поллинг неожиданно завершился")
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.restarts += 1
+                self.error = str(e)
+                logger.error(f"❌ Ошибка поллинга ({self.restarts}/{self.max_restarts}): {e}")
+
+                if self.restarts > self.max_restarts:
+                    self.state = "failed"
+                    self.supervisor.on_service_failed(self)
+                    return
+
+                self.state = "restarting"
+                try:
+                    # Пауза перед повтором прерывается остановкой сервиса
+                    await asyncio.wait_for(self._stop_event.wait(), timeout=delay)
+                except asyncio.TimeoutError:
+                    pass
+                delay = min(delay * 2, 60)
+
+    async def _stop_polling(self):
+        try:
+            await self.dp.stop_polling()
+        except RuntimeError:
+            pass  # Поллинг не запущен
+
+    async def restart(self) -> bool:
+        """Перезапустить поллинг без пересоздания бота и диспетчера"""
+        if self.task is None or self.task.done() or self.state != "running":
+            return False
+
+        logger.info("🔄 Перезапуск поллинга...")
+        self._restart_requested = True
+        await self._stop_polling()
+        return True
+
+    async def stop(self):
+        self._stopping = True
+        self._stop_event.set()
+        if self.dp is not None:
+            await self._stop_polling()
+
+        if self.task is not None:
+            try:
+                await asyncio.wait_for(self.task, timeout=10)
+            except asyncio.TimeoutError:
+                self.task.cancel()
+            except Exception:
+                pass
+
+        await run_bot.stop_background_tasks()
+        if self.bot is not None:
+            await self.bot.session.close()
+        run_bot.remove_lock_file()
+
+
+class WebService(Service):
+    """Веб-панель aiohttp в том же цикле событий"""
+
+    name = "web"
+
+    def __init__(self, supervisor: "Supervisor"):
+        super().__init__(supervisor)
+        self.runner = None
+
+    async def start(self):
+        from aiohttp import web
+        import render_server
+
+        app = render_server.create_app(supervised=True)
+        app["supervisor"] = self.supervisor
+
+        self.runner = web.AppRunner(app, access_log=None)
+        await self.runner.setup()
+
+        port = int(os.getenv("PORT", 10000))
+        site = web.TCPSite(self.runner, "0.0.0.0", port)
+        await site.start()
+        logger.info(f"🌐 Веб-панель слушает порт {port}")
+
+    async def stop(self):
+        if self.runner is not None:
+            await self.runner.cleanup()
+
+
+class KeepAliveService(Service):
+    """Самопинг для бесплатного инстанса Render"""
+
+    name = "keep_alive"
+    critical = False
+
+    def __init__(self, supervisor: "Supervisor"):
+        super().__init__(supervisor)
+        self.task: Optional[asyncio.Task] = None
+
+    async def start(self):
+        import render_server
+
+        self.task = asyncio.create_task(render_server.keep_alive_ping())
+
+    async def stop(self):
+        if self.task is not None and not self.task.done():
+            self.task.cancel()
+            try:
+                await self.task
+            except asyncio.CancelledError:
+                pass
+
+
+class Supervisor:
+    """Запуск сервисов по порядку, общий статус и упорядоченная остановка"""
+
+    def __init__(self):
+        self.services: List[Service] = [
+            RestoreService(self),
+            DatabaseService(self),
+            BotService(self),
+            WebService(self),
+            KeepAliveService(self),
+        ]
+        self.started_at = datetime.now()
+        self.exit_code = 0
+        self._stop_event: Optional[asyncio.Event] = None
+
+    def get_service(self, name: str) -> Optional[Service]:
+        for service in self.services:
+            if service.name == name:
+                return service
+        return None
+
+    def get_health(self) -> Dict[str, Any]:
+        """Сводный статус для /health"""
+        services = {service.name: service.get_status() for service in self.services}
+        critical_ok = all(
+            service.is_healthy() for service in self.services if service.critical
+        )
+        all_ok = all(status["healthy"] for status in services.values())
+
+        return {
+            "status": "ok" if all_ok else ("degraded" if critical_ok else "failed"),
+            "healthy": critical_ok,
+            "uptime": str(datetime.now() - self.started_at),
+            "pid": os.getpid(),
+            "services": services,
+        }
+
+    def on_service_failed(self, service: Service):
+        """Падение критичного сервиса останавливает весь процесс (Render перезапустит инстанс)"""
+        if service.critical:
+            logger.error(f"❌ Критичный сервис '{service.name}' упал: {service.error}")
+            self.exit_code = 1
+            self.request_stop()
+
+    def request_stop(self):
+        if self._stop_event is not None:
+            self._stop_event.set()
+
+    async def restart_service(self, name: str) -> bool:
+        service = self.get_service(name)
+        if service is None or not hasattr(service, "restart"):
+            return False
+        return await service.restart()
+
+    async def _start_all(self) -> bool:
+        for service in self.services:
+            service.state = "starting"
+            try:
+                with run_bot.startup_profiler.phase(f"service:{service.name}"):
+                    await service.start()
+                if service.state == "starting":
+                    service.state = "running"
+                service.started_at = datetime.now()
+                logger.info(f"✅ Сервис '{service.name}' запущен")
+            except Exception as e:
+                service.state = "failed"
+                service.error = str(e)
+                if service.critical:
+                    logger.error(f"❌ Не удалось запустить сервис '{service.name}': {e}")
+                    self.exit_code = 1
+                    return False
+                logger.warning(f"⚠️ Сервис '{service.name}' не запущен: {e}")
+        return True
+
+    async def _stop_all(self):
+        for service in reversed(self.services):
+            if service.state in ("pending", "stopped"):
+                continue
+            try:
+                await service.stop()
+                logger.info(f"🛑 Сервис '{service.name}' остановлен")
+            except Exception as e:
+                logger.error(f"❌ Ошибка остановки сервиса '{service.name}': {e}")
+            service.state = "stopped"
+
+    async def run(self) -> int:
+        self._stop_event = asyncio.Event()
+
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            try:
+                loop.add_signal_handler(sig, self.request_stop)
+            except NotImplementedError:
+                pass
+
+        # Перезапуск бота из веб-панели идет через супервизор, а не через новый процесс
+        from app.bot_restarter import bot_restarter
+        bot_restarter.attach_supervisor(self)
+
+        logger.info("🚀 Запуск ShadowTalk (единый процесс)...")
+        if await self._start_all():
+            startup_time = (datetime.now() - self.started_at).total_seconds()
+            logger.info(f"✅ Все сервисы запущены за {startup_time:.1f} секунд")
+            await self._stop_event.wait()
+
+        logger.info("🛑 Остановка сервисов...")
+        await self._stop_all()
+        logger.info("👋 Завершение работы")
+        return self.exit_code
+
+
+def main():
+    """Точка входа"""
+    run_bot.setup_directories()
+    supervisor = Supervisor()
+    sys.exit(asyncio.run(supervisor.run()))
+
+
+if __name__ == "__main__":
+    main()
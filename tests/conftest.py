@@ -0,0 +1,16 @@
+import os
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+# Модули приложения при импорте читают конфигурацию и создают data/, backups/ и БД
+# в текущей директории - тесты работают во временной
+_workdir = tempfile.mkdtemp(prefix="anon-bot-tests-")
+os.chdir(_workdir)
+os.environ.setdefault("BOT_TOKEN", "123456:test-token")
+os.environ.setdefault("ADMIN_IDS", "1")
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{_workdir}/data/bot.db")
+os.environ.setdefault("FAST_START", "true")
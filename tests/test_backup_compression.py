@@ -0,0 +1,52 @@
+import sqlite3
+
+import pytest
+
+from app.backup_compression import compress_db, connect_backup, consistent_db_file
+
+
+@pytest.fixture(params=["delete", "wal"])
+def live_db(tmp_path, request):
+    path = str(tmp_path / "bot.db")
+    conn = sqlite3.connect(path)
+    conn.execute(f"PRAGMA journal_mode={request.param}")
+    conn.execute("CREATE TABLE users (id INTEGER PRIMARY KEY, name TEXT)")
+    conn.executemany("INSERT INTO users (name) VALUES (?)", [(f"user{i}" * 20,) for i in range(2000)])
+    conn.commit()
+    conn.close()
+    return path
+
+
+def _insert(path: str, name: str):
+    # timeout=0: запись не ждет чужих блокировок, а сразу падает с "database is locked"
+    conn = sqlite3.connect(path, timeout=0)
+    try:
+        conn.execute("INSERT INTO users (name) VALUES (?)", (name,))
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def test_writes_commit_while_snapshot_is_read(live_db):
+    with consistent_db_file(live_db, step_pages=8) as snapshot:
+        snapshot.read(4096)
+        _insert(live_db, "during")
+        rest = snapshot.read()
+
+    assert rest
+    conn = sqlite3.connect(live_db)
+    assert conn.execute("SELECT COUNT(*) FROM users").fetchone()[0] == 2001
+    conn.close()
+
+
+def test_compressed_snapshot_is_consistent(live_db, tmp_path):
+    (backup,) = compress_db(live_db, str(tmp_path / "backup.db.gz"), "gzip")
+
+    conn = connect_backup(backup)
+    try:
+        assert conn.execute("PRAGMA integrity_check").fetchone()[0] == "ok"
+        assert conn.execute("SELECT COUNT(*) FROM users").fetchone()[0] == 2000
+    finally:
+        conn.close()
+    # Временный файл снимка не остается рядом с БД
+    assert sorted(p.name for p in tmp_path.iterdir() if "snapshot" in p.name) == []
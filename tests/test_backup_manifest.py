@@ -0,0 +1,70 @@
+import sqlite3
+
+import pytest
+
+from app import backup_manifest
+from app.backup_compression import compress_db
+from app.backup_manifest import BackupManifest, estimate_row_counts, inspect_backup
+
+
+@pytest.fixture
+def source_db(tmp_path):
+    path = str(tmp_path / "source.db")
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE users (id INTEGER PRIMARY KEY, name TEXT)")
+    conn.execute("CREATE TABLE anon_messages (id INTEGER PRIMARY KEY, text TEXT)")
+    conn.executemany("INSERT INTO users (name) VALUES (?)", [(f"user{i}",) for i in range(50)])
+    conn.commit()
+    conn.close()
+    return path
+
+
+@pytest.fixture
+def no_decompress(monkeypatch):
+    def connect_backup(path):
+        pytest.fail("бэкап распакован ради подсчета записей")
+
+    monkeypatch.setattr(backup_manifest, "connect_backup", connect_backup)
+
+
+def _trace(conn):
+    statements = []
+    conn.set_trace_callback(statements.append)
+    return statements
+
+
+def test_estimate_row_counts_uses_rowid_not_count(source_db):
+    conn = sqlite3.connect(source_db)
+    statements = _trace(conn)
+
+    assert estimate_row_counts(conn) == {"anon_messages": 0, "users": 50}
+    assert not [sql for sql in statements if "COUNT(" in sql.upper()]
+    conn.close()
+
+
+def test_compressed_backup_takes_counts_from_source(source_db, tmp_path, no_decompress):
+    conn = sqlite3.connect(source_db)
+    row_counts = estimate_row_counts(conn)
+    conn.close()
+    (backup_path,) = compress_db(source_db, str(tmp_path / "backup.db.gz"), "gzip")
+
+    entry = BackupManifest(str(tmp_path / "manifest.json")).record(backup_path, row_counts=row_counts)
+
+    assert entry["error"] is None
+    assert entry["is_valid"]
+    assert entry["row_counts"] == {"anon_messages": 0, "users": 50}
+    assert entry["total_records"] == 50
+
+
+def test_revalidation_reuses_counts_of_unchanged_file(source_db, tmp_path, monkeypatch):
+    (backup_path,) = compress_db(source_db, str(tmp_path / "backup.db.gz"), "gzip")
+    previous = inspect_backup(backup_path)
+    assert previous["row_counts"]["users"] == 50
+
+    def connect_backup(path):
+        pytest.fail("бэкап распакован повторно")
+
+    monkeypatch.setattr(backup_manifest, "connect_backup", connect_backup)
+    entry = inspect_backup(backup_path, previous=previous)
+
+    assert entry["row_counts"] == previous["row_counts"]
@@ -0,0 +1,98 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+from app.callback_router import (
+    CallbackFactory, CallbackIndex, CallbackRoute, CallbackTrie,
+    ADMIN_VIEW_CONVERSATION_CB, CONFIRM_RESTORE_CB, REPLY_CB,
+)
+
+
+def _handler(callback):
+    pass
+
+
+def _trie(*routes):
+    trie = CallbackTrie()
+    for pattern, exact in routes:
+        trie.insert(CallbackRoute(pattern, exact, _handler))
+    return trie
+
+
+def test_longest_prefix_wins():
+    trie = _trie(("admin_", False), ("admin_page_", False), ("admin_page_users_", False))
+
+    assert trie.resolve("admin_page_users_3").pattern == "admin_page_users_"
+    assert trie.resolve("admin_page_stats").pattern == "admin_page_"
+    assert trie.resolve("admin_main").pattern == "admin_"
+
+
+def test_exact_match_beats_prefix():
+    trie = _trie(("admin_", False), ("admin_main", True))
+
+    assert trie.resolve("admin_main").exact
+    # Точное значение не должно срабатывать как префикс
+    assert trie.resolve("admin_main_extra").pattern == "admin_"
+
+
+def test_no_match():
+    trie = _trie(("reply_", False), ("cancel_restore", True))
+
+    assert trie.resolve("report_1") is None
+    assert trie.resolve("cancel") is None
+    assert trie.resolve("") is None
+
+
+def test_duplicate_route_is_rejected():
+    trie = CallbackTrie()
+
+    assert trie.insert(CallbackRoute("reply_", False, _handler))
+    assert not trie.insert(CallbackRoute("reply_", False, _handler))
+    # Точный маршрут с тем же текстом - отдельная запись
+    assert trie.insert(CallbackRoute("reply_", True, _handler))
+
+
+def test_factory_round_trip():
+    assert REPLY_CB.unpack(REPLY_CB.pack(15)) == (15,)
+    assert REPLY_CB.unpack(REPLY_CB.pack(message_id=7)).message_id == 7
+
+    data = ADMIN_VIEW_CONVERSATION_CB.unpack(ADMIN_VIEW_CONVERSATION_CB.pack(3, user2_id=9))
+    assert (data.user1_id, data.user2_id) == (3, 9)
+
+
+def test_factory_last_field_keeps_underscores():
+    packed = CONFIRM_RESTORE_CB.pack("before_upload_backup.db")
+
+    assert packed == "confirm_restore_before_upload_backup.db"
+    assert CONFIRM_RESTORE_CB.unpack(packed).file_name == "before_upload_backup.db"
+
+
+def test_factory_compatible_with_legacy_format():
+    assert REPLY_CB.unpack("reply_15").message_id == 15
+
+
+def test_factory_without_fields():
+    factory = CallbackFactory("noop_")
+
+    assert factory.pack() == "noop_"
+    assert factory.unpack("noop_") == ()
+
+
+@pytest.mark.parametrize("data", ["report_1", "reply_abc", "admin_view_conversation_3"])
+def test_factory_rejects_malformed_data(data):
+    factory = REPLY_CB if not data.startswith("admin") else ADMIN_VIEW_CONVERSATION_CB
+    with pytest.raises(ValueError):
+        factory.unpack(data)
+
+
+def test_index_filter_passes_unpacked_data():
+    index = CallbackIndex(name="test_index")
+    index.factory(REPLY_CB)(_handler)
+    index.exact("cancel_restore")(_handler)
+
+    result = asyncio.run(index._resolve_filter(SimpleNamespace(data="reply_42")))
+    assert result["callback_data"].message_id == 42
+    assert "callback_data" not in asyncio.run(index._resolve_filter(SimpleNamespace(data="cancel_restore")))
+    # Фабрика не смогла разобрать данные - хэндлер не вызывается
+    assert asyncio.run(index._resolve_filter(SimpleNamespace(data="reply_x"))) is False
@@ -0,0 +1,188 @@
+import os
+import shutil
+import sqlite3
+
+import pytest
+
+from auto_restore import AutoRestore
+from app.backup_manifest import BackupManifest
+from app.change_journal import ChangeJournal, bulk_delete, journal_dir_for
+from app.database import create_tables, get_session_local
+from app.database_manager import DatabaseManager, db_manager
+from app.models import User
+
+
+def _add_user(telegram_id: int) -> int:
+    db = get_session_local()()
+    try:
+        user = User(telegram_id=telegram_id, first_name=f"user{telegram_id}")
+        db.add(user)
+        db.commit()
+        return user.id
+    finally:
+        db.close()
+
+
+def _telegram_ids():
+    db = get_session_local()()
+    try:
+        return {row.telegram_id for row in db.query(User.telegram_id)}
+    finally:
+        db.close()
+
+
+def _backup(name: str) -> str:
+    path = db_manager.create_backup(name, send_to_admins=False, compression="none")
+    assert path
+    return path
+
+
+@pytest.fixture
+def users_db():
+    """Таблицы приложения и пустая users (другие тесты могут подменять рабочую БД)"""
+    assert create_tables()
+    db = get_session_local()()
+    try:
+        db.query(User).delete()
+        db.commit()
+    finally:
+        db.close()
+
+
+def test_pitr_does_not_replay_writes_rolled_back_by_restore(users_db):
+    _add_user(2000)
+    base = _backup("pitr_base.db")
+    _add_user(2001)  # "late" - откатывается восстановлением
+
+    assert db_manager.restore_from_backup(base)
+    assert _telegram_ids() == {2000}
+    barrier = db_manager.journal.last_barrier()
+    assert barrier["base"]["backup"] == "pitr_base.db"
+
+    _add_user(2002)
+    assert db_manager.restore_point_in_time()
+    assert _telegram_ids() == {2000, 2002}
+
+    # Повторный point-in-time от того же бэкапа идет по уже записанным диапазонам
+    _add_user(2003)
+    assert db_manager.restore_point_in_time(backup_path=base)
+    assert _telegram_ids() == {2000, 2002, 2003}
+
+
+def test_backup_from_previous_timeline_is_rejected(users_db):
+    _add_user(2100)
+    old = _backup("pitr_old.db")
+    _add_user(2101)
+    other = _backup("pitr_other.db")
+
+    assert db_manager.restore_from_backup(other)
+    assert db_manager.journal.last_barrier()["base"]["backup"] == "pitr_other.db"
+
+    # Журнал после pitr_old.db относится к линии времени до восстановления
+    assert not db_manager.restore_point_in_time(backup_path=old)
+    assert _telegram_ids() == {2100, 2101}
+
+
+def test_restore_without_base_blocks_older_backups(users_db, tmp_path):
+    _add_user(2200)
+    backup = _backup("pitr_before_upload.db")
+    uploaded = tmp_path / "uploaded.db"
+    uploaded.write_bytes(open(db_manager.db_path, "rb").read())
+
+    assert db_manager.restore_from_backup(str(uploaded))
+    assert db_manager.journal.last_barrier()["base"] is None
+    assert not db_manager.restore_point_in_time(backup_path=backup)
+
+
+def test_bulk_delete_is_journaled_and_replayed(users_db):
+    _add_user(2300)
+    removed = [_add_user(2301), _add_user(2302)]
+    base = _backup("pitr_bulk.db")
+    after_seq = db_manager.journal.flush()
+
+    db = get_session_local()()
+    try:
+        assert bulk_delete(db, User, removed, chunk_size=1) == 2
+        db.commit()
+    finally:
+        db.close()
+
+    records = list(db_manager.journal.read(after_seq=after_seq))
+    assert [(r["table"], r["op"], r["row"]) for r in records] == [
+        ("users", "delete", {"id": user_id}) for user_id in removed
+    ]
+
+    assert db_manager.restore_point_in_time(backup_path=base)
+    assert _telegram_ids() == {2300}
+
+
+def test_rolled_back_bulk_delete_is_not_journaled(users_db):
+    user_id = _add_user(2400)
+    after_seq = db_manager.journal.flush()
+
+    db = get_session_local()()
+    try:
+        bulk_delete(db, User, [user_id])
+        db.rollback()
+    finally:
+        db.close()
+
+    assert list(db_manager.journal.read(after_seq=after_seq)) == []
+    assert _telegram_ids() == {2400}
+
+
+def test_admin_message_is_journaled(users_db):
+    from app.handlers.conversations_admin import save_admin_message
+
+    receiver = _add_user(2500)
+    after_seq = db_manager.journal.flush()
+
+    assert save_admin_message(None, receiver, "привет")
+
+    records = list(db_manager.journal.read(after_seq=after_seq))
+    assert [(r["table"], r["op"]) for r in records] == [("anon_messages", "upsert")]
+    assert records[0]["row"]["receiver_id"] == receiver
+    assert records[0]["row"]["text"] == "привет"
+
+
+def _sqlite_ids(path: str):
+    conn = sqlite3.connect(path)
+    try:
+        return {row[0] for row in conn.execute("SELECT telegram_id FROM users")}
+    finally:
+        conn.close()
+
+
+def _user_change(user_id: int) -> dict:
+    return {"table": "users", "op": "upsert", "pk": ["id"], "row": {"id": user_id, "telegram_id": user_id}}
+
+
+def test_auto_restore_replays_journal_tail(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    os.makedirs("data")
+    conn = sqlite3.connect("data/bot.db")
+    conn.execute("CREATE TABLE users (id INTEGER PRIMARY KEY, telegram_id INTEGER, filler TEXT)")
+    conn.execute("CREATE TABLE anon_messages (id INTEGER PRIMARY KEY)")
+    conn.execute("INSERT INTO users VALUES (1, 1, ?)", ("x" * 4096,))
+    conn.commit()
+    conn.close()
+
+    journal = ChangeJournal(journal_dir_for("data/bot.db"))
+    journal_seq = journal.checkpoint()
+    os.makedirs("backups")
+    shutil.copyfile("data/bot.db", "backups/base.db")
+    BackupManifest("backups/manifest.json").record("backups/base.db", journal_seq=journal_seq)
+    journal.append([_user_change(2)])
+    journal.flush()
+    journal.close()
+
+    # БД потеряна: автовосстановление берет бэкап и применяет журнал после него
+    os.remove("data/bot.db")
+    assert AutoRestore().run()
+    assert _sqlite_ids("data/bot.db") == {1, 2}
+
+    # Позже point-in-time от того же бэкапа по-прежнему доходит до всех записей
+    manager = DatabaseManager("data/bot.db")
+    manager.journal.append([_user_change(3)])
+    assert manager.restore_point_in_time()
+    assert _sqlite_ids("data/bot.db") == {1, 2, 3}
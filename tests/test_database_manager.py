@@ -0,0 +1,40 @@
+import pytest
+
+from app.database import create_tables, get_session_local
+from app.database_manager import db_manager, ensure_initial_backup
+from app.models import User
+
+
+@pytest.fixture
+def no_full_scans(monkeypatch):
+    """Запуск не должен считать записи COUNT(*) по всем таблицам"""
+    def get_db_info():
+        pytest.fail("get_db_info() (COUNT(*) по таблицам) на пути запуска")
+
+    monkeypatch.setattr(db_manager, "get_db_info", get_db_info)
+
+
+@pytest.fixture
+def user_row():
+    assert create_tables()
+    db = get_session_local()()
+    try:
+        if db.query(User.id).first() is None:
+            db.add(User(telegram_id=3000, first_name="user3000"))
+            db.commit()
+    finally:
+        db.close()
+
+
+def test_auto_restore_on_startup_skips_populated_db(no_full_scans, user_row):
+    assert db_manager.auto_restore_on_startup() is False
+
+
+def test_ensure_initial_backup_checks_data_without_counting(no_full_scans, user_row, monkeypatch):
+    created = []
+    monkeypatch.setattr(db_manager, "list_backups", lambda: [])
+    monkeypatch.setattr(db_manager, "create_backup", lambda name: created.append(name) or name)
+
+    ensure_initial_backup()
+
+    assert created == ["initial_backup.db"]
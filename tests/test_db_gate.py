@@ -0,0 +1,128 @@
+import asyncio
+import os
+import sqlite3
+import threading
+
+import pytest
+
+from app.db_gate import DatabaseGate, GateBusyError, db_gate
+from app.database_manager import db_manager
+
+
+def _write(path: str, writer: int, n: int):
+    conn = sqlite3.connect(path, timeout=30)
+    try:
+        conn.execute("INSERT INTO events (writer, n) VALUES (?, ?)", (writer, n))
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def _rows(path: str):
+    conn = sqlite3.connect(path)
+    try:
+        return set(conn.execute("SELECT writer, n FROM events"))
+    finally:
+        conn.close()
+
+
+@pytest.fixture
+def events_db(tmp_path):
+    """Рабочая БД с таблицей events и бэкап, в котором есть только строка (0, 0)"""
+    db_path = db_manager.db_path
+    for path in (db_path, str(tmp_path / "backup.db")):
+        conn = sqlite3.connect(path)
+        conn.execute("DROP TABLE IF EXISTS events")
+        conn.execute("CREATE TABLE events (writer INTEGER, n INTEGER)")
+        conn.commit()
+        conn.close()
+    _write(str(tmp_path / "backup.db"), 0, 0)
+    return db_path, str(tmp_path / "backup.db")
+
+
+def test_restore_under_concurrent_writers_loses_no_writes(events_db):
+    db_path, backup_path = events_db
+    generation = {"value": 0}
+    swap = db_manager._swap_database
+
+    def counting_swap(path):
+        swap(path)
+        generation["value"] += 1
+
+    async def writer(writer_id: int, stop: asyncio.Event, log: list):
+        n = 0
+        while not stop.is_set():
+            n += 1
+            async with db_gate.request():
+                before = generation["value"]
+                await asyncio.to_thread(_write, db_path, writer_id, n)
+                log.append((writer_id, n, before, generation["value"]))
+            await asyncio.sleep(0)
+
+    async def scenario():
+        stop = asyncio.Event()
+        log = []
+        tasks = [asyncio.create_task(writer(i, stop, log)) for i in range(1, 9)]
+        await asyncio.sleep(0.3)
+        db_manager._swap_database = counting_swap
+        try:
+            restored = await asyncio.to_thread(db_manager._restore_validated, backup_path)
+        finally:
+            del db_manager._swap_database
+        await asyncio.sleep(0.3)
+        stop.set()
+        await asyncio.gather(*tasks)
+        return restored, log
+
+    restored, log = asyncio.run(scenario())
+    assert restored
+    assert generation["value"] == 1
+
+    # Ни одна запись не выполнялась во время подмены
+    assert all(before == after for _, _, before, after in log)
+
+    before_swap = {(w, n) for w, n, gen, _ in log if gen == 0}
+    after_swap = {(w, n) for w, n, gen, _ in log if gen == 1}
+    assert before_swap and after_swap
+
+    # Данные - бэкап плюс все записи, подтвержденные после подмены
+    assert _rows(db_path) == {(0, 0)} | after_swap
+
+
+def test_exclusive_times_out_and_reopens_gate():
+    gate = DatabaseGate(quiesce_timeout=0.1)
+    released = threading.Event()
+
+    def hold_request():
+        with gate.try_request() as entered:
+            assert entered
+            released.wait(5)
+
+    holder = threading.Thread(target=hold_request)
+    holder.start()
+    try:
+        while gate.active == 0:
+            pass
+        with pytest.raises(GateBusyError):
+            with gate.exclusive():
+                pytest.fail("БД не должна подменяться при активных запросах")
+        assert not gate.closed
+        with gate.try_request() as entered:
+            assert entered
+    finally:
+        released.set()
+        holder.join()
+
+
+def test_restore_aborts_when_requests_do_not_finish(events_db, monkeypatch):
+    db_path, backup_path = events_db
+    _write(db_path, 5, 1)
+    monkeypatch.setattr(db_gate, "quiesce_timeout", 0.1)
+
+    with db_gate.try_request() as entered:
+        assert entered
+        assert not db_manager._restore_validated(backup_path)
+
+    assert not db_gate.closed
+    assert _rows(db_path) == {(5, 1)}
+    assert os.path.exists(db_path)
@@ -0,0 +1,75 @@
+import asyncio
+
+import pytest
+from aiogram import Bot
+from aiogram.client.session.aiohttp import AiohttpSession
+from aiogram.methods import GetMe, GetUpdates
+from aiogram.types import Update, User
+
+from app.health import HealthMonitor
+
+
+class StubSession(AiohttpSession):
+    """Сессия без сети: make_request отдает результат метода, как настоящая"""
+
+    def __init__(self, result=None, error=None):
+        super().__init__()
+        self.result = result
+        self.error = error
+
+    async def make_request(self, bot, method, timeout=None):
+        if self.error is not None:
+            raise self.error
+        return self.result
+
+
+def _call(session, method, monitor=None):
+    monitor = monitor or HealthMonitor(startup_grace=0, poll_stale=60)
+
+    async def scenario():
+        bot = Bot("123456:test-token", session=session)
+        monitor.watch_bot(bot)
+        try:
+            return monitor, await bot(method)
+        finally:
+            await session.close()
+
+    return asyncio.run(scenario())
+
+
+def test_get_updates_passes_through_and_records_poll():
+    updates = [Update(update_id=1), Update(update_id=2)]
+
+    monitor, result = _call(StubSession(result=updates), GetUpdates())
+
+    assert result == updates
+    assert monitor.last_poll is not None
+    assert monitor.updates_received == 2
+    assert monitor.polling_status()["ok"]
+
+
+def test_empty_get_updates_is_a_poll_without_updates():
+    monitor, result = _call(StubSession(result=[]), GetUpdates())
+
+    assert result == []
+    assert monitor.last_poll is not None
+    assert monitor.last_update is None
+
+
+def test_failed_get_updates_is_recorded():
+    monitor = HealthMonitor()
+
+    with pytest.raises(RuntimeError):
+        _call(StubSession(error=RuntimeError("network")), GetUpdates(), monitor)
+
+    assert monitor.last_poll_error == "RuntimeError: network"
+
+
+def test_other_methods_are_not_polls():
+    me = User(id=1, is_bot=True, first_name="bot")
+
+    monitor, result = _call(StubSession(result=me), GetMe())
+
+    assert result == me
+    assert monitor.last_poll is None
+    assert monitor.api_in_flight == 0
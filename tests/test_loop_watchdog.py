@@ -0,0 +1,44 @@
+import asyncio
+import time
+
+from app.loop_watchdog import LoopWatchdog
+
+
+async def _block(seconds: float):
+    time.sleep(seconds)
+
+
+def _stalls(blockers):
+    async def scenario():
+        watchdog = LoopWatchdog(threshold_ms=100, tick=0.01)
+        watchdog.start()
+        try:
+            await asyncio.sleep(0.05)
+            for blocker in blockers:
+                await blocker(watchdog)
+                await asyncio.sleep(0.05)
+        finally:
+            await watchdog.stop()
+        return watchdog.recent()
+
+    return asyncio.run(scenario())
+
+
+def test_unlabeled_tasks_share_a_bounded_label():
+    async def unlabeled(watchdog):
+        await asyncio.gather(*(asyncio.create_task(_block(0.2), name=f"Task-{i}") for i in range(3)))
+
+    stalls = _stalls([unlabeled])
+
+    assert stalls
+    assert {stall["where"] for stall in stalls} == {"task:_block"}
+    # Имя задачи остается в записи для лога, но не становится меткой метрики
+    assert {stall["task"] for stall in stalls} <= {"Task-0", "Task-1", "Task-2"}
+
+
+def test_activity_label_wins():
+    async def labeled(watchdog):
+        with watchdog.activity("bot:test.handler"):
+            await _block(0.2)
+
+    assert [stall["where"] for stall in _stalls([labeled])] == ["bot:test.handler"]
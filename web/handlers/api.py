@@ -2,28 +2,43 @@
 API эндпоинты для веб-панели
 """
 from aiohttp import web
+from aiogram import Bot
 import json
 import os
 import shutil
 import sqlite3
 from datetime import datetime
 import asyncio
+import logging
 from web.utils.database import get_stats
 from web.utils.system import get_system_info
+from web.utils.db_access import web_db
+from web.utils import log_reader
 
 # Импортируем менеджер БД
 import sys
 sys.path.append(os.path.join(os.path.dirname(__file__), '..', '..'))
 from app.database_manager import db_manager
+from app.backup_jobs import backup_jobs
+from app.backup_delivery import normalize_admin_ids, send_backup_file
+from app.metrics_sampler import metrics_sampler
+from app.metrics import metrics, CONTENT_TYPE as METRICS_CONTENT_TYPE, instrument_bot
+from app.loop_watchdog import loop_watchdog
+from app.db_gate import gate_exempt
+from app.db_upload import (
+    DB_UPLOAD_CHUNK_SIZE, DB_UPLOAD_MAX_BYTES, UPLOAD_DIR, DatabaseUploadWriter, UploadRejected, staged_uploads
+)
 from app.config import ADMIN_IDS, BOT_TOKEN
 
+logger = logging.getLogger(__name__)
+
 # Проверяем доступность функций переподключения
 try:
     from app.database import force_reconnect, check_database_connection
     DATABASE_RECONNECT_AVAILABLE = True
 except ImportError:
     DATABASE_RECONNECT_AVAILABLE = False
-    print("⚠️ Функции переподключения БД недоступны")
+    logger.warning("⚠️ Функции переподключения БД недоступны")
 
 # Проверяем доступность перезапуска бота
 try:
@@ -31,46 +46,37 @@ try:
     BOT_RESTART_AVAILABLE = True
 except ImportError:
     BOT_RESTART_AVAILABLE = False
-    print("⚠️ Перезапуск бота недоступен")
+    logger.warning("⚠️ Перезапуск бота недоступен")
 
 async def send_backup_to_telegram(file_path, caption):
     """Отправить файл в Telegram админам"""
     try:
-        # Динамический импорт aiogram чтобы избежать циклических импортов
-        from aiogram import Bot
-        from aiogram.types import FSInputFile
-        
         if not BOT_TOKEN:
-            print("⚠️ BOT_TOKEN не настроен")
+            logger.warning("⚠️ BOT_TOKEN не настроен")
             return {"sent": 0, "total": len(ADMIN_IDS), "error": "BOT_TOKEN не настроен"}
         
         if not ADMIN_IDS:
-            print("⚠️ ADMIN_IDS не настроены")
+            logger.warning("⚠️ ADMIN_IDS не настроены")
             return {"sent": 0, "total": 0, "error": "ADMIN_IDS не настроены"}
         
         bot = Bot(token=BOT_TOKEN)
-        sent_count = 0
+        instrument_bot(bot)
         
         file_size = os.path.getsize(file_path)
         file_size_mb = file_size / (1024 * 1024)
         
-        for admin_id in ADMIN_IDS:
-            try:
-                await bot.send_document(
-                    chat_id=admin_id,
-                    document=FSInputFile(file_path),
-                    caption=f"{caption}\n📊 Размер: {file_size_mb:.2f} MB\n⏰ {datetime.now().strftime('%H:%M:%S')}"
-                )
-                sent_count += 1
-                print(f"✅ Отправлено админу {admin_id}")
-            except Exception as e:
-                print(f"❌ Ошибка отправки админу {admin_id}: {e}")
+        # Одна загрузка файла, остальным админам - по file_id из ответа Telegram
+        result = await send_backup_file(
+            bot, normalize_admin_ids(ADMIN_IDS), file_path,
+            caption=f"{caption}\n📊 Размер: {file_size_mb:.2f} MB\n⏰ {datetime.now().strftime('%H:%M:%S')}"
+        )
+        sent_count = result["sent"]
         
         await bot.session.close()
         return {"sent": sent_count, "total": len(ADMIN_IDS)}
         
     except Exception as e:
-        print(f"❌ Ошибка в send_backup_to_telegram: {e}")
+        logger.error(f"❌ Ошибка в send_backup_to_telegram: {e}")
         return {"sent": 0, "total": len(ADMIN_IDS), "error": str(e)}
 
 # ==================== API ЭНДПОИНТЫ ====================
@@ -78,7 +84,7 @@ async def send_backup_to_telegram(file_path, caption):
 async def api_stats_handler(request):
     """API для получения статистики"""
     try:
-        stats = get_stats()
+        stats = await web_db.run(get_stats)
         return web.json_response({
             'success': True,
             'total_users': stats['total_users'],
@@ -96,7 +102,7 @@ async def api_stats_handler(request):
 async def api_system_stats_handler(request):
     """API для получения системной статистики"""
     try:
-        system_info = get_system_info()
+        system_info = await web_db.run(get_system_info)
         return web.json_response({
             'success': True,
             'cpu_percent': system_info['cpu_percent'],
@@ -110,10 +116,81 @@ async def api_system_stats_handler(request):
             'error': str(e)
         }, status=500)
 
+@gate_exempt
+async def api_metrics_history(request):
+    """API: снимки метрик из кольцевого буфера сборщика"""
+    return web.json_response({
+        'success': True,
+        'interval': metrics_sampler.interval,
+        'samples': metrics_sampler.history()
+    })
+
+@gate_exempt
+async def api_metrics_stream(request):
+    """
+    Поток метрик (Server-Sent Events)
+
+    Сначала отправляется история (событие history), затем каждый новый снимок. Все
+    подписчики ждут один и тот же цикл сбора, запросов к psutil и БД поток не делает.
+    """
+    response = web.StreamResponse(headers={
+        'Content-Type': 'text/event-stream',
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'
+    })
+    await response.prepare(request)
+
+    try:
+        retry_ms = int(metrics_sampler.interval * 1000)
+        history = json.dumps(metrics_sampler.history())
+        await response.write(f"retry: {retry_ms}\nevent: history\ndata: {history}\n\n".encode())
+        async for sample in metrics_sampler.subscribe():
+            await response.write(f"data: {json.dumps(sample)}\n\n".encode())
+    except ConnectionResetError:
+        # Вкладка закрыта: подписка снимается при выходе из цикла
+        pass
+
+    return response
+
+@gate_exempt
+async def api_loop_stalls(request):
+    """API: последние блокировки цикла событий (метка хэндлера/маршрута, длительность, стек)"""
+    return web.json_response({
+        'success': True,
+        'running': loop_watchdog.running,
+        'threshold_ms': loop_watchdog.threshold * 1000,
+        'max_lag_ms': round(loop_watchdog.max_lag_ms, 1),
+        'stalls': loop_watchdog.recent()
+    })
+
+@gate_exempt
+async def api_prometheus_metrics(request):
+    """
+    Метрики в текстовом формате Prometheus
+
+    Только чтение счетчиков в памяти: запросов к БД нет, поэтому отвечает и во
+    время восстановления БД.
+    """
+    return web.Response(body=metrics.render().encode(), headers={'Content-Type': METRICS_CONTENT_TYPE})
+
 async def api_create_backup(request):
-    """API для создания бэкапа"""
+    """
+    API для создания бэкапа
+    
+    Бэкап выполняется в фоновом потоке. С параметром async=1 ответ возвращается сразу
+    с ID задачи, статус опрашивается через /api/backup_job?id=...
+    """
     try:
-        backup_path = db_manager.create_backup()
+        job = backup_jobs.submit()
+        
+        if request.query.get('async') == '1':
+            return web.json_response({
+                'success': True,
+                'job': job.to_dict()
+            }, status=202)
+        
+        await backup_jobs.wait(job)
+        backup_path = job.result_path
         
         if backup_path:
             backup_name = os.path.basename(backup_path)
@@ -131,7 +208,7 @@ async def api_create_backup(request):
                 'size': size,
                 'size_mb': round(size / (1024 * 1024), 2),
                 'timestamp': datetime.now().isoformat(),
-                'backup_count': len(db_manager.list_backups()),
+                'backup_count': len(await web_db.run(db_manager.list_backups)),
                 'telegram_sent': send_result['sent'],
                 'telegram_total': send_result['total']
             }
@@ -143,7 +220,8 @@ async def api_create_backup(request):
         else:
             return web.json_response({
                 'success': False,
-                'error': 'Не удалось создать бэкап'
+                'error': job.error or 'Не удалось создать бэкап',
+                'job': job.to_dict()
             }, status=500)
             
     except Exception as e:
@@ -152,6 +230,106 @@ async def api_create_backup(request):
             'error': str(e)
         }, status=500)
 
+async def api_backup_job(request):
+    """API статуса задачи бэкапа"""
+    job = backup_jobs.get(request.query.get('id', ''))
+    if job is None:
+        return web.json_response({
+            'success': False,
+            'error': 'Задача не найдена'
+        }, status=404)
+    
+    response_data = {
+        'success': True,
+        'job': job.to_dict()
+    }
+    if job.state == 'done' and job.result_path and os.path.exists(job.result_path):
+        size = os.path.getsize(job.result_path)
+        response_data['backup_name'] = os.path.basename(job.result_path)
+        response_data['size_mb'] = round(size / (1024 * 1024), 2)
+    
+    return web.json_response(response_data)
+
+async def api_backup_jobs(request):
+    """API списка последних задач бэкапа"""
+    return web.json_response({
+        'success': True,
+        'jobs': [job.to_dict() for job in backup_jobs.list_jobs()]
+    })
+
+async def api_cancel_backup_job(request):
+    """API отмены задачи бэкапа"""
+    job_id = request.query.get('id', '')
+    if backup_jobs.cancel(job_id):
+        return web.json_response({
+            'success': True,
+            'message': f'Отмена задачи {job_id} запрошена'
+        })
+    return web.json_response({
+        'success': False,
+        'error': 'Задача не найдена или уже завершена'
+    }, status=404)
+
+async def api_create_incremental_backup(request):
+    """API для создания инкрементального бэкапа (фоновая задача, ответ сразу с ID задачи)"""
+    try:
+        job = backup_jobs.submit(request.query.get('name') or None, incremental=True)
+        return web.json_response({
+            'success': True,
+            'job': job.to_dict()
+        }, status=202)
+    except Exception as e:
+        return web.json_response({
+            'success': False,
+            'error': str(e)
+        }, status=500)
+
+async def api_incremental_backups(request):
+    """API списка инкрементальных снимков и статистики хранилища чанков"""
+    try:
+        snapshots = await asyncio.to_thread(db_manager.list_incremental_backups)
+        stats = await asyncio.to_thread(db_manager.incremental.get_stats)
+        return web.json_response({
+            'success': True,
+            'snapshots': snapshots,
+            'stats': stats
+        })
+    except Exception as e:
+        return web.json_response({
+            'success': False,
+            'error': str(e)
+        }, status=500)
+
+async def api_restore_incremental(request):
+    """API для восстановления из инкрементального снимка"""
+    try:
+        name = request.query.get('name', '')
+        if not name or os.path.basename(name) != name:
+            return web.json_response({
+                'success': False,
+                'error': 'Не указано имя снимка'
+            }, status=400)
+        
+        success = await asyncio.to_thread(db_manager.restore_from_incremental, name)
+        if not success:
+            return web.json_response({
+                'success': False,
+                'error': 'Ошибка восстановления из снимка'
+            }, status=500)
+        
+        # Соединения пула переоткрываются внутри восстановления (шлюз БД)
+        return web.json_response({
+            'success': True,
+            'message': f'БД восстановлена из снимка {name}',
+            'db_reconnected': True,
+            'timestamp': datetime.now().isoformat()
+        })
+    except Exception as e:
+        return web.json_response({
+            'success': False,
+            'error': str(e)
+        }, status=500)
+
 async def api_restore_backup(request):
     """API для восстановления из бэкапа"""
     try:
@@ -171,16 +349,11 @@ async def api_restore_backup(request):
             }, status=404)
         
         # Восстанавливаем
-        success = db_manager.restore_from_backup(backup_path)
+        success = await db_manager.async_restore_from_backup(backup_path)
         
         if success:
-            # Пытаемся переподключить БД сразу
-            db_reconnected = False
-            if DATABASE_RECONNECT_AVAILABLE:
-                try:
-                    db_reconnected = force_reconnect()
-                except Exception as e:
-                    print(f"⚠️ Ошибка переподключения БД: {e}")
+            # Соединения пула переоткрываются внутри восстановления (шлюз БД)
+            db_reconnected = True
             
             # Отправляем уведомление админам
             await send_backup_to_telegram(
@@ -192,7 +365,7 @@ async def api_restore_backup(request):
             response = {
                 'success': True,
                 'message': f'БД восстановлена из {file_name}',
-                'requires_restart': True,
+                'requires_restart': False,
                 'db_reconnected': db_reconnected,
                 'bot_restart_available': BOT_RESTART_AVAILABLE,
                 'timestamp': datetime.now().isoformat()
@@ -219,12 +392,12 @@ async def api_restore_backup(request):
 async def api_cleanup_backups(request):
     """API для очистки старых бэкапов"""
     try:
-        deleted_count = db_manager.cleanup_old_backups()
+        deleted_count = await web_db.run(db_manager.cleanup_old_backups)
         
         return web.json_response({
             'success': True,
             'deleted': deleted_count,
-            'backup_count': len(db_manager.list_backups()),
+            'backup_count': len(await web_db.run(db_manager.list_backups)),
             'timestamp': datetime.now().isoformat()
         })
             
@@ -237,15 +410,16 @@ async def api_cleanup_backups(request):
 async def api_dbinfo(request):
     """API для получения информации о БД"""
     try:
-        db_info = db_manager.get_db_info()
-        backups = db_manager.list_backups()
+        db_info, backups = await asyncio.gather(
+            web_db.run(db_manager.get_db_info), web_db.run(db_manager.list_backups)
+        )
         
         return web.json_response({
             'success': True,
             'db_info': db_info,
             'backup_count': len(backups),
             'timestamp': datetime.now().isoformat()
-        })
+        }, dumps=lambda data: json.dumps(data, default=str))
             
     except Exception as e:
         return web.json_response({
@@ -297,35 +471,44 @@ async def api_get_backup_info(request):
         size_mb = stat.st_size / (1024 * 1024)
         created = datetime.fromtimestamp(stat.st_ctime)
         
-        # Получаем информацию о содержимом БД
-        conn = sqlite3.connect(f"file:{backup_path}?mode=ro", uri=True)
-        cursor = conn.cursor()
-        
-        cursor.execute("SELECT name FROM sqlite_master WHERE type='table'")
-        tables = [row[0] for row in cursor.fetchall()]
+        # Таблицы и число записей - из манифеста бэкапов (записаны при создании),
+        # целостность - потоковым SHA-256 в потоке, без запросов к таблицам
+        entry = await web_db.run(db_manager.manifest.entry_for, backup_path) or {}
+        verification = await asyncio.to_thread(db_manager.verify_backup, backup_path)
+        tables = entry.get('tables', [])
+        row_counts = entry.get('row_counts', {})
+        total_records = entry.get('total_records', 0)
+        
+        # Колонки читаются из схемы только у несжатого бэкапа (сжатый пришлось бы распаковать)
+        columns_by_table = {}
+        if not entry.get('compressed'):
+            def read_columns(conn):
+                return {
+                    table: [col[1] for col in conn.execute(f'PRAGMA table_info("{table}")')]
+                    for table in tables
+                }
+            try:
+                columns_by_table = await web_db.read(read_columns, backup_path)
+            except sqlite3.Error:
+                pass
         
         table_info = []
-        total_records = 0
-        
         for table in tables:
-            try:
-                cursor.execute(f"SELECT COUNT(*) FROM {table}")
-                count = cursor.fetchone()[0]
-                total_records += count
-                
-                cursor.execute(f"PRAGMA table_info({table})")
-                columns = cursor.fetchall()
-                
-                table_info.append({
-                    'name': table,
-                    'records': count,
-                    'columns': len(columns),
-                    'column_names': [col[1] for col in columns[:5]]
-                })
-            except:
-                continue
+            columns = columns_by_table.get(table, [])
+            table_info.append({
+                'name': table,
+                'records': row_counts.get(table) or 0,
+                'columns': len(columns),
+                'column_names': columns[:5]
+            })
         
-        conn.close()
+        if verification['ok']:
+            integrity = (
+                f"✅ SHA-256 {'совпадает' if verification['sha256_match'] else 'не записан'}, "
+                f"{verification['page_count'] or '?'} стр. ({verification['seconds']:.2f} сек)"
+            )
+        else:
+            integrity = f"❌ {verification['error']}"
         
         html = f'''
         <div style="margin-bottom: 20px;">
@@ -353,6 +536,11 @@ async def api_get_backup_info(request):
             <div>{total_records:,}</div>
         </div>
         
+        <div style="margin-bottom: 20px;">
+            <div style="font-weight: 600; color: var(--primary); margin-bottom: 5px;">Целостность:</div>
+            <div>{integrity}</div>
+        </div>
+        
         <div style="margin-bottom: 20px;">
             <div style="font-weight: 600; color: var(--primary); margin-bottom: 10px;">Таблицы:</div>
             <div style="max-height: 300px; overflow-y: auto;">
@@ -397,10 +585,72 @@ async def api_get_backup_info(request):
             'error': str(e)
         }, status=500)
 
+async def api_verify_backup(request):
+    """API проверки целостности бэкапа: SHA-256 и заголовок, quick=1 - еще PRAGMA quick_check"""
+    try:
+        file_name = os.path.basename(request.query.get('file', ''))
+        backup_path = os.path.join('backups', file_name)
+        if not file_name or not os.path.exists(backup_path):
+            return web.json_response({
+                'success': False,
+                'error': 'Файл не найден'
+            }, status=404)
+        
+        quick = request.query.get('quick', '0') in ('1', 'true')
+        result = await asyncio.to_thread(db_manager.verify_backup, backup_path, quick)
+        return web.json_response({
+            'success': True,
+            'file': file_name,
+            **result
+        })
+        
+    except Exception as e:
+        return web.json_response({
+            'success': False,
+            'error': str(e)
+        }, status=500)
+
+def _read_detailed_counts(conn: sqlite3.Connection) -> dict:
+    """Статистика текущей БД для api_get_db_detailed_info (выполняется в пуле веб-панели)"""
+    cursor = conn.cursor()
+    counts = {}
+    
+    # Получаем статистику по пользователям
+    try:
+        counts['users'] = cursor.execute("SELECT COUNT(*) FROM users").fetchone()[0]
+        counts['active_users'] = cursor.execute("SELECT COUNT(*) FROM users WHERE anon_link_uid IS NOT NULL").fetchone()[0]
+        counts['premium_users'] = cursor.execute("SELECT COUNT(*) FROM users WHERE available_reveals > 0").fetchone()[0]
+    except sqlite3.OperationalError as e:
+        if "interrupted" in str(e):
+            raise
+        counts['users'] = counts['active_users'] = counts['premium_users'] = 0
+    
+    # Получаем статистику по сообщениям
+    try:
+        counts['messages'] = cursor.execute("SELECT COUNT(*) FROM anon_messages").fetchone()[0]
+        counts['messages_today'] = cursor.execute(
+            "SELECT COUNT(*) FROM anon_messages WHERE timestamp >= datetime('now', '-1 day')"
+        ).fetchone()[0]
+    except sqlite3.OperationalError as e:
+        if "interrupted" in str(e):
+            raise
+        counts['messages'] = counts['messages_today'] = 0
+    
+    # Получаем статистику по платежам
+    try:
+        counts['payments'] = cursor.execute("SELECT COUNT(*) FROM payments WHERE status = 'completed'").fetchone()[0]
+        counts['revenue'] = cursor.execute("SELECT SUM(amount) FROM payments WHERE status = 'completed'").fetchone()[0] or 0
+    except sqlite3.OperationalError as e:
+        if "interrupted" in str(e):
+            raise
+        counts['payments'] = counts['revenue'] = 0
+    
+    return counts
+
 async def api_get_db_detailed_info(request):
     """API для получения детальной информации о текущей БД"""
     try:
-        db_info = db_manager.get_db_info()
+        db_info = await web_db.run(db_manager.get_db_info)
         db_path = db_manager.db_path
         
         if not os.path.exists(db_path):
@@ -413,43 +663,10 @@ async def api_get_db_detailed_info(request):
         size_mb = stat.st_size / (1024 * 1024)
         modified = datetime.fromtimestamp(stat.st_mtime)
         
-        conn = sqlite3.connect(db_path)
-        cursor = conn.cursor()
-        
-        # Получаем статистику по пользователям
-        try:
-            cursor.execute("SELECT COUNT(*) FROM users")
-            users_count = cursor.fetchone()[0]
-            
-            cursor.execute("SELECT COUNT(*) FROM users WHERE anon_link_uid IS NOT NULL")
-            active_users = cursor.fetchone()[0]
-            
-            cursor.execute("SELECT COUNT(*) FROM users WHERE available_reveals > 0")
-            premium_users = cursor.fetchone()[0]
-        except:
-            users_count = active_users = premium_users = 0
-        
-        # Получаем статистику по сообщениям
-        try:
-            cursor.execute("SELECT COUNT(*) FROM anon_messages")
-            messages_count = cursor.fetchone()[0]
-            
-            cursor.execute("SELECT COUNT(*) FROM anon_messages WHERE timestamp >= datetime('now', '-1 day')")
-            messages_today = cursor.fetchone()[0]
-        except:
-            messages_count = messages_today = 0
-        
-        # Получаем статистику по платежам
-        try:
-            cursor.execute("SELECT COUNT(*) FROM payments WHERE status = 'completed'")
-            payments_count = cursor.fetchone()[0]
-            
-            cursor.execute("SELECT SUM(amount) FROM payments WHERE status = 'completed'")
-            total_revenue = cursor.fetchone()[0] or 0
-        except:
-            payments_count = total_revenue = 0
-        
-        conn.close()
+        counts = await web_db.read(_read_detailed_counts, db_path)
+        users_count, active_users, premium_users = counts['users'], counts['active_users'], counts['premium_users']
+        messages_count, messages_today = counts['messages'], counts['messages_today']
+        payments_count, total_revenue = counts['payments'], counts['revenue']
         
         # Форматируем выручку
         revenue_formatted = f"{total_revenue / 100:.2f} ₽" if total_revenue else "0.00 ₽"
@@ -606,80 +823,92 @@ async def api_send_current_db_to_admins(request):
             'error': str(e)
         }, status=500)
 
+def _reject_upload(error: str, status: int = 400):
+    """Отказ в загрузке до конца тела запроса: непрочитанный остаток не должен попасть в следующий запрос"""
+    response = web.json_response({
+        'success': False,
+        'error': error
+    }, status=status)
+    response.force_close()
+    return response
+
 async def api_upload_db(request):
-    """API для загрузки новой БД"""
+    """
+    API для загрузки новой БД.
+    
+    Файл читается из multipart-потока один раз: запись на диск, SHA-256, лимит размера и
+    проверка заголовка SQLite идут по мере поступления (app.db_upload). Флажки формы
+    могут идти в любом порядке относительно файла.
+    """
+    # Заголовки multipart добавляют к файлу немного байт
+    if request.content_length and request.content_length > DB_UPLOAD_MAX_BYTES + 64 * 1024:
+        return _reject_upload(
+            f'Файл слишком большой. Максимальный размер: {DB_UPLOAD_MAX_BYTES // (1024 * 1024)}MB', 413)
+    
+    staged = None
     try:
         reader = await request.multipart()
-        field = await reader.next()
+        form = {}
         
-        if field.name != 'database':
+        while True:
+            field = await reader.next()
+            if field is None:
+                break
+            
+            if field.name != 'database':
+                form[field.name] = await field.text()
+                continue
+            
+            if staged is not None:
+                return _reject_upload('Можно загрузить только один файл')
+            
+            filename = os.path.basename(field.filename or '')
+            if not filename.endswith('.db'):
+                return _reject_upload('Только файлы .db разрешены')
+            
+            filepath = os.path.join(UPLOAD_DIR, f"upload_{int(datetime.now().timestamp())}_{filename}")
+            with DatabaseUploadWriter(filepath) as writer:
+                while True:
+                    chunk = await field.read_chunk(DB_UPLOAD_CHUNK_SIZE)
+                    if not chunk:
+                        break
+                    await asyncio.to_thread(writer.write, chunk)
+                staged = await asyncio.to_thread(writer.finish)
+        
+        if staged is None:
             return web.json_response({
                 'success': False,
                 'error': 'Неверное поле'
             }, status=400)
         
-        filename = field.filename
-        if not filename.endswith('.db'):
-            return web.json_response({
-                'success': False,
-                'error': 'Только файлы .db разрешены'
-            }, status=400)
-        
-        # Создаем директорию uploads если нет
-        upload_dir = 'uploads'
-        os.makedirs(upload_dir, exist_ok=True)
-        
-        filepath = os.path.join(upload_dir, f"upload_{int(datetime.now().timestamp())}_{filename}")
-        
-        # Записываем файл
-        size = 0
-        with open(filepath, 'wb') as f:
-            while True:
-                chunk = await field.read_chunk()
-                if not chunk:
-                    break
-                size += len(chunk)
-                f.write(chunk)
-        
-        print(f"📁 Файл загружен: {filepath} ({size} байт)")
+        filepath = staged.path
         
         # Проверяем валидность
-        if not db_manager.validate_backup(filepath):
-            os.remove(filepath)
+        if not await web_db.run(db_manager.validate_backup, filepath):
             return web.json_response({
                 'success': False,
                 'error': 'Файл не является валидной SQLite БД'
             }, status=400)
         
         # Создаем бекап текущей БД если запрошено
-        data = await request.post()
-        create_backup = data.get('create_backup', 'off') == 'on'
+        create_backup = form.get('create_backup', 'off') == 'on'
         
         if create_backup:
-            db_manager.create_backup("before_upload_backup.db", send_to_admins=False)
-            print("✅ Бекап текущей БД создан")
+            await db_manager.async_create_backup("before_upload_backup.db", send_to_admins=False)
+            logger.info("✅ Бекап текущей БД создан")
         
         # Восстанавливаем БД
-        print(f"🔄 Восстанавливаю БД из {filepath}")
-        success = db_manager.restore_from_backup(filepath)
-        
-        # Очищаем загруженный файл
-        if os.path.exists(filepath):
-            os.remove(filepath)
+        logger.info(f"🔄 Восстанавливаю БД из {filepath}")
+        success = await db_manager.async_restore_from_backup(filepath, verified=staged.verify_result())
         
         if success:
-            print("✅ БД восстановлена успешно")
+            logger.info("✅ БД восстановлена успешно")
             
-            # Пытаемся переподключить БД
-            db_reconnected = False
-            if DATABASE_RECONNECT_AVAILABLE:
-                try:
-                    db_reconnected = force_reconnect()
-                except Exception as e:
-                    print(f"⚠️ Ошибка переподключения БД: {e}")
+            # Соединения пула переоткрываются внутри восстановления (шлюз БД)
+            db_reconnected = True
             
             # Отправляем админам если запрошено
-            send_to_admins = data.get('send_to_admins', 'off') == 'on'
+            send_to_admins = form.get('send_to_admins', 'off') == 'on'
             if send_to_admins:
                 await send_backup_to_telegram(
                     db_manager.db_path, 
@@ -689,7 +918,7 @@ async def api_upload_db(request):
             return web.json_response({
                 'success': True,
                 'message': '✅ БД успешно загружена и восстановлена!',
-                'requires_restart': True,
+                'requires_restart': False,
                 'db_reconnected': db_reconnected,
                 'bot_restart_available': BOT_RESTART_AVAILABLE,
                 'timestamp': datetime.now().isoformat()
@@ -700,6 +929,9 @@ async def api_upload_db(request):
                 'error': '❌ Ошибка восстановления БД'
             }, status=500)
             
+    except UploadRejected as e:
+        logger.warning(f"⚠️ Загрузка БД отклонена: {e}")
+        return _reject_upload(str(e), 413 if e.too_large else 400)
     except Exception as e:
         import traceback
         traceback.print_exc()
@@ -707,6 +939,12 @@ async def api_upload_db(request):
             'success': False,
             'error': f'❌ Ошибка: {str(e)}'
         }, status=500)
+    finally:
+        # Очищаем загруженный файл
+        if staged is not None:
+            staged_uploads.discard(staged.path)
+            if os.path.exists(staged.path):
+                os.remove(staged.path)
 
 # ==================== НОВЫЕ API ДЛЯ УПРАВЛЕНИЯ ====================
 
@@ -723,7 +961,7 @@ async def api_reconnect_db(request):
         
         if success:
             # Проверяем соединение
-            check_result = check_database_connection()
+            check_result = await web_db.run(check_database_connection)
             
             return web.json_response({
                 'success': True,
@@ -752,7 +990,7 @@ async def api_check_db_connection(request):
                 'error': 'Функция проверки соединения недоступна'
             }, status=500)
         
-        result = check_database_connection()
+        result = await web_db.run(check_database_connection)
         
         return web.json_response({
             'success': result['success'],
@@ -839,3 +1077,110 @@ async def api_send_backup(request):
         'message': f'Backup {file_name} будет отправлен',
         'timestamp': datetime.now().isoformat()
     })
+
+# ==================== ЛОГИ ====================
+
+def _log_query_int(request, name: str, default: int, maximum: int) -> int:
+    try:
+        return max(1, min(int(request.query.get(name, default)), maximum))
+    except ValueError:
+        return default
+
+@gate_exempt
+async def api_logs_tail(request):
+    """API: последние строки лога (?file=&lines=)"""
+    path = log_reader.resolve_log_file(request.query.get('file'))
+    if path is None:
+        return web.json_response({'success': False, 'error': 'Лог не найден'}, status=404)
+    
+    lines = await asyncio.to_thread(log_reader.tail, path, _log_query_int(request, 'lines', 200, 5000))
+    return web.json_response({
+        'success': True,
+        'file': request.query.get('file') or log_reader.LOG_FILE,
+        'lines': lines
+    })
+
+@gate_exempt
+async def api_logs_search(request):
+    """
+    API: поиск по логам (?file=&level=&q=&period=&since=&until=&limit=)
+
+    Без file поиск идет по основному логу и всем его ротированным копиям.
+    """
+    since, until = log_reader.period_bounds(request.query.get('period'))
+    try:
+        result = await asyncio.to_thread(
+            log_reader.search_logs,
+            name=request.query.get('file') or None,
+            level=request.query.get('level'),
+            text=request.query.get('q') or None,
+            since=request.query.get('since') or since,
+            until=request.query.get('until') or until,
+            limit=_log_query_int(request, 'limit', 200, 2000)
+        )
+    except FileNotFoundError as e:
+        return web.json_response({'success': False, 'error': str(e)}, status=404)
+    
+    return web.json_response({'success': True, **result})
+
+@gate_exempt
+async def api_logs_download(request):
+    """API: скачать файл лога (отдается потоком, без чтения в память)"""
+    path = log_reader.resolve_log_file(request.query.get('file'))
+    if path is None:
+        return web.Response(status=404, text="Лог не найден")
+    
+    return web.FileResponse(path, headers={
+        'Content-Disposition': f'attachment; filename="{os.path.basename(path)}"',
+        'Content-Type': 'application/gzip' if path.endswith('.gz') else 'text/plain; charset=utf-8'
+    })
+
+@gate_exempt
+async def api_logs_stream(request):
+    """
+    Live-tail лога (Server-Sent Events, ?file=&level=&q=)
+
+    Новые записи приходят по мере появления; фильтр по уровню применяется к первой
+    строке записи, продолжения (traceback) идут вместе с ней.
+    """
+    path = log_reader.resolve_log_file(request.query.get('file'))
+    if path is None:
+        return web.Response(status=404, text="Лог не найден")
+    
+    level = (request.query.get('level') or '').upper()
+    min_level = log_reader.LEVELS.index(level) if level in log_reader.LEVELS else 0
+    needle = (request.query.get('q') or '').lower()
+    
+    response = web.StreamResponse(headers={
+        'Content-Type': 'text/event-stream',
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'
+    })
+    await response.prepare(request)
+    
+    try:
+        await response.write(b": connected\n\n")
+        show_record = min_level == 0
+        async for lines in log_reader.follow(path):
+            selected = []
+            for line in lines:
+                header = log_reader.parse_header(line)
+                if header is not None:
+                    show_record = log_reader.LEVELS.index(header[2]) >= min_level
+                if show_record and (not needle or needle in line.lower()):
+                    selected.append(line)
+            if selected:
+                await response.write(f"data: {json.dumps(selected, ensure_ascii=False)}\n\n".encode())
+            else:
+                # Комментарий SSE: проверка, что вкладка еще открыта
+                await response.write(b": ping\n\n")
+    except ConnectionResetError:
+        pass
+    
+    return response
+
+@gate_exempt
+async def api_clear_logs(request):
+    """API: очистить логи (основной лог обрезается, остальные файлы удаляются)"""
+    removed = await asyncio.to_thread(log_reader.clear_logs)
+    return web.json_response({'success': True, 'cleared': removed})
@@ -9,15 +9,16 @@ from datetime import datetime
 
 # Используем глобальный экземпляр из database_manager
 from app.database_manager import db_manager
+from web.utils.db_access import web_db
 
 async def backups_handler(request):
     """Страница управления бекапами"""
     try:
         # Получаем список бэкапов через менеджер
-        backups = db_manager.list_backups()
+        backups = await web_db.run(db_manager.list_backups)
         
         # Получаем информацию о БД
-        db_info = db_manager.get_db_info()
+        db_info = await web_db.run(db_manager.get_db_info)
         
         # Получаем информацию о текущей БД
         current_db_info = await get_current_db_info()
@@ -226,14 +227,13 @@ async def backups_handler(request):
         function createNewBackup() {{
             if (confirm('Создать новый бекап базы данных?')) {{
                 showLoading('Создание бекапа...');
-                fetch('/api/create_backup')
+                fetch('/api/create_backup?async=1')
                     .then(response => response.json())
                     .then(data => {{
-                        hideLoading();
                         if (data.success) {{
-                            alert(`✅ Бекап создан: ${{data.backup_name}}\\n📊 Размер: ${{data.size_mb.toFixed(2)}} MB\\n📤 Отправлено: ${{data.telegram_sent}}/${{data.telegram_total}} админам`);
-                            location.reload();
+                            pollBackupJob(data.job.id);
                         }} else {{
+                            hideLoading();
                             alert('❌ Ошибка: ' + data.error);
                         }}
                     }})
@@ -244,6 +244,35 @@ async def backups_handler(request):
             }}
         }}
         
+        function pollBackupJob(jobId) {{
+            fetch(`/api/backup_job?id=${{jobId}}`)
+                .then(response => response.json())
+                .then(data => {{
+                    if (!data.success) {{
+                        hideLoading();
+                        alert('❌ Ошибка: ' + data.error);
+                        return;
+                    }}
+                    
+                    const job = data.job;
+                    if (job.state === 'done') {{
+                        hideLoading();
+                        alert(`✅ Бекап создан: ${{data.backup_name}}\\n📊 Размер: ${{data.size_mb.toFixed(2)}} MB`);
+                        location.reload();
+                    }} else if (job.state === 'failed' || job.state === 'cancelled') {{
+                        hideLoading();
+                        alert('❌ Бекап не создан: ' + (job.error || job.state));
+                    }} else {{
+                        showLoading(`Создание бекапа... ${{job.progress.toFixed(0)}}%`);
+                        setTimeout(() => pollBackupJob(jobId), 700);
+                    }}
+                }})
+                .catch(error => {{
+                    hideLoading();
+                    alert('❌ Ошибка сети: ' + error);
+                }});
+        }}
+        
         function restoreBackup(filename) {{
             if (confirm(`Восстановить БД из бэкапа ${{filename}}?\\n\\nТекущая БД будет заменена!\\n\\nПосле восстановления рекомендуется:\\n1. Переподключить БД\\n2. Перезапустить бота`)) {{
                 showLoading('Восстановление БД...');
@@ -504,12 +533,12 @@ async def backups_handler(request):
                     body: formData
                 }});
                 
-                if (!response.ok) {{
+                // Отказ (лимит размера, не SQLite) приходит JSON с текстом ошибки
+                const result = await response.json().catch(() => null);
+                if (!result) {{
                     throw new Error('Ошибка загрузки: ' + response.status);
                 }}
                 
-                const result = await response.json();
-                
                 if (result.success) {{
                     progressBar.style.width = '100%';
                     uploadStatus.textContent = '✅ ' + result.message;
@@ -553,53 +582,56 @@ async def backups_handler(request):
         return web.Response(text=f"Ошибка: {e}", content_type='text/html')
 
 async def get_current_db_info():
-    """Получить детальную информацию о текущей БД"""
+    """Получить детальную информацию о текущей БД (запросы - в пуле веб-панели)"""
     try:
-        db_path = db_manager.db_path
-        
-        if not os.path.exists(db_path):
+        if not os.path.exists(db_manager.db_path):
             return {"total_records": 0, "tables_html": "<p>БД не найдена</p>"}
         
-        conn = sqlite3.connect(db_path)
-        cursor = conn.cursor()
-        
-        # Получаем список таблиц
-        cursor.execute("SELECT name FROM sqlite_master WHERE type='table'")
-        tables = [row[0] for row in cursor.fetchall()]
-        
-        total_records = 0
-        tables_html = ""
-        
-        for table in tables:
-            try:
-                cursor.execute(f"SELECT COUNT(*) FROM {table}")
-                count = cursor.fetchone()[0]
-                total_records += count
-                
-                # Получаем структуру таблицы
-                cursor.execute(f"PRAGMA table_info({table})")
-                columns = cursor.fetchall()
-                
-                tables_html += f'''
-                <div style="background: white; padding: 15px; border-radius: 10px; box-shadow: 0 2px 10px rgba(0,0,0,0.1);">
-                    <div style="font-weight: 600; color: var(--primary); margin-bottom: 10px;">
-                        {table} <span class="badge badge-success">{count} записей</span>
-                    </div>
-                    <div style="font-size: 0.9em; color: var(--gray);">
-                        Колонки: {', '.join([col[1] for col in columns[:3]])}{'...' if len(columns) > 3 else ''}
-                    </div>
-                </div>
-                '''
-            except:
-                continue
-        
-        conn.close()
-        
-        return {
-            "total_records": total_records,
-            "tables_html": tables_html,
-            "tables": tables
-        }
+        return await web_db.read(_read_current_db_info)
         
     except Exception as e:
         return {"total_records": 0, "tables_html": f"<p>Ошибка: {e}</p>"}
+
+def _read_current_db_info(conn: sqlite3.Connection):
+    cursor = conn.cursor()
+    
+    # Получаем список таблиц
+    cursor.execute("SELECT name FROM sqlite_master WHERE type='table'")
+    tables = [row[0] for row in cursor.fetchall()]
+    
+    total_records = 0
+    tables_html = ""
+    
+    for table in tables:
+        try:
+            cursor.execute(f"SELECT COUNT(*) FROM {table}")
+            count = cursor.fetchone()[0]
+            total_records += count
+            
+            # Получаем структуру таблицы
+            cursor.execute(f"PRAGMA table_info({table})")
+            columns = cursor.fetchall()
+            
+            tables_html += f'''
+            <div style="background: white; padding: 15px; border-radius: 10px; box-shadow: 0 2px 10px rgba(0,0,0,0.1);">
+                <div style="font-weight: 600; color: var(--primary); margin-bottom: 10px;">
+                    {table} <span class="badge badge-success">{count} записей</span>
+                </div>
+                <div style="font-size: 0.9em; color: var(--gray);">
+                    Колонки: {', '.join([col[1] for col in columns[:3]])}{'...' if len(columns) > 3 else ''}
+                </div>
+            </div>
+            '''
+        except sqlite3.OperationalError as e:
+            # Прерывание по таймауту пула веб-панели не глотаем
+            if "interrupted" in str(e):
+                raise
+            continue
+        except Exception:
+            continue
+    
+    return {
+        "total_records": total_records,
+        "tables_html": tables_html,
+        "tables": tables
+    }
@@ -3,50 +3,46 @@
 """
 from aiohttp import web
 from web.utils.templates import get_base_html
-import os
+from web.utils.assets import assets
+from web.utils import log_reader
+from urllib.parse import quote
 from datetime import datetime
+import asyncio
+from html import escape
+
+# Сколько последних строк основного лога показывать на странице
+TAIL_LINES = 200
 
 async def logs_handler(request):
     """Страница просмотра логов"""
-    log_files = []
-    logs_dir = 'logs'
-    
-    if os.path.exists(logs_dir):
-        for file in os.listdir(logs_dir):
-            if file.endswith('.log'):
-                filepath = os.path.join(logs_dir, file)
-                stat = os.stat(filepath)
-                size_kb = stat.st_size / 1024
-                log_files.append({
-                    'name': file,
-                    'size': f"{size_kb:.1f} KB",
-                    'modified': datetime.fromtimestamp(stat.st_mtime).strftime('%d.%m.%Y %H:%M')
-                })
+    log_files = await asyncio.to_thread(log_reader.list_log_files)
     
-    # Читаем последние 50 строк из основного лога
-    log_content = ""
-    main_log = 'bot.log'
-    if os.path.exists(main_log):
+    # Последние строки основного лога (чтение с конца файла)
+    main_log = log_reader.resolve_log_file(log_reader.LOG_FILE)
+    if main_log:
         try:
-            with open(main_log, 'r', encoding='utf-8') as f:
-                lines = f.readlines()
-                log_content = ''.join(lines[-50:])  # Последние 50 строк
-        except:
+            lines = await asyncio.to_thread(log_reader.tail, main_log, TAIL_LINES)
+            log_content = escape('\n'.join(lines))
+        except OSError:
             log_content = "Не удалось прочитать файл лога"
     else:
         log_content = "Файл лога не найден"
     
     log_files_html = ''
-    for log in sorted(log_files, key=lambda x: x['modified'], reverse=True):
+    for log in log_files:
+        name = escape(log['name'])
         log_files_html += f'''
         <tr>
-            <td>{log["name"]}</td>
-            <td>{log["size"]}</td>
-            <td>{log["modified"]}</td>
-            <td>
-                <button class="btn" style="padding: 6px 12px;" onclick="viewLog('{log['name']}')">
+            <td>{name}</td>
+            <td>{log['size'] / 1024:.1f} KB</td>
+            <td>{datetime.fromtimestamp(log['modified']).strftime('%d.%m.%Y %H:%M')}</td>
+            <td style="white-space: nowrap;">
+                <button class="btn" style="padding: 6px 12px;" data-log="{name}" onclick="viewLog(this.dataset.log)">
                     <i class="fas fa-eye"></i>
                 </button>
+                <a class="btn" style="padding: 6px 12px;" href="/api/logs/download?file={quote(log['name'])}">
+                    <i class="fas fa-download"></i>
+                </a>
             </td>
         </tr>
         '''
@@ -63,15 +59,17 @@ async def logs_handler(request):
         <div style="display: grid; grid-template-columns: 2fr 1fr; gap: 30px; margin-bottom: 30px;">
             <div>
                 <h3 style="margin-bottom: 15px;">
-                    <i class="fas fa-file-alt"></i> Основной лог (bot.log)
+                    <i class="fas fa-file-alt"></i> <span id="log-title">Основной лог ({escape(log_reader.LOG_FILE)})</span>
+                    <span id="log-status" style="font-size: 0.6em; color: var(--gray); margin-left: 10px;"></span>
                 </h3>
-                <div style="background: #1f2937; color: #00ff00; padding: 20px; border-radius: 10px; font-family: monospace; font-size: 0.9em; height: 400px; overflow-y: auto;">
-                    {log_content or 'Логи отсутствуют'}
-                </div>
+                <div id="log-view" data-file="{escape(log_reader.LOG_FILE)}" data-main="{escape(log_reader.LOG_FILE)}" style="background: #1f2937; color: #00ff00; padding: 20px; border-radius: 10px; font-family: monospace; font-size: 0.9em; height: 400px; overflow-y: auto; white-space: pre-wrap; word-break: break-word;">{log_content or 'Логи отсутствуют'}</div>
                 <div style="margin-top: 10px; display: flex; gap: 10px;">
                     <button class="btn" onclick="refreshLogs()">
                         <i class="fas fa-sync-alt"></i> Обновить
                     </button>
+                    <button class="btn" id="live-button" onclick="toggleLive()">
+                        <i class="fas fa-play"></i> Live
+                    </button>
                     <button class="btn btn-secondary" onclick="clearLogs()">
                         <i class="fas fa-trash"></i> Очистить логи
                     </button>
@@ -120,9 +118,9 @@ async def logs_handler(request):
             <div style="display: flex; gap: 15px; flex-wrap: wrap; margin-bottom: 20px;">
                 <select id="logLevel" style="padding: 10px; border: 2px solid var(--gray-light); border-radius: 8px;">
                     <option value="all">Все уровни</option>
-                    <option value="info">Только INFO</option>
-                    <option value="warning">Только WARNING</option>
-                    <option value="error">Только ERROR</option>
+                    <option value="info">INFO и выше</option>
+                    <option value="warning">WARNING и выше</option>
+                    <option value="error">ERROR и выше</option>
                 </select>
                 
                 <input type="text" id="logSearch" placeholder="Поиск по тексту..." 
@@ -146,46 +144,15 @@ async def logs_handler(request):
             <h3><i class="fas fa-lightbulb"></i> Рекомендации</h3>
             <ul style="margin-top: 10px; padding-left: 20px;">
                 <li>Регулярно очищайте логи для экономии места на диске</li>
-                <li>Используйте фильтры для поиска конкретных ошибок</li>
+                <li>Используйте фильтры для поиска конкретных ошибок: поиск идет по основному логу и его ротированным копиям</li>
+                <li>Live включает просмотр новых записей в реальном времени с учетом фильтра уровня и текста</li>
                 <li>Все критические ошибки автоматически отправляются администраторам</li>
                 <li>Рекомендуется хранить логи не более 30 дней</li>
             </ul>
         </div>
     </div>
     
-    <script>
-    function refreshLogs() {{
-        location.reload();
-    }}
-    
-    function clearLogs() {{
-        if (confirm('Вы уверены? Это удалит все логи и их нельзя будет восстановить.')) {{
-            fetch('/api/clear_logs')
-                .then(response => response.json())
-                .then(data => {{
-                    if (data.success) {{
-                        alert('Логи очищены!');
-                        refreshLogs();
-                    }}
-                }});
-        }}
-    }}
-    
-    function downloadLogs() {{
-        alert('Скачивание логов...\\n\\nФункция будет реализована в следующей версии.');
-    }}
-    
-    function viewLog(filename) {{
-        alert('Просмотр лога: ' + filename + '\\n\\nФункция будет реализована в следующей версии.');
-    }}
-    
-    function applyFilters() {{
-        const level = document.getElementById('logLevel').value;
-        const search = document.getElementById('logSearch').value;
-        const date = document.getElementById('logDate').value;
-        alert(`Применены фильтры:\\nУровень: ${{level}}\\nПоиск: ${{search}}\\nПериод: ${{date}}`);
-    }}
-    </script>
+    <script src="{assets.url('js/logs.js')}" defer></script>
     '''
     
     html = get_base_html("Просмотр логов", content, active_tab='/logs')
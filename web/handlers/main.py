@@ -1,18 +1,19 @@
 """
 Обработчик главной страницы
 """
+import asyncio
 from aiohttp import web
 from web.utils.templates import get_base_html
 from web.utils.database import get_stats
 from web.utils.system import get_system_info
+from web.utils.db_access import web_db
 from datetime import datetime
 
 async def index_handler(request):
     """Главная страница - дашборд"""
     try:
         # Получаем статистику
-        stats = get_stats()
-        system_info = get_system_info()
+        stats, system_info = await asyncio.gather(web_db.run(get_stats), web_db.run(get_system_info))
         
         content = f'''
         <div class="glass-card">
@@ -1,94 +1,118 @@
 """
 Обработчик страницы мониторинга
 """
+from datetime import datetime
+from html import escape
 from aiohttp import web
 from web.utils.templates import get_base_html
 from web.utils.system import get_system_info
+from web.utils.assets import assets
+from app.metrics_sampler import metrics_sampler
+from app.loop_watchdog import loop_watchdog
 import psutil
 import humanize
 
+def _metric_tile(element_id: str, value: str, label: str, color: str, background: str) -> str:
+    return f'''
+            <div style="background: {background}; padding: 20px; border-radius: 15px; text-align: center;">
+                <div id="{element_id}" style="font-size: 2em; font-weight: 800; color: {color};">{value}</div>
+                <div style="color: var(--gray);">{label}</div>
+            </div>'''
+
+def _chart(element_id: str, label: str) -> str:
+    return f'''
+            <div style="padding: 15px; background: white; border-radius: 10px; box-shadow: 0 2px 5px rgba(0,0,0,0.05);">
+                <div style="color: var(--gray); font-size: 0.9em; margin-bottom: 8px;">{label}</div>
+                <canvas id="{element_id}" height="80" style="width: 100%;"></canvas>
+            </div>'''
+
+def _loop_stalls(limit: int = 10) -> str:
+    """Последние блокировки цикла событий (стек - по клику)"""
+    stalls = loop_watchdog.recent()[:limit]
+    if not stalls:
+        return '<div style="color: var(--gray);">Блокировок не было</div>'
+    rows = []
+    for stall in stalls:
+        stack = escape("".join(stall["stack"])) or "стек не снят"
+        rows.append(f'''
+                <tr>
+                    <td style="padding: 8px; white-space: nowrap;">{datetime.fromtimestamp(stall["ts"]).strftime("%d.%m %H:%M:%S")}</td>
+                    <td style="padding: 8px; font-weight: 600; color: var(--warning);">{stall["duration_ms"]:.0f} мс</td>
+                    <td style="padding: 8px;">
+                        <div>{escape(stall["where"])}</div>
+                        <details>
+                            <summary style="color: var(--gray); cursor: pointer;">{escape(stall["frame"] or "стек")}</summary>
+                            <pre style="font-size: 0.8em; overflow-x: auto;">{stack}</pre>
+                        </details>
+                    </td>
+                </tr>''')
+    return f'''
+            <table style="width: 100%; border-collapse: collapse;">
+                {''.join(rows)}
+            </table>'''
+
 async def monitor_handler(request):
-    """Страница мониторинга системы"""
+    """
+    Страница мониторинга системы
+
+    Значения на странице - последний снимок фонового сборщика метрик, дальше они
+    обновляются потоком /api/metrics/stream без перезагрузки страницы.
+    """
     system_info = get_system_info()
-    
-    # Получаем процессы
-    processes = []
-    for proc in psutil.process_iter(['pid', 'name', 'cpu_percent', 'memory_percent']):
-        try:
-            processes.append(proc.info)
-        except (psutil.NoSuchProcess, psutil.AccessDenied):
-            pass
-    
-    processes.sort(key=lambda x: x.get('cpu_percent', 0), reverse=True)
+    sample = metrics_sampler.latest() or {}
     
     # Сетевая статистика
     net_io = psutil.net_io_counters()
     
-    processes_html = ''
-    for proc in processes[:15]:  # Показываем 15 процессов
-        pid = proc.get('pid', 'N/A')
-        name = proc.get('name', 'Unknown')[:25]
-        cpu = proc.get('cpu_percent', 0)
-        mem = proc.get('memory_percent', 0)
-        
-        processes_html += f'''
-        <tr>
-            <td><code>{pid}</code></td>
-            <td>{name}</td>
-            <td>
-                <div style="display: flex; align-items: center; gap: 10px;">
-                    <span>{cpu:.1f}%</span>
-                    <div style="flex: 1; height: 6px; background: #e5e7eb; border-radius: 3px;">
-                        <div style="height: 100%; width: {cpu}%; background: var(--primary); border-radius: 3px;"></div>
-                    </div>
-                </div>
-            </td>
-            <td>{mem:.1f}%</td>
-        </tr>
-        '''
+    def shown(key, fmt):
+        return fmt(sample[key]) if key in sample else '—'
     
-    # HTML для случая, когда нет процессов
-    no_processes_html = '''<tr><td colspan="4" style="padding: 20px; text-align: center; color: var(--gray);">Нет данных о процессах</td></tr>'''
+    tiles = ''.join([
+        _metric_tile('cpu-value', shown('cpu_percent', lambda v: f'{v}%'), 'CPU процесса',
+                     'var(--primary)', 'rgba(99, 102, 241, 0.1)'),
+        _metric_tile('rss-value', shown('rss', humanize.naturalsize), 'Память процесса (RSS)',
+                     'var(--success)', 'rgba(16, 185, 129, 0.1)'),
+        _metric_tile('lag-value', shown('loop_lag_ms', lambda v: f'{v} мс'), 'Задержка цикла событий',
+                     'var(--warning)', 'rgba(245, 158, 11, 0.1)'),
+        _metric_tile('queue-value', shown('bot_queue', str), 'Апдейтов бота в обработке',
+                     'var(--secondary)', 'rgba(139, 92, 246, 0.1)'),
+        _metric_tile('db-value', shown('db_size', humanize.naturalsize), 'Размер БД',
+                     'var(--primary)', 'rgba(99, 102, 241, 0.1)'),
+        _metric_tile('memory-value', f"{system_info['memory_percent']}%", 'Память системы',
+                     'var(--success)', 'rgba(16, 185, 129, 0.1)'),
+        _metric_tile('uptime-value', system_info['uptime'], 'Аптайм', 'var(--warning)', 'rgba(245, 158, 11, 0.1)'),
+    ])
     
     content = f'''
     <div class="glass-card">
         <h2 style="margin-bottom: 25px;">
             <i class="fas fa-chart-line"></i> Мониторинг системы
+            <span id="stream-status" style="font-size: 0.5em; color: var(--gray); margin-left: 10px;">подключение...</span>
         </h2>
         
         <div style="display: grid; grid-template-columns: repeat(auto-fit, minmax(200px, 1fr)); gap: 20px; margin-bottom: 30px;">
-            <div style="background: rgba(99, 102, 241, 0.1); padding: 20px; border-radius: 15px; text-align: center;">
-                <div style="font-size: 2.5em; font-weight: 800; color: var(--primary);">
-                    {system_info['cpu_percent']}%
-                </div>
-                <div style="color: var(--gray);">Загрузка CPU</div>
-            </div>
-            
-            <div style="background: rgba(16, 185, 129, 0.1); padding: 20px; border-radius: 15px; text-align: center;">
-                <div style="font-size: 2.5em; font-weight: 800; color: var(--success);">
-                    {system_info['memory_percent']}%
-                </div>
-                <div style="color: var(--gray);">Использование памяти</div>
-                <div style="font-size: 0.9em; margin-top: 5px;">
-                    {system_info.get('memory_used', 'N/A')} / {system_info.get('memory_total', 'N/A')}
-                </div>
-            </div>
-            
-            <div style="background: rgba(245, 158, 11, 0.1); padding: 20px; border-radius: 15px; text-align: center;">
-                <div style="font-size: 1.8em; font-weight: 800; color: var(--warning);">
-                    {system_info['uptime']}
-                </div>
-                <div style="color: var(--gray);">Аптайм системы</div>
-            </div>
-            
-            <div style="background: rgba(139, 92, 246, 0.1); padding: 20px; border-radius: 15px; text-align: center;">
-                <div style="font-size: 2em; font-weight: 800; color: var(--secondary);">
-                    {len(processes)}
-                </div>
-                <div style="color: var(--gray);">Активных процессов</div>
+            {tiles}
+        </div>
+        
+        <div style="margin-top: 30px;">
+            <h3 style="margin-bottom: 15px;">
+                <i class="fas fa-wave-square"></i> История (каждые {metrics_sampler.interval:g} с)
+            </h3>
+            <div style="display: grid; grid-template-columns: repeat(auto-fit, minmax(300px, 1fr)); gap: 15px;">
+                {_chart('cpu-chart', 'CPU процесса, %')}
+                {_chart('rss-chart', 'Память процесса, MB')}
+                {_chart('lag-chart', 'Задержка цикла событий, мс')}
+                {_chart('queue-chart', 'Апдейтов бота в обработке')}
             </div>
         </div>
         
+        <div style="margin-top: 30px;">
+            <h3 style="margin-bottom: 15px;">
+                <i class="fas fa-hourglass-half"></i> Блокировки цикла событий (дольше {loop_watchdog.threshold * 1000:.0f} мс)
+            </h3>
+            {_loop_stalls()}
+        </div>
+        
         <div style="margin-top: 30px;">
             <h3 style="margin-bottom: 15px;">
                 <i class="fas fa-network-wired"></i> Сетевая статистика
@@ -121,27 +145,6 @@ async def monitor_handler(request):
             </div>
         </div>
         
-        <div style="margin-top: 30px;">
-            <h3 style="margin-bottom: 15px;">
-                <i class="fas fa-tasks"></i> Активные процессы (Топ-15)
-            </h3>
-            <div style="overflow-x: auto;">
-                <table style="width: 100%; border-collapse: collapse;">
-                    <thead>
-                        <tr style="background: var(--primary); color: white;">
-                            <th style="padding: 12px; text-align: left;">PID</th>
-                            <th style="padding: 12px; text-align: left;">Имя процесса</th>
-                            <th style="padding: 12px; text-align: left;">CPU</th>
-                            <th style="padding: 12px; text-align: left;">Память</th>
-                        </tr>
-                    </thead>
-                    <tbody>
-                        {processes_html if processes_html else no_processes_html}
-                    </tbody>
-                </table>
-            </div>
-        </div>
-        
         <div style="margin-top: 30px; padding: 20px; background: rgba(99, 102, 241, 0.05); border-radius: 15px;">
             <h3><i class="fas fa-info-circle"></i> Информация о системе</h3>
             <div style="display: grid; grid-template-columns: repeat(auto-fit, minmax(250px, 1fr)); gap: 15px; margin-top: 15px;">
@@ -161,20 +164,7 @@ async def monitor_handler(request):
         </div>
     </div>
     
-    <script>
-    function refreshMonitor() {{
-        fetch('/api/system_stats')
-            .then(response => response.json())
-            .then(data => {{
-                document.getElementById('cpu-value').textContent = data.cpu_percent + '%';
-                document.getElementById('memory-value').textContent = data.memory_percent + '%';
-                document.getElementById('uptime-value').textContent = data.uptime;
-            }});
-    }}
-    
-    // Обновляем каждые 10 секунд
-    setInterval(refreshMonitor, 10000);
-    </script>
+    <script src="{assets.url('js/monitor.js')}" defer></script>
     '''
     
     html = get_base_html("Мониторинг системы", content, active_tab='/monitor')
@@ -4,12 +4,13 @@
 from aiohttp import web
 from web.utils.templates import get_base_html
 from web.utils.database import get_stats
+from web.utils.db_access import web_db
 from datetime import datetime, timedelta
 
 async def users_handler(request):
     """Страница управления пользователями"""
     try:
-        stats = get_stats()
+        stats = await web_db.run(get_stats)
         
         # HTML для случая, когда нет подключения к БД
         no_db_html = '''<tr><td colspan="5" style="padding: 30px; text-align: center; color: var(--gray);"><i class="fas fa-database" style="font-size: 2em; margin-bottom: 10px; display: block;"></i>Для просмотра пользователей необходимо подключение к базе данных</td></tr>'''
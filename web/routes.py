@@ -21,12 +21,23 @@ def setup_routes(app: web.Application):
     from web.handlers.api import (
         api_stats_handler,
         api_system_stats_handler,
+        api_metrics_history,
+        api_metrics_stream,
+        api_prometheus_metrics,
+        api_loop_stalls,
         api_create_backup,
+        api_backup_job,
+        api_backup_jobs,
+        api_cancel_backup_job,
+        api_create_incremental_backup,
+        api_incremental_backups,
+        api_restore_incremental,
         api_restore_backup,
         api_cleanup_backups,
         api_dbinfo,
         api_download_backup,
         api_get_backup_info,
+        api_verify_backup,
         api_get_db_detailed_info,
         api_send_to_admins,
         api_send_current_db_to_admins,
@@ -36,7 +47,13 @@ def setup_routes(app: web.Application):
         api_reconnect_db,
         api_check_db_connection,
         api_restart_bot,
-        api_bot_status
+        api_bot_status,
+        # Логи
+        api_logs_tail,
+        api_logs_search,
+        api_logs_download,
+        api_logs_stream,
+        api_clear_logs
     )
     
     logger.info("📋 Регистрация маршрутов веб-панели...")
@@ -53,14 +70,25 @@ def setup_routes(app: web.Application):
     # API endpoints (статистика)
     app.router.add_get('/api/stats', api_stats_handler)
     app.router.add_get('/api/system_stats', api_system_stats_handler)
+    app.router.add_get('/api/metrics/history', api_metrics_history)
+    app.router.add_get('/api/metrics/stream', api_metrics_stream)
+    app.router.add_get('/metrics', api_prometheus_metrics)
+    app.router.add_get('/api/loop_stalls', api_loop_stalls)
     
     # API endpoints (бэкапы)
     app.router.add_get('/api/create_backup', api_create_backup)
+    app.router.add_get('/api/backup_job', api_backup_job)
+    app.router.add_get('/api/backup_jobs', api_backup_jobs)
+    app.router.add_get('/api/cancel_backup_job', api_cancel_backup_job)
+    app.router.add_get('/api/create_incremental_backup', api_create_incremental_backup)
+    app.router.add_get('/api/incremental_backups', api_incremental_backups)
+    app.router.add_get('/api/restore_incremental', api_restore_incremental)
     app.router.add_get('/api/restore_backup', api_restore_backup)
     app.router.add_get('/api/cleanup_backups', api_cleanup_backups)
     app.router.add_get('/api/dbinfo', api_dbinfo)
     app.router.add_get('/api/download_backup', api_download_backup)
     app.router.add_get('/api/get_backup_info', api_get_backup_info)
+    app.router.add_get('/api/verify_backup', api_verify_backup)
     app.router.add_get('/api/get_db_detailed_info', api_get_db_detailed_info)
     app.router.add_get('/api/send_to_admins', api_send_to_admins)
     app.router.add_get('/api/send_current_db_to_admins', api_send_current_db_to_admins)
@@ -73,8 +101,38 @@ def setup_routes(app: web.Application):
     app.router.add_get('/api/restart_bot', api_restart_bot)
     app.router.add_get('/api/bot_status', api_bot_status)
     
+    # API endpoints (логи)
+    app.router.add_get('/api/logs', api_logs_tail)
+    app.router.add_get('/api/logs/search', api_logs_search)
+    app.router.add_get('/api/logs/download', api_logs_download)
+    app.router.add_get('/api/logs/stream', api_logs_stream)
+    app.router.add_get('/api/clear_logs', api_clear_logs)
+    
     # Legacy endpoints для совместимости
     app.router.add_get('/create_backup', api_create_backup)
     app.router.add_get('/send_backup', api_send_backup)
     
+    setup_response_cache(app)
+    
+    # Открытые live-tail логов закрываются до ожидания соединений при выключении
+    app.on_shutdown.append(stop_log_streams)
+    
     logger.info("✅ Все маршруты зарегистрированы")
+
+async def stop_log_streams(app: web.Application):
+    from web.utils.log_reader import stop_followers
+    stop_followers()
+
+def setup_response_cache(app: web.Application):
+    """Кэш (TTL в секундах) для страниц и API, которые панель опрашивает по таймеру"""
+    from web.utils.response_cache import response_cache, create_cache_middleware
+    
+    response_cache.register('/', ttl=10)
+    response_cache.register('/dashboard', ttl=10)
+    response_cache.register('/users', ttl=30)
+    response_cache.register('/api/stats', ttl=5)
+    response_cache.register('/api/dbinfo', ttl=15, sources=('db', 'backups'))
+    
+    # Внешний middleware: ответ из кэша не ждет шлюз БД и не занимает пул запросов
+    app.middlewares.insert(0, create_cache_middleware(response_cache))
+    logger.info(f"🗄️ Кэш ответов: {len(response_cache.rules)} маршрутов" + ("" if response_cache.enabled else " (отключен)"))
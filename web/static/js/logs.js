@@ -0,0 +1,163 @@
+/**
+ * Страница логов: просмотр файлов, поиск по фильтрам и live-tail (SSE)
+ */
+
+const LEVEL_COLORS = {
+    DEBUG: '#9ca3af',
+    INFO: '#10b981',
+    WARNING: '#f59e0b',
+    ERROR: '#ef4444',
+    CRITICAL: '#dc2626'
+};
+const MAX_LIVE_LINES = 2000;
+
+let liveSource = null;
+
+function logView() {
+    return document.getElementById('log-view');
+}
+
+function currentFile() {
+    return logView().dataset.file;
+}
+
+function setStatus(text) {
+    document.getElementById('log-status').textContent = text;
+}
+
+function lineElement(text, level) {
+    const line = document.createElement('div');
+    line.textContent = text;
+    const match = level || (text.match(/ - (DEBUG|INFO|WARNING|ERROR|CRITICAL) - /) || [])[1];
+    if (match && match !== 'INFO') {
+        line.style.color = LEVEL_COLORS[match];
+    }
+    return line;
+}
+
+function showLines(lines) {
+    const view = logView();
+    view.textContent = '';
+    if (!lines.length) {
+        view.textContent = 'Записей не найдено';
+        return;
+    }
+    const fragment = document.createDocumentFragment();
+    lines.forEach(item => fragment.appendChild(
+        typeof item === 'string' ? lineElement(item) : lineElement(item.text, item.level)
+    ));
+    view.appendChild(fragment);
+    view.scrollTop = view.scrollHeight;
+}
+
+function viewLog(filename) {
+    stopLive();
+    logView().dataset.file = filename;
+    document.getElementById('log-title').textContent = filename;
+    refreshLogs();
+}
+
+function refreshLogs() {
+    setStatus('загрузка...');
+    fetch(`/api/logs?file=${encodeURIComponent(currentFile())}&lines=500`)
+        .then(response => response.json())
+        .then(data => {
+            if (!data.success) {
+                throw new Error(data.error);
+            }
+            showLines(data.lines);
+            setStatus(`последние ${data.lines.length} строк`);
+        })
+        .catch(error => setStatus('ошибка: ' + error.message));
+}
+
+function filterParams() {
+    const params = new URLSearchParams();
+    const level = document.getElementById('logLevel').value;
+    const search = document.getElementById('logSearch').value.trim();
+    if (level !== 'all') {
+        params.set('level', level);
+    }
+    if (search) {
+        params.set('q', search);
+    }
+    return params;
+}
+
+function applyFilters() {
+    stopLive();
+    const params = filterParams();
+    params.set('period', document.getElementById('logDate').value);
+    // Основной лог ищется вместе с ротированными копиями, другой файл - отдельно
+    if (currentFile() !== logView().dataset.main) {
+        params.set('file', currentFile());
+    }
+    setStatus('поиск...');
+    fetch('/api/logs/search?' + params.toString())
+        .then(response => response.json())
+        .then(data => {
+            if (!data.success) {
+                throw new Error(data.error);
+            }
+            showLines(data.records);
+            const more = data.truncated ? ' (показаны последние)' : '';
+            setStatus(`найдено ${data.records.length}${more}, файлов: ${data.files_scanned}, ` +
+                      `диапазон ${(data.bytes_in_range / 1024).toFixed(0)} KB`);
+        })
+        .catch(error => setStatus('ошибка: ' + error.message));
+}
+
+function downloadLogs() {
+    window.location = '/api/logs/download?file=' + encodeURIComponent(currentFile());
+}
+
+function toggleLive() {
+    if (liveSource) {
+        stopLive();
+        return;
+    }
+    const params = filterParams();
+    params.set('file', currentFile());
+    liveSource = new EventSource('/api/logs/stream?' + params.toString());
+    liveSource.onopen = () => setStatus('● live');
+    liveSource.onerror = () => setStatus('переподключение...');
+    liveSource.onmessage = event => {
+        const view = logView();
+        const atBottom = view.scrollHeight - view.scrollTop - view.clientHeight < 30;
+        JSON.parse(event.data).forEach(text => view.appendChild(lineElement(text)));
+        while (view.childNodes.length > MAX_LIVE_LINES) {
+            view.removeChild(view.firstChild);
+        }
+        if (atBottom) {
+            view.scrollTop = view.scrollHeight;
+        }
+    };
+    document.getElementById('live-button').innerHTML = '<i class="fas fa-stop"></i> Стоп';
+}
+
+function stopLive() {
+    if (!liveSource) {
+        return;
+    }
+    liveSource.close();
+    liveSource = null;
+    setStatus('');
+    document.getElementById('live-button').innerHTML = '<i class="fas fa-play"></i> Live';
+}
+
+function clearLogs() {
+    if (confirm('Вы уверены? Это удалит все логи и их нельзя будет восстановить.')) {
+        fetch('/api/clear_logs')
+            .then(response => response.json())
+            .then(data => {
+                if (data.success) {
+                    alert('Логи очищены!');
+                    location.reload();
+                }
+            });
+    }
+}
+
+document.addEventListener('DOMContentLoaded', () => {
+    logView().scrollTop = logView().scrollHeight;
+});
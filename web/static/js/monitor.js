@@ -0,0 +1,96 @@
+/**
+ * Страница мониторинга: живые метрики из потока /api/metrics/stream (SSE)
+ */
+
+const MAX_POINTS = 150;
+const samples = [];
+
+function formatBytes(bytes) {
+    const units = ['B', 'KB', 'MB', 'GB'];
+    let value = bytes;
+    let unit = 0;
+    while (value >= 1024 && unit < units.length - 1) {
+        value /= 1024;
+        unit++;
+    }
+    return value.toFixed(unit ? 1 : 0) + ' ' + units[unit];
+}
+
+function setText(id, text) {
+    const element = document.getElementById(id);
+    if (element) {
+        element.textContent = text;
+    }
+}
+
+function drawChart(id, values, color) {
+    const canvas = document.getElementById(id);
+    if (!canvas || !values.length) {
+        return;
+    }
+    // Размер буфера по фактической ширине на экране
+    canvas.width = canvas.clientWidth;
+    const ctx = canvas.getContext('2d');
+    const max = Math.max(...values, 1);
+    const step = canvas.width / Math.max(MAX_POINTS - 1, 1);
+    const offset = MAX_POINTS - values.length;
+
+    ctx.clearRect(0, 0, canvas.width, canvas.height);
+    ctx.strokeStyle = color;
+    ctx.lineWidth = 2;
+    ctx.beginPath();
+    values.forEach((value, i) => {
+        const x = (offset + i) * step;
+        const y = canvas.height - 4 - (value / max) * (canvas.height - 8);
+        if (i === 0) {
+            ctx.moveTo(x, y);
+        } else {
+            ctx.lineTo(x, y);
+        }
+    });
+    ctx.stroke();
+
+    ctx.fillStyle = '#6b7280';
+    ctx.font = '11px sans-serif';
+    ctx.fillText('max ' + (Math.round(max * 10) / 10), 4, 12);
+}
+
+function render() {
+    const last = samples[samples.length - 1];
+    if (!last) {
+        return;
+    }
+    setText('cpu-value', last.cpu_percent + '%');
+    setText('rss-value', formatBytes(last.rss));
+    setText('lag-value', last.loop_lag_ms + ' мс');
+    setText('queue-value', last.bot_queue);
+    setText('db-value', formatBytes(last.db_size));
+    setText('memory-value', last.memory_percent + '%');
+
+    drawChart('cpu-chart', samples.map(s => s.cpu_percent), '#6366f1');
+    drawChart('rss-chart', samples.map(s => s.rss / (1024 * 1024)), '#10b981');
+    drawChart('lag-chart', samples.map(s => s.loop_lag_ms), '#f59e0b');
+    drawChart('queue-chart', samples.map(s => s.bot_queue), '#8b5cf6');
+}
+
+function addSamples(items) {
+    samples.push(...items);
+    samples.splice(0, Math.max(samples.length - MAX_POINTS, 0));
+    render();
+}
+
+function connectMetrics() {
+    const source = new EventSource('/api/metrics/stream');
+
+    source.addEventListener('history', event => {
+        samples.length = 0;
+        addSamples(JSON.parse(event.data));
+    });
+    source.onmessage = event => addSamples([JSON.parse(event.data)]);
+    source.onopen = () => setText('stream-status', '● онлайн');
+    // EventSource переподключается сам, история придет заново
+    source.onerror = () => setText('stream-status', 'переподключение...');
+}
+
+document.addEventListener('DOMContentLoaded', connectMetrics);
+window.addEventListener('resize', render);
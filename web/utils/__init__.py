@@ -10,6 +10,8 @@ from .templates import (
 )
 from .database import get_stats
 from .system import get_system_info
+from .db_access import web_db, WebQueryTimeout
+from .response_cache import response_cache
 
 __all__ = [
     'get_base_html',
@@ -17,5 +19,8 @@ __all__ = [
     'get_footer',
     'get_common_css',
     'get_stats',
-    'get_system_info'
+    'get_system_info',
+    'web_db',
+    'WebQueryTimeout',
+    'response_cache'
 ]
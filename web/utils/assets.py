@@ -0,0 +1,151 @@
+"""
+Статические файлы веб-панели
+
+При запуске все файлы web/static читаются в память один раз: для каждого считается
+хэш содержимого и заранее готовятся сжатые версии (gzip, brotli - если установлен).
+Шаблоны ссылаются на файлы по имени с хэшем (css/panel.1a2b3c4d5e.css) - такие
+ответы кэшируются браузером навсегда, а новая версия файла получает новое имя.
+По обычному имени файл тоже доступен, но с проверкой по ETag.
+"""
+import os
+import gzip
+import hashlib
+import logging
+import mimetypes
+from dataclasses import dataclass
+from typing import Dict, Optional
+
+from aiohttp import web
+
+logger = logging.getLogger(__name__)
+
+# brotli - необязательная зависимость: без нее отдается gzip
+try:
+    import brotli
+    BROTLI_AVAILABLE = True
+except ImportError:
+    brotli = None
+    BROTLI_AVAILABLE = False
+
+# Font Awesome: локальная копия в web/static/vendor/fontawesome или внешний адрес
+FONTAWESOME_LOCAL = "vendor/fontawesome/css/all.min.css"
+WEB_FONTAWESOME_URL = os.getenv(
+    "WEB_FONTAWESOME_URL", "https://cdnjs.cloudflare.com/ajax/libs/font-awesome/6.4.0/css/all.min.css"
+)
+
+IMMUTABLE_CACHE = "public, max-age=31536000, immutable"
+
+# Меньше этого сжатие не окупается
+_MIN_COMPRESS_SIZE = 512
+_COMPRESSIBLE = ("text/", "application/javascript", "application/json", "image/svg+xml")
+
+
+@dataclass
+class Asset:
+    """Файл из web/static, загруженный в память"""
+    name: str
+    hashed_name: str
+    content_type: str
+    body: bytes
+    etag: str
+    gzip: Optional[bytes] = None
+    br: Optional[bytes] = None
+
+
+class AssetStore:
+    """Статические файлы с хэшированными именами и заранее сжатыми версиями"""
+
+    def __init__(self):
+        self.root: Optional[str] = None
+        self._by_name: Dict[str, Asset] = {}
+        self._by_hashed: Dict[str, Asset] = {}
+
+    def load(self, root: str):
+        """Прочитать и сжать все файлы директории root"""
+        self.root = root
+        self._by_name.clear()
+        self._by_hashed.clear()
+
+        raw_size = compressed_size = 0
+        for dirpath, _, filenames in os.walk(root):
+            for filename in filenames:
+                full_path = os.path.join(dirpath, filename)
+                name = os.path.relpath(full_path, root).replace(os.sep, "/")
+                with open(full_path, "rb") as f:
+                    body = f.read()
+
+                digest = hashlib.sha256(body).hexdigest()[:10]
+                stem, ext = os.path.splitext(name)
+                content_type = mimetypes.guess_type(name)[0] or "application/octet-stream"
+                asset = Asset(
+                    name=name,
+                    hashed_name=f"{stem}.{digest}{ext}",
+                    content_type=content_type,
+                    body=body,
+                    etag=digest,
+                )
+
+                if len(body) >= _MIN_COMPRESS_SIZE and content_type.startswith(_COMPRESSIBLE):
+                    asset.gzip = gzip.compress(body, compresslevel=9, mtime=0)
+                    if BROTLI_AVAILABLE:
+                        asset.br = brotli.compress(body, quality=11)
+                    raw_size += len(body)
+                    compressed_size += len(asset.br or asset.gzip)
+
+                self._by_name[name] = asset
+                self._by_hashed[asset.hashed_name] = asset
+
+        logger.info(
+            f"🎨 Статика: {len(self._by_name)} файлов, сжатые версии {raw_size / 1024:.0f} KB -> "
+            f"{compressed_size / 1024:.0f} KB ({'brotli' if BROTLI_AVAILABLE else 'gzip'})"
+        )
+
+    def url(self, name: str) -> str:
+        """Адрес файла с хэшем содержимого (или по имени, если файл не загружен)"""
+        asset = self._by_name.get(name)
+        return f"/static/{asset.hashed_name if asset else name}"
+
+    def has(self, name: str) -> bool:
+        return name in self._by_name
+
+    async def handle(self, request: web.Request) -> web.Response:
+        name = request.match_info["path"]
+        asset = self._by_hashed.get(name)
+        immutable = asset is not None
+        if asset is None:
+            asset = self._by_name.get(name)
+        if asset is None:
+            raise web.HTTPNotFound()
+
+        accept = request.headers.get("Accept-Encoding", "")
+        body, encoding = asset.body, None
+        if asset.br and "br" in accept:
+            body, encoding = asset.br, "br"
+        elif asset.gzip and "gzip" in accept:
+            body, encoding = asset.gzip, "gzip"
+
+        etag = f"{asset.etag}-{encoding}" if encoding else asset.etag
+        if request.if_none_match and any(tag.value == etag for tag in request.if_none_match):
+            response = web.Response(status=304)
+        else:
+            response = web.Response(body=body)
+            response.content_type = asset.content_type
+            if encoding:
+                response.headers["Content-Encoding"] = encoding
+        response.etag = etag
+        response.headers["Cache-Control"] = IMMUTABLE_CACHE if immutable else "no-cache"
+        if asset.gzip:
+            response.headers["Vary"] = "Accept-Encoding"
+        return response
+
+    def setup(self, app: web.Application, root: str):
+        """Загрузить файлы и обслуживать их по маршруту /static/"""
+        self.load(root)
+        app.router.add_get("/static/{path:.*}", self.handle)
+
+        from web.utils.templates import reset_page_cache
+        reset_page_cache()
+
+
+# Глобальный экземпляр
+assets = AssetStore()
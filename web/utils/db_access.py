@@ -0,0 +1,89 @@
+"""
+Доступ к БД для веб-панели
+
+render_server запускает бота в том же цикле событий, что и веб-панель, поэтому
+синхронный запрос sqlite3/SQLAlchemy прямо в хэндлере останавливает и доставку
+сообщений. Все обращения панели к БД идут через отдельный ограниченный пул потоков:
+панель не может занять больше WEB_DB_WORKERS потоков, а каждый запрос ограничен
+WEB_DB_TIMEOUT секундами (вместе с ожиданием в очереди пула).
+"""
+import os
+import time
+import asyncio
+import sqlite3
+import logging
+import functools
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Optional, TypeVar
+
+logger = logging.getLogger(__name__)
+
+WEB_DB_WORKERS = int(os.getenv("WEB_DB_WORKERS", 2))
+WEB_DB_TIMEOUT = float(os.getenv("WEB_DB_TIMEOUT", 10))
+
+# Как часто (в инструкциях VM SQLite) проверять, не истек ли срок запроса
+_PROGRESS_STEPS = 10000
+
+T = TypeVar("T")
+
+
+class WebQueryTimeout(Exception):
+    """Запрос веб-панели к БД не уложился в отведенное время"""
+
+
+class WebDataAccess:
+    """Ограниченный пул потоков для блокирующих запросов веб-панели"""
+
+    def __init__(self, workers: int = WEB_DB_WORKERS, timeout: float = WEB_DB_TIMEOUT):
+        self.timeout = timeout
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="web-db")
+
+    async def run(self, func: Callable[..., T], *args, timeout: Optional[float] = None, **kwargs) -> T:
+        """
+        Выполнить блокирующую функцию в пуле панели.
+
+        Контекст (в том числе отметка шлюза БД о текущем запросе) переносится в поток.
+        По таймауту ожидание прерывается, а запрос, еще стоящий в очереди, отменяется.
+        """
+        timeout = self.timeout if timeout is None else timeout
+        loop = asyncio.get_running_loop()
+        call = functools.partial(contextvars.copy_context().run, func, *args, **kwargs)
+        try:
+            return await asyncio.wait_for(loop.run_in_executor(self._executor, call), timeout)
+        except asyncio.TimeoutError:
+            name = getattr(func, "__qualname__", repr(func))
+            logger.warning(f"⏱️ Запрос веб-панели {name} не уложился в {timeout:.0f} с")
+            raise WebQueryTimeout(f"Запрос к БД не уложился в {timeout:.0f} с, попробуйте позже")
+
+    async def read(self, func: Callable[[sqlite3.Connection], T], db_path: Optional[str] = None,
+                   timeout: Optional[float] = None) -> T:
+        """
+        Выполнить func(conn) на отдельном read-only соединении с рабочей БД.
+
+        Срок проверяется и внутри SQLite: запрос, не уложившийся в таймаут, прерывается
+        и освобождает поток пула, а не дорабатывает в фоне.
+        """
+        timeout = self.timeout if timeout is None else timeout
+        return await self.run(self._read, func, db_path, time.monotonic() + timeout, timeout=timeout)
+
+    @staticmethod
+    def _read(func: Callable[[sqlite3.Connection], T], db_path: Optional[str], deadline: float) -> T:
+        if db_path is None:
+            from app.database_manager import db_manager
+            db_path = db_manager.db_path
+
+        conn = sqlite3.connect(f"file:{db_path}?mode=ro", uri=True, timeout=max(deadline - time.monotonic(), 0.1))
+        conn.set_progress_handler(lambda: time.monotonic() > deadline, _PROGRESS_STEPS)
+        try:
+            return func(conn)
+        except sqlite3.OperationalError as e:
+            if time.monotonic() > deadline:
+                raise WebQueryTimeout("Запрос к БД прерван по таймауту") from e
+            raise
+        finally:
+            conn.close()
+
+
+# Глобальный экземпляр
+web_db = WebDataAccess()
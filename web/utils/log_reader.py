@@ -0,0 +1,444 @@
+"""
+Чтение логов для веб-панели
+
+- tail: последние N строк читаются с конца файла блоками, время зависит только от
+  числа показанных строк, а не от размера лога;
+- search: фильтр по уровню, тексту и времени по основному логу и его ротированным
+  копиям. Для каждого файла строится разреженный индекс (смещение, время записи)
+  через каждые LOG_INDEX_STEP байт: файлы вне периода пропускаются целиком, а в
+  остальных читается только диапазон, попадающий в период. Индекс ротированных
+  файлов строится один раз, активного - дописывается по мере роста;
+- follow: новые строки активного файла для live-tail (с учетом ротации).
+
+Понимает оба формата записей: JSON-строки app/logging_setup.py и прежний текстовый
+"время - логгер - уровень - сообщение". JSON-записи показываются в текстовом виде
+(format_line), traceback - следующими строками той же записи.
+"""
+import os
+import re
+import gzip
+import json
+import bisect
+import asyncio
+import logging
+import threading
+from collections import deque
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from typing import Any, AsyncIterator, Dict, Iterator, List, Optional, Set, Tuple
+
+from app.logging_setup import LOG_DIR, LOG_FILE
+
+logger = logging.getLogger(__name__)
+
+LOG_INDEX_STEP = int(os.getenv("LOG_INDEX_STEP", 64 * 1024))
+
+LEVELS = ["DEBUG", "INFO", "WARNING", "ERROR", "CRITICAL"]
+
+# 2026-01-31 12:00:00,123 - имя логгера - LEVEL - сообщение
+_HEADER_RE = re.compile(
+    r"^(\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2}),\d{3} - (.*?) - (DEBUG|INFO|WARNING|ERROR|CRITICAL) - "
+)
+# {"time": "2026-01-31 12:00:00,123", "level": "LEVEL", "logger": "имя логгера", ... (JsonFormatter)
+_JSON_HEADER_RE = re.compile(
+    r'^\{"time": "(\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2}),\d{3}", '
+    r'"level": "(DEBUG|INFO|WARNING|ERROR|CRITICAL)", "logger": "((?:[^"\\]|\\.)*)"'
+)
+
+_BLOCK_SIZE = 64 * 1024
+# Сколько live-tail читает за один опрос
+_FOLLOW_MAX_READ = 1024 * 1024
+
+
+def parse_header(line: str) -> Optional[Tuple[str, str, str]]:
+    """(время 'YYYY-MM-DD HH:MM:SS', логгер, уровень) для первой строки записи, иначе None"""
+    match = _HEADER_RE.match(line)
+    if match:
+        return match.groups()
+    match = _JSON_HEADER_RE.match(line)
+    if match:
+        time, level, logger_name = match.groups()
+        return time, logger_name, level
+    return None
+
+
+def format_line(line: str) -> str:
+    """JSON-запись в текстовом виде (traceback - следующими строками), остальные строки как есть"""
+    if not line.startswith('{"time": '):
+        return line
+    try:
+        data = json.loads(line)
+    except ValueError:
+        return line
+
+    text = f"{data.get('time')} - {data.get('logger')} - {data.get('level')} - {data.get('message')}"
+    context = []
+    if "update_id" in data:
+        context.append(f"update {data['update_id']}")
+    if "user_id" in data:
+        context.append(f"user {data['user_id']}")
+    if "handler_ms" in data:
+        context.append(f"{data['handler_ms']} мс")
+    if "sample_rate" in data:
+        context.append(f"1/{data['sample_rate']}")
+    if context:
+        text += f" [{', '.join(context)}]"
+    if data.get("exc"):
+        text += "\n" + data["exc"]
+    return text
+
+
+def _is_gzip(path: str) -> bool:
+    return path.endswith(".gz")
+
+
+def _open(path: str):
+    return gzip.open(path, "rb") if _is_gzip(path) else open(path, "rb")
+
+
+def _decode(raw: bytes) -> str:
+    return raw.decode("utf-8", errors="replace").rstrip("\r\n")
+
+
+# ==================== ФАЙЛЫ ====================
+
+def list_log_files() -> List[Dict[str, Any]]:
+    """Основной лог, его ротированные копии и файлы из LOG_DIR (новые первыми)"""
+    paths = []
+    log_dir = os.path.dirname(LOG_FILE) or "."
+    base = os.path.basename(LOG_FILE)
+    if os.path.isdir(log_dir):
+        paths += [
+            os.path.normpath(os.path.join(log_dir, name)) for name in os.listdir(log_dir)
+            if name == base or name.startswith(base + ".")
+        ]
+    if os.path.isdir(LOG_DIR):
+        paths += [
+            os.path.normpath(os.path.join(LOG_DIR, name)) for name in os.listdir(LOG_DIR)
+            if ".log" in name and os.path.isfile(os.path.join(LOG_DIR, name))
+        ]
+
+    files = []
+    for path in dict.fromkeys(paths):
+        try:
+            stat = os.stat(path)
+        except OSError:
+            continue
+        files.append({
+            "name": path.replace(os.sep, "/"),
+            "path": path,
+            "size": stat.st_size,
+            "modified": stat.st_mtime,
+            "main": os.path.basename(path).startswith(base),
+            "compressed": _is_gzip(path),
+        })
+    files.sort(key=lambda item: (not item["main"], -item["modified"]))
+    return files
+
+
+def resolve_log_file(name: Optional[str]) -> Optional[str]:
+    """Путь к файлу лога по имени из списка (другие пути не принимаются)"""
+    name = name or LOG_FILE
+    for item in list_log_files():
+        if item["name"] == name.replace(os.sep, "/"):
+            return item["path"]
+    return None
+
+
+# ==================== TAIL ====================
+
+def _reverse_lines(f, start: int, end: int) -> Iterator[bytes]:
+    """Строки диапазона [start, end) несжатого файла с конца к началу"""
+    position = end
+    remainder = b""
+    while position > start:
+        size = min(_BLOCK_SIZE, position - start)
+        position -= size
+        f.seek(position)
+        chunk = f.read(size) + remainder
+        lines = chunk.split(b"\n")
+        # Первая строка блока может продолжаться в предыдущем блоке
+        remainder = lines.pop(0)
+        for line in reversed(lines):
+            yield line
+    if remainder:
+        yield remainder
+
+
+def tail(path: str, lines: int = 100) -> List[str]:
+    """Последние lines строк файла (JSON-записи - в текстовом виде)"""
+    if _is_gzip(path):
+        with _open(path) as f:
+            return [format_line(_decode(line)) for line in deque(f, maxlen=lines)]
+
+    result = []
+    with open(path, "rb") as f:
+        end = f.seek(0, os.SEEK_END)
+        iterator = _reverse_lines(f, 0, end)
+        # Хвост без перевода строки в конце файла - пустая строка, ее не показываем
+        for raw in iterator:
+            if raw or result:
+                result.append(format_line(_decode(raw)))
+                if len(result) >= lines:
+                    break
+    result.reverse()
+    return result
+
+
+# ==================== ИНДЕКС ====================
+
+@dataclass
+class LogIndex:
+    """Разреженный индекс файла лога: время записи через каждые LOG_INDEX_STEP байт"""
+    path: str
+    inode: int = 0
+    end: int = 0                   # до какого смещения файл проиндексирован (граница строки)
+    offsets: List[int] = field(default_factory=list)
+    times: List[str] = field(default_factory=list)
+    first_time: Optional[str] = None
+    last_time: Optional[str] = None
+
+    def update(self):
+        """Дописать индекс для новых данных (файл лога только растет до ротации)"""
+        stat = os.stat(self.path)
+        if stat.st_ino != self.inode or (not _is_gzip(self.path) and stat.st_size < self.end):
+            # Файл заменен или обрезан - индекс строится заново
+            self.inode, self.end = stat.st_ino, 0
+            self.offsets, self.times = [], []
+            self.first_time = self.last_time = None
+        elif _is_gzip(self.path) and self.end:
+            return
+
+        next_checkpoint = (self.offsets[-1] + LOG_INDEX_STEP) if self.offsets else 0
+        with _open(self.path) as f:
+            f.seek(self.end)
+            offset = self.end
+            for raw in f:
+                if not raw.endswith(b"\n"):
+                    break  # Строка еще дописывается
+                header = parse_header(raw.decode("utf-8", errors="replace"))
+                if header:
+                    time = header[0]
+                    if self.first_time is None:
+                        self.first_time = time
+                    self.last_time = time
+                    if offset >= next_checkpoint:
+                        self.offsets.append(offset)
+                        self.times.append(time)
+                        next_checkpoint = offset + LOG_INDEX_STEP
+                offset += len(raw)
+            self.end = offset
+
+    def range_for(self, since: Optional[str], until: Optional[str]) -> Tuple[int, int]:
+        """Диапазон байт, в котором могут быть записи периода [since, until]"""
+        start, end = 0, self.end
+        if since and self.times:
+            i = bisect.bisect_left(self.times, since)
+            start = self.offsets[i - 1] if i > 0 else 0
+        if until and self.times:
+            i = bisect.bisect_right(self.times, until)
+            if i < len(self.offsets):
+                end = self.offsets[i]
+        return start, end
+
+
+class LogIndexCache:
+    """Индексы файлов логов (по пути)"""
+
+    def __init__(self):
+        self._indexes: Dict[str, LogIndex] = {}
+        self._lock = threading.Lock()
+
+    def get(self, path: str) -> LogIndex:
+        with self._lock:
+            index = self._indexes.get(path)
+            if index is None:
+                index = self._indexes[path] = LogIndex(path)
+            index.update()
+            # Индексы удаленных файлов больше не нужны
+            for stale in [p for p in self._indexes if not os.path.exists(p)]:
+                del self._indexes[stale]
+            return index
+
+
+log_indexes = LogIndexCache()
+
+
+# ==================== ПОИСК ====================
+
+def period_bounds(period: Optional[str]) -> Tuple[Optional[str], Optional[str]]:
+    """Границы (since, until) для периода today / yesterday / week / month / all"""
+    now = datetime.now()
+    midnight = now.replace(hour=0, minute=0, second=0, microsecond=0)
+    bounds = {
+        "today": (midnight, None),
+        "yesterday": (midnight - timedelta(days=1), midnight - timedelta(seconds=1)),
+        "week": (now - timedelta(days=7), None),
+        "month": (now - timedelta(days=30), None),
+    }.get(period or "all", (None, None))
+    return tuple(value.strftime("%Y-%m-%d %H:%M:%S") if value else None for value in bounds)
+
+
+def _reverse_records(path: str, start: int, end: int) -> Iterator[Tuple[Tuple[str, str, str], List[str]]]:
+    """Записи (заголовок, строки) диапазона файла с конца; traceback относится к записи выше"""
+    if _is_gzip(path):
+        with _open(path) as f:
+            f.seek(start)
+            raw_lines = f.read(end - start).split(b"\n")
+        lines = reversed(raw_lines)
+    else:
+        f = open(path, "rb")
+        lines = _reverse_lines(f, start, end)
+
+    try:
+        continuation: List[str] = []
+        for raw in lines:
+            line = _decode(raw)
+            header = parse_header(line)
+            if header is None:
+                if line:
+                    continuation.append(line)
+                continue
+            continuation.reverse()
+            yield header, [format_line(line)] + continuation
+            continuation = []
+    finally:
+        if not _is_gzip(path):
+            f.close()
+
+
+def search_logs(name: Optional[str] = None, level: Optional[str] = None, text: Optional[str] = None,
+                since: Optional[str] = None, until: Optional[str] = None, limit: int = 200) -> Dict[str, Any]:
+    """
+    Последние limit записей, подходящих под фильтры (в хронологическом порядке).
+
+    name - конкретный файл, по умолчанию основной лог со всеми ротированными копиями.
+    level - минимальный уровень, text - подстрока без учета регистра, since/until -
+    'YYYY-MM-DD HH:MM:SS'.
+    """
+    if name:
+        path = resolve_log_file(name)
+        if path is None:
+            raise FileNotFoundError(f"Лог {name} не найден")
+        paths = [path]
+    else:
+        paths = [item["path"] for item in list_log_files() if item["main"]]
+
+    min_level = LEVELS.index(level.upper()) if level and level.upper() in LEVELS else 0
+    needle = text.lower() if text else None
+
+    records: List[Dict[str, Any]] = []
+    files_scanned = 0
+    bytes_in_range = 0
+    truncated = False
+
+    for path in paths:
+        index = log_indexes.get(path)
+        if since and index.last_time and index.last_time < since:
+            continue
+        if until and index.first_time and index.first_time > until:
+            continue
+
+        start, end = index.range_for(since, until)
+        files_scanned += 1
+        bytes_in_range += end - start
+        for (time, logger_name, record_level), lines in _reverse_records(path, start, end):
+            if until and time > until:
+                continue
+            if since and time < since:
+                break
+            if LEVELS.index(record_level) < min_level:
+                continue
+            message = "\n".join(lines)
+            if needle and needle not in message.lower():
+                continue
+            records.append({
+                "time": time,
+                "level": record_level,
+                "logger": logger_name,
+                "text": message,
+                "file": path.replace(os.sep, "/"),
+            })
+            if len(records) >= limit:
+                truncated = True
+                break
+        if truncated:
+            break
+
+    records.sort(key=lambda record: record["time"])
+    return {
+        "records": records,
+        "truncated": truncated,
+        "files_scanned": files_scanned,
+        "bytes_in_range": bytes_in_range,
+    }
+
+
+def clear_logs() -> int:
+    """Очистить основной лог и удалить ротированные копии и файлы LOG_DIR"""
+    removed = 0
+    for item in list_log_files():
+        try:
+            if item["path"] == os.path.normpath(LOG_FILE):
+                # Файл открыт обработчиком логирования - обрезаем, а не удаляем
+                with open(item["path"], "wb"):
+                    pass
+            else:
+                os.remove(item["path"])
+            removed += 1
+        except OSError as e:
+            logger.warning(f"⚠️ Не удалось очистить {item['name']}: {e}")
+    return removed
+
+
+# ==================== LIVE-TAIL ====================
+
+# События остановки открытых live-tail (выставляются при выключении веб-сервера)
+_followers: Set[asyncio.Event] = set()
+
+
+def stop_followers():
+    """Завершить все live-tail, чтобы открытые вкладки не задерживали выключение"""
+    for stop in _followers:
+        stop.set()
+
+
+async def follow(path: str, poll_interval: float = 1.0) -> AsyncIterator[List[str]]:
+    """
+    Новые полные строки файла по мере записи (JSON-записи - в текстовом виде); при
+    ротации чтение продолжается с нового файла
+    """
+    stop = asyncio.Event()
+    _followers.add(stop)
+    f = open(path, "rb")
+    try:
+        f.seek(0, os.SEEK_END)
+        inode = os.fstat(f.fileno()).st_ino
+        buffer = b""
+        while True:
+            try:
+                await asyncio.wait_for(stop.wait(), poll_interval)
+                return
+            except asyncio.TimeoutError:
+                pass
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue  # Файл в процессе ротации
+            data = b""
+            if stat.st_ino != inode or stat.st_size < f.tell():
+                # Ротация: дочитываем старый файл и переходим на новый
+                if stat.st_ino != inode:
+                    data = f.read(_FOLLOW_MAX_READ) + b"\n"
+                f.close()
+                f = open(path, "rb")
+                inode = os.fstat(f.fileno()).st_ino
+
+            data += f.read(_FOLLOW_MAX_READ)
+            buffer += data
+            *lines, buffer = buffer.split(b"\n")
+            # Пустой список - новых строк нет (позволяет проверить, что клиент еще подключен)
+            yield [format_line(_decode(line)) for line in lines if line]
+    finally:
+        _followers.discard(stop)
+        f.close()
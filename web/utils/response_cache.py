@@ -0,0 +1,216 @@
+"""
+Кэш ответов веб-панели с ETag / Last-Modified
+
+Страницы и API, которые JavaScript панели опрашивает по таймеру, каждый раз заново
+собирали HTML/JSON и ходили в БД. Теперь готовый ответ хранится в памяти с TTL,
+заданным для маршрута, а браузер получает ETag и Last-Modified и на повторный запрос
+с If-None-Match / If-Modified-Since получает 304 без тела.
+
+Запись кэша сбрасывается раньше TTL, если изменились ее источники данных. Для этого
+не нужны явные вызовы из бота или менеджера БД - источники сверяются по os.stat:
+- "db" - файл БД и его WAL (новые данные, восстановление, импорт);
+- "backups" - директория бэкапов и манифест (создание, удаление, проверка бэкапа).
+"""
+import os
+import gzip
+import time
+import asyncio
+import hashlib
+import logging
+from dataclasses import dataclass
+from typing import Callable, Dict, Optional, Tuple
+
+from aiohttp import web
+
+logger = logging.getLogger(__name__)
+
+WEB_CACHE_ENABLED = os.getenv("WEB_CACHE_ENABLED", "true").lower() in ("1", "true", "yes", "on")
+WEB_CACHE_MAX_ENTRIES = int(os.getenv("WEB_CACHE_MAX_ENTRIES", 256))
+
+# Ответы меньше этого размера не сжимаются
+_MIN_GZIP_SIZE = 1024
+
+
+def _stat_key(path: str) -> Tuple:
+    try:
+        st = os.stat(path)
+        return (st.st_ino, st.st_size, st.st_mtime_ns)
+    except OSError:
+        return ()
+
+
+def _db_fingerprint() -> Tuple:
+    from app.database_manager import db_manager
+    return (_stat_key(db_manager.db_path), _stat_key(f"{db_manager.db_path}-wal"))
+
+
+def _backups_fingerprint() -> Tuple:
+    from app.database_manager import db_manager
+    return (_stat_key(db_manager.backup_dir), _stat_key(db_manager.manifest_file))
+
+
+# Источники данных, от которых зависят закэшированные ответы
+SOURCES: Dict[str, Callable[[], Tuple]] = {
+    "db": _db_fingerprint,
+    "backups": _backups_fingerprint,
+}
+
+
+@dataclass
+class CachedResponse:
+    """Готовый ответ и состояние источников на момент его сборки"""
+    body: bytes
+    content_type: str
+    charset: Optional[str]
+    etag: str
+    last_modified: float
+    expires: float
+    fingerprint: Tuple
+    gzip_body: Optional[bytes] = None
+
+
+@dataclass
+class CacheRule:
+    ttl: float
+    sources: Tuple[str, ...]
+
+
+class ResponseCache:
+    """Кэш GET-ответов по маршрутам с TTL и проверкой источников данных"""
+
+    def __init__(self, enabled: bool = WEB_CACHE_ENABLED, max_entries: int = WEB_CACHE_MAX_ENTRIES):
+        self.enabled = enabled
+        self.max_entries = max_entries
+        self.rules: Dict[str, CacheRule] = {}
+        self._entries: Dict[str, CachedResponse] = {}
+        self._locks: Dict[str, asyncio.Lock] = {}
+        self.hits = 0
+        self.misses = 0
+        self.not_modified = 0
+
+    def register(self, path: str, ttl: float, sources: Tuple[str, ...] = ("db",)):
+        """Кэшировать GET-ответы маршрута path не дольше ttl секунд"""
+        self.rules[path] = CacheRule(ttl=ttl, sources=tuple(sources))
+
+    def invalidate(self, path: Optional[str] = None):
+        """Сбросить записи маршрута (или весь кэш)"""
+        if path is None:
+            self._entries.clear()
+        else:
+            for key in [key for key in self._entries if key.split("?", 1)[0] == path]:
+                del self._entries[key]
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "not_modified": self.not_modified,
+        }
+
+    def _fingerprint(self, rule: CacheRule) -> Tuple:
+        return tuple(SOURCES[source]() for source in rule.sources)
+
+    def _fresh(self, key: str, fingerprint: Tuple) -> Optional[CachedResponse]:
+        entry = self._entries.get(key)
+        if entry and entry.expires > time.monotonic() and entry.fingerprint == fingerprint:
+            return entry
+        return None
+
+    @staticmethod
+    def _client_has(request: web.Request, entry: CachedResponse, etag: str) -> bool:
+        """У клиента уже есть эта версия ответа"""
+        if_none_match = request.if_none_match
+        if if_none_match:
+            return any(tag.value == etag or tag.value == "*" for tag in if_none_match)
+        if_modified_since = request.if_modified_since
+        if if_modified_since:
+            return int(entry.last_modified) <= int(if_modified_since.timestamp())
+        return False
+
+    def _respond(self, request: web.Request, entry: CachedResponse, status: str) -> web.Response:
+        # Сжатая версия готовится один раз на запись кэша, а не на каждый ответ
+        compress = len(entry.body) >= _MIN_GZIP_SIZE and "gzip" in request.headers.get("Accept-Encoding", "")
+        if compress and entry.gzip_body is None:
+            entry.gzip_body = gzip.compress(entry.body, compresslevel=6)
+        etag = f"{entry.etag}-gzip" if compress else entry.etag
+
+        if self._client_has(request, entry, etag):
+            self.not_modified += 1
+            response = web.Response(status=304)
+        elif compress:
+            response = web.Response(body=entry.gzip_body, content_type=entry.content_type, charset=entry.charset)
+            response.headers["Content-Encoding"] = "gzip"
+        else:
+            response = web.Response(body=entry.body, content_type=entry.content_type, charset=entry.charset)
+        response.etag = etag
+        if len(entry.body) >= _MIN_GZIP_SIZE:
+            response.headers["Vary"] = "Accept-Encoding"
+        response.last_modified = entry.last_modified
+        # Браузер хранит ответ, но перед использованием всегда переспрашивает сервер
+        response.headers["Cache-Control"] = "no-cache"
+        response.headers["X-Cache"] = status
+        return response
+
+    async def handle(self, request: web.Request, handler) -> web.StreamResponse:
+        rule = self.rules.get(request.path) if self.enabled else None
+        if rule is None or request.method not in ("GET", "HEAD"):
+            return await handler(request)
+
+        key = request.path_qs
+        fingerprint = self._fingerprint(rule)
+        entry = self._fresh(key, fingerprint)
+        if entry:
+            self.hits += 1
+            return self._respond(request, entry, "HIT")
+
+        # Одновременные промахи по маршруту собирают ответ по очереди, повторный берется из кэша
+        lock = self._locks.setdefault(request.path, asyncio.Lock())
+        async with lock:
+            fingerprint = self._fingerprint(rule)
+            entry = self._fresh(key, fingerprint)
+            if entry:
+                self.hits += 1
+                return self._respond(request, entry, "HIT")
+
+            self.misses += 1
+            response = await handler(request)
+            if not (type(response) is web.Response and response.status == 200
+                    and isinstance(response.body, bytes)):
+                return response
+
+            # Отпечаток снят до сборки: изменения во время сборки сбросят запись на следующем запросе
+            body = response.body
+            entry = CachedResponse(
+                body=body,
+                content_type=response.content_type,
+                charset=response.charset,
+                etag=hashlib.sha1(body).hexdigest(),
+                last_modified=time.time(),
+                expires=time.monotonic() + rule.ttl,
+                fingerprint=fingerprint,
+            )
+            previous = self._entries.get(key)
+            if previous and previous.etag == entry.etag:
+                # Содержимое не изменилось - сохраняем дату изменения для If-Modified-Since
+                entry.last_modified = previous.last_modified
+            self._entries.pop(key, None)
+            self._entries[key] = entry
+            while len(self._entries) > self.max_entries:
+                # Самая старая запись (например, запрос со случайными параметрами)
+                del self._entries[next(iter(self._entries))]
+            return self._respond(request, entry, "MISS")
+
+
+def create_cache_middleware(cache: ResponseCache):
+    """Middleware aiohttp: ответы зарегистрированных маршрутов отдаются из кэша"""
+
+    @web.middleware
+    async def response_cache_middleware(request, handler):
+        return await cache.handle(request, handler)
+
+    return response_cache_middleware
+
+
+# Глобальный экземпляр
+response_cache = ResponseCache()
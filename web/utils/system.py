@@ -10,7 +10,11 @@ def get_system_info():
     """Получение системной информации"""
     try:
         memory = psutil.virtual_memory()
-        cpu_percent = psutil.cpu_percent(interval=0.1)
+        
+        # Загрузка CPU из последнего снимка сборщика метрик: без замера на 0.1 с в запросе
+        from app.metrics_sampler import metrics_sampler
+        sample = metrics_sampler.latest()
+        cpu_percent = sample['system_cpu_percent'] if sample else psutil.cpu_percent(interval=None)
         
         # Время запуска приложения (приблизительно)
         from render_server import START_TIME